@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tokenizer đơn giản cho các field text của schema (lowercase + tách từ theo \\w+)
+- Emulate copyField của managed-schema (search_text_cloud <- search_text, ...)
+- KHÔNG phải VnCoreNLP: terms của từ ghép tiếng Việt sẽ khác với terms Solr index,
+  chỉ dùng khi không có analysis API (solr_stub_server.py, wordcloud_sketch.py --analyzer local)
+"""
+
+import re
+from typing import Any, Dict, List, Set
+
+# Các field text được tokenize khi facet/analyze
+TEXT_FIELDS = {"title", "search_text", "sound", "effect"}
+# copyField trong managed-schema: field đích -> field nguồn
+COPY_FIELDS = {
+    "search_text_cloud": "search_text",
+    "search_text_exactly": "search_text",
+    "sound_exactly": "sound",
+    "effect_exactly": "effect",
+}
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def field_terms(doc: Dict[str, Any], field: str) -> Set[str]:
+    """Các terms được index của một field (emulate analyzer và copyField)"""
+    source = COPY_FIELDS.get(field, field)
+    values = as_list(doc.get(source))
+    if source in TEXT_FIELDS:
+        terms = set()
+        for value in values:
+            terms.update(tokenize(str(value)))
+        return terms
+    return {str(v).lower() if isinstance(v, bool) else str(v) for v in values}
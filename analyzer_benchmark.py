@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script để benchmark tốc độ analyzer (VnCoreNLP tokenizer) trên 3 Solr containers
+- Lấy mẫu documents từ file export, chia nhóm theo độ dài search_text
+- Gửi từng document qua endpoint /analysis/field của field search_text_cloud
+- Đo latency, QTime và tokens/giây theo từng nhóm độ dài và từng container
+- Tách riêng chi phí tokenizer khỏi chi phí commit/merge khi indexing
+
+Cách sử dụng:
+    python analyzer_benchmark.py [data_file] [options]
+
+Ví dụ:
+    python analyzer_benchmark.py exported_data.jsonl
+    python analyzer_benchmark.py exported_data.jsonl --per-bucket 100 --repeat 3
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from json_stream import DocumentReader
+
+ANALYSIS_FIELD = "search_text_cloud"
+PER_BUCKET = 50  # Số documents mẫu mỗi nhóm độ dài
+WARMUP_REQUESTS = 20  # Số request làm nóng (load model VnCoreNLP, JIT)
+
+# Nhóm theo số ký tự của search_text: (tên, min, max)
+LENGTH_BUCKETS = [
+    ("< 200", 0, 200),
+    ("200-1k", 200, 1000),
+    ("1k-5k", 1000, 5000),
+    (">= 5k", 5000, None),
+]
+
+# Container configurations
+CONTAINERS = [
+    {
+        "name": "solr_8_5_2_1_1",
+        "port": 8983,
+        "core": "topic_tanvd",
+        "version": "Solr 8.5.2 (VnCoreNLP 1.1.1)"
+    },
+    {
+        "name": "solr_8_5_2_1_2",
+        "port": 8984,
+        "core": "topic_tanvd",
+        "version": "Solr 8.5.2 (VnCoreNLP 1.2)"
+    },
+    {
+        "name": "solr_9_11",
+        "port": 8985,
+        "core": "topic_tanvd_9",
+        "version": "Solr 9.11"
+    }
+]
+
+
+def get_text(doc: Dict[str, Any]) -> str:
+    """Lấy search_text dạng string (field multiValued nên có thể là list)"""
+    value = doc.get("search_text", "")
+    if isinstance(value, list):
+        return "\n".join(str(item) for item in value)
+    return str(value)
+
+
+def bucket_of(length: int) -> Optional[int]:
+    for idx, (_, low, high) in enumerate(LENGTH_BUCKETS):
+        if length >= low and (high is None or length < high):
+            return idx
+    return None
+
+
+def sample_corpus(data_file: str, per_bucket: int, seed: int) -> List[List[str]]:
+    """Reservoir sampling theo từng nhóm độ dài, đọc file một lần"""
+    rng = random.Random(seed)
+    samples: List[List[str]] = [[] for _ in LENGTH_BUCKETS]
+    seen = [0] * len(LENGTH_BUCKETS)
+
+    for doc in DocumentReader(data_file):
+        text = get_text(doc)
+        if not text.strip():
+            continue
+        idx = bucket_of(len(text))
+        seen[idx] += 1
+        if len(samples[idx]) < per_bucket:
+            samples[idx].append(text)
+        else:
+            j = rng.randrange(seen[idx])
+            if j < per_bucket:
+                samples[idx][j] = text
+    return samples
+
+
+def count_tokens(data: Dict[str, Any], field: str) -> int:
+    """Đếm số tokens ở bước cuối cùng của analysis chain (index-time)"""
+    stages = (data.get("analysis", {}).get("field_names", {})
+              .get(field, {}).get("index", []))
+    # Dạng [className1, [tokens...], className2, [tokens...], ...]
+    for item in reversed(stages):
+        if isinstance(item, list):
+            return len(item)
+    return 0
+
+
+def analyze(session: requests.Session, port: int, core: str, text: str,
+            field: str = ANALYSIS_FIELD) -> Tuple[float, int, int]:
+    """Gửi text qua field analysis API, trả về (latency giây, QTime ms, số tokens)"""
+    url = f"http://localhost:{port}/solr/{core}/analysis/field"
+    data = {
+        "analysis.fieldname": field,
+        "analysis.fieldvalue": text,
+        "analysis.showmatch": "false",
+        "wt": "json"
+    }
+    start = time.perf_counter()
+    # POST để tránh giới hạn độ dài URL với text dài
+    response = session.post(url, data=data, timeout=120)
+    latency = time.perf_counter() - start
+    response.raise_for_status()
+    result = response.json()
+    qtime = result.get("responseHeader", {}).get("QTime", 0)
+    return latency, qtime, count_tokens(result, field)
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def benchmark_container(container: Dict[str, Any], samples: List[List[str]],
+                        repeat: int, warmup: int, field: str) -> Optional[Dict[str, Any]]:
+    session = requests.Session()
+    port, core = container["port"], container["core"]
+
+    # Làm nóng bằng các documents ngắn nhất
+    warm_texts = [t for bucket in samples for t in bucket][:warmup]
+    try:
+        for text in warm_texts:
+            analyze(session, port, core, text, field)
+    except requests.exceptions.RequestException as e:
+        print(f"   ❌ Không thể gọi analysis API trên {container['version']}: {e}")
+        return None
+
+    buckets = []
+    for (label, _, _), texts in zip(LENGTH_BUCKETS, samples):
+        latencies, qtimes = [], []
+        total_tokens = total_chars = errors = 0
+        for _ in range(repeat):
+            for text in texts:
+                try:
+                    latency, qtime, tokens = analyze(session, port, core, text, field)
+                except requests.exceptions.RequestException:
+                    errors += 1
+                    continue
+                latencies.append(latency)
+                qtimes.append(qtime)
+                total_tokens += tokens
+                total_chars += len(text)
+
+        total_latency = sum(latencies)
+        total_qtime = sum(qtimes) / 1000
+        requests_ok = len(latencies)
+        buckets.append({
+            "bucket": label,
+            "requests": requests_ok,
+            "errors": errors,
+            "avg_chars": total_chars / requests_ok if requests_ok else 0,
+            "avg_tokens": total_tokens / requests_ok if requests_ok else 0,
+            "latency_p50_ms": percentile(latencies, 50) * 1000,
+            "latency_p95_ms": percentile(latencies, 95) * 1000,
+            "latency_mean_ms": statistics.mean(latencies) * 1000 if latencies else 0,
+            "qtime_mean_ms": statistics.mean(qtimes) if qtimes else 0,
+            "tokens_per_sec": total_tokens / total_latency if total_latency > 0 else 0,
+            "tokens_per_sec_server": total_tokens / total_qtime if total_qtime > 0 else 0,
+            "chars_per_sec": total_chars / total_latency if total_latency > 0 else 0
+        })
+    return {"container": container["name"], "version": container["version"], "buckets": buckets}
+
+
+def print_results(results: List[Dict[str, Any]]):
+    header = f"   {'Nhóm':<8} {'Req':>5} {'Tokens':>8} {'p50 ms':>9} {'p95 ms':>9} {'QTime':>8} {'tok/s':>10} {'tok/s (QTime)':>14}"
+    for result in results:
+        print(f"📊 {result['version']}")
+        print(header)
+        for b in result["buckets"]:
+            print(f"   {b['bucket']:<8} {b['requests']:>5} {b['avg_tokens']:>8.0f} "
+                  f"{b['latency_p50_ms']:>9.1f} {b['latency_p95_ms']:>9.1f} {b['qtime_mean_ms']:>8.1f} "
+                  f"{b['tokens_per_sec']:>10,.0f} {b['tokens_per_sec_server']:>14,.0f}")
+            if b["errors"]:
+                print(f"      ⚠️  {b['errors']} request lỗi")
+        print()
+
+    # So sánh tokens/giây (theo QTime) giữa các containers cho từng nhóm
+    if len(results) > 1:
+        base = results[0]
+        print(f"📈 So sánh tokens/giây (server) với {base['version']}:")
+        for other in results[1:]:
+            for b0, b1 in zip(base["buckets"], other["buckets"]):
+                if b0["tokens_per_sec_server"] > 0 and b1["tokens_per_sec_server"] > 0:
+                    ratio = b1["tokens_per_sec_server"] / b0["tokens_per_sec_server"]
+                    print(f"   {other['version']} [{b1['bucket']}]: x{ratio:.2f}")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark analyzer qua Solr field analysis API")
+    parser.add_argument("data_file", nargs="?", default="exported_data.jsonl")
+    parser.add_argument("--field", default=ANALYSIS_FIELD, help="Field để analyze (mặc định: search_text_cloud)")
+    parser.add_argument("--per-bucket", type=int, default=PER_BUCKET, help="Số documents mẫu mỗi nhóm độ dài")
+    parser.add_argument("--repeat", type=int, default=1, help="Số lần lặp lại mỗi document")
+    parser.add_argument("--warmup", type=int, default=WARMUP_REQUESTS)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print("━" * 70)
+    print("🔬 Benchmark analyzer trên 3 Solr Containers")
+    print("━" * 70)
+    print(f"📋 Field: {args.field}")
+    print(f"📋 File mẫu: {args.data_file}")
+    print()
+
+    print("📖 Đang lấy mẫu corpus...")
+    try:
+        samples = sample_corpus(args.data_file, args.per_bucket, args.seed)
+    except OSError as e:
+        print(f"❌ Không đọc được file: {e}")
+        sys.exit(1)
+    for (label, _, _), texts in zip(LENGTH_BUCKETS, samples):
+        print(f"   • {label}: {len(texts)} documents")
+    print()
+
+    results = []
+    for container in CONTAINERS:
+        print(f"🔍 Benchmarking {container['version']}...")
+        start = time.time()
+        result = benchmark_container(container, samples, args.repeat, args.warmup, args.field)
+        if result:
+            results.append(result)
+            print(f"   ✅ Xong trong {time.time() - start:.1f}s")
+    print()
+
+    if not results:
+        print("❌ Không có container nào trả về kết quả")
+        sys.exit(1)
+
+    print_results(results)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    json_file = f"analyzer_benchmark_{timestamp}.json"
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            "metadata": {
+                "data_file": args.data_file,
+                "field": args.field,
+                "per_bucket": args.per_bucket,
+                "repeat": args.repeat,
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            },
+            "results": results
+        }, f, indent=2, ensure_ascii=False)
+    print(f"💾 Kết quả JSON đã được lưu vào: {json_file}")
+
+
+if __name__ == "__main__":
+    main()
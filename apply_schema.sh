@@ -1,21 +1,37 @@
 #!/bin/bash
 
-# Script để apply lại schema cho cả 2 Solr containers (8.5.2 và 9.11)
+# Script để apply lại schema (configset) cho tất cả Solr containers song song
+# - Copy configset đã mount vào conf của core đang chạy
+# - Reload core bằng Core Admin API (RELOAD), không restart container
+# - Nếu RELOAD lỗi (hoặc MODE=recreate) thì UNLOAD và CREATE lại core
+# - Đợi theo readiness probe (ping core) thay vì sleep cố định
+#
+# Cách sử dụng:
+#   ./apply_schema.sh [core_solr_8] [core_solr_9]
+#
+# Biến môi trường:
+#   MODE=reload|recreate   reload giữ nguyên index; recreate xóa index và tạo core mới (mặc định: reload)
+#   FORCE=1                Reload kể cả khi configset không thay đổi
+#   READY_TIMEOUT=120      Số giây tối đa đợi Solr/core sẵn sàng
+#   ONLY=solr_9_11         Chỉ apply cho các containers này (phân cách bằng dấu phẩy)
 
 COLLECTION_NAME_8="${1:-topic_tanvd}"
 COLLECTION_NAME_9="${2:-topic_tanvd_9}"
 
-# Cấu hình Solr 8.5.2
-SERVICE_8="solr_8"              # Service name trong docker-compose
-CONTAINER_8="solr_8_5_2"        # Container name
-SOLR_URL_8="http://localhost:8983/solr"
-CONFIGSET_8="wordcloud_config"
+MODE="${MODE:-reload}"
+FORCE="${FORCE:-0}"
+READY_TIMEOUT="${READY_TIMEOUT:-120}"
+POLL_INTERVAL=0.5
 
-# Cấu hình Solr 9.11
-SERVICE_9="solr_9"              # Service name trong docker-compose
-CONTAINER_9="solr_9_11"        # Container name
-SOLR_URL_9="http://localhost:8984/solr"
-CONFIGSET_9="wordcloud_config"
+CONFIGSET_DIR="/opt/solr/server/solr/configsets/wordcloud_config"
+CORE_ROOT="/var/solr/data"
+
+# Danh sách containers: service|container|url|core|label (theo docker-compose.yml)
+TARGETS=(
+    "solr_8_5_2_1_1|solr_8_5_2_1_1|http://localhost:8983/solr|${COLLECTION_NAME_8}|Solr 8.5.2 (VnCoreNLP 1.1.1)"
+    "solr_8_5_2_1_2|solr_8_5_2_1_2|http://localhost:8984/solr|${COLLECTION_NAME_8}|Solr 8.5.2 (VnCoreNLP 1.2)"
+    "solr_9|solr_9_11|http://localhost:8985/solr|${COLLECTION_NAME_9}|Solr 9.11"
+)
 
 # Màu sắc
 GREEN='\033[0;32m'
@@ -25,205 +41,206 @@ BLUE='\033[0;34m'
 CYAN='\033[0;36m'
 NC='\033[0m'
 
+if [ "$MODE" != "reload" ] && [ "$MODE" != "recreate" ]; then
+    echo -e "${RED}❌ MODE không hợp lệ: ${MODE} (reload|recreate)${NC}"
+    exit 1
+fi
+
+WORK_DIR=$(mktemp -d)
+trap 'rm -rf "$WORK_DIR"' EXIT
+
 echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
-echo -e "${BLUE}🔄 Apply Schema cho cả 2 Solr Containers${NC}"
+echo -e "${BLUE}🔄 Apply Schema song song cho ${#TARGETS[@]} Solr Containers (MODE=${MODE})${NC}"
 echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
 echo ""
 
-# Hàm apply schema cho một Solr instance
+now_ms() {
+    echo $(( $(date +%s%N) / 1000000 ))
+}
+
+# Đợi đến khi lệnh trả về thành công hoặc hết READY_TIMEOUT
+wait_until() {
+    local deadline=$(( $(date +%s) + READY_TIMEOUT ))
+    while [ "$(date +%s)" -lt "$deadline" ]; do
+        if "$@"; then
+            return 0
+        fi
+        sleep "$POLL_INTERVAL"
+    done
+    return 1
+}
+
+solr_up() {
+    curl -sf "$1/admin/cores?action=STATUS&wt=json" > /dev/null 2>&1
+}
+
+core_ready() {
+    curl -sf "$1/$2/admin/ping?wt=json" 2>/dev/null | grep -q '"status": *"OK"'
+}
+
+core_exists() {
+    curl -s "$1/admin/cores?action=STATUS&core=$2&wt=json" 2>/dev/null | grep -q "\"name\": *\"$2\""
+}
+
+core_admin() {
+    curl -s "$1/admin/cores?wt=json&$2" 2>/dev/null
+}
+
+# Apply configset cho một container; ghi timings vào $WORK_DIR/<container>.result
 apply_schema_to_solr() {
     local SERVICE_NAME=$1
     local CONTAINER_NAME=$2
     local SOLR_URL=$3
     local COLLECTION_NAME=$4
-    local CONFIGSET=$5
-    local SOLR_VERSION=$6
-    
-    echo -e "${CYAN}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━${NC}"
-    echo -e "${CYAN}📦 Processing: ${SOLR_VERSION}${NC}"
-    echo -e "${CYAN}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━${NC}"
-    echo ""
-    
-    # Bước 1: Kiểm tra Solr
-    echo -e "${BLUE}📋 Bước 1: Kiểm tra Solr ${SOLR_VERSION}...${NC}"
-    if ! curl -s "${SOLR_URL}/admin/ping" > /dev/null 2>&1; then
-        echo -e "${RED}❌ Solr ${SOLR_VERSION} không chạy. Đang khởi động...${NC}"
-        docker-compose up -d ${SERVICE_NAME}
-        echo -e "${YELLOW}   Đợi Solr khởi động (15 giây)...${NC}"
-        sleep 15
-    fi
-    echo -e "${GREEN}✅ Solr ${SOLR_VERSION} đang chạy${NC}"
-    echo ""
-    
-    # Bước 2: Xóa collection cũ TRƯỚC KHI restart (nếu có)
-    echo -e "${BLUE}📋 Bước 2: Xóa collection cũ (nếu có) trước khi restart...${NC}"
-    CORE_CHECK_BEFORE=$(curl -s "${SOLR_URL}/admin/cores?action=STATUS&core=${COLLECTION_NAME}" 2>/dev/null)
-    if echo "$CORE_CHECK_BEFORE" | grep -q "\"name\":\"${COLLECTION_NAME}\"" || \
-       curl -s "${SOLR_URL}/admin/cores?action=STATUS" 2>/dev/null | grep -q "\"${COLLECTION_NAME}\""; then
-        echo -e "${YELLOW}⚠️  Tìm thấy collection cũ: ${COLLECTION_NAME}. Đang xóa...${NC}"
-        curl -s "${SOLR_URL}/admin/cores?action=UNLOAD&core=${COLLECTION_NAME}&deleteIndex=true&deleteDataDir=true&deleteInstanceDir=true" > /dev/null 2>&1
-        sleep 2
-        echo -e "${GREEN}✅ Đã xóa collection cũ${NC}"
-    else
-        echo -e "${GREEN}✅ Không có collection cũ nào${NC}"
-    fi
-    echo ""
-    
-    # Bước 3: Restart Solr để load schema mới
-    echo -e "${BLUE}📋 Bước 2: Restart Solr để load schema mới...${NC}"
-    echo -e "${YELLOW}   Đang restart ${SOLR_VERSION}...${NC}"
-    docker-compose restart ${SERVICE_NAME}
-    if [ $? -ne 0 ]; then
-        echo -e "${RED}❌ Lỗi khi restart ${SOLR_VERSION}${NC}"
-        return 1
-    fi
-    echo -e "${YELLOW}   Đợi Solr khởi động lại (20 giây)...${NC}"
-    sleep 20
-    
-    # Kiểm tra Solr đã sẵn sàng
-    for i in {1..10}; do
-        if curl -s "${SOLR_URL}/admin/ping" > /dev/null 2>&1; then
-            echo -e "${GREEN}✅ Solr ${SOLR_VERSION} đã sẵn sàng${NC}"
-            break
-        fi
-        if [ $i -eq 10 ]; then
-            echo -e "${RED}❌ Solr ${SOLR_VERSION} chưa sẵn sàng sau 10 lần thử${NC}"
+    local SOLR_VERSION=$5
+    local RESULT_FILE="${WORK_DIR}/${CONTAINER_NAME}.result"
+    local CORE_CONF="${CORE_ROOT}/${COLLECTION_NAME}/conf"
+    local t_start t0 t_up=0 t_sync=0 t_apply=0 t_ready=0 action="reload"
+
+    finish() {
+        echo "$1|${action}|${t_up}|${t_sync}|${t_apply}|${t_ready}|$(( $(now_ms) - t_start ))" > "$RESULT_FILE"
+    }
+
+    t_start=$(now_ms)
+
+    # Bước 1: Đảm bảo Solr đang chạy
+    t0=$(now_ms)
+    if ! solr_up "$SOLR_URL"; then
+        echo -e "${YELLOW}⚠️  Solr không chạy, đang khởi động ${SERVICE_NAME}...${NC}"
+        docker-compose up -d "${SERVICE_NAME}"
+        if ! wait_until solr_up "$SOLR_URL"; then
+            echo -e "${RED}❌ Solr chưa sẵn sàng sau ${READY_TIMEOUT}s${NC}"
+            finish FAILED
             return 1
         fi
-        echo -e "${YELLOW}   Đợi... ($i/10)${NC}"
-        sleep 3
-    done
-    echo ""
-    
-    # Bước 4: Xóa collection cũ (sau khi restart, solr-precreate đã tạo lại core với schema cũ nếu core đã tồn tại)
-    echo -e "${BLUE}📋 Bước 4: Xóa collection cũ để tạo lại với schema mới...${NC}"
-    
-    # Kiểm tra core có tồn tại không
-    CORE_CHECK=$(curl -s "${SOLR_URL}/admin/cores?action=STATUS&core=${COLLECTION_NAME}" 2>/dev/null)
-    if echo "$CORE_CHECK" | grep -q "\"name\":\"${COLLECTION_NAME}\"" || \
-       curl -s "${SOLR_URL}/admin/cores?action=STATUS" 2>/dev/null | grep -q "\"${COLLECTION_NAME}\""; then
-        echo -e "${YELLOW}⚠️  Tìm thấy collection: ${COLLECTION_NAME}. Đang xóa...${NC}"
-        
-        # Xóa bằng API (cách đáng tin cậy nhất)
-        curl -s "${SOLR_URL}/admin/cores?action=UNLOAD&core=${COLLECTION_NAME}&deleteIndex=true&deleteDataDir=true&deleteInstanceDir=true" > /dev/null 2>&1
-        
-        # Thử xóa bằng solr command nếu có
-        if [ "$SOLR_VERSION" = "Solr 9.11" ]; then
-            docker exec ${CONTAINER_NAME} solr delete -c "${COLLECTION_NAME}" --solr-url "${SOLR_URL}" 2>&1 | grep -v "ERROR" || true
+    fi
+    t_up=$(( $(now_ms) - t0 ))
+    echo -e "${GREEN}✅ Solr đang chạy ($(( t_up ))ms)${NC}"
+
+    # Bước 2: Đồng bộ configset vào conf của core
+    t0=$(now_ms)
+    if [ "$MODE" = "reload" ] && core_exists "$SOLR_URL" "$COLLECTION_NAME"; then
+        if [ "$FORCE" != "1" ] && docker exec "$CONTAINER_NAME" diff -rq "${CONFIGSET_DIR}/conf" "$CORE_CONF" > /dev/null 2>&1; then
+            echo -e "${GREEN}✅ Configset không thay đổi, bỏ qua (FORCE=1 để reload)${NC}"
+            action="skip"
+        elif ! docker exec "$CONTAINER_NAME" sh -c "cp -r '${CONFIGSET_DIR}/conf/.' '${CORE_CONF}/'"; then
+            echo -e "${RED}❌ Không copy được configset vào ${CORE_CONF}${NC}"
+            finish FAILED
+            return 1
         else
-            docker exec ${CONTAINER_NAME} solr delete -c "${COLLECTION_NAME}" 2>&1 | grep -v "ERROR" || true
-        fi
-        
-        echo -e "${YELLOW}   Đợi collection được xóa hoàn toàn (5 giây)...${NC}"
-        sleep 5
-        
-        # Kiểm tra lại
-        CORE_CHECK_AFTER=$(curl -s "${SOLR_URL}/admin/cores?action=STATUS&core=${COLLECTION_NAME}" 2>/dev/null)
-        if echo "$CORE_CHECK_AFTER" | grep -q "\"name\":\"${COLLECTION_NAME}\""; then
-            echo -e "${YELLOW}⚠️  Core vẫn còn, thử xóa lại...${NC}"
-            curl -s "${SOLR_URL}/admin/cores?action=UNLOAD&core=${COLLECTION_NAME}&deleteIndex=true&deleteDataDir=true&deleteInstanceDir=true" > /dev/null 2>&1
-            sleep 3
+            echo -e "${GREEN}✅ Đã copy configset vào ${CORE_CONF}${NC}"
         fi
-        
-        echo -e "${GREEN}✅ Đã xóa collection cũ${NC}"
     else
-        echo -e "${GREEN}✅ Không có collection cũ nào${NC}"
+        action="recreate"
     fi
-    echo ""
-    
-    # Bước 5: Tạo lại collection
-    echo -e "${BLUE}📋 Bước 5: Tạo lại collection ${COLLECTION_NAME}...${NC}"
-    
-    # Tạo core với đúng URL cho Solr 9
-    CREATE_OUTPUT=""
-    if [ "$SOLR_VERSION" = "Solr 9.11" ]; then
-        CREATE_OUTPUT=$(docker exec ${CONTAINER_NAME} solr create_core -c ${COLLECTION_NAME} -d ${CONFIGSET} --solr-url "${SOLR_URL}" 2>&1)
-    else
-        CREATE_OUTPUT=$(docker exec ${CONTAINER_NAME} solr create_core -c ${COLLECTION_NAME} -d ${CONFIGSET} 2>&1)
+    t_sync=$(( $(now_ms) - t0 ))
+
+    # Bước 3: RELOAD core, nếu lỗi thì tạo lại core
+    t0=$(now_ms)
+    if [ "$action" = "reload" ]; then
+        RELOAD_OUTPUT=$(core_admin "$SOLR_URL" "action=RELOAD&core=${COLLECTION_NAME}")
+        if echo "$RELOAD_OUTPUT" | grep -q '"status": *0[,}]'; then
+            echo -e "${GREEN}✅ Đã RELOAD core ${COLLECTION_NAME}${NC}"
+        else
+            echo -e "${YELLOW}⚠️  RELOAD lỗi, chuyển sang tạo lại core:${NC}"
+            echo "$RELOAD_OUTPUT" | grep -o '"msg": *"[^"]*"' | head -1
+            action="recreate"
+        fi
     fi
-    
-    CREATE_RESULT=$?
-    echo "$CREATE_OUTPUT"
-    
-    # Nếu lỗi do core đã tồn tại, thử xóa và tạo lại
-    if [ $CREATE_RESULT -ne 0 ]; then
-        if echo "$CREATE_OUTPUT" | grep -qi "already exists"; then
-            echo -e "${YELLOW}⚠️  Core đã tồn tại, đang xóa và tạo lại...${NC}"
-            curl -s "${SOLR_URL}/admin/cores?action=UNLOAD&core=${COLLECTION_NAME}&deleteIndex=true&deleteDataDir=true&deleteInstanceDir=true" > /dev/null 2>&1
-            sleep 3
-            
-            if [ "$SOLR_VERSION" = "Solr 9.11" ]; then
-                CREATE_OUTPUT=$(docker exec ${CONTAINER_NAME} solr create_core -c ${COLLECTION_NAME} -d ${CONFIGSET} --solr-url "${SOLR_URL}" 2>&1)
-            else
-                CREATE_OUTPUT=$(docker exec ${CONTAINER_NAME} solr create_core -c ${COLLECTION_NAME} -d ${CONFIGSET} 2>&1)
+    if [ "$action" = "recreate" ]; then
+        if core_exists "$SOLR_URL" "$COLLECTION_NAME"; then
+            core_admin "$SOLR_URL" "action=UNLOAD&core=${COLLECTION_NAME}&deleteIndex=true&deleteDataDir=true" > /dev/null
+            if ! wait_until sh -c "! curl -s '${SOLR_URL}/admin/cores?action=STATUS&core=${COLLECTION_NAME}&wt=json' | grep -q '\"name\": *\"${COLLECTION_NAME}\"'"; then
+                echo -e "${RED}❌ Không UNLOAD được core ${COLLECTION_NAME}${NC}"
+                finish FAILED
+                return 1
             fi
-            CREATE_RESULT=$?
-            echo "$CREATE_OUTPUT"
+            echo -e "${GREEN}✅ Đã UNLOAD core ${COLLECTION_NAME}${NC}"
         fi
+        if ! docker exec "$CONTAINER_NAME" sh -c "rm -rf '${CORE_CONF}' && mkdir -p '${CORE_CONF}' && cp -r '${CONFIGSET_DIR}/conf/.' '${CORE_CONF}/'"; then
+            echo -e "${RED}❌ Không copy được configset vào ${CORE_CONF}${NC}"
+            finish FAILED
+            return 1
+        fi
+        CREATE_OUTPUT=$(core_admin "$SOLR_URL" "action=CREATE&name=${COLLECTION_NAME}&instanceDir=${COLLECTION_NAME}")
+        if ! echo "$CREATE_OUTPUT" | grep -q '"status": *0[,}]'; then
+            echo -e "${RED}❌ Có lỗi xảy ra khi tạo core:${NC}"
+            echo "$CREATE_OUTPUT" | grep -o '"msg": *"[^"]*"' | head -1
+            finish FAILED
+            return 1
+        fi
+        echo -e "${GREEN}✅ Đã tạo lại core ${COLLECTION_NAME} (index rỗng)${NC}"
     fi
-    
-    if [ $CREATE_RESULT -ne 0 ]; then
-        echo -e "${RED}❌ Có lỗi xảy ra khi tạo collection cho ${SOLR_VERSION}${NC}"
-        return 1
-    fi
-    
-    echo -e "${GREEN}✅ Đã tạo collection thành công cho ${SOLR_VERSION}!${NC}"
-    echo ""
-    
-    # Bước 6: Kiểm tra kết quả
-    echo -e "${BLUE}📋 Bước 6: Kiểm tra kết quả...${NC}"
-    STATUS_CHECK=$(curl -s "${SOLR_URL}/admin/cores?action=STATUS&core=${COLLECTION_NAME}" 2>/dev/null | grep -o "\"name\":\"${COLLECTION_NAME}\"" | wc -l)
-    if [ "$STATUS_CHECK" -gt 0 ]; then
-        echo -e "${GREEN}✅ Collection ${COLLECTION_NAME} đã được tạo thành công trên ${SOLR_VERSION}${NC}"
-        return 0
-    else
-        echo -e "${RED}❌ Collection ${COLLECTION_NAME} chưa được tạo trên ${SOLR_VERSION}${NC}"
+    t_apply=$(( $(now_ms) - t0 ))
+
+    # Bước 4: Readiness probe
+    t0=$(now_ms)
+    if ! wait_until core_ready "$SOLR_URL" "$COLLECTION_NAME"; then
+        echo -e "${RED}❌ Core ${COLLECTION_NAME} chưa sẵn sàng sau ${READY_TIMEOUT}s${NC}"
+        finish FAILED
         return 1
     fi
-}
+    t_ready=$(( $(now_ms) - t0 ))
+    echo -e "${GREEN}✅ Core ${COLLECTION_NAME} sẵn sàng${NC}"
 
-# Apply schema cho Solr 8.5.2
-echo -e "${BLUE}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━${NC}"
-echo -e "${BLUE}🚀 Bắt đầu apply schema cho Solr 8.5.2${NC}"
-echo -e "${BLUE}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━${NC}"
-echo ""
-
-apply_schema_to_solr "${SERVICE_8}" "${CONTAINER_8}" "${SOLR_URL_8}" "${COLLECTION_NAME_8}" "${CONFIGSET_8}" "Solr 8.5.2"
-RESULT_8=$?
+    finish OK
+    return 0
+}
 
-echo ""
-echo ""
+# Chạy song song, mỗi container ghi log riêng
+PIDS=()
+NAMES=()
+for target in "${TARGETS[@]}"; do
+    IFS='|' read -r service container url core label <<< "$target"
+    if [ -n "$ONLY" ] && [[ ",${ONLY}," != *",${container},"* ]]; then
+        continue
+    fi
+    echo -e "${CYAN}🚀 Bắt đầu: ${label} (${url}/${core})${NC}"
+    apply_schema_to_solr "$service" "$container" "$url" "$core" "$label" > "${WORK_DIR}/${container}.log" 2>&1 &
+    PIDS+=($!)
+    NAMES+=("$container|$label|$url|$core")
+done
 
-# Apply schema cho Solr 9.11
-echo -e "${BLUE}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━${NC}"
-echo -e "${BLUE}🚀 Bắt đầu apply schema cho Solr 9.11${NC}"
-echo -e "${BLUE}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━${NC}"
-echo ""
+FAILED=0
+for i in "${!PIDS[@]}"; do
+    wait "${PIDS[$i]}" || FAILED=1
+done
 
-apply_schema_to_solr "${SERVICE_9}" "${CONTAINER_9}" "${SOLR_URL_9}" "${COLLECTION_NAME_9}" "${CONFIGSET_9}" "Solr 9.11"
-RESULT_9=$?
+# In log của từng container
+for entry in "${NAMES[@]}"; do
+    IFS='|' read -r container label url core <<< "$entry"
+    echo ""
+    echo -e "${CYAN}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━${NC}"
+    echo -e "${CYAN}📦 ${label}${NC}"
+    echo -e "${CYAN}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━${NC}"
+    sed 's/^/   /' "${WORK_DIR}/${container}.log"
+done
 
+# Bảng thời gian theo container
 echo ""
 echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
-if [ $RESULT_8 -eq 0 ] && [ $RESULT_9 -eq 0 ]; then
-    echo -e "${GREEN}✅ Hoàn thành! Schema đã được apply cho cả 2 Solr containers${NC}"
-    echo ""
-    echo -e "${CYAN}📊 Tóm tắt:${NC}"
-    echo -e "   ${GREEN}✅ Solr 8.5.2:${NC} ${SOLR_URL_8}/${COLLECTION_NAME_8}"
-    echo -e "   ${GREEN}✅ Solr 9.11:${NC} ${SOLR_URL_9}/${COLLECTION_NAME_9}"
-    echo ""
-    echo -e "${BLUE}📝 Để insert data, chạy:${NC}"
-    echo "   ./insert_data.sh"
+echo -e "${CYAN}⏱️  Thời gian theo container (ms):${NC}"
+printf "   %-32s %-8s %-9s %7s %7s %7s %7s %8s\n" "Container" "Status" "Action" "Up" "Sync" "Apply" "Ready" "Total"
+for entry in "${NAMES[@]}"; do
+    IFS='|' read -r container label url core <<< "$entry"
+    IFS='|' read -r status action t_up t_sync t_apply t_ready t_total < "${WORK_DIR}/${container}.result"
+    printf "   %-32s %-8s %-9s %7s %7s %7s %7s %8s\n" "$label" "$status" "$action" "$t_up" "$t_sync" "$t_apply" "$t_ready" "$t_total"
+done
+echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
+
+if [ $FAILED -eq 0 ]; then
+    echo -e "${GREEN}✅ Hoàn thành! Schema đã được apply cho tất cả Solr containers${NC}"
+    if [ "$MODE" = "recreate" ]; then
+        echo ""
+        echo -e "${BLUE}📝 Index đã bị xóa, để insert data chạy:${NC}"
+        echo "   ./insert_data.sh"
+    else
+        echo -e "${YELLOW}💡 RELOAD giữ nguyên index: nếu thay đổi analyzer cần index lại dữ liệu (./insert_data.sh)${NC}"
+    fi
     echo ""
     exit 0
 else
-    echo -e "${RED}❌ Có lỗi xảy ra khi apply schema${NC}"
-    if [ $RESULT_8 -ne 0 ]; then
-        echo -e "${RED}   - Solr 8.5.2: FAILED${NC}"
-    fi
-    if [ $RESULT_9 -ne 0 ]; then
-        echo -e "${RED}   - Solr 9.11: FAILED${NC}"
-    fi
+    echo -e "${RED}❌ Có lỗi xảy ra khi apply schema (xem log ở trên)${NC}"
     echo ""
     exit 1
 fi
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script để bulk index dữ liệu vào các Solr containers
+- Đọc file JSONL hoặc JSON array theo kiểu streaming (bộ nhớ không đổi)
+- Gửi theo batch với nhiều worker song song cho mỗi container
+- Dùng commitWithin thay vì commit=true cho từng request, commit một lần ở cuối
+- Retry các batch bị lỗi với exponential backoff
+- Báo cáo docs/giây cho từng container để so sánh thời gian indexing
+
+Cách sử dụng:
+    python bulk_index.py [target] [data_file] [options]
+
+Tham số:
+    target: "all" (mặc định), "8_1_1", "8_1_2", "9", hoặc "8" (cả 2 Solr 8)
+    data_file: file JSONL hoặc JSON array (mặc định: exported_data.jsonl)
+
+Ví dụ:
+    python bulk_index.py
+    python bulk_index.py 8 exported_data.jsonl --batch-size 2000 --workers 8
+    python bulk_index.py --url http://localhost:8985/solr --core topic_tanvd_9 data.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from json_stream import DocumentReader
+
+# Cấu hình mặc định
+BATCH_SIZE = 1000  # Số documents mỗi request
+WORKERS = 4  # Số request song song cho mỗi container
+COMMIT_WITHIN_MS = 10000  # Solr tự commit trong vòng 10 giây
+MAX_RETRIES = 5  # Số lần retry tối đa cho một batch
+RETRY_BASE_DELAY = 1.0  # Giây, nhân đôi sau mỗi lần retry
+REQUEST_TIMEOUT = 300
+PROGRESS_EVERY = 10  # In tiến độ sau mỗi N batches
+
+# Container configurations (giống insert_data.sh)
+TARGETS = {
+    "8_1_1": {
+        "name": "solr_8_5_2_1_1",
+        "url": "http://localhost:8983/solr",
+        "core": "topic_tanvd",
+        "version": "Solr 8.5.2 (VnCoreNLP 1.1.1)"
+    },
+    "8_1_2": {
+        "name": "solr_8_5_2_1_2",
+        "url": "http://localhost:8984/solr",
+        "core": "topic_tanvd",
+        "version": "Solr 8.5.2 (VnCoreNLP 1.2)"
+    },
+    "9": {
+        "name": "solr_9_11",
+        "url": "http://localhost:8985/solr",
+        "core": "topic_tanvd_9",
+        "version": "Solr 9.11"
+    }
+}
+
+TARGET_GROUPS = {
+    "all": ["8_1_1", "8_1_2", "9"],
+    "8": ["8_1_1", "8_1_2"],
+    "8_1_1": ["8_1_1"],
+    "8_1_2": ["8_1_2"],
+    "9": ["9"]
+}
+
+
+class IndexStats:
+    """Thống kê indexing cho một container"""
+    def __init__(self, version: str):
+        self.version = version
+        self.docs_sent = 0
+        self.docs_failed = 0
+        self.batches = 0
+        self.retries = 0
+        self.index_time = 0.0
+        self.commit_time = 0.0
+        self.num_found: Optional[int] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def total_time(self) -> float:
+        return self.index_time + self.commit_time
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.docs_sent / self.total_time if self.total_time > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "docs_sent": self.docs_sent,
+            "docs_failed": self.docs_failed,
+            "batches": self.batches,
+            "retries": self.retries,
+            "index_time": self.index_time,
+            "commit_time": self.commit_time,
+            "total_time": self.total_time,
+            "docs_per_sec": self.docs_per_sec,
+            "num_found": self.num_found
+        }
+
+
+class BulkIndexer:
+    def __init__(self, solr_url: str, core: str, version: str = "",
+                 batch_size: int = BATCH_SIZE, workers: int = WORKERS,
+                 commit_within: int = COMMIT_WITHIN_MS, max_retries: int = MAX_RETRIES,
+                 drop_version: bool = True, timeout: int = REQUEST_TIMEOUT):
+        self.solr_url = solr_url.rstrip('/')
+        self.core = core
+        self.version = version or core
+        self.update_url = f"{self.solr_url}/{core}/update"
+        self.batch_size = batch_size
+        self.workers = workers
+        self.commit_within = commit_within
+        self.max_retries = max_retries
+        self.drop_version = drop_version
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        """Mỗi worker thread dùng một Session riêng để giữ kết nối"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers['Content-Type'] = 'application/json'
+            self._local.session = session
+        return session
+
+    def ping(self) -> bool:
+        try:
+            response = self._session().get(f"{self.solr_url}/{self.core}/admin/ping",
+                                           params={"wt": "json"}, timeout=10)
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def clear(self):
+        """Xóa toàn bộ dữ liệu cũ"""
+        response = self._session().post(self.update_url, params={"commit": "true"},
+                                         data=json.dumps({"delete": {"query": "*:*"}}),
+                                         timeout=self.timeout)
+        response.raise_for_status()
+
+    def commit(self):
+        response = self._session().post(self.update_url, params={"commit": "true"},
+                                         data='{"commit": {}}', timeout=self.timeout)
+        response.raise_for_status()
+
+    def count(self) -> Optional[int]:
+        try:
+            response = self._session().get(f"{self.solr_url}/{self.core}/select",
+                                           params={"q": "*:*", "rows": "0", "wt": "json"},
+                                           timeout=30)
+            response.raise_for_status()
+            return response.json().get('response', {}).get('numFound')
+        except (requests.exceptions.RequestException, ValueError):
+            return None
+
+    def post_batch(self, payload: bytes, stats: IndexStats) -> Optional[str]:
+        """Gửi một batch, retry với exponential backoff. Trả về lỗi cuối cùng nếu thất bại"""
+        params = {"commitWithin": str(self.commit_within), "overwrite": "true", "wt": "json"}
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                with self._lock:
+                    stats.retries += 1
+                time.sleep(RETRY_BASE_DELAY * (2 ** (attempt - 1)))
+            try:
+                response = self._session().post(self.update_url, params=params,
+                                                data=payload, timeout=self.timeout)
+                if response.status_code == 200:
+                    return None
+                error = f"HTTP {response.status_code}: {response.text[:300]}"
+                # Lỗi 400 (dữ liệu sai) thì retry cũng không giải quyết được
+                if response.status_code == 400:
+                    break
+            except requests.exceptions.RequestException as e:
+                error = str(e)
+        return error
+
+    def index_file(self, data_file: str, failed_file: Optional[str] = None) -> IndexStats:
+        """Index toàn bộ file, giữ tối đa 2 * workers batch trong bộ nhớ"""
+        stats = IndexStats(self.version)
+        reader = DocumentReader(data_file)
+        in_flight = threading.BoundedSemaphore(self.workers * 2)
+        failed_out = None
+
+        def send(batch: List[Dict[str, Any]]):
+            nonlocal failed_out
+            try:
+                payload = json.dumps(batch, ensure_ascii=False).encode('utf-8')
+                error = self.post_batch(payload, stats)
+                with self._lock:
+                    stats.batches += 1
+                    if error is None:
+                        stats.docs_sent += len(batch)
+                    else:
+                        stats.docs_failed += len(batch)
+                        stats.last_error = error
+                        if failed_file:
+                            if failed_out is None:
+                                failed_out = open(failed_file, 'w', encoding='utf-8')
+                            for doc in batch:
+                                failed_out.write(json.dumps(doc, ensure_ascii=False) + '\n')
+                    if stats.batches % PROGRESS_EVERY == 0:
+                        elapsed = time.time() - start
+                        percent = reader.bytes_read * 100 / reader.total_bytes if reader.total_bytes else 0
+                        print(f"   📤 {stats.docs_sent:,} docs | {percent:.1f}% file | "
+                              f"{stats.docs_sent / elapsed if elapsed > 0 else 0:.0f} docs/giây | "
+                              f"retries: {stats.retries} | lỗi: {stats.docs_failed:,}", flush=True)
+            finally:
+                in_flight.release()
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            batch = []
+            for doc in reader:
+                if self.drop_version:
+                    doc.pop('_version_', None)
+                batch.append(doc)
+                if len(batch) >= self.batch_size:
+                    in_flight.acquire()
+                    executor.submit(send, batch)
+                    batch = []
+            if batch:
+                in_flight.acquire()
+                executor.submit(send, batch)
+        stats.index_time = time.time() - start
+
+        if failed_out is not None:
+            failed_out.close()
+        if reader.bad_records:
+            print(f"   ⚠️  Bỏ qua {reader.bad_records:,} records không parse được ({reader.last_error})")
+
+        commit_start = time.time()
+        self.commit()
+        stats.commit_time = time.time() - commit_start
+        stats.num_found = self.count()
+        return stats
+
+
+def format_stats_line(stats: IndexStats) -> str:
+    return (f"{stats.docs_sent:,} docs trong {stats.total_time:.2f}s "
+            f"({stats.docs_per_sec:,.0f} docs/giây, index {stats.index_time:.2f}s + commit {stats.commit_time:.2f}s)")
+
+
+def run_target(target: Dict[str, str], data_file: str, args) -> Optional[IndexStats]:
+    """Index vào một container, trả về None nếu container không sẵn sàng"""
+    print("━" * 70)
+    print(f"📦 Processing: {target['version']}")
+    print("━" * 70)
+
+    indexer = BulkIndexer(target["url"], target["core"], target["version"],
+                          batch_size=args.batch_size, workers=args.workers,
+                          commit_within=args.commit_within, max_retries=args.retries,
+                          drop_version=not args.keep_version)
+
+    if not indexer.ping():
+        print(f"❌ Solr {target['version']} không chạy hoặc core {target['core']} không tồn tại")
+        return None
+    print(f"✅ {target['url']}/{target['core']} đang chạy")
+
+    if not args.keep_existing:
+        print("📋 Xóa dữ liệu cũ...")
+        try:
+            indexer.clear()
+            print("✅ Đã xóa dữ liệu cũ")
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️  Không xóa được dữ liệu cũ: {e}")
+
+    print(f"⏱️  Bắt đầu index (batch {args.batch_size}, {args.workers} workers, "
+          f"commitWithin {args.commit_within}ms)...")
+    failed_file = None
+    if args.failed_dir:
+        os.makedirs(args.failed_dir, exist_ok=True)
+        failed_file = os.path.join(args.failed_dir, f"failed_{target['name']}.jsonl")
+
+    try:
+        stats = indexer.index_file(data_file, failed_file)
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Lỗi khi commit vào {target['version']}: {e}")
+        return None
+
+    print(f"✅ {format_stats_line(stats)}")
+    if stats.retries:
+        print(f"   🔁 Số lần retry: {stats.retries}")
+    if stats.docs_failed:
+        print(f"   ❌ {stats.docs_failed:,} docs lỗi sau {args.retries} lần retry: {stats.last_error}")
+        if failed_file:
+            print(f"      Đã ghi các docs lỗi vào: {failed_file}")
+    if stats.num_found is not None:
+        print(f"   Tổng số documents: {stats.num_found:,}")
+    print()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk index dữ liệu vào các Solr containers")
+    parser.add_argument("target", nargs="?", default="all",
+                        help="Container cần index: " + ", ".join(sorted(TARGET_GROUPS)) + " (mặc định: all)")
+    parser.add_argument("data_file", nargs="?", default="exported_data.jsonl",
+                        help="File JSONL hoặc JSON array (mặc định: exported_data.jsonl)")
+    parser.add_argument("--url", help="Solr URL, dùng cùng --core thay cho target")
+    parser.add_argument("--core", help="Tên core khi dùng --url")
+    parser.add_argument("--label", help="Tên hiển thị khi dùng --url")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--commit-within", type=int, default=COMMIT_WITHIN_MS, help="commitWithin (ms)")
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES)
+    parser.add_argument("--keep-existing", action="store_true", help="Không xóa dữ liệu cũ trước khi index")
+    parser.add_argument("--keep-version", action="store_true", help="Giữ field _version_ (mặc định: bỏ)")
+    parser.add_argument("--failed-dir", help="Thư mục ghi các docs không index được")
+    parser.add_argument("--report", help="Ghi thống kê ra file JSON")
+    args = parser.parse_args()
+
+    # Khi dùng --url thì tham số đầu tiên là data_file
+    if args.url and args.target not in TARGET_GROUPS:
+        args.data_file = args.target
+    elif args.target not in TARGET_GROUPS:
+        parser.error(f"target không hợp lệ: {args.target}")
+
+    if not os.path.exists(args.data_file):
+        print(f"❌ Không tìm thấy file data: {args.data_file}")
+        sys.exit(1)
+
+    if args.url:
+        if not args.core:
+            parser.error("--url cần đi kèm --core")
+        targets = [{"name": args.core, "url": args.url, "core": args.core,
+                    "version": args.label or f"{args.url}/{args.core}"}]
+    else:
+        targets = [TARGETS[key] for key in TARGET_GROUPS[args.target]]
+
+    print("━" * 70)
+    print("📥 Bulk index dữ liệu vào Solr")
+    print("━" * 70)
+    print(f"📁 File: {args.data_file} ({os.path.getsize(args.data_file) / (1024 * 1024):.1f} MB)")
+    print(f"🎯 Containers: {', '.join(t['version'] for t in targets)}")
+    print()
+
+    results = []
+    for target in targets:
+        stats = run_target(target, args.data_file, args)
+        results.append((target, stats))
+
+    print("━" * 70)
+    print("📊 KẾT QUẢ SO SÁNH THỜI GIAN INDEXING")
+    print("━" * 70)
+    for target, stats in results:
+        if stats is None:
+            print(f"   ❌ {target['version']}: FAILED")
+        else:
+            status = "✅" if stats.docs_failed == 0 else "⚠️ "
+            print(f"   {status} {target['version']}: {format_stats_line(stats)}")
+    print()
+
+    if args.report:
+        report = {
+            "data_file": args.data_file,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "batch_size": args.batch_size,
+            "workers": args.workers,
+            "commit_within": args.commit_within,
+            "results": {t["name"]: (s.to_dict() if s else None) for t, s in results}
+        }
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Đã lưu thống kê vào: {args.report}")
+
+    ok = all(s is not None and s.docs_failed == 0 for _, s in results)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
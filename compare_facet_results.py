@@ -3,25 +3,59 @@
 """
 Script để so sánh kết quả facet giữa 3 Solr containers
 - Lấy 100 documents đầu tiên từ Solr
-- Query từng ID trên cả 3 containers
+- Gom các documents có search_text giống nhau (hash nội dung), mỗi nội dung chỉ query một lần
+- Query từng nội dung trên cả 3 containers, kết quả được áp dụng cho mọi document cùng hash
 - So sánh kết quả facet giữa các containers
 
 Cách sử dụng:
-    python compare_facet_results.py [num_docs] [source_port]
+    python compare_facet_results.py [num_docs] [source_port] [--no-dedup] [--cold | --warm] [--hedge=MS]
+                                    [--reconcile] [--exhaustive] [--profile[=cprofile|folded]]
     
 Tham số:
     num_docs: Số documents để lấy (mặc định: 100)
     source_port: Port của Solr để lấy danh sách documents (mặc định: 8983)
+    --no-dedup: Query từng document, không gom theo search_text
+    --cold: RELOAD core trước khi query (đo với cache rỗng)
+    --warm: Chạy warming queries trước khi query (đo với cache đã nóng)
+    --hedge=MS: Gửi thêm một request nếu query chậm hơn MS mili giây (cắt tail latency)
+    --exhaustive: Lấy đủ tất cả facet terms của documents dài (vượt facet.limit) bằng facet.offset
+    --reconcile: Đối chiếu toàn bộ id giữa các containers trước (cursorMark, ghi danh sách id thiếu/thừa)
+    --profile: Ghi cProfile dump (.prof), --profile=folded ghi folded stacks cho flame graph
+
+Cache stats (/admin/mbeans) của từng container được snapshot trước và sau bước query,
+delta (hit ratio, evictions, size) được ghi vào log và file JSON.
+
+Trước khi query facet, các documents được lấy mẫu được kiểm tra có trên mọi container không
+({!terms f=id} theo batch). Document thiếu trên một container là lỗi index, được báo cáo riêng
+và không được query/so sánh, để không bị tính là khác biệt do tokenizer.
+
+Document có nhiều terms hơn facet.limit bị cắt khác nhau trên mỗi container nên bị tính là khác biệt
+dù analyzer giống nhau. Các documents này được đếm và báo cáo; với --exhaustive, kết quả có đủ
+facet.limit terms được lấy tiếp các trang facet.offset song song (document ngắn vẫn chỉ 1 request).
+
+Query lỗi được retry với backoff, mỗi container có circuit breaker riêng; query vẫn lỗi
+được ghi nhận là lỗi (không tính là "Document không tồn tại") và bị loại khỏi phần so sánh.
+
+Thời gian theo phase (http, decode, compare, report) được in cuối log và lưu trong metadata JSON.
 """
 
-import requests
+import hashlib
 import json
+import re
 import sys
 from urllib.parse import urlencode
-from collections import defaultdict
+from collections import Counter, defaultdict
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from reconcile_documents import check_presence, format_reconcile_report, reconcile
+from resilience import CircuitOpenError, RequestFailed, ResilientClient, RetryPolicy
+from solr_javabin import facet_pairs, solr_get
+from solr_cache_stats import (build_warming_queries, delta_containers, format_cache_report,
+                              reload_core, run_queries, snapshot_containers)
+from tracing import TRACER, pop_profile_arg, profiled, span
+
 # Thử import openpyxl, nếu không có thì sẽ báo lỗi khi cần
 try:
     from openpyxl import Workbook
@@ -31,9 +65,42 @@ try:
 except ImportError:
     HAS_OPENPYXL = False
 
-# Tham số từ command line
-NUM_DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
-SOURCE_PORT = int(sys.argv[2]) if len(sys.argv) > 2 else 8983
+# Tham số từ command line (được parse trong main() để module có thể import từ script khác)
+NUM_DOCS = 1000
+SOURCE_PORT = 8983
+DEDUP = True
+WARM = False
+COLD = False
+HEDGE_MS = None
+RECONCILE = False
+EXHAUSTIVE = False
+PROFILE = None
+
+# Retry/backoff + circuit breaker theo container cho facet queries
+CLIENT = ResilientClient(RetryPolicy(max_attempts=4, base_delay=0.5, max_delay=10))
+
+# Số trang facet.offset lấy song song mỗi đợt khi kết quả bị cắt ở facet.limit
+FACET_PAGE_WORKERS = 4
+_page_executor = None
+
+
+def parse_cli_args(argv):
+    """Parse tham số dòng lệnh vào các biến module"""
+    global NUM_DOCS, SOURCE_PORT, DEDUP, WARM, COLD, HEDGE_MS, RECONCILE, EXHAUSTIVE, CLIENT, PROFILE
+    PROFILE, argv = pop_profile_arg(argv)
+    positional_args = [arg for arg in argv if not arg.startswith("--")]
+    NUM_DOCS = int(positional_args[0]) if len(positional_args) > 0 else NUM_DOCS
+    SOURCE_PORT = int(positional_args[1]) if len(positional_args) > 1 else SOURCE_PORT
+    DEDUP = "--no-dedup" not in argv
+    WARM = "--warm" in argv
+    COLD = "--cold" in argv
+    RECONCILE = "--reconcile" in argv
+    EXHAUSTIVE = "--exhaustive" in argv
+    for arg in argv:
+        if arg.startswith("--hedge="):
+            HEDGE_MS = float(arg.split("=", 1)[1])
+    if HEDGE_MS is not None:
+        CLIENT = ResilientClient(CLIENT.policy, hedge_after=HEDGE_MS / 1000)
 
 # Query parameters cho facet
 FACET_PARAMS = {
@@ -43,7 +110,6 @@ FACET_PARAMS = {
     "facet.sort": "count",
     "rows": "0",
     "wt": "json",
-    "indent": "true",
     "facet.limit": "1000",
     "facet.mincount": "1"
 }
@@ -82,9 +148,7 @@ def get_document_ids(port, core, num_docs):
     }
     
     try:
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
+        data = CLIENT.call(str(port), lambda: solr_get(None, url, params, timeout=30))
         
         ids = [doc["id"] for doc in data.get("response", {}).get("docs", [])]
         return ids
@@ -93,63 +157,114 @@ def get_document_ids(port, core, num_docs):
         return []
 
 
-def get_search_text(port, core, doc_id):
-    """Lấy field search_text từ document"""
+def join_search_text(search_text):
+    """search_text là field multiValued, join lại thành string"""
+    if isinstance(search_text, list):
+        return "\n".join(str(item) for item in search_text)
+    return str(search_text) if search_text is not None else ""
+
+
+def get_documents(port, core, num_docs):
+    """Lấy danh sách (ID, search_text) trong một request thay vì query search_text từng document"""
     url = f"http://localhost:{port}/solr/{core}/select"
     params = {
-        "q": f"id:{doc_id}",
-        "fl": "search_text",
-        "rows": 1,
+        "q": "*:*",
+        "rows": num_docs,
+        "fl": "id,search_text",
         "wt": "json"
     }
     
     try:
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        
-        docs = data.get("response", {}).get("docs", [])
-        if docs and "search_text" in docs[0]:
-            search_text = docs[0]["search_text"]
-            # Nếu là list, join lại thành string
-            if isinstance(search_text, list):
-                return "\n".join(str(item) for item in search_text)
-            return str(search_text)
-        return ""
+        data = CLIENT.call(str(port), lambda: solr_get(None, url, params, timeout=60))
+        
+        return [(doc["id"], doc.get("search_text", ""))
+                for doc in data.get("response", {}).get("docs", [])]
     except Exception as e:
-        return ""
+        print(f"❌ ERROR khi lấy documents: {str(e)}")
+        return []
+
+
+def text_hash(search_text):
+    """
+    Hash nội dung search_text đã chuẩn hóa nhẹ
+    
+    Chỉ gộp khoảng trắng và bỏ giá trị rỗng (tokenizer không phân biệt),
+    không lowercase/chuẩn hóa Unicode vì analyzer có thể cho kết quả khác.
+    Các giá trị của field multiValued được analyze riêng nên giữ ranh giới giữa chúng.
+    """
+    values = search_text if isinstance(search_text, list) else [search_text]
+    normalized = [re.sub(r"\s+", " ", str(v)).strip() for v in values if v is not None]
+    normalized = [v for v in normalized if v]
+    return hashlib.sha1("\x1f".join(normalized).encode("utf-8")).hexdigest()
+
+
+def group_by_text(docs):
+    """Gom document IDs theo hash search_text, giữ thứ tự xuất hiện"""
+    groups = {}
+    for doc_id, search_text in docs:
+        groups.setdefault(text_hash(search_text), []).append(doc_id)
+    return groups
+
 
+def _get_page_executor():
+    global _page_executor
+    if _page_executor is None:
+        _page_executor = ThreadPoolExecutor(max_workers=FACET_PAGE_WORKERS, thread_name_prefix="facet-page")
+    return _page_executor
 
-def get_facet_results(port, core, doc_id):
-    """Lấy kết quả facet cho một document ID"""
+
+def _facet_terms(data):
+    """Facet terms của search_text_cloud: list phẳng [term1, count1, ...] (JSON) hoặc TermCounts (javabin)"""
+    facet_field = data.get("facet_counts", {}).get("facet_fields", {}).get("search_text_cloud", [])
+    return facet_pairs(facet_field)
+
+
+def get_facet_results(port, core, doc_id, exhaustive=None):
+    """
+    Lấy kết quả facet cho một document ID
+
+    Nếu exhaustive (mặc định theo --exhaustive) và kết quả có đủ facet.limit terms (bị cắt),
+    lấy tiếp các trang facet.offset song song (tối đa FACET_PAGE_WORKERS trang mỗi đợt) đến khi
+    gặp trang thiếu. facet.sort=count phá hòa theo thứ tự index nên các trang không chồng lên nhau.
+
+    Raise RequestFailed/CircuitOpenError nếu query lỗi, để không nhầm với document không tồn tại.
+    """
     url = f"http://localhost:{port}/solr/{core}/select"
     params = FACET_PARAMS.copy()
     params["fq"] = f"id:{doc_id}"
     
-    try:
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Extract facet terms
-        facet_field = data.get("facet_counts", {}).get("facet_fields", {}).get("search_text_cloud", [])
-        
-        # Convert từ array [term1, count1, term2, count2, ...] thành dict
-        facet_dict = {}
-        for i in range(0, len(facet_field), 2):
-            if i + 1 < len(facet_field):
-                term = facet_field[i]
-                count = facet_field[i + 1]
-                facet_dict[term] = count
-        
-        return facet_dict, data.get("response", {}).get("numFound", 0)
-    except Exception as e:
-        print(f"   ❌ ERROR khi query ID {doc_id}: {str(e)}")
-        return {}, 0
+    data = CLIENT.call(str(port), lambda: solr_get(None, url, params, timeout=30, compact=True))
+    
+    pairs = _facet_terms(data)
+    facet_dict = dict(pairs)
+    limit = int(params["facet.limit"])
+    if exhaustive is None:
+        exhaustive = EXHAUSTIVE
+    
+    if exhaustive and 0 < limit <= len(pairs):
+        def fetch_page(offset):
+            page_params = dict(params, **{"facet.offset": str(offset)})
+            return _facet_terms(CLIENT.call(str(port), lambda: solr_get(None, url, page_params,
+                                                                         timeout=30, compact=True)))
+        
+        # Đợt đầu 1 trang (đa số document dài chỉ vượt limit một ít), sau đó tăng gấp đôi số trang
+        offset, batch = limit, 1
+        while True:
+            offsets = [offset + i * limit for i in range(batch)]
+            pages = list(_get_page_executor().map(fetch_page, offsets))
+            for page in pages:
+                facet_dict.update(page)
+            if any(len(page) < limit for page in pages):
+                break
+            offset += batch * limit
+            batch = min(batch * 2, FACET_PAGE_WORKERS)
+    
+    return facet_dict, data.get("response", {}).get("numFound", 0)
 
 
-def compare_facet_results(results_dict):
-    """So sánh kết quả facet giữa các containers"""
+def compare_facet_results(results_dict, failures=None):
+    """So sánh kết quả facet giữa các containers (bỏ qua documents bị query lỗi ở một trong hai bên)"""
+    failures = failures or {}
     comparisons = []
     
     # So sánh từng cặp containers
@@ -167,8 +282,13 @@ def compare_facet_results(results_dict):
             only_in_1 = 0
             only_in_2 = 0
             total_terms_diff = 0
+            failed_count = 0
             
             for doc_id in results_dict:
+                failed = failures.get(doc_id, {})
+                if version1 in failed or version2 in failed:
+                    failed_count += 1
+                    continue
                 facets1 = results_dict[doc_id].get(version1, {})
                 facets2 = results_dict[doc_id].get(version2, {})
                 
@@ -198,14 +318,16 @@ def compare_facet_results(results_dict):
                 "different": diff_count,
                 "only_in_1": only_in_1,
                 "only_in_2": only_in_2,
+                "failed": failed_count,
                 "avg_terms_diff": total_terms_diff / diff_count if diff_count > 0 else 0
             })
     
     return comparisons
 
 
-def export_to_excel(results_dict, search_text_dict, ids, timestamp, logger):
+def export_to_excel(results_dict, search_text_dict, ids, timestamp, logger, dedup_stats=None, failures=None):
     """Xuất kết quả facet ra file Excel"""
+    failures = failures or {}
     if not HAS_OPENPYXL:
         logger.log("⚠️  Thư viện openpyxl chưa được cài đặt. Không thể tạo file Excel.")
         logger.log("   Cài đặt bằng lệnh: pip install openpyxl")
@@ -258,8 +380,12 @@ def export_to_excel(results_dict, search_text_dict, ids, timestamp, logger):
         # Cột 3-5: Facet results cho từng container
         for col_idx, container in enumerate(CONTAINERS, 3):
             facets = results_dict[doc_id].get(container["version"], {})
+            error = failures.get(doc_id, {}).get(container["version"])
             
-            if not facets:
+            if error:
+                cell = ws.cell(row=row_idx, column=col_idx, value=f"❌ Query lỗi: {error}")
+                cell.font = Font(size=10, italic=True, color="C00000")
+            elif not facets:
                 cell_value = "Document không tồn tại"
                 cell = ws.cell(row=row_idx, column=col_idx, value=cell_value)
                 cell.font = Font(size=10, italic=True, color="808080")
@@ -312,6 +438,9 @@ def export_to_excel(results_dict, search_text_dict, ids, timestamp, logger):
     total_docs = len(ids)
     stats_data = [
         ["Tổng số documents", total_docs],
+        ["Số nội dung search_text khác nhau", dedup_stats["distinct_texts"] if dedup_stats else total_docs],
+        ["Dedup ratio (%)", round(dedup_stats["dedup_ratio"] * 100, 2) if dedup_stats else 0],
+        ["Tổng số queries", dedup_stats["total_queries"] if dedup_stats else total_docs * len(CONTAINERS)],
         ["Solr 8.5.2 (VnCoreNLP 1.1.1)", ""],
         ["  - Documents có facet", sum(1 for doc_id in ids if results_dict[doc_id].get(CONTAINERS[0]["version"], {}))],
         ["Solr 8.5.2 (VnCoreNLP 1.2)", ""],
@@ -324,6 +453,8 @@ def export_to_excel(results_dict, search_text_dict, ids, timestamp, logger):
     same_count = 0
     diff_count = 0
     for doc_id in ids:
+        if failures.get(doc_id):
+            continue
         facets1 = results_dict[doc_id].get(CONTAINERS[0]["version"], {})
         facets2 = results_dict[doc_id].get(CONTAINERS[1]["version"], {})
         facets3 = results_dict[doc_id].get(CONTAINERS[2]["version"], {})
@@ -338,6 +469,7 @@ def export_to_excel(results_dict, search_text_dict, ids, timestamp, logger):
         ["So sánh", ""],
         ["  - Documents giống nhau (cả 3 containers)", same_count],
         ["  - Documents khác nhau", diff_count],
+        ["  - Documents bị query lỗi (không so sánh)", sum(1 for doc_id in ids if failures.get(doc_id))],
     ])
     
     # Ghi thống kê
@@ -375,6 +507,12 @@ class Logger:
 
 
 def main():
+    parse_cli_args(sys.argv[1:])
+    with profiled(PROFILE, "compare_facet_results"):
+        run_comparison()
+
+
+def run_comparison():
     # Tạo log file
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_file = f"facet_comparison_log_{timestamp}.txt"
@@ -396,14 +534,64 @@ def main():
         logger.log()
         
         source_container = CONTAINERS[0]  # Dùng container đầu tiên làm source
-        ids = get_document_ids(SOURCE_PORT, source_container["core"], NUM_DOCS)
+        docs = get_documents(SOURCE_PORT, source_container["core"], NUM_DOCS)
+        ids = [doc_id for doc_id, _ in docs]
         
         if not ids:
             logger.log("❌ Không lấy được document IDs. Kiểm tra lại Solr containers.")
             sys.exit(1)
         
+        search_text_dict = {doc_id: join_search_text(text) for doc_id, text in docs}  # Lưu search_text cho mỗi document
+        
         logger.log(f"✅ Đã lấy được {len(ids)} document IDs")
         logger.log(f"   Ví dụ IDs: {ids[:5] if len(ids) >= 5 else ids}")
+        
+        # Documents không có trên mọi container là lỗi index: báo cáo riêng, không query facet
+        reconcile_result = None
+        if RECONCILE:
+            logger.log("🧮 Đối chiếu toàn bộ id giữa các containers...")
+            try:
+                with span("reconcile"):
+                    reconcile_result = reconcile(CLIENT, CONTAINERS, f"reconcile_{timestamp}")
+                for line in format_reconcile_report(reconcile_result, CONTAINERS):
+                    logger.log(f"   {line}")
+            except (RequestFailed, CircuitOpenError, ValueError) as e:
+                logger.log(f"⚠️  Không đối chiếu được toàn bộ id: {e}")
+        
+        with span("presence"):
+            presence = check_presence(CLIENT, CONTAINERS, ids)
+        missing_docs = presence["missing"]
+        for version, error in presence["errors"].items():
+            logger.log(f"⚠️  Không kiểm tra được documents trên {version} (vẫn query facet): {error}")
+        if missing_docs:
+            missing_per_container = Counter(v for versions in missing_docs.values() for v in versions)
+            logger.log(f"⚠️  {len(missing_docs)} documents thiếu trên ít nhất một container "
+                       f"(lỗi index, không so sánh facet):")
+            for container in CONTAINERS:
+                if missing_per_container[container["version"]]:
+                    logger.log(f"   - {container['version']}: thiếu {missing_per_container[container['version']]}")
+            for doc_id, versions in list(missing_docs.items())[:10]:
+                logger.log(f"   {doc_id}: {', '.join(versions)}")
+            if len(missing_docs) > 10:
+                logger.log(f"   ... (và {len(missing_docs) - 10} documents khác, xem missing_docs trong file JSON)")
+        else:
+            logger.log(f"✅ Tất cả {len(ids)} documents có trên cả {len(CONTAINERS)} containers")
+        
+        docs = [(doc_id, text) for doc_id, text in docs if doc_id not in missing_docs]
+        compared_ids = [doc_id for doc_id, _ in docs]
+        if not compared_ids:
+            logger.log("❌ Không có document nào có trên tất cả containers để so sánh.")
+            sys.exit(1)
+        
+        # Gom documents có cùng search_text: cùng nội dung qua cùng analyzer cho cùng facet
+        if DEDUP:
+            groups = list(group_by_text(docs).values())
+        else:
+            groups = [[doc_id] for doc_id in compared_ids]
+        dedup_ratio = 1 - len(groups) / len(compared_ids)
+        logger.log(f"✅ Số nội dung search_text khác nhau: {len(groups)} "
+                   f"(dedup ratio: {dedup_ratio*100:.1f}%, "
+                   f"tiết kiệm {(len(compared_ids) - len(groups)) * len(CONTAINERS)} queries)")
         logger.log()
     
         # Bước 2: Query từng ID trên cả 3 containers
@@ -412,34 +600,71 @@ def main():
         logger.log("━" * 70)
         logger.log()
         
+        # Chuẩn bị trạng thái cache theo chế độ đo
+        cache_mode = "cold" if COLD else "warm" if WARM else "as-is"
+        if COLD:
+            for container in CONTAINERS:
+                ok = reload_core(container["port"], container["core"])
+                logger.log(f"🧊 RELOAD {container['version']}: {'✅' if ok else '❌ lỗi'}")
+        elif WARM:
+            warming_queries = build_warming_queries(FACET_PARAMS, compared_ids)
+            for container in CONTAINERS:
+                warm = run_queries(container["port"], container["core"], warming_queries)
+                logger.log(f"🔥 Warming {container['version']}: {warm['queries']} queries, {warm['errors']} lỗi")
+        cache_before = snapshot_containers(CONTAINERS)
+        
         results_dict = defaultdict(dict)
-        search_text_dict = {}  # Lưu search_text cho mỗi document
-        total_queries = len(ids) * len(CONTAINERS)
+        failures = defaultdict(dict)  # {doc_id: {version: lỗi}}
+        facet_limit = int(FACET_PARAMS["facet.limit"])
+        long_docs = defaultdict(dict)  # {doc_id: {version: số terms}} khi số terms chạm facet.limit
+        estimated_queries = len(groups) * len(CONTAINERS)
         current_query = 0
         
         start_time = time.time()
         
-        for idx, doc_id in enumerate(ids, 1):
-            logger.log(f"📄 Processing document {idx}/{len(ids)}: {doc_id}")
-            
-            # Lấy search_text từ container đầu tiên
-            search_text = get_search_text(SOURCE_PORT, source_container["core"], doc_id)
-            search_text_dict[doc_id] = search_text
+        for idx, group in enumerate(groups, 1):
+            doc_id = group[0]
+            if len(group) > 1:
+                logger.log(f"📄 Processing document {idx}/{len(groups)}: {doc_id} (+{len(group) - 1} documents cùng search_text)")
+            else:
+                logger.log(f"📄 Processing document {idx}/{len(groups)}: {doc_id}")
             
             for container in CONTAINERS:
-                current_query += 1
                 logger.log(f"   🔍 Querying {container['version']}...", end=" ")
                 
-                facets, num_found = get_facet_results(
-                    container["port"],
-                    container["core"],
-                    doc_id
-                )
+                # Nếu document đại diện không có trên container, thử document khác cùng nhóm
+                facets, num_found, error = {}, 0, None
+                for member_id in group:
+                    current_query += 1
+                    try:
+                        facets, num_found = get_facet_results(
+                            container["port"],
+                            container["core"],
+                            member_id
+                        )
+                    except (RequestFailed, CircuitOpenError) as e:
+                        error = str(e)
+                        break
+                    if num_found > 0:
+                        break
                 
-                results_dict[doc_id][container["version"]] = facets
+                is_long = not error and len(facets) >= facet_limit
+                for member_id in group:
+                    if error:
+                        failures[member_id][container["version"]] = error
+                    else:
+                        results_dict[member_id][container["version"]] = facets
+                    if is_long:
+                        long_docs[member_id][container["version"]] = len(facets)
                 
-                if num_found == 0:
+                if error:
+                    logger.log(f"❌ Query lỗi: {error}")
+                elif num_found == 0:
                     logger.log(f"⚠️  Document không tồn tại")
+                elif is_long and not EXHAUSTIVE:
+                    logger.log(f"⚠️  {len(facets)} facet terms (bị cắt ở facet.limit, dùng --exhaustive để lấy đủ)")
+                elif is_long:
+                    logger.log(f"✅ {len(facets)} facet terms (vượt facet.limit, đã lấy thêm bằng facet.offset)")
                 else:
                     logger.log(f"✅ {len(facets)} facet terms")
             
@@ -447,13 +672,31 @@ def main():
             if idx % 10 == 0:
                 elapsed = time.time() - start_time
                 avg_time = elapsed / current_query
-                remaining = (total_queries - current_query) * avg_time
-                logger.log(f"   ⏱️  Progress: {current_query}/{total_queries} queries ({idx}/{len(ids)} docs)")
+                remaining = max(0, estimated_queries - current_query) * avg_time
+                logger.log(f"   ⏱️  Progress: {current_query}/{estimated_queries} queries ({idx}/{len(groups)} nội dung)")
                 logger.log(f"   ⏱️  Estimated time remaining: {remaining:.1f}s")
             logger.log()
         
+        total_queries = current_query
+        
         elapsed_time = time.time() - start_time
         logger.log(f"✅ Hoàn thành query {total_queries} queries trong {elapsed_time:.2f} giây")
+        failed_queries = sum(len(errors) for errors in failures.values())
+        if failed_queries:
+            logger.log(f"❌ {failed_queries} kết quả (document x container) bị query lỗi, "
+                       f"{len(failures)} documents không được so sánh đầy đủ")
+        if long_docs:
+            action = "đã lấy đủ terms (--exhaustive)" if EXHAUSTIVE else "kết quả bị cắt, so sánh không chính xác"
+            logger.log(f"📏 {len(long_docs)} documents có từ {facet_limit} facet terms trở lên: {action}")
+        logger.log("🛡️  Retry/circuit breaker:")
+        for line in CLIENT.format_stats():
+            logger.log(f"   {line}")
+        logger.log()
+        
+        cache_deltas = delta_containers(cache_before, snapshot_containers(CONTAINERS))
+        logger.log(f"📊 Cache delta trong lúc query (chế độ: {cache_mode}):")
+        for line in format_cache_report(cache_deltas):
+            logger.log(f"   {line}")
         logger.log()
     
         # Bước 3: So sánh kết quả
@@ -462,17 +705,20 @@ def main():
         logger.log("━" * 70)
         logger.log()
         
-        comparisons = compare_facet_results(results_dict)
+        with span("compare"):
+            comparisons = compare_facet_results(results_dict, failures)
         
         for comp in comparisons:
             logger.log(f"📊 So sánh: {comp['container1']} vs {comp['container2']}")
-            logger.log(f"   ✅ Giống nhau: {comp['same']} documents ({comp['same']*100/len(ids):.1f}%)")
-            logger.log(f"   ❌ Khác nhau: {comp['different']} documents ({comp['different']*100/len(ids):.1f}%)")
+            logger.log(f"   ✅ Giống nhau: {comp['same']} documents ({comp['same']*100/len(compared_ids):.1f}%)")
+            logger.log(f"   ❌ Khác nhau: {comp['different']} documents ({comp['different']*100/len(compared_ids):.1f}%)")
             
             if comp['different'] > 0:
                 logger.log(f"   📈 Documents chỉ có trong {comp['container1']}: {comp['only_in_1']}")
                 logger.log(f"   📈 Documents chỉ có trong {comp['container2']}: {comp['only_in_2']}")
                 logger.log(f"   📊 Trung bình số terms khác nhau: {comp['avg_terms_diff']:.2f}")
+            if comp['failed'] > 0:
+                logger.log(f"   ⚠️  Bỏ qua {comp['failed']} documents bị query lỗi")
             logger.log()
     
         # Bước 4: Tìm các documents có sự khác biệt lớn nhất
@@ -482,7 +728,10 @@ def main():
         logger.log()
         
         diff_docs = []
+        compare_start = time.perf_counter()
         for doc_id in results_dict:
+            if failures.get(doc_id):
+                continue
             facets1 = results_dict[doc_id].get(CONTAINERS[0]["version"], {})
             facets2 = results_dict[doc_id].get(CONTAINERS[1]["version"], {})
             facets3 = results_dict[doc_id].get(CONTAINERS[2]["version"], {})
@@ -501,6 +750,7 @@ def main():
                 diff_docs.append({
                     "id": doc_id,
                     "diff_score": diff_score,
+                    "truncated": bool(long_docs.get(doc_id)) and not EXHAUSTIVE,
                     "terms_count": {
                         CONTAINERS[0]["version"]: len(terms1),
                         CONTAINERS[1]["version"]: len(terms2),
@@ -515,13 +765,20 @@ def main():
         
         # Sắp xếp theo độ khác biệt
         diff_docs.sort(key=lambda x: x["diff_score"], reverse=True)
+        TRACER.add("compare.diff_docs", time.perf_counter() - compare_start)
+        truncated_diffs = sum(1 for doc in diff_docs if doc["truncated"])
+        if truncated_diffs:
+            logger.log(f"⚠️  {truncated_diffs}/{len(diff_docs)} documents khác biệt có kết quả bị cắt ở "
+                       f"facet.limit={facet_limit}, chạy lại với --exhaustive để so sánh đầy đủ")
+            logger.log()
         
         # Hiển thị top 10 documents có sự khác biệt lớn nhất
         logger.log("Top 10 documents có sự khác biệt lớn nhất:")
         logger.log()
         for idx, doc in enumerate(diff_docs[:10], 1):
             logger.log(f"{idx}. ID: {doc['id']}")
-            logger.log(f"   Độ khác biệt: {doc['diff_score']} terms")
+            logger.log(f"   Độ khác biệt: {doc['diff_score']} terms"
+                       + (" (kết quả bị cắt ở facet.limit)" if doc["truncated"] else ""))
             logger.log(f"   Số terms:")
             for version, count in doc['terms_count'].items():
                 logger.log(f"      - {version}: {count}")
@@ -566,33 +823,70 @@ def main():
         output_data = {
             "metadata": {
                 "num_docs": len(ids),
+                "compared_docs": len(compared_ids),
+                "missing_docs": len(missing_docs),
+                "exhaustive": EXHAUSTIVE,
+                "facet_limit": facet_limit,
+                "long_docs": len(long_docs),
                 "source_port": SOURCE_PORT,
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "elapsed_time": elapsed_time
+                "elapsed_time": elapsed_time,
+                "dedup": DEDUP,
+                "distinct_texts": len(groups),
+                "dedup_ratio": dedup_ratio,
+                "total_queries": total_queries,
+                "queries_without_dedup": len(compared_ids) * len(CONTAINERS),
+                "cache_mode": cache_mode,
+                "cache_stats": cache_deltas,
+                "failed_queries": failed_queries,
+                "resilience": CLIENT.snapshot(),
+                "trace": TRACER.snapshot()
             },
+            "failures": failures,
+            "missing_docs": missing_docs,  # {doc_id: [containers thiếu document]}
+            "presence_errors": presence["errors"],
+            "long_docs": long_docs,  # {doc_id: {container: số terms}} với số terms >= facet.limit
+            "reconcile": reconcile_result,
             "comparisons": comparisons,
             "top_differences": diff_docs[:20],  # Top 20
             "all_differences": diff_docs,  # Tất cả documents có khác biệt
-            "sample_results": {doc_id: results_dict[doc_id] for doc_id in ids[:10]}  # Mẫu 10 documents đầu
+            "sample_results": {doc_id: results_dict[doc_id] for doc_id in compared_ids[:10]}  # Mẫu 10 documents đầu
         }
         
-        with open(json_file, 'w', encoding='utf-8') as f:
+        with span("report.json"), open(json_file, 'w', encoding='utf-8') as f:
             json.dump(output_data, f, indent=2, ensure_ascii=False)
         
         logger.log(f"💾 Kết quả JSON đã được lưu vào: {json_file}")
         logger.log()
         
         # Xuất ra Excel
-        excel_file = export_to_excel(results_dict, search_text_dict, ids, timestamp, logger)
+        dedup_stats = {
+            "distinct_texts": len(groups),
+            "dedup_ratio": dedup_ratio,
+            "total_queries": total_queries
+        }
+        with span("report.excel"):
+            excel_file = export_to_excel(results_dict, search_text_dict, compared_ids, timestamp, logger, dedup_stats, failures)
         
         # Tóm tắt
         logger.log("━" * 70)
         logger.log("📊 Tóm tắt")
         logger.log("━" * 70)
-        logger.log(f"✅ Đã query {len(ids)} documents trên {len(CONTAINERS)} containers")
-        logger.log(f"✅ Tổng số queries: {total_queries}")
+        logger.log(f"✅ Đã query {len(compared_ids)} documents trên {len(CONTAINERS)} containers")
+        if missing_docs:
+            logger.log(f"⚠️  Documents thiếu trên ít nhất một container (lỗi index, không so sánh): {len(missing_docs)}")
+        if reconcile_result:
+            gaps = reconcile_result["total_ids"] - reconcile_result["common"]
+            logger.log(f"🧮 Đối chiếu toàn bộ: {reconcile_result['total_ids']:,} ids, {gaps:,} ids lệch giữa các containers")
+        logger.log(f"✅ Số nội dung search_text khác nhau: {len(groups)} (dedup ratio: {dedup_ratio*100:.1f}%)")
+        logger.log(f"✅ Tổng số queries: {total_queries} (không dedup: {len(compared_ids) * len(CONTAINERS)})")
+        if failed_queries:
+            logger.log(f"❌ Kết quả bị query lỗi: {failed_queries} (xem mục failures trong file JSON)")
         logger.log(f"⏱️  Thời gian thực thi: {elapsed_time:.2f} giây")
         logger.log(f"📈 Tốc độ trung bình: {total_queries/elapsed_time:.2f} queries/giây")
+        logger.log("⏱️  Thời gian theo phase:")
+        for line in TRACER.report_lines():
+            logger.log(f"   {line}")
         logger.log(f"📝 Log file: {log_file}")
         logger.log(f"📄 JSON file: {json_file}")
         if excel_file:
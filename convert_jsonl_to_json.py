@@ -1,14 +1,28 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Script để chuyển đổi file JSONL (một JSON object mỗi dòng) 
+Script để chuyển đổi file JSONL (một JSON object mỗi dòng)
 sang file JSON array format
+- Đọc file một lần duy nhất (mmap), nhận diện encoding từ phần đầu file
+- Chia file thành các chunk theo ranh giới dòng, parse/encode song song bằng process pool
+- Mặc định ghi output dạng compact (mỗi document một dòng), --indent để format đẹp
+- Tiến độ tính theo số bytes đã xử lý, không cần đếm trước số dòng
+- In thời gian theo phase (read, decode.json, encode.json cộng từ các worker; wait, write ở
+  process chính), --profile[=cprofile|folded] ghi file profile của process chính
 """
 
+import argparse
+import codecs
 import json
-import sys
+import mmap
 import os
-from typing import Iterator
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from tracing import TRACER, add_profile_args, profiled, span
 
 # Set UTF-8 encoding cho Windows
 if sys.platform == 'win32':
@@ -16,101 +30,210 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
-def convert_jsonl_to_json(jsonl_file: str, json_file: str, batch_size: int = 1000):
+CHUNK_SIZE = 16 * 1024 * 1024  # 16 MB mỗi chunk
+PREFIX_SIZE = 64 * 1024  # Số bytes đầu file dùng để nhận diện encoding
+MAX_ERRORS_REPORTED = 5
+
+
+def detect_encoding(path: str, prefix_size: int = PREFIX_SIZE) -> str:
+    """Nhận diện encoding từ phần đầu file thay vì đọc cả file nhiều lần"""
+    with open(path, 'rb') as f:
+        prefix = f.read(prefix_size)
+
+    if prefix.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        prefix.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        # Prefix có thể cắt ngang một ký tự UTF-8 nhiều bytes ở cuối
+        if e.reason == 'unexpected end of data' and e.start >= len(prefix) - 3:
+            return 'utf-8'
+    try:
+        prefix.decode('cp1252')
+        return 'cp1252'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def split_chunks(mm: mmap.mmap, chunk_size: int) -> List[Tuple[int, int]]:
+    """Chia file thành các đoạn [start, end) kết thúc tại ranh giới dòng"""
+    size = len(mm)
+    chunks = []
+    start = 0
+    while start < size:
+        end = mm.find(b'\n', min(start + chunk_size, size - 1))
+        end = size if end == -1 else end + 1
+        chunks.append((start, end))
+        start = end
+    return chunks
+
+
+def convert_chunk(path: str, start: int, end: int, encoding: str,
+                  indent: Optional[int]) -> Tuple[bytes, int, List[str], Dict[str, float]]:
+    """
+    Parse và encode lại một chunk (chạy trong worker process)
+
+    Returns:
+        (các documents đã encode nối bằng ",\\n", số documents, danh sách lỗi,
+         thời gian read/decode/encode để process chính cộng vào tracer)
+    """
+    read_start = time.perf_counter()
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = mm[start:end]
+
+    if start == 0 and data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
+    decode = encoding not in ('utf-8', 'utf-8-sig')
+    separators = (',', ': ') if indent is not None else (',', ':')
+
+    perf_counter = time.perf_counter
+    read_time = perf_counter() - read_start
+
+    parts = []
+    errors = []
+    offset = start
+    decode_time = encode_time = 0.0
+    for line in data.split(b'\n'):
+        line_offset = offset
+        offset += len(line) + 1
+        line = line.strip()
+        if not line:
+            continue
+        t0 = perf_counter()
+        try:
+            try:
+                doc = json.loads(line.decode(encoding, errors='replace') if decode else line)
+            except UnicodeDecodeError:
+                # Bytes UTF-8 lỗi: thay ký tự lỗi như bản decode cả file thay vì bỏ record
+                doc = json.loads(line.decode('utf-8', errors='replace'))
+        except ValueError as e:
+            errors.append(f"byte {line_offset}: {e}")
+            continue
+        t1 = perf_counter()
+        parts.append(json.dumps(doc, ensure_ascii=False, indent=indent, separators=separators))
+        decode_time += t1 - t0
+        encode_time += perf_counter() - t1
+
+    t0 = perf_counter()
+    body = ',\n'.join(parts).encode('utf-8')
+    timings = {"read": read_time, "decode.json": decode_time,
+               "encode.json": encode_time + perf_counter() - t0}
+    return body, len(parts), errors, timings
+
+
+def convert_jsonl_to_json(jsonl_file: str, json_file: str, chunk_size: int = CHUNK_SIZE,
+                          workers: Optional[int] = None, indent: Optional[int] = None):
     """
     Chuyển đổi JSONL sang JSON array
-    
+
     Args:
         jsonl_file: File JSONL input
         json_file: File JSON output
-        batch_size: Số records xử lý mỗi lần để tránh memory issues
+        chunk_size: Số bytes mỗi chunk gửi cho một worker
+        workers: Số worker processes (mặc định: số CPU)
+        indent: Indent cho mỗi document (mặc định: None - compact)
     """
     if not os.path.exists(jsonl_file):
         print(f"❌ File không tồn tại: {jsonl_file}")
         return False
-    
+
     print(f"📖 Đang đọc file: {jsonl_file}")
-    
-    total_records = 0
-    
-    # Đếm tổng số dòng trước - thử nhiều encoding
-    encodings_to_try = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252', 'iso-8859-1']
-    file_encoding = None
-    
-    for enc in encodings_to_try:
-        try:
-            with open(jsonl_file, 'r', encoding=enc, errors='replace') as f:
-                for _ in f:
-                    total_records += 1
-            file_encoding = enc
-            print(f"   ✅ Phát hiện encoding: {enc}")
-            break
-        except UnicodeDecodeError:
-            continue
-    
-    if file_encoding is None:
-        print(f"   ⚠️  Không thể xác định encoding, sử dụng utf-8 với errors='replace'")
-        file_encoding = 'utf-8'
-        # Đếm lại với errors='replace'
-        with open(jsonl_file, 'r', encoding=file_encoding, errors='replace') as f:
-            for _ in f:
-                total_records += 1
-    
-    print(f"   ✅ Tổng số records: {total_records:,}")
+
+    total_bytes = os.path.getsize(jsonl_file)
+    file_encoding = detect_encoding(jsonl_file)
+    workers = workers or os.cpu_count() or 1
+    print(f"   ✅ Phát hiện encoding: {file_encoding}")
+    print(f"   ✅ Kích thước: {total_bytes / (1024 * 1024):.1f} MB")
     print(f"📝 Đang ghi vào file: {json_file}")
-    
-    # Đọc và ghi theo batch
-    with open(jsonl_file, 'r', encoding=file_encoding, errors='replace') as infile, \
-         open(json_file, 'w', encoding='utf-8') as outfile:
-        
-        outfile.write('[\n')
-        
+
+    start_time = time.time()
+    count = 0
+    error_count = 0
+    processed_bytes = 0
+
+    with open(json_file, 'wb') as outfile:
+        outfile.write(b'[\n')
         first = True
-        count = 0
-        
-        for line in infile:
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                doc = json.loads(line)
-                
-                if not first:
-                    outfile.write(',\n')
-                else:
+
+        def write_result(result: Tuple[bytes, int, List[str], Dict[str, float]], nbytes: int):
+            nonlocal first, count, error_count, processed_bytes
+            body, n, errors, timings = result
+            for name, seconds in timings.items():
+                TRACER.add(name, seconds)
+            with span("write"):
+                if n:
+                    if not first:
+                        outfile.write(b',\n')
+                    outfile.write(body)
                     first = False
-                
-                json.dump(doc, outfile, ensure_ascii=False, indent=2)
-                count += 1
-                
-                if count % batch_size == 0:
-                    print(f"   Đã xử lý: {count:,} / {total_records:,} ({count*100/total_records:.1f}%)")
-                    outfile.flush()
-                    
-            except json.JSONDecodeError as e:
-                print(f"⚠️  Lỗi khi parse dòng {count + 1}: {e}")
-                continue
-        
-        outfile.write('\n]')
-    
-    print(f"✅ Hoàn thành! Đã chuyển đổi {count:,} records")
+            count += n
+            error_count += len(errors)
+            for err in errors[:max(0, MAX_ERRORS_REPORTED - (error_count - len(errors)))]:
+                print(f"⚠️  Lỗi khi parse {err}")
+            processed_bytes += nbytes
+            elapsed = time.time() - start_time
+            speed = processed_bytes / (1024 * 1024) / elapsed if elapsed > 0 else 0
+            print(f"   Đã xử lý: {processed_bytes / (1024 * 1024):,.1f} / {total_bytes / (1024 * 1024):,.1f} MB "
+                  f"({processed_bytes * 100 / total_bytes:.1f}%) - {count:,} records - {speed:.1f} MB/s")
+
+        if total_bytes > 0:
+            with open(jsonl_file, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    with span("split"):
+                        chunks = split_chunks(mm, chunk_size)
+
+            if workers == 1 or len(chunks) == 1:
+                for start, end in chunks:
+                    write_result(convert_chunk(jsonl_file, start, end, file_encoding, indent), end - start)
+            else:
+                # Giữ tối đa 2 * workers chunk đang xử lý, ghi theo đúng thứ tự
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    pending = deque()
+                    for start, end in chunks:
+                        pending.append((executor.submit(convert_chunk, jsonl_file, start, end,
+                                                        file_encoding, indent), end - start))
+                        if len(pending) >= workers * 2:
+                            future, nbytes = pending.popleft()
+                            with span("wait"):
+                                result = future.result()
+                            write_result(result, nbytes)
+                    while pending:
+                        future, nbytes = pending.popleft()
+                        with span("wait"):
+                            result = future.result()
+                        write_result(result, nbytes)
+
+        outfile.write(b'\n]')
+
+    elapsed = time.time() - start_time
+    print(f"✅ Hoàn thành! Đã chuyển đổi {count:,} records trong {elapsed:.2f}s")
+    if error_count:
+        print(f"   ⚠️  Bỏ qua {error_count:,} dòng lỗi")
     print(f"   Input: {jsonl_file}")
-    print(f"   Output: {json_file}")
+    print(f"   Output: {json_file} ({os.path.getsize(json_file) / (1024 * 1024):.1f} MB)")
+    TRACER.print_report()
     return True
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python convert_jsonl_to_json.py <jsonl_file> [json_file]")
-        print()
-        print("Ví dụ:")
-        print("  python convert_jsonl_to_json.py exported_data.jsonl")
-        print("  python convert_jsonl_to_json.py exported_data.jsonl output.json")
-        sys.exit(1)
-    
-    jsonl_file = sys.argv[1]
-    json_file = sys.argv[2] if len(sys.argv) > 2 else jsonl_file.replace('.jsonl', '.json')
-    
-    convert_jsonl_to_json(jsonl_file, json_file)
+    parser = argparse.ArgumentParser(
+        description="Chuyển đổi JSONL sang JSON array",
+        epilog="Ví dụ:\n"
+               "  python convert_jsonl_to_json.py exported_data.jsonl\n"
+               "  python convert_jsonl_to_json.py exported_data.jsonl output.json --workers 8",
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("jsonl_file")
+    parser.add_argument("json_file", nargs="?")
+    parser.add_argument("--workers", type=int, default=None, help="Số worker processes (mặc định: số CPU)")
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_SIZE // (1024 * 1024), help="Kích thước mỗi chunk (MB)")
+    parser.add_argument("--indent", type=int, default=None, help="Indent mỗi document (mặc định: compact)")
+    add_profile_args(parser)
+    args = parser.parse_args()
 
+    json_file = args.json_file or args.jsonl_file.replace('.jsonl', '.json')
+    with profiled(args.profile, "convert_jsonl_to_json", args.profile_out):
+        success = convert_jsonl_to_json(args.jsonl_file, json_file, args.chunk_mb * 1024 * 1024,
+                                        args.workers, args.indent)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script để so sánh 2 snapshot export (exported_data.jsonl) của cùng một collection
+- External sort cả 2 file theo id với bộ nhớ giới hạn (spill các run ra file tạm)
+- Merge-join 2 luồng đã sort để tìm id được thêm, bị xóa và bị thay đổi
+- Mặc định chỉ so sánh search_text và các field engagement, có thể chỉ định field khác
+- Output: added.jsonl, removed.jsonl, changed.jsonl, reindex.jsonl, changed_ids.txt, summary.json
+
+Cách sử dụng:
+    python diff_exports.py <old_export> <new_export> [options]
+
+Ví dụ:
+    python diff_exports.py snapshots/exported_data_0101.jsonl exported_data.jsonl
+    python diff_exports.py old.jsonl new.jsonl --fields search_text,title --output-dir diff_title
+    python diff_exports.py old.json new.json --all-fields --memory-mb 128
+
+reindex.jsonl chứa document mới của các id thêm/thay đổi, có thể đưa thẳng vào bulk_index.py.
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import struct
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from external_sort import external_sort
+from json_stream import DocumentReader
+
+ENGAGEMENT_FIELDS = [
+    'views', 'likes', 'comments', 'shares', 'haha', 'sad', 'angry', 'wow', 'heart',
+    'reaction', 'engagement_total', 'engagement_s_c', 'engage_*',
+]
+DEFAULT_FIELDS = ['search_text'] + ENGAGEMENT_FIELDS
+DEFAULT_IGNORE = ['_version_']
+MEMORY_MB = 256
+PROGRESS_EVERY = 100000
+
+SEP = b'\x00'  # id và document được nối bằng NUL, nên sort theo bytes = sort theo id
+SEQ = struct.Struct('>Q')  # Số thứ tự trong file (big-endian, cố định độ dài) nằm ngay sau id
+
+
+def iter_keyed_records(path: str, stats: Dict[str, Any]) -> Iterator[bytes]:
+    """
+    Đọc file export, trả về records dạng b'<id>\\0<seq><document json>'
+
+    seq là số thứ tự của document trong file nên sort theo bytes = sort theo (id, seq),
+    nội dung document không ảnh hưởng thứ tự giữa các bản trùng id.
+    """
+    reader = DocumentReader(path)
+    for doc in reader:
+        doc_id = doc.get('id')
+        if doc_id is None:
+            stats['missing_id'] += 1
+            continue
+        body = json.dumps(doc, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        yield str(doc_id).encode('utf-8') + SEP + SEQ.pack(reader.docs_read) + body
+        if reader.docs_read % PROGRESS_EVERY == 0:
+            percent = reader.bytes_read * 100 / reader.total_bytes if reader.total_bytes else 100
+            print(f"   📖 {os.path.basename(path)}: {reader.docs_read:,} docs ({percent:.1f}%)")
+    stats['docs'] = reader.docs_read
+    stats['bad_records'] = reader.bad_records
+
+
+def iter_sorted_documents(path: str, run_bytes: int, tmp_dir: Optional[str],
+                          stats: Dict[str, Any]) -> Iterator[Tuple[bytes, bytes]]:
+    """
+    Sort file export theo id, trả về (id bytes, document bytes)
+
+    Nếu một id xuất hiện nhiều lần thì giữ bản xuất hiện cuối cùng trong file (seq lớn nhất).
+    """
+    stats.update({'docs': 0, 'missing_id': 0, 'duplicates': 0, 'bad_records': 0})
+    sort_stats: Dict[str, Any] = {}
+    records = external_sort(iter_keyed_records(path, stats), run_bytes=run_bytes,
+                            tmp_dir=tmp_dir, stats=sort_stats)
+    pending: Optional[Tuple[bytes, bytes]] = None
+    for record in records:
+        key, rest = record.split(SEP, 1)
+        body = rest[SEQ.size:]
+        if pending is not None:
+            if pending[0] == key:
+                stats['duplicates'] += 1
+            else:
+                yield pending
+        pending = (key, body)
+    if pending is not None:
+        yield pending
+    stats['runs'] = sort_stats.get('runs', 0)
+
+
+class FieldMatcher:
+    """Chọn field để so sánh (hỗ trợ wildcard như engage_*)"""
+
+    def __init__(self, fields: Optional[List[str]], ignore: List[str]):
+        self.fields = fields
+        self.ignore = set(ignore)
+        self._cache: Dict[str, bool] = {}
+
+    def __call__(self, name: str) -> bool:
+        matched = self._cache.get(name)
+        if matched is None:
+            if name in self.ignore:
+                matched = False
+            elif self.fields is None:
+                matched = True
+            else:
+                matched = any(fnmatch.fnmatchcase(name, p) for p in self.fields)
+            self._cache[name] = matched
+        return matched
+
+
+def compare_documents(old: Dict[str, Any], new: Dict[str, Any],
+                      matcher: FieldMatcher) -> Dict[str, Dict[str, Any]]:
+    """So sánh 2 documents, trả về {field: {"old": ..., "new": ...}} cho các field khác nhau"""
+    changes = {}
+    for name in set(old) | set(new):
+        if not matcher(name):
+            continue
+        old_value = old.get(name)
+        new_value = new.get(name)
+        if old_value != new_value:
+            changes[name] = {"old": old_value, "new": new_value}
+    return changes
+
+
+def merge_join(old_iter: Iterator[Tuple[bytes, bytes]],
+               new_iter: Iterator[Tuple[bytes, bytes]]) -> Iterator[Tuple[str, Optional[bytes], Optional[bytes]]]:
+    """Merge-join 2 luồng đã sort theo id, trả về (id, old, new); thiếu bên nào thì bên đó là None"""
+    end = (None, None)
+    old_id, old_body = next(old_iter, end)
+    new_id, new_body = next(new_iter, end)
+    while old_id is not None or new_id is not None:
+        if new_id is None or (old_id is not None and old_id < new_id):
+            yield old_id.decode('utf-8'), old_body, None
+            old_id, old_body = next(old_iter, end)
+        elif old_id is None or new_id < old_id:
+            yield new_id.decode('utf-8'), None, new_body
+            new_id, new_body = next(new_iter, end)
+        else:
+            yield old_id.decode('utf-8'), old_body, new_body
+            old_id, old_body = next(old_iter, end)
+            new_id, new_body = next(new_iter, end)
+
+
+def diff_exports(old_file: str, new_file: str, output_dir: str, fields: Optional[List[str]],
+                 ignore: List[str], run_bytes: int, tmp_dir: Optional[str] = None) -> Dict[str, Any]:
+    """So sánh 2 snapshot và ghi kết quả vào output_dir, trả về summary"""
+    os.makedirs(output_dir, exist_ok=True)
+    matcher = FieldMatcher(fields, ignore)
+    old_stats: Dict[str, Any] = {}
+    new_stats: Dict[str, Any] = {}
+    counts = Counter()
+    field_counts = Counter()
+
+    def open_out(name):
+        return open(os.path.join(output_dir, name), 'w', encoding='utf-8')
+
+    start = time.time()
+    with open_out('added.jsonl') as added_f, open_out('removed.jsonl') as removed_f, \
+            open_out('changed.jsonl') as changed_f, open_out('reindex.jsonl') as reindex_f, \
+            open_out('changed_ids.txt') as ids_f:
+        old_iter = iter_sorted_documents(old_file, run_bytes, tmp_dir, old_stats)
+        new_iter = iter_sorted_documents(new_file, run_bytes, tmp_dir, new_stats)
+        for doc_id, old_body, new_body in merge_join(old_iter, new_iter):
+            if new_body is None:
+                counts['removed'] += 1
+                removed_f.write(old_body.decode('utf-8') + '\n')
+                continue
+            new_text = new_body.decode('utf-8')
+            if old_body is None:
+                counts['added'] += 1
+                added_f.write(new_text + '\n')
+                reindex_f.write(new_text + '\n')
+                ids_f.write(doc_id + '\n')
+                continue
+
+            counts['common'] += 1
+            if old_body == new_body:
+                counts['unchanged'] += 1
+                continue
+            changes = compare_documents(json.loads(old_body), json.loads(new_text), matcher)
+            if not changes:
+                counts['unchanged'] += 1
+                continue
+            counts['changed'] += 1
+            field_counts.update(changes.keys())
+            changed_f.write(json.dumps({"id": doc_id, "fields": sorted(changes), "changes": changes},
+                                       ensure_ascii=False) + '\n')
+            reindex_f.write(new_text + '\n')
+            ids_f.write(doc_id + '\n')
+
+    summary = {
+        "timestamp": datetime.now().isoformat(),
+        "old_file": old_file,
+        "new_file": new_file,
+        "fields": fields if fields is not None else "*",
+        "ignore": ignore,
+        "old": old_stats,
+        "new": new_stats,
+        "added": counts['added'],
+        "removed": counts['removed'],
+        "changed": counts['changed'],
+        "unchanged": counts['unchanged'],
+        "field_changes": dict(field_counts.most_common()),
+        "elapsed_seconds": round(time.time() - start, 2),
+    }
+    with open_out('summary.json') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def print_summary(summary: Dict[str, Any], output_dir: str):
+    print("\n" + "━" * 70)
+    print("📊 KẾT QUẢ SO SÁNH SNAPSHOT")
+    print("━" * 70)
+    for label, key in (("Snapshot cũ", "old"), ("Snapshot mới", "new")):
+        s = summary[key]
+        print(f"   {label}: {s['docs']:,} docs, {s.get('runs', 0)} runs, "
+              f"{s['duplicates']:,} id trùng, {s['missing_id']:,} thiếu id, {s['bad_records']:,} lỗi")
+    print(f"\n   ➕ Thêm mới:     {summary['added']:,}")
+    print(f"   ➖ Bị xóa:       {summary['removed']:,}")
+    print(f"   ✏️  Thay đổi:     {summary['changed']:,}")
+    print(f"   ✅ Không đổi:    {summary['unchanged']:,}")
+    if summary['field_changes']:
+        print("\n   Số document thay đổi theo field:")
+        for name, count in summary['field_changes'].items():
+            print(f"      {name:<25} {count:>10,}")
+    print(f"\n⏱️  Thời gian: {summary['elapsed_seconds']:.2f}s")
+    print(f"💾 Kết quả đã lưu vào: {output_dir}/")
+    print("━" * 70)
+
+
+def main():
+    # Set UTF-8 encoding cho Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="So sánh 2 snapshot export theo id (external sort + merge-join)")
+    parser.add_argument("old_file", help="Snapshot cũ (JSON hoặc JSONL)")
+    parser.add_argument("new_file", help="Snapshot mới (JSON hoặc JSONL)")
+    parser.add_argument("--fields", help=f"Các field cần so sánh, hỗ trợ wildcard (mặc định: {','.join(DEFAULT_FIELDS)})")
+    parser.add_argument("--all-fields", action="store_true", help="So sánh tất cả các field")
+    parser.add_argument("--ignore", default=','.join(DEFAULT_IGNORE),
+                        help="Các field bỏ qua khi so sánh (mặc định: _version_)")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_MB,
+                        help=f"Bộ nhớ tối đa cho mỗi run khi sort (mặc định: {MEMORY_MB})")
+    parser.add_argument("--tmp-dir", help="Thư mục chứa file tạm khi sort")
+    parser.add_argument("--output-dir", help="Thư mục output (mặc định: diff_<timestamp>)")
+    args = parser.parse_args()
+
+    for path in (args.old_file, args.new_file):
+        if not os.path.exists(path):
+            print(f"❌ File không tồn tại: {path}")
+            sys.exit(1)
+
+    if args.all_fields:
+        fields = None
+    elif args.fields:
+        fields = [f.strip() for f in args.fields.split(',') if f.strip()]
+    else:
+        fields = DEFAULT_FIELDS
+    ignore = [f.strip() for f in args.ignore.split(',') if f.strip()]
+    output_dir = args.output_dir or f"diff_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+    print("━" * 70)
+    print(f"🔍 So sánh snapshot: {args.old_file} -> {args.new_file}")
+    print(f"   Field: {'tất cả' if fields is None else ', '.join(fields)}")
+    print(f"   Bộ nhớ mỗi run: {args.memory_mb} MB")
+    print("━" * 70)
+
+    summary = diff_exports(args.old_file, args.new_file, output_dir, fields, ignore,
+                           args.memory_mb * 1024 * 1024, args.tmp_dir)
+    print_summary(summary, output_dir)
+
+
+if __name__ == "__main__":
+    main()
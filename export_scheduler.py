@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Export/refresh nhiều Solr collections từ một manifest, dùng chung worker pool và ngân sách tải
+- Global token bucket: tổng số request/giây tới cluster nguồn không vượt quá `rps`
+  bất kể số collections/workers
+- Công bằng: mỗi lượt một worker lấy collection kế tiếp theo vòng tròn, chạy `weight` trang
+  (cursorMark) rồi trả collection về cuối hàng đợi; mỗi collection tối đa một request đang chạy
+- Mỗi collection có file output và file state riêng (cùng format với export_solr_data.py),
+  dừng giữa chừng (Ctrl+C, lỗi) thì chạy lại để resume
+- Lỗi liên tiếp của một collection được backoff riêng, quá MAX_CONSECUTIVE_FAILURES lần thì
+  collection đó bị đánh dấu failed, các collection khác vẫn chạy tiếp
+- --refresh: collection đã export xong được chạy lại với fq theo ngày cập nhật
+  ({date_field}:[lần chạy trước - REFRESH_OVERLAP TO *]), ghi ra file delta riêng
+
+Manifest (JSON):
+    {
+      "solr_url": "http://solrtopic-testing.ynm.local/solr",
+      "username": "app", "password": "...",
+      "rps": 2, "workers": 4, "rows": 500, "output_dir": "exports",
+      "collections": [
+        {"name": "topic_10236681"},
+        {"name": "topic_10236682", "weight": 2, "fq": ["platform:1"]},
+        {"name": "topic_tanvd", "key": "local_9", "solr_url": "http://localhost:8985/solr"}
+      ]
+    }
+
+Cách sử dụng:
+    python export_scheduler.py manifest.json [--refresh] [--rps 2] [--workers 4] [--only topic_a,topic_b]
+    python export_scheduler.py manifest.json --status
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from export_solr_data import (MAX_CONSECUTIVE_FAILURES, MAX_RETRIES, RETRY_MAX_DELAY, ROWS_PER_REQUEST,
+                              SOLR_PASSWORD, SOLR_URL, SOLR_USERNAME, WAIT_SECONDS, SolrExporter, StateManager)
+from resilience import ResilientClient, RetryPolicy
+from tracing import TRACER, add_profile_args, profiled, span
+
+DEFAULT_RPS = 1.0
+DEFAULT_WORKERS = 4
+DEFAULT_OUTPUT_DIR = "exports"
+DATE_FIELD = "man_updated_at"
+REFRESH_OVERLAP = timedelta(minutes=15)  # Lùi mốc refresh để không sót document cập nhật trễ
+PROGRESS_EVERY = 30  # Giây giữa các lần in bảng tiến độ
+
+
+class TokenBucket:
+    """Giới hạn số request/giây dùng chung cho mọi worker (burst tối đa `capacity` request)"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, stop: Optional[threading.Event] = None) -> bool:
+        """Chờ đến khi có token; trả về False nếu bị dừng trong lúc chờ"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                delay = (1 - self.tokens) / self.rate
+                self.waited += delay
+            with span("ratelimit.wait"):
+                if stop is not None:
+                    if stop.wait(delay):
+                        return False
+                else:
+                    time.sleep(delay)
+
+
+class CollectionJob:
+    """Một collection trong manifest: cursor, file output/state và thống kê của lần chạy"""
+
+    def __init__(self, spec: Dict[str, Any], defaults: Dict[str, Any], client: ResilientClient,
+                 output_dir: str, refresh: bool):
+        self.name = spec["name"]
+        self.key = spec.get("key", self.name)
+        self.weight = max(1, int(spec.get("weight", 1)))
+        self.rows = int(spec.get("rows", defaults["rows"]))
+        self.date_field = spec.get("date_field", DATE_FIELD)
+        self.base_filters = list(spec.get("fq", []))
+        self.solr_url = spec.get("solr_url", defaults["solr_url"])
+        self.username = spec.get("username", defaults["username"])
+        self.password = spec.get("password", defaults["password"])
+        self.client = client
+        self.output_dir = output_dir
+        self.state_manager = StateManager(os.path.join(output_dir, f"{self.key}.state.json"))
+        self.state = self.state_manager.load_state()
+        self.status = "pending"
+        self.message = ""
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.exported_this_run = 0
+        self.ready_at = 0.0
+        self.total_docs = None
+        self.backoff = RetryPolicy(base_delay=WAIT_SECONDS, max_delay=RETRY_MAX_DELAY * 5)
+        self._file = None
+        self._prepare(refresh)
+
+    def _prepare(self, refresh: bool):
+        """Chọn chế độ: resume lần chạy dở, bỏ qua nếu đã xong, hoặc bắt đầu refresh"""
+        state = self.state
+        finished = state.get("status") == "done"
+        self.mode = state.get("mode", "full")
+        self.since = state.get("since")
+        if finished and refresh:
+            # Mốc refresh: thời điểm bắt đầu lượt trước (UTC) lùi lại REFRESH_OVERLAP
+            started = datetime.fromisoformat(state["pass_started_utc"]) - REFRESH_OVERLAP
+            self.mode = "refresh"
+            self.since = started.strftime("%Y-%m-%dT%H:%M:%SZ")
+            state.update({"cursor_mark": "*", "total_exported": 0, "start_time": None,
+                          "pass_started_utc": None, "status": "pending", "output_file": None})
+            finished = False
+        if finished:
+            self.status = "done"
+            self.message = "đã export xong (dùng --refresh để lấy dữ liệu mới)"
+            self.total_docs = state.get("total_docs")
+        filters = list(self.base_filters)
+        if self.mode == "refresh":
+            filters.append(f"{self.date_field}:[{self.since} TO *]")
+            self.output_file = os.path.join(self.output_dir, f"{self.key}_refresh_{self.since[:10]}.jsonl")
+        else:
+            self.output_file = os.path.join(self.output_dir, f"{self.key}.jsonl")
+        if state.get("output_file") and not finished:
+            self.output_file = state["output_file"]  # Resume lượt đang dở: ghi tiếp vào đúng file cũ
+        self.exporter = SolrExporter(self.solr_url, self.name, self.username, self.password,
+                                     client=self.client, filters=filters)
+        self.exporter.client_key = self.key  # Breaker/thống kê riêng khi nhiều entry cùng tên collection
+        self.cursor_mark = state.get("cursor_mark", "*")
+        self.total_exported = state.get("total_exported", 0)
+        self.start_time = state.get("start_time") or datetime.now().isoformat()
+        self.pass_started_utc = state.get("pass_started_utc") or datetime.now(timezone.utc).isoformat()
+
+    def save(self):
+        self.state_manager.save_state(self.cursor_mark, self.total_exported, self.start_time,
+                                      status=self.status, mode=self.mode, since=self.since,
+                                      output_file=self.output_file, pass_started_utc=self.pass_started_utc,
+                                      total_docs=self.total_docs)
+
+    def _record_failure(self) -> bool:
+        """Request lỗi (sau retry): backoff riêng collection này, trả về False nếu đã bỏ cuộc"""
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+            self.status = "failed"
+            self.message = f"lỗi {self.consecutive_failures} lần liên tiếp"
+            self.save()
+            return False
+        self.ready_at = time.monotonic() + self.backoff.delay(self.consecutive_failures)
+        return True
+
+    def run_page(self, bucket: TokenBucket, stop: threading.Event) -> bool:
+        """Chạy một trang cursorMark, trả về True nếu collection còn trang tiếp theo"""
+        if stop.is_set():
+            return True
+
+        def throttle():
+            # Mỗi lần gửi (kể cả retry trong ResilientClient) đều lấy token từ ngân sách chung.
+            # Nếu bị dừng trong lúc chờ thì vẫn gửi nốt để trang đang chạy kết thúc gọn
+            bucket.acquire(stop)
+            self.requests += 1
+
+        self.exporter.before_request = throttle
+        if self.total_docs is None:
+            total_docs = self.exporter.get_total_count()
+            if total_docs is None:
+                return self._record_failure()
+            self.consecutive_failures = 0
+            self.total_docs = total_docs
+            if total_docs == 0:
+                self.status = "done"
+                self.message = "không có documents khớp"
+                self.save()
+                return False
+            if stop.is_set():
+                return True
+        page_start = time.time()
+        data = self.exporter.query_with_cursor(self.cursor_mark, self.rows)
+        if not data:
+            return self._record_failure()
+        self.consecutive_failures = 0
+
+        docs = data.get('response', {}).get('docs', [])
+        next_cursor_mark = data.get('nextCursorMark')
+        if docs:
+            if self._file is None:
+                self._file = open(self.output_file, 'a', encoding='utf-8')
+            with span("write"):
+                for doc in docs:
+                    self._file.write(json.dumps(doc, ensure_ascii=False) + '\n')
+                self._file.flush()
+            self.total_exported += len(docs)
+            self.exported_this_run += len(docs)
+        finished = not docs or not next_cursor_mark or next_cursor_mark == self.cursor_mark
+        if next_cursor_mark:
+            self.cursor_mark = next_cursor_mark
+        if finished:
+            self.status = "done"
+        self.save()
+        percent = self.total_exported * 100 / self.total_docs if self.total_docs else 100
+        print(f"   [{self.key}] +{len(docs):,} ({self.total_exported:,}/{self.total_docs:,}, {percent:.1f}%) "
+              f"{time.time() - page_start:.2f}s{' ✅ xong' if finished else ''}", flush=True)
+        return not finished
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Scheduler:
+    """Worker pool dùng chung, cấp collection theo vòng tròn (mỗi collection tối đa một worker)"""
+
+    def __init__(self, jobs: List[CollectionJob], bucket: TokenBucket, workers: int):
+        self.jobs = jobs
+        self.bucket = bucket
+        self.workers = workers
+        self.queue = [job for job in jobs if job.status == "pending"]
+        self.active = 0
+        self.stop = threading.Event()
+        self._cond = threading.Condition()
+
+    def _next_job(self) -> Optional[CollectionJob]:
+        """Collection đầu tiên (theo vòng tròn) đã hết thời gian backoff; None khi không còn việc"""
+        with self._cond:
+            while not self.stop.is_set():
+                if not self.queue and self.active == 0:
+                    return None
+                now = time.monotonic()
+                for idx, job in enumerate(self.queue):
+                    if job.ready_at <= now:
+                        self.active += 1
+                        return self.queue.pop(idx)
+                waits = [job.ready_at - now for job in self.queue]
+                self._cond.wait(timeout=min(waits) if waits else None)
+            return None
+
+    def _release(self, job: CollectionJob, more: bool):
+        with self._cond:
+            self.active -= 1
+            if more:
+                self.queue.append(job)
+            self._cond.notify_all()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            more = True
+            try:
+                job.status = "running"
+                for _ in range(job.weight):
+                    more = job.run_page(self.bucket, self.stop)
+                    if not more or self.stop.is_set() or job.ready_at > time.monotonic():
+                        break
+                if more and job.status == "running":
+                    job.status = "pending"
+            except Exception as e:
+                job.status = "failed"
+                job.message = str(e)
+                job.save()
+                more = False
+                print(f"   ❌ [{job.key}] {e}")
+            finally:
+                if not more:
+                    job.close()
+                self._release(job, more and not self.stop.is_set())
+
+    def run(self):
+        threads = [threading.Thread(target=self._worker, name=f"export-worker-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        last_progress = time.time()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1)
+                if time.time() - last_progress >= PROGRESS_EVERY:
+                    print_status(self.jobs)
+                    last_progress = time.time()
+        except KeyboardInterrupt:
+            print("\n⚠️  ĐÃ DỪNG BỞI NGƯỜI DÙNG (Ctrl+C), đợi các request đang chạy xong...")
+            self.stop.set()
+            with self._cond:
+                self._cond.notify_all()
+            try:
+                for thread in threads:
+                    thread.join()
+            except KeyboardInterrupt:
+                # Ctrl+C lần 2: không đợi nữa, state đã được lưu sau mỗi page (ghi atomic)
+                print("⚠️  Dừng ngay, các collection sẽ tiếp tục từ page đã lưu gần nhất")
+        for job in self.jobs:
+            if job.status in ("running", "pending") and job.requests:
+                job.status = "pending"
+                job.save()
+            job.close()
+
+
+def print_status(jobs: List[CollectionJob]):
+    print("─" * 80)
+    print(f"   {'Collection':<28} {'Trạng thái':<10} {'Đã export':>12} {'Tổng':>12} {'Req':>6} {'Lỗi':>5}")
+    for job in jobs:
+        total = f"{job.total_docs:,}" if job.total_docs is not None else "-"
+        print(f"   {job.key:<28} {job.status:<10} {job.total_exported:>12,} {total:>12} "
+              f"{job.requests:>6} {job.failures:>5}")
+    print("─" * 80)
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    keys = [c.get("key", c["name"]) for c in manifest.get("collections", [])]
+    duplicates = [key for key, n in Counter(keys).items() if n > 1]
+    if duplicates:
+        raise ValueError(f"Trùng collection trong manifest (đặt \"key\" riêng): {', '.join(duplicates)}")
+    return manifest
+
+
+def main():
+    # Set UTF-8 encoding cho Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="Export/refresh nhiều Solr collections với ngân sách tải chung")
+    parser.add_argument("manifest", help="File manifest JSON")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Collection đã export xong thì lấy thêm documents cập nhật từ lần chạy trước")
+    parser.add_argument("--rps", type=float, help="Tổng số request/giây tới Solr (ghi đè manifest)")
+    parser.add_argument("--workers", type=int, help="Số worker (ghi đè manifest)")
+    parser.add_argument("--only", help="Chỉ chạy các collection (key) này, phân cách bằng dấu phẩy")
+    parser.add_argument("--status", action="store_true", help="Chỉ in trạng thái từ các file state")
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    try:
+        manifest = load_manifest(args.manifest)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Manifest không hợp lệ: {e}")
+        sys.exit(1)
+
+    defaults = {
+        "solr_url": manifest.get("solr_url", SOLR_URL),
+        "username": manifest.get("username", SOLR_USERNAME),
+        "password": manifest.get("password", SOLR_PASSWORD),
+        "rows": manifest.get("rows", ROWS_PER_REQUEST),
+    }
+    rps = args.rps or float(manifest.get("rps", DEFAULT_RPS))
+    output_dir = manifest.get("output_dir", DEFAULT_OUTPUT_DIR)
+    specs = manifest.get("collections", [])
+    if args.only:
+        only = {key.strip() for key in args.only.split(',')}
+        specs = [spec for spec in specs if spec.get("key", spec["name"]) in only]
+    workers = min(args.workers or int(manifest.get("workers", DEFAULT_WORKERS)), max(1, len(specs)))
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Một client (retry + breaker theo collection) dùng chung cho mọi worker
+    client = ResilientClient(RetryPolicy(max_attempts=MAX_RETRIES, base_delay=1.0, max_delay=RETRY_MAX_DELAY))
+    jobs = [CollectionJob(spec, defaults, client, output_dir, args.refresh) for spec in specs]
+
+    print("=" * 80)
+    print(f"📦 EXPORT {len(jobs)} COLLECTIONS ({'refresh' if args.refresh else 'full/resume'})")
+    print("=" * 80)
+    print(f"   Ngân sách: {rps:g} request/giây dùng chung, {workers} workers")
+    print(f"   Thư mục output/state: {os.path.abspath(output_dir)}")
+    for job in jobs:
+        mode = f"refresh từ {job.since}" if job.mode == "refresh" else "full"
+        resume = f", resume từ {job.total_exported:,} records" if job.total_exported and job.status != "done" else ""
+        print(f"   • {job.key}: {job.status}, {mode}{resume}{' - ' + job.message if job.message else ''}")
+    print()
+    if args.status:
+        print_status(jobs)
+        return
+
+    start = time.time()
+    bucket = TokenBucket(rps)
+    scheduler = Scheduler(jobs, bucket, workers)
+    with profiled(args.profile, "export_scheduler", args.profile_out):
+        scheduler.run()
+    elapsed = time.time() - start
+
+    print()
+    print("=" * 80)
+    print("📊 THỐNG KÊ")
+    print("=" * 80)
+    print_status(jobs)
+    total_requests = sum(job.requests for job in jobs)
+    print(f"   • Tổng số requests: {total_requests:,} trong {elapsed:.1f}s "
+          f"({total_requests / elapsed if elapsed > 0 else 0:.2f}/giây, giới hạn {rps:g}/giây)")
+    print(f"   • Records export trong lần chạy này: {sum(job.exported_this_run for job in jobs):,}")
+    print(f"   • Thời gian chờ ngân sách tải: {bucket.waited:.1f}s")
+    for line in client.format_stats():
+        print(f"   • {line}")
+    failed = [job for job in jobs if job.status == "failed"]
+    for job in failed:
+        print(f"   ❌ {job.key}: {job.message}")
+    pending = [job for job in jobs if job.status == "pending"]
+    if pending:
+        print(f"\n🔄 ĐỂ TIẾP TỤC: python export_scheduler.py {args.manifest}")
+    TRACER.print_report()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
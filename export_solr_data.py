@@ -6,6 +6,10 @@ Script để export dữ liệu từ Solr collection
 - Sử dụng cursorMark để pagination hiệu quả
 - Lưu state để có thể resume khi dừng giữa chừng
 - Tối ưu hiệu năng bằng cách ghi file theo batch
+- Request lỗi được retry với exponential backoff + jitter (có retry budget, circuit breaker);
+  lỗi liên tiếp quá MAX_CONSECUTIVE_FAILURES lần thì lưu state và dừng để resume sau
+- In thời gian theo phase (http, decode, write, state.save, wait) khi kết thúc;
+  --profile[=cprofile|folded] ghi file profile cho cả lần chạy
 """
 
 import requests
@@ -14,9 +18,13 @@ import json
 import os
 import sys
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Callable
 from urllib.parse import urlencode
 
+from resilience import CircuitOpenError, RequestFailed, ResilientClient, RetryPolicy
+from solr_javabin import solr_get
+from tracing import TRACER, pop_profile_arg, profiled, span
+
 # Cấu hình
 SOLR_URL = "http://solrtopic-testing.ynm.local/solr"
 COLLECTION_NAME = "topic_10236681"
@@ -26,30 +34,46 @@ ROWS_PER_REQUEST = 500  # Số records mỗi request
 WAIT_SECONDS = 10  # Đợi 60 giây (1 phút) giữa các request
 OUTPUT_FILE = "exported_data.jsonl"  # JSONL format (một JSON object mỗi dòng)
 STATE_FILE = "export_state.json"  # File lưu trạng thái
+MAX_RETRIES = 5  # Số lần thử tối đa cho một request (backoff 1s, 2s, 4s... có jitter)
+RETRY_MAX_DELAY = 60  # Giây, trần của backoff
+MAX_CONSECUTIVE_FAILURES = 6  # Số request lỗi liên tiếp (sau khi đã retry) trước khi dừng export
 
 
 class SolrExporter:
-    def __init__(self, solr_url: str, collection_name: str, username: str, password: str):
+    def __init__(self, solr_url: str, collection_name: str, username: str, password: str,
+                 client: Optional[ResilientClient] = None, filters: Optional[List[str]] = None):
         self.solr_url = solr_url.rstrip('/')
         self.collection_name = collection_name
         self.auth = (username, password)
+        self.filters = list(filters or [])  # fq áp dụng cho mọi query (vd: refresh theo ngày cập nhật)
+        self.client_key = collection_name  # Key của breaker/thống kê trong ResilientClient
+        self.before_request: Optional[Callable[[], Any]] = None  # Gọi trước mỗi lần gửi request (kể cả retry)
+        self.last_error: Optional[BaseException] = None  # Lỗi của query_with_cursor gần nhất
         self.query_url = f"{self.solr_url}/{collection_name}/query"
+        self.client = client or ResilientClient(RetryPolicy(max_attempts=MAX_RETRIES, base_delay=1.0,
+                                                            max_delay=RETRY_MAX_DELAY))
         
-    def get_total_count(self) -> int:
-        """Lấy tổng số documents trong collection"""
+    def get_total_count(self) -> Optional[int]:
+        """Lấy tổng số documents trong collection, None nếu không query được (khác với 0 documents)"""
         params = {
             "q": "*:*",
             "rows": "0",
             "wt": "json"
         }
+        if self.filters:
+            params["fq"] = self.filters
+
+        def fetch():
+            if self.before_request is not None:
+                self.before_request()
+            return solr_get(None, self.query_url, params, timeout=30, auth=self.auth)
+
         try:
-            response = requests.get(self.query_url, params=params, auth=self.auth, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+            data = self.client.call(self.client_key, fetch, hedge=False)
             return data.get('response', {}).get('numFound', 0)
-        except Exception as e:
+        except (RequestFailed, CircuitOpenError, ValueError) as e:
             print(f"❌ Lỗi khi lấy tổng số documents: {e}")
-            return 0
+            return None
     
     def get_cursor_mark(self) -> str:
         """Lấy cursorMark ban đầu từ Solr"""
@@ -77,18 +101,26 @@ class SolrExporter:
             "rows": str(rows),
             "sort": "id asc",  # Bắt buộc phải có sort để dùng cursorMark
             "cursorMark": cursor_mark,
-            "wt": "json",
+            "wt": "json",  # SOLR_WT=javabin để dùng javabin (response nhỏ hơn), lỗi thì fallback JSON
             "indent": "false"  # Không indent để giảm kích thước response
         }
+        if self.filters:
+            params["fq"] = self.filters
         
+        def fetch():
+            if self.before_request is not None:
+                self.before_request()
+            return solr_get(None, self.query_url, params, timeout=60, auth=self.auth)
+
+        self.last_error = None
         try:
-            response = requests.get(self.query_url, params=params, auth=self.auth, timeout=60)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return self.client.call(self.client_key, fetch, hedge=False)
+        except (RequestFailed, CircuitOpenError) as e:
+            self.last_error = e
             print(f"❌ Lỗi khi query Solr: {e}")
-            if hasattr(e.response, 'text'):
-                print(f"   Response: {e.response.text[:500]}")
+            response = getattr(getattr(e, 'error', None), 'response', None)
+            if hasattr(response, 'text'):
+                print(f"   Response: {response.text[:500]}")
             return None
 
 
@@ -111,17 +143,23 @@ class StateManager:
             "start_time": None
         }
     
-    def save_state(self, cursor_mark: str, total_exported: int, start_time: Optional[str] = None):
-        """Lưu state vào file"""
+    def save_state(self, cursor_mark: str, total_exported: int, start_time: Optional[str] = None,
+                   **extra: Any):
+        """Lưu state vào file (extra: các field bổ sung, vd: trạng thái của export_scheduler.py)"""
         state = {
             "cursor_mark": cursor_mark,
             "total_exported": total_exported,
             "last_export_time": datetime.now().isoformat(),
             "start_time": start_time or datetime.now().isoformat()
         }
+        state.update(extra)
         try:
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(state, f, indent=2, ensure_ascii=False)
+            # Ghi file tạm rồi đổi tên: bị ngắt giữa chừng cũng không làm hỏng state cũ
+            tmp_file = f"{self.state_file}.tmp"
+            with span("state.save"):
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, indent=2, ensure_ascii=False)
+                os.replace(tmp_file, self.state_file)
         except Exception as e:
             print(f"⚠️  Lỗi khi lưu state: {e}")
 
@@ -165,6 +203,9 @@ def export_data():
     # Lấy tổng số documents
     print("📊 Đang lấy thông tin collection...")
     total_docs = exporter.get_total_count()
+    if total_docs is None:
+        print("❌ Không lấy được thông tin collection, chạy lại sau (state không thay đổi)")
+        sys.exit(1)
     if total_docs == 0:
         print("❌ Không tìm thấy documents trong collection!")
         return
@@ -192,6 +233,8 @@ def export_data():
         print()
     
     request_count = 0
+    consecutive_failures = 0
+    failure_backoff = RetryPolicy(base_delay=WAIT_SECONDS, max_delay=RETRY_MAX_DELAY * 5)
     last_save_time = time.time()
     query_start_time = time.time()
     
@@ -262,10 +305,22 @@ def export_data():
                 
                 if not data:
                     print("❌")
-                    print("   ⚠️  Không nhận được dữ liệu, đợi 10 giây rồi thử lại...")
-                    time.sleep(10)
+                    if isinstance(exporter.last_error, CircuitOpenError):
+                        # Breaker từ chối ngay, chưa gửi request nào: chờ hết reset_timeout, không tính là lỗi
+                        delay = exporter.client.reset_timeout
+                        print(f"   ⏸️  Circuit breaker đang mở, đợi {delay:.0f} giây rồi thử lại...")
+                        time.sleep(delay)
+                        continue
+                    consecutive_failures += 1
+                    if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                        raise RuntimeError(f"Query lỗi {consecutive_failures} lần liên tiếp, dừng export")
+                    delay = failure_backoff.delay(consecutive_failures)
+                    print(f"   ⚠️  Không nhận được dữ liệu ({consecutive_failures}/{MAX_CONSECUTIVE_FAILURES}), "
+                          f"đợi {delay:.0f} giây rồi thử lại...")
+                    time.sleep(delay)
                     continue
                 
+                consecutive_failures = 0
                 print(f"✅ ({query_time:.2f}s)")
                 
                 # Lấy documents từ response
@@ -279,11 +334,12 @@ def export_data():
                 # Ghi documents vào file (JSONL format)
                 write_start = time.time()
                 batch_count = 0
-                for doc in docs:
-                    json_line = json.dumps(doc, ensure_ascii=False)
-                    f.write(json_line + '\n')
-                    batch_count += 1
-                f.flush()  # Đảm bảo ghi vào disk ngay
+                with span("write"):
+                    for doc in docs:
+                        json_line = json.dumps(doc, ensure_ascii=False)
+                        f.write(json_line + '\n')
+                        batch_count += 1
+                    f.flush()  # Đảm bảo ghi vào disk ngay
                 write_time = time.time() - write_start
                 
                 total_exported += batch_count
@@ -356,9 +412,10 @@ def export_data():
                     print(f"   ⏳ Đợi {WAIT_SECONDS} giây trước request tiếp theo...")
                     print()
                     # Hiển thị countdown
-                    for i in range(WAIT_SECONDS, 0, -1):
-                        print(f"\r   ⏳ Còn {i} giây...", end='', flush=True)
-                        time.sleep(1)
+                    with span("wait"):
+                        for i in range(WAIT_SECONDS, 0, -1):
+                            print(f"\r   ⏳ Còn {i} giây...", end='', flush=True)
+                            time.sleep(1)
                     print("\r   " + " " * 30 + "\r", end='')  # Xóa dòng countdown
                 else:
                     break
@@ -437,8 +494,13 @@ def export_data():
         print(f"   Chạy lại script: python export_solr_data.py")
         print()
         print("=" * 80)
+        sys.exit(1)
+    finally:
+        TRACER.print_report()
 
 
 if __name__ == "__main__":
-    export_data()
+    profile_mode, _ = pop_profile_arg(sys.argv[1:])
+    with profiled(profile_mode, "export_solr_data"):
+        export_data()
 
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+External sort cho dữ liệu lớn hơn RAM
+- Gom records (bytes) thành các run có kích thước giới hạn, sort trong RAM rồi ghi ra file tạm
+- Merge các run bằng heapq.merge, tối đa MAX_FAN_IN file mở cùng lúc (merge nhiều lượt nếu cần)
+- Record được ghi dạng length-prefixed nên có thể chứa bất kỳ byte nào
+"""
+
+import heapq
+import os
+import struct
+import tempfile
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+RUN_BYTES = 256 * 1024 * 1024  # Kích thước tối đa của một run trong RAM
+MAX_FAN_IN = 64  # Số run tối đa merge cùng lúc
+_LEN = struct.Struct('>I')
+
+
+def _write_run(records: Iterable[bytes], tmp_dir: str) -> str:
+    fd, path = tempfile.mkstemp(prefix='run_', suffix='.bin', dir=tmp_dir)
+    with os.fdopen(fd, 'wb', buffering=1024 * 1024) as f:
+        for record in records:
+            f.write(_LEN.pack(len(record)))
+            f.write(record)
+    return path
+
+
+def _read_run(path: str) -> Iterator[bytes]:
+    with open(path, 'rb', buffering=1024 * 1024) as f:
+        while True:
+            header = f.read(_LEN.size)
+            if not header:
+                return
+            (length,) = _LEN.unpack(header)
+            yield f.read(length)
+
+
+def external_sort(records: Iterable[bytes], key: Optional[Callable[[bytes], Any]] = None,
+                  run_bytes: int = RUN_BYTES, tmp_dir: Optional[str] = None,
+                  stats: Optional[dict] = None) -> Iterator[bytes]:
+    """
+    Sort records với bộ nhớ giới hạn
+
+    Args:
+        records: Các records dạng bytes
+        key: Hàm lấy khóa sort (mặc định: chính record)
+        run_bytes: Số bytes tối đa giữ trong RAM cho một run
+        tmp_dir: Thư mục chứa file tạm (mặc định: thư mục tạm của hệ thống)
+        stats: Dict để ghi lại số records và số runs đã spill
+
+    Yields:
+        Records theo thứ tự tăng dần của key
+    """
+    with tempfile.TemporaryDirectory(prefix='extsort_', dir=tmp_dir) as work_dir:
+        runs: List[str] = []
+        buffer: List[bytes] = []
+        buffered = 0
+        count = 0
+        for record in records:
+            buffer.append(record)
+            buffered += len(record) + 64  # Ước tính overhead của object bytes
+            count += 1
+            if buffered >= run_bytes:
+                buffer.sort(key=key)
+                runs.append(_write_run(buffer, work_dir))
+                buffer = []
+                buffered = 0
+
+        buffer.sort(key=key)
+        if runs and buffer:
+            runs.append(_write_run(buffer, work_dir))
+            buffer = []
+        if stats is not None:
+            stats['records'] = count
+            stats['runs'] = len(runs)
+
+        if not runs:
+            # Vừa RAM: không cần ghi file tạm
+            yield from buffer
+            return
+
+        # Merge nhiều lượt nếu số run vượt quá MAX_FAN_IN
+        while len(runs) > MAX_FAN_IN:
+            merged = []
+            for i in range(0, len(runs), MAX_FAN_IN):
+                group = runs[i:i + MAX_FAN_IN]
+                merged.append(_write_run(heapq.merge(*(_read_run(p) for p in group), key=key), work_dir))
+                for path in group:
+                    os.remove(path)
+            runs = merged
+
+        yield from heapq.merge(*(_read_run(p) for p in runs), key=key)
+
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script để so sánh các cách facet tương đương trên search_text_cloud
+- Classic facet.field với facet.method mặc định, fc, fcs, enum, uif
+- JSON Facet API (type=terms) với method smart, dv, uif, enum
+- Chạy cùng workload (fq=id:<id> như compare_facet_results.py) trên cả 3 containers
+- Kiểm tra kết quả giống hệt formulation đang dùng (FACET_PARAMS)
+- Xếp hạng theo latency và bộ nhớ cache (ramBytesUsed qua /admin/mbeans, heap JVM nếu có)
+
+Cách sử dụng:
+    python facet_strategy_explorer.py [num_docs] [options]
+
+Ví dụ:
+    python facet_strategy_explorer.py 200 --repeat 3
+    python facet_strategy_explorer.py 100 --only json --no-reload
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from compare_facet_results import CONTAINERS, FACET_PARAMS, get_document_ids
+from solr_cache_stats import fetch_cache_stats, reload_core, summarize_latencies
+
+FACET_FIELD = FACET_PARAMS["facet.field"]
+CLASSIC_METHODS = [None, "fc", "fcs", "enum", "uif"]
+JSON_METHODS = ["smart", "dv", "uif", "enum"]
+REPEAT = 3
+REQUEST_TIMEOUT = 60
+
+Terms = List[Tuple[str, int]]
+
+
+def classic_formulation(method: Optional[str] = None) -> Dict[str, str]:
+    params = {k: v for k, v in FACET_PARAMS.items() if k != "indent"}
+    if method:
+        params["facet.method"] = method
+    return params
+
+
+def json_formulation(method: str) -> Dict[str, str]:
+    facet = {
+        "type": "terms",
+        "field": FACET_FIELD,
+        "limit": int(FACET_PARAMS["facet.limit"]),
+        "mincount": int(FACET_PARAMS["facet.mincount"]),
+        "sort": "count desc" if FACET_PARAMS["facet.sort"] == "count" else "index asc",
+        "method": method,
+    }
+    return {"q": FACET_PARAMS["q"], "rows": "0", "wt": "json", "json.facet": json.dumps({"terms": facet})}
+
+
+def build_formulations(only: Optional[str] = None) -> List[Tuple[str, Dict[str, str]]]:
+    """Danh sách (tên, params); phần tử đầu tiên là formulation đang dùng làm baseline"""
+    formulations = []
+    if only != "json":
+        for method in CLASSIC_METHODS:
+            name = f"facet.method={method}" if method else "facet.field (hiện tại)"
+            formulations.append((name, classic_formulation(method)))
+    if only != "classic":
+        for method in JSON_METHODS:
+            formulations.append((f"json.facet method={method}", json_formulation(method)))
+    if only == "json":
+        # Baseline vẫn phải là formulation đang dùng
+        formulations.insert(0, ("facet.field (hiện tại)", classic_formulation()))
+    return formulations
+
+
+def parse_terms(data: Dict[str, Any]) -> Terms:
+    """Lấy danh sách (term, count) từ response classic hoặc JSON Facet"""
+    if "facets" in data:
+        buckets = data["facets"].get("terms", {}).get("buckets", [])
+        return [(str(b["val"]), b["count"]) for b in buckets]
+    flat = data.get("facet_counts", {}).get("facet_fields", {}).get(FACET_FIELD, [])
+    return list(zip(flat[::2], flat[1::2]))
+
+
+def compare_terms(baseline: Terms, result: Terms) -> str:
+    """
+    So sánh với baseline
+
+    Returns:
+        identical: giống hệt cả thứ tự
+        order: cùng terms/counts nhưng khác thứ tự (tie-break khác nhau)
+        tie: baseline bị cắt ở facet.limit và chỉ khác ở các terms có count bằng count nhỏ nhất
+        different: khác kết quả
+    """
+    if baseline == result:
+        return "identical"
+    base_map, result_map = dict(baseline), dict(result)
+    if base_map == result_map:
+        return "order"
+    # Chỉ coi là tie khi baseline thực sự bị cắt ở facet.limit, nếu không mọi term đều phải khớp
+    if len(baseline) == int(FACET_PARAMS["facet.limit"]) and len(baseline) == len(result):
+        boundary = min(c for _, c in baseline)
+        diff_terms = set(base_map.items()) ^ set(result_map.items())
+        if all(count == boundary for _, count in diff_terms):
+            return "tie"
+    return "different"
+
+
+def memory_snapshot(session: requests.Session, port: int, core: str) -> Dict[str, Optional[int]]:
+    """Tổng ramBytesUsed của các cache và heap JVM đang dùng (nếu endpoint có)"""
+    snapshot: Dict[str, Optional[int]] = {"cache_ram_bytes": None, "heap_used_bytes": None}
+    try:
+        caches = fetch_cache_stats(port, core, session)
+        ram = [c.get("ramBytesUsed") for c in caches.values() if isinstance(c.get("ramBytesUsed"), (int, float))]
+        entries = sum(c.get("size", c.get("entries_count", 0)) or 0 for c in caches.values())
+        snapshot["cache_ram_bytes"] = int(sum(ram)) if ram else None
+        snapshot["cache_entries"] = entries
+    except (requests.RequestException, ValueError):
+        pass
+    try:
+        response = session.get(f"http://localhost:{port}/solr/admin/info/system",
+                               params={"wt": "json"}, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        snapshot["heap_used_bytes"] = response.json().get("jvm", {}).get("memory", {}).get("raw", {}).get("used")
+    except (requests.RequestException, ValueError):
+        pass
+    return snapshot
+
+
+def run_formulation(session: requests.Session, container: Dict[str, Any], params: Dict[str, str],
+                    ids: List[str], repeat: int) -> Dict[str, Any]:
+    """Chạy một formulation cho tất cả ids, lặp lại repeat lần; lần đầu giữ kết quả để so sánh"""
+    url = f"http://localhost:{container['port']}/solr/{container['core']}/select"
+    terms_by_id: Dict[str, Optional[Terms]] = {}
+    latencies: List[float] = []
+    qtimes: List[float] = []
+    errors = 0
+    first_query_ms = None
+    last_error = None
+    for round_idx in range(repeat):
+        for doc_id in ids:
+            query = dict(params, fq=f"id:{doc_id}")
+            start = time.perf_counter()
+            try:
+                response = session.get(url, params=query, timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+                data = response.json()
+            except (requests.RequestException, ValueError) as e:
+                errors += 1
+                last_error = str(e)
+                if round_idx == 0:
+                    terms_by_id[doc_id] = None
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+            if first_query_ms is None:
+                first_query_ms = elapsed  # Bao gồm chi phí uninvert/load field sau RELOAD
+            else:
+                latencies.append(elapsed)
+            qtimes.append(data.get("responseHeader", {}).get("QTime", 0))
+            if round_idx == 0:
+                terms_by_id[doc_id] = parse_terms(data)
+    summary = summarize_latencies(latencies, qtimes, errors)
+    summary["first_query_ms"] = first_query_ms
+    summary["last_error"] = last_error
+    return {"latency": summary, "terms": terms_by_id}
+
+
+def explore_container(container: Dict[str, Any], formulations: List[Tuple[str, Dict[str, str]]],
+                      ids: List[str], repeat: int, reload: bool) -> List[Dict[str, Any]]:
+    session = requests.Session()
+    port, core = container["port"], container["core"]
+    baseline_terms: Dict[str, Optional[Terms]] = {}
+    rows = []
+    for idx, (name, params) in enumerate(formulations):
+        if reload:
+            reload_core(port, core, session)
+        mem_before = memory_snapshot(session, port, core)
+        run = run_formulation(session, container, params, ids, repeat)
+        mem_after = memory_snapshot(session, port, core)
+
+        if idx == 0:
+            baseline_terms = run["terms"]
+        verdicts = {"identical": 0, "order": 0, "tie": 0, "different": 0, "error": 0}
+        for doc_id, terms in run["terms"].items():
+            base = baseline_terms.get(doc_id)
+            if terms is None or base is None:
+                verdicts["error"] += 1
+            else:
+                verdicts[compare_terms(base, terms)] += 1
+
+        def mem_delta(key):
+            if mem_before.get(key) is None or mem_after.get(key) is None:
+                return None
+            return mem_after[key] - mem_before[key]
+
+        rows.append({
+            "formulation": name,
+            "params": params,
+            "latency": run["latency"],
+            "verdicts": verdicts,
+            "correct": verdicts["different"] == 0 and verdicts["error"] == 0,
+            "cache_ram_bytes": mem_after.get("cache_ram_bytes"),
+            "cache_ram_delta": mem_delta("cache_ram_bytes"),
+            "cache_entries_delta": mem_delta("cache_entries"),
+            "heap_delta_bytes": mem_delta("heap_used_bytes"),
+        })
+    return rows
+
+
+def rank_key(row: Dict[str, Any]):
+    latency = row["latency"].get("p50_ms")
+    memory = row["cache_ram_delta"] if row["cache_ram_delta"] is not None else row["cache_entries_delta"]
+    return (not row["correct"], latency if latency is not None else float("inf"),
+            memory if memory is not None else 0)
+
+
+def format_bytes(value: Optional[int]) -> str:
+    if value is None:
+        return "-"
+    if abs(value) >= 1024 ** 3:
+        return f"{value / 1024 ** 3:.2f}GB"
+    return f"{value / (1024 * 1024):.1f}MB" if abs(value) >= 1024 * 1024 else f"{value / 1024:.1f}KB"
+
+
+def print_container_report(version: str, rows: List[Dict[str, Any]]):
+    print(f"\n📦 {version}")
+    print(f"   {'#':>2} {'Formulation':<28} {'OK':<3} {'p50':>8} {'p95':>8} {'QTime':>7} {'1st':>8} "
+          f"{'CacheRAM':>10} {'Heap':>9}  Khác/Tie/Order/Lỗi")
+    for rank, row in enumerate(sorted(rows, key=rank_key), 1):
+        lat = row["latency"]
+        p50 = f"{lat['p50_ms']:.1f}" if lat.get("p50_ms") is not None else "-"
+        p95 = f"{lat['p95_ms']:.1f}" if lat.get("p95_ms") is not None else "-"
+        qtime = f"{lat['qtime_mean_ms']:.1f}" if lat.get("qtime_mean_ms") is not None else "-"
+        first = f"{lat['first_query_ms']:.1f}" if lat.get("first_query_ms") is not None else "-"
+        v = row["verdicts"]
+        ok = "✅" if row["correct"] else "❌"
+        if row["cache_ram_delta"] is not None:
+            memory = format_bytes(row["cache_ram_delta"])
+        elif row["cache_entries_delta"] is not None:
+            memory = f"{row['cache_entries_delta']:+,} ent"
+        else:
+            memory = "-"
+        print(f"   {rank:>2} {row['formulation']:<28} {ok:<3} {p50:>8} {p95:>8} {qtime:>7} {first:>8} "
+              f"{memory:>10} {format_bytes(row['heap_delta_bytes']):>9}  "
+              f"{v['different']}/{v['tie']}/{v['order']}/{v['error']}")
+        if lat.get("last_error") and not lat.get("queries"):
+            print(f"      ⚠️  {lat['last_error'][:100]}")
+
+
+def main():
+    # Set UTF-8 encoding cho Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="So sánh facet.method và JSON Facet API trên các containers")
+    parser.add_argument("num_docs", nargs="?", type=int, default=100, help="Số documents trong workload (mặc định: 100)")
+    parser.add_argument("--source-port", type=int, default=CONTAINERS[0]["port"])
+    parser.add_argument("--repeat", type=int, default=REPEAT, help=f"Số lần lặp workload (mặc định: {REPEAT})")
+    parser.add_argument("--only", choices=["classic", "json"], help="Chỉ chạy classic facet hoặc JSON Facet")
+    parser.add_argument("--no-reload", action="store_true",
+                        help="Không RELOAD core trước mỗi formulation (bộ nhớ/1st query không tách biệt)")
+    args = parser.parse_args()
+
+    source = next((c for c in CONTAINERS if c["port"] == args.source_port), CONTAINERS[0])
+    ids = get_document_ids(args.source_port, source["core"], args.num_docs)
+    if not ids:
+        print("❌ Không lấy được document IDs. Kiểm tra lại Solr containers.")
+        sys.exit(1)
+
+    formulations = build_formulations(args.only)
+    print("━" * 70)
+    print(f"🔬 Facet strategy explorer: {len(formulations)} formulations x {len(CONTAINERS)} containers")
+    print(f"   Workload: {len(ids)} documents x {args.repeat} lần, field {FACET_FIELD}")
+    print(f"   Baseline: {formulations[0][0]}")
+    print("━" * 70)
+
+    results = {}
+    recommended = {}
+    for container in CONTAINERS:
+        rows = explore_container(container, formulations, ids, args.repeat, not args.no_reload)
+        results[container["version"]] = rows
+        print_container_report(container["version"], rows)
+        best = sorted(rows, key=rank_key)[0]
+        if best["correct"]:
+            recommended[container["version"]] = {"formulation": best["formulation"], "params": best["params"]}
+            print(f"   🏆 Nhanh nhất và đúng: {best['formulation']}")
+        else:
+            print("   ⚠️  Không có formulation nào cho kết quả giống baseline")
+
+    print("\n" + "━" * 70)
+    print("📋 Query đề xuất theo version:")
+    for version, rec in recommended.items():
+        print(f"   {version}: {rec['formulation']}")
+        print(f"      {json.dumps(rec['params'], ensure_ascii=False)}")
+    print("   (Cột Khác/Tie/Order/Lỗi: số documents khác baseline, khác ở biên limit, khác thứ tự, bị lỗi)")
+
+    output_file = f"facet_strategy_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({"num_docs": len(ids), "repeat": args.repeat, "results": results,
+                   "recommended": recommended}, f, ensure_ascii=False, indent=2)
+    print(f"💾 Kết quả đã lưu vào: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
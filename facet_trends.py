@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Word cloud theo cửa sổ thời gian trượt (24h, 7 ngày...) trên man_updated_at, dùng cache theo bucket
+- Chia thời gian thành các bucket cố định (giờ/ngày), facet.range cho số documents mỗi bucket
+- Mỗi bucket đã đóng được query facet search_text_cloud một lần (fq theo khoảng thời gian) và cache ra đĩa
+- Cửa sổ bất kỳ = merge (cộng count) các bucket trong cache + query trực tiếp phần biên chưa trọn bucket
+  và bucket đang mở, nên mỗi lần hỏi lại chỉ phải query phần mới
+- Bucket trong cache được đối chiếu với số documents từ facet.range, lệch (document đến muộn,
+  bị xóa) thì query lại. Cập nhật nội dung không đổi số documents thì không phát hiện được:
+  dùng --no-cache hoặc xóa thư mục cache sau khi reindex
+- So sánh word cloud cùng cửa sổ giữa 3 containers, có thể so với một facet query trên cả cửa sổ (--verify)
+
+Cách sử dụng:
+    python facet_trends.py [--window 24h] [--end ISO] [--bucket hour|day] [--top 100] [options]
+
+Ví dụ:
+    python facet_trends.py --window 24h
+    python facet_trends.py --window 7d --bucket day --fq "domain:news.vn" --trend
+    python facet_trends.py --window 24h --end 2024-05-01T12:30:00Z --verify --port 8985
+
+Count mỗi bucket mặc định lấy đủ tất cả terms (--bucket-limit -1) nên kết quả merge chính xác như
+facet trên cả cửa sổ. Với --bucket-limit N, term bị cắt ở một bucket có thể bị đếm thiếu, cận sai số
+được in ra cùng kết quả.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from compare_facet_results import CONTAINERS, FACET_PARAMS
+from resilience import CircuitOpenError, RequestFailed, ResilientClient, RetryPolicy
+from solr_javabin import facet_pairs, solr_get
+
+FACET_FIELD = "search_text_cloud"
+DATE_FIELD = "man_updated_at"
+CACHE_DIR = "facet_trend_cache"
+TOP_K = 100
+BUCKET_LIMIT = -1  # Lấy tất cả terms của mỗi bucket để merge chính xác
+SETTLE_MINUTES = 15  # Bucket kết thúc trước now - SETTLE_MINUTES mới được cache (chờ commit/document đến muộn)
+WORKERS = 4
+BUCKETS = {
+    "hour": (timedelta(hours=1), "+1HOUR"),
+    "day": (timedelta(days=1), "+1DAY"),
+}
+WINDOW_RE = re.compile(r"^(\d+)([hdm])$")
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+CLIENT = ResilientClient(RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=10))
+
+
+def to_iso(dt: datetime) -> str:
+    return dt.strftime(ISO_FORMAT)
+
+
+def parse_iso(value: str) -> datetime:
+    value = value.rstrip('Z').split('.')[0]
+    if len(value) == 10:
+        value += "T00:00:00"
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+
+
+def parse_window(value: str) -> timedelta:
+    """24h, 7d, 90m -> timedelta"""
+    match = WINDOW_RE.match(value.strip())
+    if not match:
+        raise ValueError(f"Cửa sổ không hợp lệ: {value} (ví dụ: 24h, 7d, 90m)")
+    amount, unit = int(match.group(1)), match.group(2)
+    return {"h": timedelta(hours=amount), "d": timedelta(days=amount), "m": timedelta(minutes=amount)}[unit]
+
+
+def floor_bucket(dt: datetime, size: timedelta) -> datetime:
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return epoch + ((dt - epoch) // size) * size
+
+
+def range_fq(start: datetime, end: datetime) -> str:
+    return f"{DATE_FIELD}:[{to_iso(start)} TO {to_iso(end)}}}"
+
+
+def plan_segments(window_start: datetime, window_end: datetime, size: timedelta,
+                  settled_before: datetime) -> List[Tuple[datetime, datetime, bool]]:
+    """
+    Chia cửa sổ thành các đoạn (start, end, cacheable)
+
+    Đoạn trọn bucket và đã đóng (end <= settled_before) thì cacheable; phần biên không trọn bucket
+    và bucket còn mở được query trực tiếp mỗi lần.
+    """
+    segments = []
+    cursor = window_start
+    while cursor < window_end:
+        bucket_start = floor_bucket(cursor, size)
+        bucket_end = bucket_start + size
+        end = min(bucket_end, window_end)
+        whole = cursor == bucket_start and end == bucket_end
+        segments.append((cursor, end, whole and bucket_end <= settled_before))
+        cursor = end
+    return segments
+
+
+class BucketCache:
+    """Cache facet của từng bucket ra file JSON: <cache_dir>/<container>/<cache_key>/<bucket>.json"""
+
+    def __init__(self, cache_dir: str, container: Dict[str, Any], key: str, enabled: bool = True):
+        self.path = os.path.join(cache_dir, container["name"], key)
+        self.enabled = enabled
+        if enabled:
+            os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, start: datetime) -> str:
+        return os.path.join(self.path, start.strftime("%Y%m%dT%H%M%S") + ".json")
+
+    def get(self, start: datetime) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        try:
+            with open(self._file(start), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, start: datetime, entry: Dict[str, Any]):
+        if not self.enabled:
+            return
+        tmp_path = self._file(start) + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, self._file(start))
+
+
+def cache_key(fq: List[str], limit: int, bucket: str) -> str:
+    """Cache tách theo filter, bucket-limit và kích thước bucket"""
+    raw = json.dumps({"fq": sorted(fq), "limit": limit, "bucket": bucket, "field": FACET_FIELD})
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+
+def query_facet(container: Dict[str, Any], fq: List[str], limit: int) -> Tuple[List[Tuple[str, int]], int]:
+    url = f"http://localhost:{container['port']}/solr/{container['core']}/select"
+    params = dict(FACET_PARAMS)
+    params["facet.limit"] = str(limit)
+    params["fq"] = fq
+    data = CLIENT.call(container["name"], lambda: solr_get(None, url, params, timeout=120, compact=True))
+    pairs = list(facet_pairs(data.get("facet_counts", {}).get("facet_fields", {}).get(FACET_FIELD, [])))
+    return pairs, data.get("response", {}).get("numFound", 0)
+
+
+def bucket_doc_counts(container: Dict[str, Any], start: datetime, end: datetime, gap: str,
+                      fq: List[str]) -> Dict[str, int]:
+    """Số documents mỗi bucket trong [start, end) bằng một facet.range query"""
+    url = f"http://localhost:{container['port']}/solr/{container['core']}/select"
+    params = {
+        "q": "*:*", "rows": "0", "wt": "json", "fq": fq,
+        "facet": "true", "facet.range": DATE_FIELD,
+        "facet.range.start": to_iso(start), "facet.range.end": to_iso(end),
+        "facet.range.gap": gap, f"f.{DATE_FIELD}.facet.mincount": "0",
+    }
+    data = CLIENT.call(container["name"], lambda: solr_get(None, url, params, timeout=120))
+    counts = data.get("facet_counts", {}).get("facet_ranges", {}).get(DATE_FIELD, {}).get("counts", [])
+    return dict(facet_pairs(counts))
+
+
+def window_cloud(container: Dict[str, Any], window_start: datetime, window_end: datetime,
+                 args, cache: BucketCache, now: datetime) -> Tuple[Dict[str, Any], Counter]:
+    """Word cloud của cửa sổ: merge bucket từ cache + query phần còn thiếu, trả về (kết quả, count đã merge)"""
+    size, gap = BUCKETS[args.bucket]
+    settled_before = now - timedelta(minutes=args.settle_minutes)
+    segments = plan_segments(window_start, window_end, size, settled_before)
+    start_time = time.perf_counter()
+    stats = Counter()
+
+    cacheable = [(s, e) for s, e, ok in segments if ok]
+    doc_counts = {}
+    if cacheable:
+        doc_counts = bucket_doc_counts(container, cacheable[0][0], cacheable[-1][1], gap, args.fq)
+        stats["range_queries"] += 1
+
+    merged = Counter()
+    num_found = 0
+    error_bound = 0
+    to_fetch = []  # (start, end, cacheable)
+    for start, end, ok in segments:
+        if not ok:
+            stats["live"] += 1
+            to_fetch.append((start, end, False))
+            continue
+        expected = doc_counts.get(to_iso(start), 0)
+        entry = cache.get(start)
+        if entry is not None and entry["num_found"] == expected:
+            stats["cache_hits"] += 1
+        elif expected == 0:
+            # Bucket rỗng: không cần query facet
+            entry = {"start": to_iso(start), "end": to_iso(end), "num_found": 0, "terms": [],
+                     "limit": args.bucket_limit, "fetched_at": to_iso(now)}
+            cache.put(start, entry)
+            stats["empty"] += 1
+        else:
+            if entry is not None:
+                stats["invalidated"] += 1
+            to_fetch.append((start, end, True))
+            continue
+        merged.update(dict(entry["terms"]))
+        num_found += entry["num_found"]
+        if args.bucket_limit > 0 and len(entry["terms"]) >= args.bucket_limit:
+            error_bound += entry["terms"][-1][1]
+
+    def fetch(segment):
+        start, end, ok = segment
+        pairs, found = query_facet(container, args.fq + [range_fq(start, end)], args.bucket_limit)
+        return segment, pairs, found
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for (start, end, ok), pairs, found in pool.map(fetch, to_fetch):
+            stats["facet_queries"] += 1
+            if ok:
+                stats["fetched"] += 1
+                cache.put(start, {"start": to_iso(start), "end": to_iso(end), "num_found": found,
+                                  "terms": pairs, "limit": args.bucket_limit, "fetched_at": to_iso(now)})
+            merged.update(dict(pairs))
+            num_found += found
+            if args.bucket_limit > 0 and len(pairs) >= args.bucket_limit:
+                error_bound += pairs[-1][1]
+
+    top = sorted(merged.items(), key=lambda kv: (-kv[1], kv[0]))[:args.top]
+    result = {
+        "window_start": to_iso(window_start),
+        "window_end": to_iso(window_end),
+        "num_found": num_found,
+        "top": top,
+        "error_bound": error_bound,
+        "segments": len(segments),
+        "stats": dict(stats),
+        "elapsed_ms": round((time.perf_counter() - start_time) * 1000, 1),
+    }
+    return result, merged
+
+
+def verify_window(container: Dict[str, Any], result: Dict[str, Any], args) -> Dict[str, Any]:
+    """So sánh kết quả merge với một facet query trên cả cửa sổ"""
+    start, end = parse_iso(result["window_start"]), parse_iso(result["window_end"])
+    query_start = time.perf_counter()
+    pairs, found = query_facet(container, args.fq + [range_fq(start, end)], args.top)
+    direct_ms = (time.perf_counter() - query_start) * 1000
+    direct = dict(pairs)
+    merged = dict(result["top"])
+    mismatched = [t for t in set(direct) & set(merged) if direct[t] != merged[t]]
+    kth = pairs[-1][1] if len(pairs) >= args.top else 0
+    # Term ở biên top-K có count bằng nhau có thể được chọn khác nhau
+    missing = [t for t in direct if t not in merged and direct[t] > kth]
+    return {
+        "direct_ms": round(direct_ms, 1),
+        "num_found": found,
+        "identical": not mismatched and not missing and found == result["num_found"],
+        "count_mismatches": sorted(mismatched),
+        "missing_terms": missing,
+    }
+
+
+def rising_terms(current: List[Tuple[str, int]], previous: Dict[str, int], limit: int = 20) -> List[Dict[str, Any]]:
+    """Term tăng mạnh nhất so với cửa sổ liền trước (cùng độ dài)"""
+    rows = []
+    for term, count in current:
+        before = previous.get(term, 0)
+        rows.append({"term": term, "count": count, "previous": before, "ratio": round((count + 1) / (before + 1), 2)})
+    rows.sort(key=lambda r: (-r["ratio"], -r["count"]))
+    return rows[:limit]
+
+
+def compare_clouds(results: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """So sánh word cloud giữa từng cặp containers"""
+    versions = list(results)
+    comparisons = []
+    for i in range(len(versions)):
+        for j in range(i + 1, len(versions)):
+            a, b = dict(results[versions[i]]["top"]), dict(results[versions[j]]["top"])
+            common = set(a) & set(b)
+            union = set(a) | set(b)
+            comparisons.append({
+                "container1": versions[i],
+                "container2": versions[j],
+                "overlap": round(len(common) / len(union), 4) if union else 1.0,
+                "same_counts": sum(1 for t in common if a[t] == b[t]),
+                "common": len(common),
+                "only_in_1": sorted(set(a) - set(b), key=lambda t: -a[t])[:20],
+                "only_in_2": sorted(set(b) - set(a), key=lambda t: -b[t])[:20],
+            })
+    return comparisons
+
+
+def main():
+    # Set UTF-8 encoding cho Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="Word cloud theo cửa sổ thời gian với cache facet theo bucket")
+    parser.add_argument("--window", default="24h", help="Độ dài cửa sổ: 24h, 7d, 90m (mặc định: 24h)")
+    parser.add_argument("--end", help="Thời điểm kết thúc cửa sổ (ISO, mặc định: bây giờ)")
+    parser.add_argument("--bucket", choices=sorted(BUCKETS), default="hour", help="Kích thước bucket (mặc định: hour)")
+    parser.add_argument("--top", type=int, default=TOP_K, help=f"Số term của word cloud (mặc định: {TOP_K})")
+    parser.add_argument("--fq", action="append", default=[], help="Filter thêm (có thể lặp lại), vd: domain:news.vn")
+    parser.add_argument("--port", type=int, help="Chỉ chạy trên container ở port này (mặc định: cả 3)")
+    parser.add_argument("--bucket-limit", type=int, default=BUCKET_LIMIT,
+                        help="facet.limit cho mỗi bucket, -1 = tất cả terms (mặc định: -1)")
+    parser.add_argument("--settle-minutes", type=int, default=SETTLE_MINUTES,
+                        help=f"Chỉ cache bucket đã đóng trước now - N phút (mặc định: {SETTLE_MINUTES})")
+    parser.add_argument("--workers", type=int, default=WORKERS, help=f"Số facet query song song (mặc định: {WORKERS})")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help=f"Thư mục cache (mặc định: {CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true", help="Không đọc/ghi cache")
+    parser.add_argument("--verify", action="store_true", help="So sánh với một facet query trên cả cửa sổ")
+    parser.add_argument("--trend", action="store_true", help="So sánh với cửa sổ liền trước, in các term tăng mạnh")
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    window = parse_window(args.window)
+    window_end = parse_iso(args.end) if args.end else now
+    window_start = window_end - window
+    key = cache_key(args.fq, args.bucket_limit, args.bucket)
+    containers = [c for c in CONTAINERS if not args.port or c["port"] == args.port]
+
+    print("━" * 70)
+    print(f"📈 Word cloud theo cửa sổ: {to_iso(window_start)} -> {to_iso(window_end)} ({args.window})")
+    print(f"   Bucket: {args.bucket} | Top {args.top} | Filter: {' AND '.join(args.fq) or '(không)'}")
+    print(f"   Cache: {'tắt' if args.no_cache else os.path.join(args.cache_dir, '<container>', key)}")
+    print("━" * 70)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for container in containers:
+        cache = BucketCache(args.cache_dir, container, key, enabled=not args.no_cache)
+        print(f"\n🔍 {container['version']} (port {container['port']})")
+        try:
+            result, _ = window_cloud(container, window_start, window_end, args, cache, now)
+            if args.verify:
+                result["verify"] = verify_window(container, result, args)
+            if args.trend:
+                # Cửa sổ liền trước phần lớn đã nằm trong cache
+                _, previous = window_cloud(container, window_start - window, window_start, args, cache, now)
+                result["rising"] = rising_terms(result["top"], previous)
+        except (RequestFailed, CircuitOpenError) as e:
+            print(f"   ❌ Query lỗi, bỏ qua container: {e}")
+            continue
+        results[container["version"]] = result
+
+        s = result["stats"]
+        print(f"   ✅ {result['num_found']:,} documents, {len(result['top'])} terms, {result['elapsed_ms']:.0f} ms")
+        print(f"   📦 {result['segments']} đoạn: {s.get('cache_hits', 0)} từ cache, {s.get('fetched', 0)} query mới, "
+              f"{s.get('invalidated', 0)} query lại do lệch số documents, {s.get('empty', 0)} rỗng, "
+              f"{s.get('live', 0)} phần biên/bucket đang mở")
+        if result["error_bound"]:
+            print(f"   ⚠️  --bucket-limit {args.bucket_limit}: count có thể thiếu tối đa {result['error_bound']:,}")
+        preview = ", ".join(f"{t} ({c})" for t, c in result["top"][:10])
+        print(f"   ☁️  {preview}")
+        if "verify" in result:
+            v = result["verify"]
+            status = "✅ giống hệt" if v["identical"] else "❌ khác"
+            print(f"   🔬 So với facet trên cả cửa sổ ({v['direct_ms']:.0f} ms): {status}")
+            if v["count_mismatches"] or v["missing_terms"]:
+                print(f"      count lệch: {', '.join(v['count_mismatches'][:10]) or '-'}; "
+                      f"thiếu: {', '.join(v['missing_terms'][:10]) or '-'}")
+        if result.get("rising"):
+            print("   🚀 Term tăng mạnh so với cửa sổ trước:")
+            for row in result["rising"][:10]:
+                print(f"      {row['term']:<25} {row['previous']:>8,} -> {row['count']:>8,} (x{row['ratio']})")
+
+    comparisons = compare_clouds(results)
+    if comparisons:
+        print("\n" + "━" * 70)
+        print(f"📊 So sánh word cloud top {args.top} giữa các containers")
+        print("━" * 70)
+        for comp in comparisons:
+            print(f"   {comp['container1']} vs {comp['container2']}: overlap {comp['overlap']*100:.1f}%, "
+                  f"{comp['same_counts']}/{comp['common']} term chung cùng count")
+            if comp["only_in_1"]:
+                print(f"      Chỉ có trong {comp['container1']}: {', '.join(comp['only_in_1'][:10])}")
+            if comp["only_in_2"]:
+                print(f"      Chỉ có trong {comp['container2']}: {', '.join(comp['only_in_2'][:10])}")
+
+    output_file = f"facet_trends_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({"window": args.window, "bucket": args.bucket, "fq": args.fq,
+                   "window_start": to_iso(window_start), "window_end": to_iso(window_end),
+                   "results": results, "comparisons": comparisons,
+                   "resilience": CLIENT.snapshot()}, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Kết quả đã lưu vào: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Báo cáo dung lượng index và segments của từng container, so sánh theo 1k documents
+- Core Admin STATUS: numDocs, maxDoc, deletedDocs, sizeInBytes
+- /admin/segments: số segments, kích thước từng segment, tỉ lệ deleted theo segment,
+  --raw-size để Solr ước lượng dung lượng theo field (rawSize, có sampling)
+- /admin/luke: số documents có field và số terms khác nhau (distinct) của các field cần xem,
+  mặc định search_text_cloud (indexed, multiValued, không stored), heap của index nếu có
+- Chuẩn hóa theo 1k documents (chia cho numDocs, không tính documents đã xóa) và so sánh
+  với container đầu tiên, --project-docs để ước lượng disk/heap cho số documents production
+
+Cách sử dụng:
+    python index_footprint_report.py [--fields f1,f2] [--top-terms N] [--raw-size PCT] [--project-docs N]
+
+Ví dụ:
+    python index_footprint_report.py
+    python index_footprint_report.py --fields search_text_cloud,search_text --project-docs 50000000
+    python index_footprint_report.py --raw-size 10 --port 8983 --port 8985
+
+Luke tính distinct bằng cách duyệt hết term dictionary của field, có thể mất vài phút với index
+lớn. Số terms tăng chậm hơn số documents nên distinct/1k docs không dùng để ngoại suy tuyến tính,
+--project-docs chỉ ngoại suy disk và heap.
+"""
+
+import argparse
+import json
+import re
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from compare_facet_results import CONTAINERS, FACET_PARAMS
+from facet_strategy_explorer import format_bytes
+
+DEFAULT_FIELDS = [FACET_PARAMS["facet.field"]]
+TOP_TERMS = 10
+REQUEST_TIMEOUT = 600  # Luke với numTerms > 0 duyệt toàn bộ terms của field
+SIZE_RE = re.compile(r"^\s*([\d.]+)\s*(bytes|KB|MB|GB|TB)?\s*$", re.IGNORECASE)
+SIZE_UNITS = {"bytes": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3, "tb": 1024 ** 4}
+
+
+def parse_size(value: Any) -> Optional[int]:
+    """Số bytes từ số nguyên hoặc chuỗi human readable của Solr ("12.5 MB", "830 bytes")"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = SIZE_RE.match(str(value)) if value is not None else None
+    if not match:
+        return None
+    return int(float(match.group(1)) * SIZE_UNITS[(match.group(2) or "bytes").lower()])
+
+
+def per_1k(value: Optional[float], num_docs: int) -> Optional[float]:
+    if value is None or not num_docs:
+        return None
+    return value * 1000 / num_docs
+
+
+def _get(session: requests.Session, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    response = session.get(url, params=dict(params, wt="json", **{"json.nl": "map"}), timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_footprint(container: Dict[str, Any], fields: List[str], top_terms: int = TOP_TERMS,
+                    raw_size: Optional[float] = None,
+                    session: Optional[requests.Session] = None) -> Dict[str, Any]:
+    """
+    Lấy số liệu thô của một core từ STATUS, /admin/segments và /admin/luke
+
+    Endpoint lỗi được ghi vào "errors", các phần còn lại vẫn được trả về.
+    """
+    session = session or requests.Session()
+    base = f"http://localhost:{container['port']}/solr"
+    core = container["core"]
+    raw: Dict[str, Any] = {"status": None, "segments": None, "luke": None, "errors": {}}
+
+    try:
+        data = _get(session, f"{base}/admin/cores", {"action": "STATUS", "core": core})
+        raw["status"] = data.get("status", {}).get(core, {}).get("index")
+    except (requests.RequestException, ValueError) as e:
+        raw["errors"]["status"] = str(e)
+
+    params: Dict[str, Any] = {}
+    if raw_size is not None:
+        params = {"rawSize": "true", "rawSizeSamplingPercent": raw_size}
+    try:
+        raw["segments"] = _get(session, f"{base}/{core}/admin/segments", params)
+    except (requests.RequestException, ValueError) as e:
+        raw["errors"]["segments"] = str(e)
+
+    try:
+        # numTerms > 0 để Luke trả về distinct của các field trong fl
+        raw["luke"] = _get(session, f"{base}/{core}/admin/luke",
+                           {"fl": ",".join(fields), "numTerms": max(top_terms, 1)})
+    except (requests.RequestException, ValueError) as e:
+        raw["errors"]["luke"] = str(e)
+    return raw
+
+
+def summarize_footprint(raw: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """Gom số liệu thô thành các chỉ số tuyệt đối và chuẩn hóa theo 1k documents"""
+    status = raw.get("status") or {}
+    luke = raw.get("luke") or {}
+    luke_index = luke.get("index") or {}
+    segments = list(((raw.get("segments") or {}).get("segments") or {}).values())
+
+    num_docs = status.get("numDocs", luke_index.get("numDocs")) or 0
+    max_doc = status.get("maxDoc", luke_index.get("maxDoc")) or 0
+    deleted = status.get("deletedDocs", luke_index.get("deletedDocs"))
+    if deleted is None and max_doc:
+        deleted = max_doc - num_docs
+    size = status.get("sizeInBytes")
+    if size is None and segments:
+        size = sum(seg.get("sizeInBytes", 0) for seg in segments)
+    heap = luke_index.get("indexHeapUsageBytes")
+    if heap is not None and heap < 0:
+        heap = None  # Lucene 9: segment không còn báo heap
+
+    seg_sizes = sorted(seg.get("sizeInBytes", 0) for seg in segments)
+    seg_deleted = [seg.get("delCount", 0) / seg["size"] for seg in segments if seg.get("size")]
+    summary: Dict[str, Any] = {
+        "num_docs": num_docs,
+        "max_doc": max_doc,
+        "deleted_docs": deleted,
+        "deleted_ratio": deleted / max_doc if deleted is not None and max_doc else None,
+        "size_bytes": size,
+        "size_per_1k": per_1k(size, num_docs),
+        "heap_bytes": heap,
+        "heap_per_1k": per_1k(heap, num_docs),
+        "segment_count": len(segments) if segments else status.get("segmentCount", luke_index.get("segmentCount")),
+        "largest_segment_bytes": seg_sizes[-1] if seg_sizes else None,
+        "median_segment_bytes": seg_sizes[len(seg_sizes) // 2] if seg_sizes else None,
+        "max_segment_deleted_ratio": max(seg_deleted) if seg_deleted else None,
+        "fields": {},
+        "errors": raw.get("errors", {}),
+    }
+
+    raw_sizes = ((raw.get("segments") or {}).get("rawSize") or {}).get("fieldsBySize") or {}
+    luke_fields = luke.get("fields") or {}
+    for field in fields:
+        info = luke_fields.get(field) or {}
+        top = info.get("topTerms") or []
+        if isinstance(top, dict):
+            top = [v for item in top.items() for v in item]
+        field_docs = info.get("docs")
+        distinct = info.get("distinct")
+        field_bytes = parse_size(raw_sizes.get(field)) if field in raw_sizes else None
+        summary["fields"][field] = {
+            "type": info.get("type"),
+            "docs": field_docs,
+            "coverage": field_docs / num_docs if field_docs is not None and num_docs else None,
+            "distinct_terms": distinct,
+            "distinct_per_1k": per_1k(distinct, num_docs),
+            "raw_bytes": field_bytes,
+            "raw_bytes_per_1k": per_1k(field_bytes, num_docs),
+            "raw_share": field_bytes / size if field_bytes is not None and size else None,
+            "top_terms": list(zip(top[::2], top[1::2])),
+        }
+    return summary
+
+
+def metric_rows(fields: List[str]) -> List[tuple]:
+    """(nhãn, hàm lấy giá trị từ summary, kiểu format) cho bảng so sánh"""
+    rows = [
+        ("numDocs", lambda s: s["num_docs"], "int"),
+        ("Deleted ratio", lambda s: s["deleted_ratio"], "pct"),
+        ("Segments", lambda s: s["segment_count"], "int"),
+        ("Segment lớn nhất", lambda s: s["largest_segment_bytes"], "bytes"),
+        ("Deleted max/segment", lambda s: s["max_segment_deleted_ratio"], "pct"),
+        ("Disk", lambda s: s["size_bytes"], "bytes"),
+        ("Disk / 1k docs", lambda s: s["size_per_1k"], "bytes"),
+        ("Heap index / 1k docs", lambda s: s["heap_per_1k"], "bytes"),
+    ]
+    for field in fields:
+        rows.extend([
+            (f"{field}: docs có field", lambda s, f=field: s["fields"][f]["coverage"], "pct"),
+            (f"{field}: distinct terms", lambda s, f=field: s["fields"][f]["distinct_terms"], "int"),
+            (f"{field}: terms / 1k docs", lambda s, f=field: s["fields"][f]["distinct_per_1k"], "float"),
+            (f"{field}: rawSize / 1k docs", lambda s, f=field: s["fields"][f]["raw_bytes_per_1k"], "bytes"),
+        ])
+    return rows
+
+
+def _format(value: Optional[float], kind: str) -> str:
+    if value is None:
+        return "-"
+    if kind == "bytes":
+        return format_bytes(int(value))
+    if kind == "pct":
+        return f"{value * 100:.2f}%"
+    if kind == "float":
+        return f"{value:,.1f}"
+    return f"{int(value):,}"
+
+
+def compare_footprints(summaries: Dict[str, Dict[str, Any]], fields: List[str]) -> List[Dict[str, Any]]:
+    """
+    Bảng so sánh các chỉ số giữa các containers, chênh lệch % so với container đầu tiên
+
+    Returns:
+        [{"metric": .., "kind": .., "values": {version: value}, "diff_pct": {version: pct}}]
+    """
+    versions = list(summaries)
+    table = []
+    for label, getter, kind in metric_rows(fields):
+        values = {v: getter(summaries[v]) for v in versions}
+        base = values[versions[0]] if versions else None
+        diffs = {v: (values[v] - base) * 100 / base if base and values[v] is not None else None
+                 for v in versions[1:]}
+        table.append({"metric": label, "kind": kind, "values": values, "diff_pct": diffs})
+    return table
+
+
+def project_footprint(summary: Dict[str, Any], target_docs: int) -> Dict[str, Optional[int]]:
+    """Ngoại suy tuyến tính disk/heap cho target_docs documents (không gồm documents đã xóa)"""
+    def scale(value):
+        return int(value * target_docs / 1000) if value is not None else None
+    return {"docs": target_docs, "disk_bytes": scale(summary["size_per_1k"]),
+            "heap_bytes": scale(summary["heap_per_1k"])}
+
+
+def print_report(summaries: Dict[str, Dict[str, Any]], table: List[Dict[str, Any]], fields: List[str],
+                 project_docs: Optional[int] = None):
+    versions = list(summaries)
+    width = 28
+    print("\n" + "━" * 70)
+    print("📊 DUNG LƯỢNG INDEX THEO CONTAINER")
+    print("━" * 70)
+    for version, summary in summaries.items():
+        for endpoint, error in summary["errors"].items():
+            print(f"   ⚠️  {version}: không lấy được {endpoint} ({error})")
+
+    header = f"   {'Chỉ số':<40}" + "".join(f"{v[:width]:>{width + 2}}" for v in versions)
+    print(header)
+    print("   " + "─" * (len(header) - 3))
+    for row in table:
+        if all(value is None for value in row["values"].values()):
+            continue
+        cells = []
+        for version in versions:
+            cell = _format(row["values"][version], row["kind"])
+            diff = row["diff_pct"].get(version)
+            if diff is not None:
+                cell += f" ({diff:+.1f}%)"
+            cells.append(f"{cell:>{width + 2}}")
+        print(f"   {row['metric'][:40]:<40}" + "".join(cells))
+
+    for field in fields:
+        print(f"\n🔤 Top terms của {field}:")
+        for version, summary in summaries.items():
+            top = summary["fields"][field]["top_terms"]
+            if top:
+                print(f"   {version}: " + ", ".join(f"{t} ({c:,})" for t, c in top))
+
+    if project_docs:
+        print(f"\n📈 Ước lượng cho {project_docs:,} documents (tuyến tính theo numDocs hiện tại):")
+        for version, summary in summaries.items():
+            projected = project_footprint(summary, project_docs)
+            print(f"   {version}: disk ~{_format(projected['disk_bytes'], 'bytes')}, "
+                  f"heap index ~{_format(projected['heap_bytes'], 'bytes')}")
+
+
+def main():
+    # Set UTF-8 encoding cho Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="Báo cáo dung lượng index/segments, so sánh theo 1k documents")
+    parser.add_argument("--fields", default=",".join(DEFAULT_FIELDS),
+                        help=f"Các field cần thống kê terms, cách nhau bằng dấu phẩy (mặc định: {DEFAULT_FIELDS[0]})")
+    parser.add_argument("--top-terms", type=int, default=TOP_TERMS, help="Số top terms mỗi field (Luke numTerms)")
+    parser.add_argument("--raw-size", type=float, metavar="PCT",
+                        help="Ước lượng dung lượng theo field qua /admin/segments rawSize, sampling PCT%% documents")
+    parser.add_argument("--project-docs", type=int, help="Ngoại suy disk/heap cho số documents này")
+    parser.add_argument("--port", type=int, action="append", help="Chỉ lấy các container có port này")
+    args = parser.parse_args()
+
+    fields = [f.strip() for f in args.fields.split(",") if f.strip()]
+    containers = [c for c in CONTAINERS if not args.port or c["port"] in args.port]
+    if not containers:
+        print("❌ Không có container nào khớp --port")
+        sys.exit(1)
+
+    print("━" * 70)
+    print(f"🗄️  Index footprint: {len(containers)} containers, fields: {', '.join(fields)}")
+    print("━" * 70)
+    summaries = {}
+    raw_data = {}
+    for container in containers:
+        print(f"📦 {container['version']} (port {container['port']}, core {container['core']})...")
+        raw = fetch_footprint(container, fields, args.top_terms, args.raw_size)
+        if raw["status"] is None and raw["luke"] is None:
+            print(f"   ❌ Không kết nối được: {raw['errors'].get('status')}")
+            continue
+        raw_data[container["version"]] = raw
+        summaries[container["version"]] = summarize_footprint(raw, fields)
+        summary = summaries[container["version"]]
+        print(f"   ✅ {summary['num_docs']:,} docs, {summary['segment_count'] or 0} segments, "
+              f"{_format(summary['size_bytes'], 'bytes')}")
+
+    if not summaries:
+        print("❌ Không lấy được số liệu từ container nào")
+        sys.exit(1)
+
+    table = compare_footprints(summaries, fields)
+    print_report(summaries, table, fields, args.project_docs)
+
+    output_file = f"index_footprint_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            "generated_at": datetime.now().isoformat(),
+            "fields": fields,
+            "summaries": summaries,
+            "comparison": table,
+            "projection": ({v: project_footprint(s, args.project_docs) for v, s in summaries.items()}
+                           if args.project_docs else None),
+            "raw": raw_data,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Kết quả đã lưu vào: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,11 @@
 #
 # Tham số:
 #   target: "all" (mặc định - insert vào tất cả), "8_1_1", "8_1_2", "9", hoặc "8" (cả 2 Solr 8)
-#   data_file: đường dẫn đến file JSON (mặc định: exported_data.json)
+#   data_file: đường dẫn đến file JSON hoặc JSONL (mặc định: exported_data.json)
+#
+# Biến môi trường:
+#   BATCH_SIZE: số documents mỗi request (mặc định: 1000)
+#   WORKERS: số request song song cho mỗi container (mặc định: 4)
 #
 # Ví dụ:
 #   ./insert_data.sh                                    # Insert vào tất cả containers
@@ -20,6 +24,10 @@
 TARGET="${1:-all}"
 DATA_FILE="${2:-exported_data.json}"
 
+# Cấu hình bulk index (có thể override bằng biến môi trường)
+BATCH_SIZE="${BATCH_SIZE:-1000}"
+WORKERS="${WORKERS:-4}"
+
 # Cấu hình Solr 8.5.2 với VnCoreNLP 1.1.1
 CONTAINER_8_1_1="solr_8_5_2_1_1"
 SOLR_URL_8_1_1="http://localhost:8983/solr"
@@ -102,18 +110,16 @@ insert_data_to_solr() {
     echo -e "${MAGENTA}⏱️  Bắt đầu insert data vào ${SOLR_VERSION}...${NC}"
     START_TIME=$(date +%s.%N)
     
-    # Insert data
-    response=$(curl -s -w "\n%{http_code}" --max-time 600 -X POST "${SOLR_URL}/${COLLECTION_NAME}/update?commit=true&overwrite=true" \
-      -H 'Content-Type: application/json' \
-      -d @"$DATA_FILE")
+    # Insert data theo batch bằng bulk_index.py (streaming, commitWithin, retry)
+    # Output của bulk_index.py được đẩy ra stderr để hiển thị tiến độ
+    python bulk_index.py --url "${SOLR_URL}" --core "${COLLECTION_NAME}" --label "${SOLR_VERSION}" \
+      --batch-size "${BATCH_SIZE}" --workers "${WORKERS}" --keep-existing "$DATA_FILE" >&2
+    index_result=$?
     
     END_TIME=$(date +%s.%N)
     ELAPSED_TIME=$(echo "$END_TIME - $START_TIME" | bc)
     
-    http_code=$(echo "$response" | tail -n1)
-    response_body=$(echo "$response" | sed '$d')
-    
-    if [ "$http_code" = "200" ]; then
+    if [ $index_result -eq 0 ]; then
         echo -e "${GREEN}✅ Đã insert data thành công vào ${SOLR_VERSION}!${NC}"
         echo -e "${MAGENTA}⏱️  Thời gian indexing: ${ELAPSED_TIME} giây${NC}"
         
@@ -130,8 +136,7 @@ insert_data_to_solr() {
         echo "$ELAPSED_TIME"
         return 0
     else
-        echo -e "${RED}❌ Lỗi khi insert data vào ${SOLR_VERSION} (HTTP $http_code)${NC}"
-        echo "Response: $response_body"
+        echo -e "${RED}❌ Lỗi khi insert data vào ${SOLR_VERSION}${NC}"
         return 1
     fi
 }
@@ -153,7 +158,7 @@ if grep -q '"_version_"' "$DATA_FILE"; then
     if [ ! -f "$CLEAN_FILE" ]; then
         echo -e "${YELLOW}   File sạch chưa tồn tại, đang tạo...${NC}"
         if command -v python &> /dev/null; then
-            python remove_version_field.py "$DATA_FILE" "$CLEAN_FILE"
+            python transform_documents.py "$DATA_FILE" "$CLEAN_FILE"
             if [ $? -eq 0 ]; then
                 echo -e "${GREEN}   ✅ Đã tạo file không có _version_: $CLEAN_FILE${NC}"
                 DATA_FILE="$CLEAN_FILE"
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Đọc/ghi documents của file export theo kiểu streaming (bộ nhớ không đổi)
+- Hỗ trợ JSONL (một JSON object mỗi dòng) và JSON array
+- Tự nhận diện format theo ký tự đầu tiên của file
+- Đếm số bytes đã đọc để hiển thị tiến độ mà không cần đếm trước
+- Ghi output theo từng batch (DocumentWriter)
+"""
+
+import codecs
+import json
+import os
+from typing import Any, Dict, Iterator, Optional
+
+CHUNK_SIZE = 1 << 20  # 1 MB mỗi lần đọc
+MAX_ELEMENT_SIZE = 8 * CHUNK_SIZE  # Phần tử JSON array vượt quá kích thước này bị coi là lỗi
+WHITESPACE = ' \t\r\n'
+
+
+def detect_format(path: str) -> str:
+    """Trả về 'json' nếu file là JSON array, ngược lại 'jsonl'"""
+    with open(path, 'rb') as f:
+        head = f.read(4096)
+    if head.startswith(codecs.BOM_UTF8):
+        head = head[len(codecs.BOM_UTF8):]
+    stripped = head.lstrip()
+    return 'json' if stripped.startswith(b'[') else 'jsonl'
+
+
+class DocumentReader:
+    """
+    Iterator qua các documents trong file JSONL hoặc JSON array
+
+    Không bao giờ load toàn bộ file vào RAM: JSONL đọc từng dòng,
+    JSON array được parse dần từng phần tử bằng JSONDecoder.raw_decode.
+    """
+
+    def __init__(self, path: str, fmt: Optional[str] = None, chunk_size: int = CHUNK_SIZE):
+        self.path = path
+        self.format = fmt or detect_format(path)
+        self.chunk_size = chunk_size
+        self.total_bytes = os.path.getsize(path)
+        self.bytes_read = 0
+        self.docs_read = 0
+        self.bad_records = 0
+        self.last_error: Optional[str] = None
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self.format == 'json':
+            return self._iter_json_array()
+        return self._iter_jsonl()
+
+    def _iter_jsonl(self) -> Iterator[Dict[str, Any]]:
+        with open(self.path, 'rb') as f:
+            for line_no, line in enumerate(f, 1):
+                self.bytes_read += len(line)
+                if line_no == 1 and line.startswith(codecs.BOM_UTF8):
+                    line = line[len(codecs.BOM_UTF8):]
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    doc = json.loads(line)
+                except ValueError as e:
+                    self.bad_records += 1
+                    self.last_error = f"dòng {line_no}: {e}"
+                    continue
+                self.docs_read += 1
+                yield doc
+
+    def _iter_json_array(self) -> Iterator[Dict[str, Any]]:
+        decoder = json.JSONDecoder()
+        text_decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+        buf = ''
+        pos = 0
+        eof = False
+        started = False
+        read_size = self.chunk_size
+        offset = 0  # Vị trí (bytes) trong file của buf[0]
+
+        with open(self.path, 'rb') as f:
+            def fill() -> bool:
+                """Đọc thêm dữ liệu vào buffer, trả về False khi hết file"""
+                nonlocal buf, pos, eof, offset
+                if eof:
+                    return False
+                raw = f.read(read_size)
+                if self.bytes_read == 0 and raw.startswith(codecs.BOM_UTF8):
+                    offset += len(codecs.BOM_UTF8)
+                self.bytes_read += len(raw)
+                offset += len(buf[:pos].encode('utf-8'))
+                if not raw:
+                    eof = True
+                    buf = buf[pos:] + text_decoder.decode(b'', final=True)
+                else:
+                    buf = buf[pos:] + text_decoder.decode(raw)
+                pos = 0
+                return True
+
+            while True:
+                # Bỏ qua whitespace và dấu phân cách giữa các phần tử
+                while True:
+                    while pos < len(buf) and buf[pos] in WHITESPACE:
+                        pos += 1
+                    if pos < len(buf) or not fill():
+                        break
+                if pos >= len(buf):
+                    return
+                ch = buf[pos]
+                if not started:
+                    if ch != '[':
+                        raise ValueError(f"File JSON phải là một array: {self.path}")
+                    started = True
+                    pos += 1
+                    continue
+                if ch == ']':
+                    return
+                if ch == ',':
+                    pos += 1
+                    continue
+
+                try:
+                    doc, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError as e:
+                    # Phần tử bị cắt ngang giữa 2 chunk: đọc thêm rồi thử lại. Giới hạn lookahead
+                    # để phần tử hỏng không kéo cả phần còn lại của file vào RAM
+                    if len(buf) - pos > MAX_ELEMENT_SIZE:
+                        element_offset = offset + len(buf[:pos].encode('utf-8'))
+                        self.bad_records += 1
+                        self.last_error = f"byte {element_offset:,}: {e.msg}"
+                        raise ValueError(f"Phần tử JSON lỗi hoặc lớn hơn {MAX_ELEMENT_SIZE // CHUNK_SIZE} MB "
+                                         f"tại byte {element_offset:,} ({self.path}): {e.msg}") from e
+                    if fill():
+                        read_size = min(read_size * 2, MAX_ELEMENT_SIZE)
+                        continue
+                    self.bad_records += 1
+                    self.last_error = str(e)
+                    return
+                read_size = self.chunk_size
+                pos = end
+                self.docs_read += 1
+                yield doc
+
+
+def iter_documents(path: str, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Shortcut: duyệt qua documents trong file export"""
+    return iter(DocumentReader(path, fmt))
+
+
+class DocumentWriter:
+    """
+    Ghi documents ra file JSON array hoặc JSONL theo từng batch
+
+    JSON array được ghi dạng mỗi document một dòng (hoặc indent nếu chỉ định),
+    nên chỉ cần giữ batch hiện tại trong bộ nhớ.
+    """
+
+    def __init__(self, path: str, fmt: Optional[str] = None, indent: Optional[int] = None):
+        self.path = path
+        self.format = fmt or ('jsonl' if path.endswith('.jsonl') else 'json')
+        self.indent = indent
+        self.docs_written = 0
+        self._separators = (',', ': ') if indent is not None else (',', ':')
+        self._file = open(path, 'w', encoding='utf-8')
+        if self.format == 'json':
+            self._file.write('[\n')
+
+    def write_batch(self, docs):
+        if not docs:
+            return
+        if self.format == 'jsonl':
+            self._file.write(''.join(json.dumps(doc, ensure_ascii=False, separators=self._separators) + '\n'
+                                     for doc in docs))
+        else:
+            body = ',\n'.join(json.dumps(doc, ensure_ascii=False, indent=self.indent,
+                                         separators=self._separators) for doc in docs)
+            if self.docs_written:
+                self._file.write(',\n')
+            self._file.write(body)
+        self.docs_written += len(docs)
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self.format == 'json':
+            self._file.write('\n]')
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Index id -> (offset, length) cho file export JSONL, tra cứu document theo id không cần scan file
+- Build: đọc JSONL một lượt, mỗi dòng sinh entry 20 bytes (hash 8 bytes của id + offset + length),
+  sort bằng external sort (bộ nhớ giới hạn) rồi ghi ra file index nhị phân đã sort
+- Bảng fanout 65536 phần tử (giống .idx của git) theo 2 bytes đầu của hash để thu hẹp khoảng tìm
+- Tra cứu: mmap file index + file JSONL, binary search theo hash rồi cắt đúng dòng JSON
+  (id được kiểm tra lại sau khi parse nên hash trùng không trả về nhầm document)
+- Index lưu kích thước + mtime của file JSONL, file thay đổi (export resume/append) thì báo index cũ
+
+Cách sử dụng:
+    python jsonl_index.py build exported_data.jsonl [--index exported_data.jsonl.idx] [--memory-mb 256]
+    python jsonl_index.py get exported_data.jsonl <id> [<id> ...] [--field search_text]
+    python jsonl_index.py bench exported_data.jsonl [--lookups 100000]
+
+Trong code:
+    index = load_or_build("exported_data.jsonl")
+    doc = index.get("abc")            # dict hoặc None
+    raw = index.get_raw("abc")        # bytes của dòng JSON
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from external_sort import external_sort
+from json_stream import detect_format
+
+MAGIC = b'JSIX'
+VERSION = 1
+HEADER = struct.Struct('>4sIQQQ')  # magic, version, count, kích thước JSONL, mtime_ns JSONL
+ENTRY = struct.Struct('>8sQI')  # hash id, offset, length (big-endian: so sánh bytes = so sánh số)
+FANOUT_SIZE = 65536  # fanout[p] = số entry có 2 bytes đầu của hash <= p
+FANOUT = struct.Struct(f'>{FANOUT_SIZE}Q')
+FANOUT_ITEM = struct.Struct('>Q')
+ENTRIES_START = HEADER.size + FANOUT.size
+MEMORY_MB = 256
+PROGRESS_EVERY = 1000000
+
+# Fast path: id thường là key đầu tiên của dòng export, lấy bằng regex thay vì json.loads
+_LEADING_ID = re.compile(rb'^\{\s*"id"\s*:\s*"([^"\\]*)"')
+
+
+class StaleIndexError(ValueError):
+    """File JSONL đã thay đổi sau khi build index"""
+
+
+def id_hash(doc_id: str) -> bytes:
+    return hashlib.blake2b(doc_id.encode('utf-8'), digest_size=8).digest()
+
+
+def default_index_path(data_path: str) -> str:
+    return data_path + '.idx'
+
+
+def _extract_id(line: bytes) -> Optional[str]:
+    match = _LEADING_ID.match(line)
+    if match:
+        return match.group(1).decode('utf-8')
+    try:
+        doc_id = json.loads(line).get('id')
+    except (ValueError, AttributeError):
+        return None
+    return str(doc_id) if doc_id is not None else None
+
+
+def _iter_entries(data_path: str, stats: Dict[str, int]) -> Iterator[bytes]:
+    """Đọc JSONL theo bytes, trả về entry cho từng dòng có id"""
+    offset = 0
+    with open(data_path, 'rb', buffering=1024 * 1024) as f:
+        for line in f:
+            length = len(line)
+            body = line.rstrip(b'\r\n')
+            start = offset
+            if start == 0 and body.startswith(b'\xef\xbb\xbf'):
+                body = body[3:]
+                start = 3
+            offset += length
+            if not body.strip():
+                continue
+            doc_id = _extract_id(body)
+            if doc_id is None:
+                stats['skipped'] += 1
+                continue
+            stats['entries'] += 1
+            if stats['entries'] % PROGRESS_EVERY == 0:
+                print(f"   📖 {stats['entries']:,} dòng ({offset * 100 / stats['size']:.1f}%)")
+            yield ENTRY.pack(id_hash(doc_id), start, len(body))
+
+
+def build_index(data_path: str, index_path: Optional[str] = None, memory_mb: int = MEMORY_MB,
+                tmp_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Build file index cho data_path, trả về thống kê"""
+    if detect_format(data_path) != 'jsonl':
+        raise ValueError(f"{data_path} là JSON array, chỉ hỗ trợ JSONL "
+                         "(convert bằng transform_documents.py trước)")
+    index_path = index_path or default_index_path(data_path)
+    st = os.stat(data_path)
+    stats = {'entries': 0, 'skipped': 0, 'size': st.st_size}
+    sort_stats: Dict[str, Any] = {}
+    start = time.time()
+
+    tmp_path = index_path + '.tmp'
+    counts = [0] * FANOUT_SIZE
+    with open(tmp_path, 'wb', buffering=1024 * 1024) as out:
+        out.write(HEADER.pack(MAGIC, VERSION, 0, st.st_size, st.st_mtime_ns))
+        out.write(FANOUT.pack(*counts))
+        for entry in external_sort(_iter_entries(data_path, stats), run_bytes=memory_mb * 1024 * 1024,
+                                   tmp_dir=tmp_dir, stats=sort_stats):
+            counts[(entry[0] << 8) | entry[1]] += 1
+            out.write(entry)
+        total = 0
+        for prefix, count in enumerate(counts):
+            total += count
+            counts[prefix] = total
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, VERSION, stats['entries'], st.st_size, st.st_mtime_ns))
+        out.write(FANOUT.pack(*counts))
+    os.replace(tmp_path, index_path)
+
+    stats.update({
+        'index_path': index_path,
+        'index_bytes': os.path.getsize(index_path),
+        'runs': sort_stats.get('runs', 0),
+        'elapsed_seconds': round(time.time() - start, 2),
+    })
+    return stats
+
+
+class _HashKeys:
+    """View của cột hash trong mmap, để dùng bisect trực tiếp trên file index"""
+
+    def __init__(self, mm: mmap.mmap, count: int):
+        self.mm = mm
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i: int) -> bytes:
+        pos = ENTRIES_START + i * ENTRY.size
+        return self.mm[pos:pos + 8]
+
+
+class JsonlIndex:
+    """Tra cứu document theo id qua file index đã mmap"""
+
+    def __init__(self, data_path: str, index_path: Optional[str] = None, check_stale: bool = True):
+        self.data_path = data_path
+        self.index_path = index_path or default_index_path(data_path)
+        self._index_file = open(self.index_path, 'rb')
+        self._data_file = open(data_path, 'rb')
+        self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, size, mtime_ns = HEADER.unpack_from(self._index, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{self.index_path} không phải file index hợp lệ")
+        if check_stale:
+            st = os.stat(data_path)
+            if st.st_size != size or st.st_mtime_ns != mtime_ns:
+                self.close()
+                raise StaleIndexError(f"{data_path} đã thay đổi sau khi build index, cần build lại")
+        # mmap file rỗng sẽ lỗi, trường hợp này cũng không có entry nào
+        self._data = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._keys = _HashKeys(self._index, self.count)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, doc_id: str) -> bool:
+        return self.get_raw(doc_id) is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for handle in (getattr(self, '_data', None), getattr(self, '_index', None)):
+            if isinstance(handle, mmap.mmap):
+                handle.close()
+        self._data_file.close()
+        self._index_file.close()
+
+    def _candidates(self, doc_id: str) -> Iterator[Tuple[int, int]]:
+        """Các (offset, length) có cùng hash với doc_id, theo offset giảm dần (bản mới nhất trước)"""
+        key = id_hash(doc_id)
+        prefix = (key[0] << 8) | key[1]
+        lo = FANOUT_ITEM.unpack_from(self._index, HEADER.size + (prefix - 1) * 8)[0] if prefix else 0
+        hi = FANOUT_ITEM.unpack_from(self._index, HEADER.size + prefix * 8)[0]
+        i = bisect.bisect_left(self._keys, key, lo, hi)
+        matches = []
+        while i < hi:
+            h, offset, length = ENTRY.unpack_from(self._index, ENTRIES_START + i * ENTRY.size)
+            if h != key:
+                break
+            matches.append((offset, length))
+            i += 1
+        return reversed(matches)
+
+    def _lookup(self, doc_id: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        for offset, length in self._candidates(doc_id):
+            raw = self._data[offset:offset + length]
+            doc = json.loads(raw)
+            if str(doc.get('id')) == doc_id:
+                return raw, doc
+        return None
+
+    def get_raw(self, doc_id: str) -> Optional[bytes]:
+        """Dòng JSON (bytes) của document, None nếu không có"""
+        found = self._lookup(doc_id)
+        return found[0] if found else None
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Document dạng dict, None nếu không có. Id xuất hiện nhiều lần thì lấy bản cuối file"""
+        found = self._lookup(doc_id)
+        return found[1] if found else None
+
+    def get_many(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Tra nhiều id, đọc file JSONL theo thứ tự offset để tận dụng page cache/readahead"""
+        located = []
+        for doc_id in ids:
+            for offset, length in self._candidates(doc_id):
+                located.append((offset, length, doc_id))
+        located.sort()
+        found: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        for offset, length, doc_id in located:
+            doc = json.loads(self._data[offset:offset + length])
+            if str(doc.get('id')) == doc_id:
+                found[doc_id] = (offset, doc)  # offset tăng dần nên bản cuối file thắng
+        return {doc_id: doc for doc_id, (_, doc) in found.items()}
+
+    def iter_ids_sample(self, n: int, seed: int = 42) -> List[str]:
+        """Lấy ngẫu nhiên n id có trong index (dùng cho benchmark)"""
+        rng = random.Random(seed)
+        ids = []
+        for _ in range(min(n, self.count)):
+            _, offset, length = ENTRY.unpack_from(self._index, ENTRIES_START + rng.randrange(self.count) * ENTRY.size)
+            ids.append(str(json.loads(self._data[offset:offset + length])['id']))
+        return ids
+
+
+def load_or_build(data_path: str, index_path: Optional[str] = None, memory_mb: int = MEMORY_MB) -> JsonlIndex:
+    """Mở index, build (lại) nếu chưa có hoặc đã cũ"""
+    index_path = index_path or default_index_path(data_path)
+    if os.path.exists(index_path):
+        try:
+            return JsonlIndex(data_path, index_path)
+        except StaleIndexError as e:
+            print(f"⚠️  {e}")
+    print(f"🔨 Đang build index cho {data_path}...")
+    build_index(data_path, index_path, memory_mb)
+    return JsonlIndex(data_path, index_path)
+
+
+def cmd_build(args):
+    print("━" * 70)
+    print(f"🔨 Build index: {args.data_file}")
+    print("━" * 70)
+    stats = build_index(args.data_file, args.index, args.memory_mb, args.tmp_dir)
+    print(f"\n✅ {stats['entries']:,} entries ({stats['skipped']:,} dòng bỏ qua do không có id)")
+    print(f"   Index: {stats['index_path']} ({stats['index_bytes'] / 1024 / 1024:.1f} MB, "
+          f"{stats['runs']} runs khi sort)")
+    print(f"⏱️  Thời gian: {stats['elapsed_seconds']:.2f}s")
+
+
+def cmd_get(args):
+    with load_or_build(args.data_file, args.index, args.memory_mb) as index:
+        for doc_id in args.ids:
+            doc = index.get(doc_id)
+            if doc is None:
+                print(f"❌ {doc_id}: không có trong file")
+            elif args.field:
+                print(f"{doc_id}\t{json.dumps(doc.get(args.field), ensure_ascii=False)}")
+            else:
+                print(json.dumps(doc, ensure_ascii=False))
+
+
+def cmd_bench(args):
+    with load_or_build(args.data_file, args.index, args.memory_mb) as index:
+        ids = index.iter_ids_sample(args.lookups)
+        missing = [f"missing-{i}" for i in range(len(ids))]
+        print("━" * 70)
+        print(f"⚡ Benchmark tra cứu: {len(index):,} entries, {len(ids):,} lookups")
+        print("━" * 70)
+        for label, keys in (("id có trong file", ids), ("id không có", missing)):
+            start = time.perf_counter()
+            for doc_id in keys:
+                index.get_raw(doc_id)
+            elapsed = time.perf_counter() - start
+            print(f"   {label:<20} {elapsed * 1e6 / max(1, len(keys)):>8.1f} µs/lookup")
+
+
+def main():
+    # Set UTF-8 encoding cho Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="Index id -> offset cho file export JSONL (mmap + binary search)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p):
+        p.add_argument("data_file", help="File export JSONL")
+        p.add_argument("--index", help="File index (mặc định: <data_file>.idx)")
+        p.add_argument("--memory-mb", type=int, default=MEMORY_MB,
+                       help=f"Bộ nhớ tối đa cho mỗi run khi sort (mặc định: {MEMORY_MB})")
+
+    p = sub.add_parser("build", help="Build (lại) file index")
+    add_common(p)
+    p.add_argument("--tmp-dir", help="Thư mục chứa file tạm khi sort")
+    p.set_defaults(func=cmd_build)
+
+    p = sub.add_parser("get", help="Lấy document theo id (tự build index nếu chưa có/đã cũ)")
+    add_common(p)
+    p.add_argument("ids", nargs="+", help="Các document id")
+    p.add_argument("--field", help="Chỉ in một field (vd: search_text)")
+    p.set_defaults(func=cmd_get)
+
+    p = sub.add_parser("bench", help="Đo thời gian tra cứu")
+    add_common(p)
+    p.add_argument("--lookups", type=int, default=100000, help="Số lần tra cứu (mặc định: 100000)")
+    p.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args()
+    if not os.path.exists(args.data_file):
+        print(f"❌ File không tồn tại: {args.data_file}")
+        sys.exit(1)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
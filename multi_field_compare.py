@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+So sánh terms của nhiều field giữa 3 containers, một request cho mỗi batch documents
+- Danh sách field cấu hình được (--fields), mặc định các field text_vi / text_vi_exactly
+  trong managed-schema: search_text_cloud, title, search_text, search_text_exactly, sound, effect
+- Mỗi batch documents là một request JSON Facet trên mỗi container:
+    fq={!terms f=id}id1,id2,...  +  json.facet: terms theo id, mỗi bucket có facet con cho từng field
+  nên N documents x F fields chỉ tốn 1 request/container thay vì N x F queries fq=id:<id>
+- Facet con dùng limit=-1: terms của một document luôn đầy đủ, không bị cắt như facet.limit
+- Document không có bucket trên một container là thiếu document (lỗi index), báo cáo riêng
+- Field không tồn tại trên container (HTTP 400) được phát hiện một lần, bỏ khỏi các batch sau
+- Báo cáo theo field: số documents giống/khác giữa từng cặp containers, terms lệch nhiều nhất
+
+Cách sử dụng:
+    python multi_field_compare.py [num_docs] [--fields f1,f2] [--batch-size N] [--workers N] [--all]
+
+Ví dụ:
+    python multi_field_compare.py 1000
+    python multi_field_compare.py --all --fields search_text_cloud,title --batch-size 100 --workers 8
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import requests
+
+from compare_facet_results import CLIENT, CONTAINERS
+from reconcile_documents import client_key, stream_ids, terms_filter
+from resilience import CircuitOpenError, RequestFailed
+from tracing import TRACER, add_profile_args, profiled, span
+
+DEFAULT_FIELDS = ["search_text_cloud", "title", "search_text", "search_text_exactly", "sound", "effect"]
+NUM_DOCS = 1000
+BATCH_SIZE = 50
+WORKERS = 4
+TOP_DIFF_TERMS = 20
+TOP_DIFF_DOCS = 20
+REQUEST_TIMEOUT = 120
+
+DocTerms = Dict[str, Dict[str, Set[str]]]  # {doc_id: {field: terms}}
+
+
+def _is_bad_request(error: BaseException) -> bool:
+    """HTTP 400: field không tồn tại hoặc không facet được trên container"""
+    cause = getattr(error, "error", None)
+    response = getattr(cause, "response", None)
+    return response is not None and response.status_code == 400
+
+
+def batch_request(ids: List[str], fields: List[str]) -> Dict[str, str]:
+    """Params cho một request: lọc batch bằng {!terms}, facet theo id, facet con cho từng field"""
+    sub_facets = {f"f{i}": {"type": "terms", "field": field, "limit": -1, "mincount": 1}
+                  for i, field in enumerate(fields)}
+    facet = {"docs": {"type": "terms", "field": "id", "limit": len(ids), "mincount": 1,
+                      "sort": "index asc", "facet": sub_facets}}
+    return {"q": "*:*", "fq": terms_filter(ids), "rows": "0", "wt": "json",
+            "json.facet": json.dumps(facet, ensure_ascii=False)}
+
+
+def parse_batch_response(data: Dict[str, Any], fields: List[str]) -> DocTerms:
+    result: DocTerms = {}
+    for bucket in (data.get("facets", {}).get("docs") or {}).get("buckets", []):
+        result[str(bucket["val"])] = {
+            field: {str(b["val"]) for b in (bucket.get(f"f{i}") or {}).get("buckets", [])}
+            for i, field in enumerate(fields)}
+    return result
+
+
+class ContainerFetcher:
+    """Lấy terms của một batch documents trên một container, nhớ các field không dùng được"""
+
+    def __init__(self, container: Dict[str, Any], fields: List[str]):
+        self.container = container
+        self.url = f"http://localhost:{container['port']}/solr/{container['core']}/select"
+        self.fields = list(fields)
+        self.unavailable: Dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def _post(self, ids: List[str], fields: List[str]) -> DocTerms:
+        data = batch_request(ids, fields)
+
+        def post():
+            response = requests.post(self.url, data=data, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            return response.json()
+
+        with span("http"):
+            result = CLIENT.call(client_key(self.container), post)
+        with span("parse"):
+            return parse_batch_response(result, fields)
+
+    def _probe(self, ids: List[str], fields: List[str]):
+        """Batch bị HTTP 400: thử từng field để tìm field không dùng được trên container"""
+        for field in fields:
+            try:
+                self._post(ids[:1], [field])
+            except RequestFailed as e:
+                if not _is_bad_request(e):
+                    raise
+                with self.lock:
+                    if field in self.fields:
+                        self.fields.remove(field)
+                        self.unavailable[field] = str(e.error)[:200]
+
+    def fetch(self, ids: List[str]) -> Optional[DocTerms]:
+        """
+        {doc_id: {field: terms}} cho các documents có trên container
+
+        Trả về None nếu container không còn field nào dùng được (không có gì để so sánh).
+        Raise RequestFailed/CircuitOpenError nếu query lỗi (không phải do field).
+        """
+        while True:
+            with self.lock:
+                fields = list(self.fields)
+            if not fields:
+                return None
+            try:
+                return self._post(ids, fields)
+            except RequestFailed as e:
+                if not _is_bad_request(e):
+                    raise
+                self._probe(ids, fields)
+                with self.lock:
+                    if self.fields == fields:
+                        raise  # Không tìm ra field lỗi: lỗi của cả request
+
+
+class FieldComparison:
+    """Thống kê so sánh một field giữa từng cặp containers"""
+
+    def __init__(self, field: str, versions: List[str]):
+        self.field = field
+        self.pairs = [(versions[i], versions[j]) for i in range(len(versions)) for j in range(i + 1, len(versions))]
+        self.stats = {pair: Counter() for pair in self.pairs}
+        self.only_terms = {pair: (Counter(), Counter()) for pair in self.pairs}
+        self.top_docs: List[Tuple[int, str, Dict[str, int]]] = []
+
+    def add(self, doc_id: str, terms: Dict[str, Set[str]]):
+        for pair in self.pairs:
+            v1, v2 = pair
+            if v1 not in terms or v2 not in terms:
+                self.stats[pair]["skipped"] += 1
+                continue
+            t1, t2 = terms[v1], terms[v2]
+            stats = self.stats[pair]
+            stats["compared"] += 1
+            if not t1 and not t2:
+                stats["empty"] += 1
+            if t1 == t2:
+                stats["same"] += 1
+                continue
+            only1, only2 = t1 - t2, t2 - t1
+            stats["different"] += 1
+            stats["terms_diff"] += len(only1) + len(only2)
+            self.only_terms[pair][0].update(only1)
+            self.only_terms[pair][1].update(only2)
+        all_terms = set().union(*terms.values()) if terms else set()
+        common = set.intersection(*terms.values()) if terms else set()
+        score = len(all_terms) - len(common)
+        if score:
+            self.top_docs.append((score, doc_id, {v: len(t) for v, t in terms.items()}))
+            if len(self.top_docs) > TOP_DIFF_DOCS * 4:
+                self.top_docs.sort(key=lambda x: -x[0])
+                del self.top_docs[TOP_DIFF_DOCS:]
+
+    def summary(self) -> Dict[str, Any]:
+        pairs = []
+        for pair in self.pairs:
+            stats = self.stats[pair]
+            only1, only2 = self.only_terms[pair]
+            pairs.append({
+                "container1": pair[0], "container2": pair[1],
+                "compared": stats["compared"], "same": stats["same"], "different": stats["different"],
+                "empty": stats["empty"], "skipped": stats["skipped"],
+                "avg_terms_diff": stats["terms_diff"] / stats["different"] if stats["different"] else 0,
+                "top_only_in_1": only1.most_common(TOP_DIFF_TERMS),
+                "top_only_in_2": only2.most_common(TOP_DIFF_TERMS),
+            })
+        top = sorted(self.top_docs, key=lambda x: -x[0])[:TOP_DIFF_DOCS]
+        return {"field": self.field, "pairs": pairs,
+                "top_differences": [{"id": d, "diff_score": s, "terms_count": c} for s, d, c in top]}
+
+
+def batched(iterable: Iterable[str], size: int) -> Iterator[List[str]]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def compare_batch(fetchers: List[ContainerFetcher], ids: List[str]) -> Tuple[Dict[str, DocTerms], Dict[str, str]]:
+    """
+    Lấy một batch trên tất cả containers: ({version: DocTerms}, {version: lỗi})
+
+    Container không còn field nào dùng được không có trong kết quả.
+    """
+    results: Dict[str, DocTerms] = {}
+    errors: Dict[str, str] = {}
+    for fetcher in fetchers:
+        version = fetcher.container["version"]
+        try:
+            docs = fetcher.fetch(ids)
+            if docs is not None:
+                results[version] = docs
+        except (RequestFailed, CircuitOpenError) as e:
+            errors[version] = str(e)
+    return results, errors
+
+
+def print_field_report(summary: Dict[str, Any], unavailable: Dict[str, List[str]]):
+    field = summary["field"]
+    print(f"\n🔤 {field}")
+    if unavailable.get(field):
+        print(f"   ⚠️  Không dùng được trên: {', '.join(unavailable[field])}")
+    for pair in summary["pairs"]:
+        compared = pair["compared"]
+        if not compared:
+            continue
+        print(f"   {pair['container1']} vs {pair['container2']}: "
+              f"giống {pair['same']:,}/{compared:,} ({pair['same'] * 100 / compared:.1f}%), "
+              f"khác {pair['different']:,}, TB {pair['avg_terms_diff']:.1f} terms lệch"
+              + (f", rỗng cả hai {pair['empty']:,}" if pair["empty"] else ""))
+        for key, label in (("top_only_in_1", pair["container1"]), ("top_only_in_2", pair["container2"])):
+            if pair[key]:
+                terms = ", ".join(f"{t} ({c})" for t, c in pair[key][:10])
+                print(f"      chỉ có trong {label}: {terms}")
+
+
+def main():
+    # Set UTF-8 encoding cho Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="So sánh terms nhiều field giữa các containers theo batch")
+    parser.add_argument("num_docs", nargs="?", type=int, default=NUM_DOCS,
+                        help=f"Số documents (mặc định: {NUM_DOCS})")
+    parser.add_argument("--all", action="store_true", help="So sánh toàn bộ corpus của container nguồn")
+    parser.add_argument("--fields", default=",".join(DEFAULT_FIELDS), help="Các field, cách nhau bằng dấu phẩy")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"Số documents mỗi request (mặc định: {BATCH_SIZE})")
+    parser.add_argument("--workers", type=int, default=WORKERS, help=f"Số batch chạy song song (mặc định: {WORKERS})")
+    parser.add_argument("--source-port", type=int, default=CONTAINERS[0]["port"], help="Container lấy danh sách id")
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    fields = [f.strip() for f in args.fields.split(",") if f.strip()]
+    versions = [c["version"] for c in CONTAINERS]
+    source = next((c for c in CONTAINERS if c["port"] == args.source_port), CONTAINERS[0])
+    fetchers = [ContainerFetcher(c, fields) for c in CONTAINERS]
+    comparisons = {field: FieldComparison(field, versions) for field in fields}
+    missing_docs: Dict[str, List[str]] = {}
+    failures: Dict[str, Dict[str, str]] = {}
+    processed = 0
+    requests_sent = 0
+
+    print("━" * 70)
+    print(f"🔍 So sánh {len(fields)} fields giữa {len(CONTAINERS)} containers "
+          f"({'toàn bộ corpus' if args.all else f'{args.num_docs:,} documents'}, batch {args.batch_size})")
+    print(f"   Fields: {', '.join(fields)}")
+    print("━" * 70)
+
+    def consume(ids: List[str], results: Dict[str, DocTerms], errors: Dict[str, str]):
+        nonlocal processed, requests_sent
+        processed += len(ids)
+        requests_sent += len(results) + len(errors)
+        present = [v for v in versions if v in results]
+        with span("compare"):
+            for doc_id in ids:
+                if errors:
+                    failures[doc_id] = errors
+                    continue
+                absent = [v for v in present if doc_id not in results[v]]
+                if absent:
+                    missing_docs[doc_id] = absent
+                    continue
+                for field in fields:
+                    terms = {v: results[v][doc_id][field] for v in present if field in results[v][doc_id]}
+                    comparisons[field].add(doc_id, terms)
+
+    start = time.time()
+    last_progress = start
+    ids = stream_ids(CLIENT, source, max(args.batch_size * 20, 1000))
+    if not args.all:
+        ids = islice(ids, args.num_docs)
+    with profiled(args.profile, "multi_field_compare", args.profile_out):
+        try:
+            with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                pending = []
+                for batch in batched(ids, args.batch_size):
+                    pending.append((batch, pool.submit(compare_batch, fetchers, batch)))
+                    # Giữ tối đa 2 * workers batch đang chạy, xử lý theo thứ tự
+                    while len(pending) >= args.workers * 2 or (pending and pending[0][1].done()):
+                        batch_ids, future = pending.pop(0)
+                        consume(batch_ids, *future.result())
+                    if time.time() - last_progress >= 10:
+                        last_progress = time.time()
+                        print(f"   ... {processed:,} documents ({processed / (last_progress - start):,.0f} docs/giây)")
+                for batch_ids, future in pending:
+                    consume(batch_ids, *future.result())
+        except (RequestFailed, CircuitOpenError, ValueError) as e:
+            print(f"❌ Không lấy được danh sách id từ {source['version']}: {e}")
+            sys.exit(1)
+    elapsed = time.time() - start
+    if not processed:
+        print("❌ Không có document nào để so sánh")
+        sys.exit(1)
+
+    unavailable: Dict[str, List[str]] = defaultdict(list)
+    for fetcher in fetchers:
+        for field in fetcher.unavailable:
+            unavailable[field].append(fetcher.container["version"])
+    skipped_containers = [f.container["version"] for f in fetchers if not f.fields]
+
+    print(f"\n✅ {processed:,} documents, {requests_sent:,} requests trong {elapsed:.1f}s "
+          f"(theo từng document và field: {processed * len(fields) * len(CONTAINERS):,} queries)")
+    for version in skipped_containers:
+        print(f"⚠️  {version}: không field nào dùng được (HTTP 400), bỏ qua container này")
+    if missing_docs:
+        per_container = Counter(v for absent in missing_docs.values() for v in absent)
+        print(f"⚠️  {len(missing_docs):,} documents thiếu trên ít nhất một container (lỗi index, không so sánh): "
+              + ", ".join(f"{v} {n:,}" for v, n in per_container.items()))
+    if failures:
+        print(f"❌ {len(failures):,} documents bị query lỗi, không so sánh")
+
+    print("\n" + "━" * 70)
+    print("📊 KẾT QUẢ THEO FIELD")
+    print("━" * 70)
+    summaries = [comparisons[field].summary() for field in fields]
+    for summary in summaries:
+        print_field_report(summary, unavailable)
+
+    TRACER.print_report()
+    for line in CLIENT.format_stats():
+        print(f"   {line}")
+
+    output_file = f"multi_field_comparison_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            "metadata": {"documents": processed, "fields": fields, "batch_size": args.batch_size,
+                         "requests": requests_sent, "elapsed_time": elapsed,
+                         "source_port": source["port"], "unavailable_fields": unavailable,
+                         "skipped_containers": skipped_containers,
+                         "resilience": CLIENT.snapshot(), "trace": TRACER.snapshot()},
+            "fields": summaries,
+            "missing_docs": missing_docs,
+            "failures": failures,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Kết quả đã lưu vào: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
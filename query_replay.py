@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Replay query log production lên từng container và so sánh latency / kết quả theo query template
+- Input: Solr request log (dòng "path=/select params={...} hits=.. status=.. QTime=..", có thể .gz)
+  hoặc danh sách query JSONL ({"ts": ISO|epoch, "path": "/select", "params": {..} | "q=..&fq=.."})
+- Query được gom theo template: tên params, field của fq/q, giá trị được thay bằng "?" và
+  range bằng "[range]" (fq=domain:? & fq=man_updated_at:[range] & facet.field=search_text_cloud ...)
+- Timing: giữ khoảng cách thời gian gốc (--speed để tăng/giảm tốc), --qps cố định tần suất,
+  --speed 0 chạy nhanh nhất có thể với --workers request đồng thời.
+  Replay open-loop: request trễ so với lịch (server quá tải) được ghi lại riêng (lateness)
+- Replay lần lượt từng container để latency không bị ảnh hưởng bởi container khác.
+  NOW được cố định (tham số NOW của Solr) nên date math như NOW-1DAY giống nhau trên mọi container
+- Mỗi response được rút gọn thành digest (numFound, tập id, hash facet) để so với container đầu tiên
+- Báo cáo p50/p95/p99 theo template và container, số query khác kết quả (numFound/docs/facet/lỗi)
+
+Cách sử dụng:
+    python query_replay.py <log_or_jsonl> [--speed X | --qps N] [--workers N] [--limit N] [options]
+
+Ví dụ:
+    python query_replay.py solr.log --templates-only
+    python query_replay.py solr.log.gz --speed 2 --workers 32
+    python query_replay.py queries.jsonl --qps 50 --port 8983 --port 8985
+    python query_replay.py solr.log --speed 0 --limit 10000 --now original
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from compare_facet_results import CONTAINERS
+from solr_javabin import facet_pairs
+from tracing import add_profile_args, profiled
+
+WORKERS = 16
+REQUEST_TIMEOUT = 60
+TOP_TEMPLATES = 20
+SEARCH_PATHS = ("/select", "/query")
+# Params không ảnh hưởng kết quả hoặc do Solr tự thêm, bỏ khi replay và khi tạo template
+IGNORED_PARAMS = {"wt", "indent", "version", "_", "NOW", "echoParams", "json.nl", "omitHeader"}
+# Request nội bộ giữa các shard (SolrCloud), không phải query từ client
+SHARD_PARAMS = {"isShard", "shard.url", "shards.purpose"}
+
+LOG_RE = re.compile(
+    r"^(?P<ts>\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:\.\d+)?)"
+    r".*?\bpath=(?P<path>\S+)\s+params=\{(?P<params>.*)\}"
+    r"(?:\s+hits=(?P<hits>\d+))?\s+status=(?P<status>-?\d+)\s+QTime=(?P<qtime>\d+)")
+FIELD_VALUE_RE = re.compile(r"^(?P<neg>[-+]?)(?:\{!(?P<local>[^}]*)\})?(?P<field>[\w.*]+):(?P<value>.*)$", re.DOTALL)
+RANGE_VALUE_RE = re.compile(r"^[\[{].*\bTO\b.*[\]}]$", re.DOTALL)
+
+Query = Dict[str, Any]
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """Epoch seconds từ ISO string ("2024-05-01 12:00:01.234", "...Z") hoặc epoch (giây/mili giây)"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 1e11 else float(value)
+    text = str(value).strip().replace(" ", "T")
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    try:
+        dt = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    # Solr log mặc định ghi giờ UTC
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _open_text(path: str):
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def parse_log_line(line: str) -> Optional[Query]:
+    """Một dòng request log của Solr -> query, None nếu không phải query search"""
+    match = LOG_RE.search(line)
+    if not match or match.group("path") not in SEARCH_PATHS:
+        return None
+    params = parse_qs(match.group("params"), keep_blank_values=True)
+    return {"ts": parse_timestamp(match.group("ts")), "path": match.group("path"), "params": params,
+            "qtime": int(match.group("qtime")), "hits": int(match.group("hits")) if match.group("hits") else None,
+            "status": int(match.group("status"))}
+
+
+def parse_json_line(line: str) -> Optional[Query]:
+    """Một dòng JSONL export -> query"""
+    item = json.loads(line)
+    params = item.get("params", item)
+    if isinstance(params, str):
+        params = parse_qs(params.lstrip("?"), keep_blank_values=True)
+    else:
+        params = {k: [str(x) for x in v] if isinstance(v, list) else [str(v)]
+                  for k, v in params.items() if k not in ("ts", "timestamp", "path", "qtime")}
+    path = item.get("path", "/select")
+    if path not in SEARCH_PATHS:
+        return None
+    return {"ts": parse_timestamp(item.get("ts", item.get("timestamp"))), "path": path, "params": params,
+            "qtime": item.get("qtime"), "hits": item.get("hits"), "status": item.get("status", 0)}
+
+
+def read_queries(path: str, limit: Optional[int] = None) -> Iterator[Query]:
+    """Đọc query từ Solr log hoặc JSONL (nhận diện theo từng dòng), bỏ request shard nội bộ và request lỗi"""
+    count = 0
+    with _open_text(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                query = parse_json_line(line) if line.startswith("{") else parse_log_line(line)
+            except ValueError:
+                query = None
+            if query is None or query["status"] not in (0, None):
+                continue
+            if SHARD_PARAMS & set(query["params"]) or query["params"].get("distrib") == ["false"]:
+                continue
+            yield query
+            count += 1
+            if limit and count >= limit:
+                return
+
+
+def _clause_shape(clause: str) -> str:
+    """fq/q -> dạng không có giá trị: "domain:?", "man_updated_at:[range]", "{!terms f=id}?" """
+    clause = clause.strip()
+    if clause in ("*:*", ""):
+        return clause
+    match = FIELD_VALUE_RE.match(clause)
+    if not match:
+        local = re.match(r"^\{!([^}]*)\}", clause)
+        return f"{{!{local.group(1)}}}?" if local else "?"
+    value = match.group("value").strip()
+    if value == "*":
+        shape = "*"
+    elif RANGE_VALUE_RE.match(value):
+        shape = "[range]"
+    else:
+        shape = "?"
+    local = f"{{!{match.group('local')}}}" if match.group("local") else ""
+    return f"{match.group('neg')}{local}{match.group('field')}:{shape}"
+
+
+def query_template(params: Dict[str, List[str]]) -> str:
+    """Template của query: giữ tên params và field, bỏ giá trị cụ thể của q/fq"""
+    parts = []
+    for key in sorted(params):
+        if key in IGNORED_PARAMS:
+            continue
+        for value in params[key]:
+            if key in ("q", "fq"):
+                clauses = re.split(r"\s+(?:AND|OR)\s+", value)
+                value = " AND ".join(sorted(_clause_shape(c) for c in clauses))
+            elif key in ("start", "cursorMark"):
+                value = "?"
+            parts.append(f"{key}={value}")
+    # fq thứ tự khác nhau vẫn là cùng template
+    return "&".join(sorted(parts))
+
+
+def replay_params(params: Dict[str, List[str]], now_ms: Optional[int]) -> List[Tuple[str, str]]:
+    """Params gửi lại: bỏ params của client/Solr tự thêm, ép wt=json, cố định NOW"""
+    items = [(k, v) for k, values in params.items() if k not in IGNORED_PARAMS for v in values]
+    items.append(("wt", "json"))
+    if now_ms is not None:
+        items.append(("NOW", str(now_ms)))
+    return items
+
+
+def _hash(value: Any) -> str:
+    data = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def result_digest(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Rút gọn response để so sánh giữa containers mà không phải giữ cả response
+
+    Tập id được so không theo thứ tự: documents cùng score có thể đổi chỗ giữa các phiên bản.
+    """
+    response = data.get("response") or {}
+    digest: Dict[str, Any] = {
+        "numFound": response.get("numFound"),
+        "docs": _hash(sorted(str(doc.get("id")) for doc in response.get("docs", []))),
+    }
+    facet_counts = data.get("facet_counts") or {}
+    for field, values in (facet_counts.get("facet_fields") or {}).items():
+        digest[f"facet:{field}"] = _hash(facet_pairs(values))
+    for field, values in (facet_counts.get("facet_ranges") or {}).items():
+        digest[f"range:{field}"] = _hash(facet_pairs(values.get("counts", [])))
+    if data.get("facets"):
+        digest["json.facet"] = _hash(data["facets"])
+    return digest
+
+
+def diff_kind(base: Dict[str, Any], other: Dict[str, Any]) -> str:
+    """So sánh kết quả một query với container gốc: match / error / numFound / facet / docs"""
+    if base.get("error") or other.get("error"):
+        return "error"
+    a, b = base["digest"], other["digest"]
+    if a.get("numFound") != b.get("numFound"):
+        return "numFound"
+    if any(a.get(k) != b.get(k) for k in set(a) | set(b) if k not in ("numFound", "docs")):
+        return "facet"
+    if a.get("docs") != b.get("docs"):
+        return "docs"
+    return "match"
+
+
+def build_schedule(queries: List[Query], speed: float, qps: Optional[float]) -> List[Optional[float]]:
+    """
+    Thời điểm gửi (giây tính từ lúc bắt đầu) của từng query, None = gửi ngay khi có worker rảnh
+
+    Query không có timestamp được đặt cùng lúc với query trước đó.
+    """
+    if qps:
+        return [i / qps for i in range(len(queries))]
+    if not speed:
+        return [None] * len(queries)
+    stamps = [q["ts"] for q in queries if q["ts"] is not None]
+    if not stamps:
+        return [None] * len(queries)
+    first = min(stamps)
+    schedule = []
+    last = 0.0
+    for query in queries:
+        if query["ts"] is not None:
+            last = max(0.0, (query["ts"] - first) / speed)
+        schedule.append(last)
+    return schedule
+
+
+def replay_container(container: Dict[str, Any], queries: List[Query], schedule: List[Optional[float]],
+                     workers: int, now_ms: Optional[int], pin_original: bool = False) -> List[Dict[str, Any]]:
+    """
+    Gửi tất cả queries tới một container theo lịch, trả về kết quả theo đúng thứ tự queries
+
+    Mỗi kết quả: latency_ms (thời gian nhận đủ response), lateness_ms (trễ so với lịch do thiếu
+    worker), qtime, digest hoặc error.
+    """
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+    base_url = f"http://localhost:{container['port']}/solr/{container['core']}"
+    results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+    slots = threading.Semaphore(workers)
+    done = [0]
+    done_lock = threading.Lock()
+
+    def run(index: int, due: float):
+        started = time.perf_counter()
+        query = queries[index]
+        now = int(query["ts"] * 1000) if pin_original and query["ts"] is not None else now_ms
+        result: Dict[str, Any] = {"lateness_ms": max(0.0, (started - due) * 1000)}
+        try:
+            response = session.get(base_url + query["path"], params=replay_params(query["params"], now),
+                                   timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            data = response.json()
+            result["latency_ms"] = (time.perf_counter() - started) * 1000
+            result["qtime"] = (data.get("responseHeader") or {}).get("QTime")
+            result["digest"] = result_digest(data)
+        except (requests.RequestException, ValueError) as e:
+            result["latency_ms"] = (time.perf_counter() - started) * 1000
+            result["error"] = str(e)[:200]
+        finally:
+            slots.release()
+        results[index] = result
+        with done_lock:
+            done[0] += 1
+
+    start = time.perf_counter()
+    last_progress = start
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for index, offset in enumerate(schedule):
+            if offset is not None:
+                delay = start + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            # Open-loop: lấy slot không chặn lịch quá lâu, chờ slot được tính vào lateness
+            slots.acquire()
+            due = start + offset if offset is not None else time.perf_counter()
+            executor.submit(run, index, due)
+            if time.perf_counter() - last_progress >= 10:
+                last_progress = time.perf_counter()
+                print(f"   ... {done[0]:,}/{len(queries):,} queries ({last_progress - start:.0f}s)")
+    return results  # type: ignore[return-value]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+def latency_stats(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    latencies = [r["latency_ms"] for r in results if not r.get("error")]
+    lateness = [r["lateness_ms"] for r in results]
+    return {
+        "queries": len(results),
+        "errors": sum(1 for r in results if r.get("error")),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies) if latencies else None,
+        "mean_ms": sum(latencies) / len(latencies) if latencies else None,
+        "late_p95_ms": percentile(lateness, 95),
+    }
+
+
+def summarize_replay(queries: List[Query], templates: List[str],
+                     results: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Latency và số query khác kết quả theo template và container"""
+    versions = list(results)
+    baseline = versions[0]
+    by_template: Dict[str, List[int]] = defaultdict(list)
+    for index, template in enumerate(templates):
+        by_template[template].append(index)
+
+    def section(indexes: List[int]) -> Dict[str, Any]:
+        original = [queries[i]["qtime"] for i in indexes if queries[i].get("qtime") is not None]
+        entry: Dict[str, Any] = {"count": len(indexes),
+                                 "original_qtime_p50_ms": percentile(original, 50),
+                                 "original_qtime_p95_ms": percentile(original, 95),
+                                 "containers": {}}
+        for version in versions:
+            rows = [results[version][i] for i in indexes]
+            stats = latency_stats(rows)
+            if version != baseline:
+                stats["diff"] = dict(Counter(diff_kind(results[baseline][i], results[version][i])
+                                             for i in indexes))
+            entry["containers"][version] = stats
+        return entry
+
+    ordered = sorted(by_template, key=lambda t: -len(by_template[t]))
+    return {"baseline": baseline,
+            "overall": section(list(range(len(queries)))),
+            "templates": {t: section(by_template[t]) for t in ordered}}
+
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value:.1f}" if value is not None else "-"
+
+
+def print_section(title: str, entry: Dict[str, Any], baseline: str):
+    print(f"\n📋 {title}")
+    print(f"   {entry['count']:,} queries, QTime gốc p50={_ms(entry['original_qtime_p50_ms'])}ms "
+          f"p95={_ms(entry['original_qtime_p95_ms'])}ms")
+    print(f"   {'Container':<30} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'Lỗi':>6} {'Trễ p95':>8}  Khác kết quả")
+    for version, stats in entry["containers"].items():
+        if version == baseline:
+            diff_text = "(gốc)"
+        else:
+            diff = stats["diff"]
+            differ = sum(n for kind, n in diff.items() if kind != "match")
+            detail = ", ".join(f"{kind} {n:,}" for kind, n in sorted(diff.items()) if kind != "match")
+            diff_text = f"{differ:,}" + (f" ({detail})" if detail else "")
+        print(f"   {version[:30]:<30} {_ms(stats['p50_ms']):>8} {_ms(stats['p95_ms']):>8} "
+              f"{_ms(stats['p99_ms']):>8} {_ms(stats['max_ms']):>8} {stats['errors']:>6,} "
+              f"{_ms(stats['late_p95_ms']):>8}  {diff_text}")
+
+
+def print_templates(queries: List[Query], templates: List[str], top: int):
+    counts = Counter(templates)
+    qtimes: Dict[str, List[float]] = defaultdict(list)
+    for query, template in zip(queries, templates):
+        if query.get("qtime") is not None:
+            qtimes[template].append(query["qtime"])
+    print(f"\n📋 {len(counts):,} templates từ {len(queries):,} queries (top {top}):")
+    for template, count in counts.most_common(top):
+        print(f"   {count:>8,} ({count * 100 / len(queries):5.1f}%)  QTime p50={_ms(percentile(qtimes[template], 50))}ms"
+              f"  {template}")
+
+
+def main():
+    # Set UTF-8 encoding cho Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="Replay query log production lên các containers",
+                                     epilog=__doc__.split("Ví dụ:")[1],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Solr request log (.log/.gz) hoặc JSONL danh sách query, '-' = stdin")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Hệ số tốc độ so với thời gian gốc (2 = nhanh gấp đôi, 0 = nhanh nhất có thể)")
+    parser.add_argument("--qps", type=float, help="Gửi với tần suất cố định, bỏ qua timestamp gốc")
+    parser.add_argument("--workers", type=int, default=WORKERS, help=f"Số request đồng thời tối đa (mặc định: {WORKERS})")
+    parser.add_argument("--limit", type=int, help="Chỉ replay N queries đầu tiên")
+    parser.add_argument("--now", default="replay",
+                        help="Giá trị NOW cho date math: replay (lúc bắt đầu chạy), original (timestamp từng query) "
+                             "hoặc thời điểm ISO")
+    parser.add_argument("--port", type=int, action="append", help="Chỉ replay trên các container có port này")
+    parser.add_argument("--top", type=int, default=TOP_TEMPLATES, help="Số templates in ra (mặc định: 20)")
+    parser.add_argument("--templates-only", action="store_true", help="Chỉ phân tích templates, không replay")
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    print(f"📖 Đang đọc queries: {args.input}")
+    queries = list(read_queries(args.input, args.limit))
+    if not queries:
+        print("❌ Không tìm thấy query /select hoặc /query nào trong input")
+        sys.exit(1)
+    templates = [query_template(q["params"]) for q in queries]
+    print(f"   ✅ {len(queries):,} queries")
+    print_templates(queries, templates, args.top)
+    if args.templates_only:
+        return
+
+    containers = [c for c in CONTAINERS if not args.port or c["port"] in args.port]
+    schedule = build_schedule(queries, args.speed, args.qps)
+    span_s = max((s for s in schedule if s is not None), default=None)
+    pin_original = args.now == "original"
+    if args.now in ("replay", "original"):
+        now_ms = int(time.time() * 1000)
+    else:
+        now_ts = parse_timestamp(args.now)
+        if now_ts is None:
+            print(f"❌ --now không hợp lệ: {args.now}")
+            sys.exit(1)
+        now_ms = int(now_ts * 1000)
+
+    print("\n" + "━" * 70)
+    timing = (f"tần suất {args.qps} qps" if args.qps else
+              f"tốc độ x{args.speed}" if args.speed and span_s is not None else "nhanh nhất có thể")
+    print(f"🔁 Replay {len(queries):,} queries x {len(containers)} containers, {timing}, {args.workers} workers"
+          + (f", ~{span_s:.0f}s mỗi container" if span_s is not None else ""))
+    print("━" * 70)
+
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    with profiled(args.profile, "query_replay", args.profile_out):
+        for container in containers:
+            print(f"\n📦 {container['version']} (port {container['port']})")
+            start = time.time()
+            rows = replay_container(container, queries, schedule, args.workers, now_ms, pin_original)
+            elapsed = time.time() - start
+            errors = sum(1 for r in rows if r.get("error"))
+            print(f"   ✅ {len(rows):,} queries trong {elapsed:.1f}s ({len(rows) / elapsed:.1f} qps), lỗi {errors:,}")
+            if span_s and elapsed > span_s * 1.1 + 1:
+                print(f"   ⚠️  Không giữ được lịch gốc (chậm {elapsed - span_s:.0f}s): container hoặc --workers "
+                      f"không theo kịp tải, xem cột Trễ p95")
+            results[container["version"]] = rows
+
+    summary = summarize_replay(queries, templates, results)
+    print("\n" + "━" * 70)
+    print(f"📊 KẾT QUẢ REPLAY (latency ms, so kết quả với {summary['baseline']})")
+    print("━" * 70)
+    print_section("Tất cả queries", summary["overall"], summary["baseline"])
+    for template, entry in list(summary["templates"].items())[:args.top]:
+        print_section(template, entry, summary["baseline"])
+
+    output_file = f"query_replay_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({"input": args.input, "queries": len(queries), "speed": args.speed, "qps": args.qps,
+                   "workers": args.workers, "now_ms": None if pin_original else now_ms,
+                   "containers": [c["version"] for c in containers], **summary},
+                  f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Kết quả đã lưu vào: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Đối chiếu tập documents giữa các containers trước khi so sánh facet
+- Stream toàn bộ id của từng container bằng cursorMark (fl=id, sort=id asc), mỗi container
+  một thread đọc trước vài page
+- Merge k-way các luồng id đã sort: bộ nhớ chỉ giữ page hiện tại của mỗi container,
+  không cần giữ cả tập id
+- Id không có trên mọi container được ghi vào file theo container:
+    missing_in_<container>.txt: có trên đa số containers nhưng thiếu ở container này
+    extra_in_<container>.txt:   chỉ có trên thiểu số containers, có ở container này
+  (hòa thì lấy container đầu tiên làm chuẩn)
+- check_presence(): kiểm tra nhanh một mẫu id bằng {!terms f=id} theo batch, dùng trong
+  compare_facet_results.py để bỏ documents không query được trên mọi container
+
+Cách sử dụng:
+    python reconcile_documents.py [--rows N] [--fq QUERY] [--output-dir DIR] [--port P ...]
+
+Ví dụ:
+    python reconcile_documents.py
+    python reconcile_documents.py --fq "man_updated_at:[NOW-7DAY TO *]" --port 8983 --port 8985
+
+Id được so theo thứ tự code point, trùng với thứ tự bytes UTF-8 mà Solr dùng khi sort field string.
+"""
+
+import argparse
+import heapq
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+import requests
+
+from resilience import CircuitOpenError, RequestFailed, ResilientClient, RetryPolicy
+from solr_javabin import solr_get
+
+ROWS = 10000
+PREFETCH_PAGES = 2
+PRESENCE_BATCH = 200
+SAMPLE_SIZE = 20
+OUTPUT_DIR = "reconcile"
+TERMS_SEPARATORS = ",|;~"
+
+_DONE = object()
+
+
+def client_key(container: Dict[str, Any]) -> str:
+    """Key breaker/thống kê trong ResilientClient: port, giống các query facet của compare_facet_results"""
+    return str(container["port"])
+
+
+def stream_ids(client: ResilientClient, container: Dict[str, Any], rows: int = ROWS,
+               fq: Optional[str] = None) -> Iterator[str]:
+    """
+    Tất cả id của một container theo thứ tự tăng dần (cursorMark)
+
+    Raise ValueError nếu Solr trả id không đúng thứ tự (uniqueKey không phải field string).
+    """
+    url = f"http://localhost:{container['port']}/solr/{container['core']}/select"
+    params = {"q": "*:*", "fl": "id", "rows": rows, "sort": "id asc", "cursorMark": "*", "wt": "json"}
+    if fq:
+        params["fq"] = fq
+    previous = None
+    while True:
+        data = client.call(client_key(container), lambda: solr_get(None, url, params, timeout=120))
+        for doc in data.get("response", {}).get("docs", []):
+            doc_id = str(doc["id"])
+            if previous is not None and doc_id <= previous:
+                raise ValueError(f"{container['name']}: id không tăng dần ({previous!r} -> {doc_id!r})")
+            previous = doc_id
+            yield doc_id
+        next_cursor = data.get("nextCursorMark")
+        if not next_cursor or next_cursor == params["cursorMark"]:
+            return
+        params["cursorMark"] = next_cursor
+
+
+def prefetch(iterator: Iterable[Any], depth: int) -> Iterator[Any]:
+    """Đọc trước iterator trong một thread riêng (tối đa depth phần tử), lỗi được raise ở phía đọc"""
+    buffer: "queue.Queue" = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterator:
+                if stop.is_set():
+                    return
+                buffer.put(item)
+        except BaseException as e:  # chuyển lỗi sang thread đọc
+            buffer.put(e)
+            return
+        buffer.put(_DONE)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def _paged(iterator: Iterator[str], size: int) -> Iterator[List[str]]:
+    page = []
+    for item in iterator:
+        page.append(item)
+        if len(page) >= size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def _flatten(pages: Iterator[List[str]]) -> Iterator[str]:
+    for page in pages:
+        yield from page
+
+
+def merge_presence(streams: Dict[str, Iterator[str]]) -> Iterator[tuple]:
+    """Merge k-way các luồng id đã sort, yield (id, tập các key có id đó)"""
+    def tag(key: str, stream: Iterator[str]) -> Iterator[tuple]:
+        for doc_id in stream:
+            yield doc_id, key
+
+    tagged = [tag(key, stream) for key, stream in streams.items()]
+    current = None
+    present: Set[str] = set()
+    for doc_id, key in heapq.merge(*tagged):
+        if doc_id != current:
+            if current is not None:
+                yield current, present
+            current, present = doc_id, set()
+        present.add(key)
+    if current is not None:
+        yield current, present
+
+
+def classify_gap(present: Set[str], keys: List[str]) -> Dict[str, str]:
+    """
+    {key: "missing" | "extra"} cho một id không có trên mọi container
+
+    Có trên đa số: thiếu ở các container còn lại; có trên thiểu số: thừa ở các container có nó.
+    Hòa thì theo container đầu tiên.
+    """
+    have = len(present)
+    majority = have * 2 > len(keys) or (have * 2 == len(keys) and keys[0] in present)
+    if majority:
+        return {key: "missing" for key in keys if key not in present}
+    return {key: "extra" for key in keys if key in present}
+
+
+def reconcile(client: ResilientClient, containers: List[Dict[str, Any]], output_dir: str = OUTPUT_DIR,
+              rows: int = ROWS, fq: Optional[str] = None, progress_every: int = 100000) -> Dict[str, Any]:
+    """
+    Đối chiếu toàn bộ id giữa các containers, ghi danh sách id thiếu/thừa ra output_dir
+
+    Returns:
+        {"total_ids": .., "common": .., "containers": {name: {"docs", "missing", "extra",
+         "missing_sample", "extra_sample", "missing_file", "extra_file"}}, "elapsed": ..}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    keys = [c["name"] for c in containers]
+    streams = {c["name"]: _flatten(prefetch(_paged(stream_ids(client, c, rows, fq), rows), PREFETCH_PAGES))
+               for c in containers}
+    stats: Dict[str, Dict[str, Any]] = {
+        key: {"docs": 0, "missing": 0, "extra": 0, "missing_sample": [], "extra_sample": [],
+              "missing_file": os.path.join(output_dir, f"missing_in_{key}.txt"),
+              "extra_file": os.path.join(output_dir, f"extra_in_{key}.txt")}
+        for key in keys}
+    files = {(key, kind): open(stats[key][f"{kind}_file"], "w", encoding="utf-8")
+             for key in keys for kind in ("missing", "extra")}
+
+    start = time.time()
+    total = common = 0
+    try:
+        for doc_id, present in merge_presence(streams):
+            total += 1
+            for key in present:
+                stats[key]["docs"] += 1
+            if len(present) == len(keys):
+                common += 1
+            else:
+                for key, kind in classify_gap(present, keys).items():
+                    stats[key][kind] += 1
+                    files[(key, kind)].write(doc_id + "\n")
+                    if len(stats[key][f"{kind}_sample"]) < SAMPLE_SIZE:
+                        stats[key][f"{kind}_sample"].append(doc_id)
+            if progress_every and total % progress_every == 0:
+                elapsed = time.time() - start
+                print(f"   ... {total:,} ids ({total / elapsed:,.0f} ids/giây), "
+                      f"lệch {total - common:,}")
+    finally:
+        for f in files.values():
+            f.close()
+    return {"total_ids": total, "common": common, "fq": fq, "elapsed": time.time() - start,
+            "containers": stats}
+
+
+def terms_filter(ids: List[str], field: str = "id") -> str:
+    """fq {!terms f=field} cho danh sách id, chọn separator không xuất hiện trong id"""
+    for separator in TERMS_SEPARATORS:
+        if not any(separator in doc_id for doc_id in ids):
+            option = f" separator={separator}" if separator != "," else ""
+            return f"{{!terms f={field}{option}}}" + separator.join(ids)
+    raise ValueError("Không tìm được separator cho {!terms}: id chứa tất cả ký tự " + TERMS_SEPARATORS)
+
+
+def present_ids(client: ResilientClient, container: Dict[str, Any], ids: List[str],
+                batch_size: int = PRESENCE_BATCH) -> Set[str]:
+    """
+    Các id trong danh sách có trên container, query {!terms f=id} theo batch
+
+    Dùng POST để danh sách id dài không vượt giới hạn độ dài URL của Jetty.
+    Raise RequestFailed/CircuitOpenError nếu query lỗi.
+    """
+    url = f"http://localhost:{container['port']}/solr/{container['core']}/select"
+    found: Set[str] = set()
+    for i in range(0, len(ids), batch_size):
+        batch = ids[i:i + batch_size]
+        data = {"q": "*:*", "fq": terms_filter(batch), "fl": "id", "rows": len(batch), "wt": "json"}
+
+        def post():
+            response = requests.post(url, data=data, timeout=60)
+            response.raise_for_status()
+            return response.json()
+
+        result = client.call(client_key(container), post)
+        found.update(str(doc["id"]) for doc in result.get("response", {}).get("docs", []))
+    return found
+
+
+def check_presence(client: ResilientClient, containers: List[Dict[str, Any]],
+                   ids: List[str]) -> Dict[str, Any]:
+    """
+    Kiểm tra một mẫu id có trên từng container không
+
+    Returns:
+        {"missing": {doc_id: [version, ...]}, "errors": {version: lỗi}}
+        Container bị lỗi không được tính là thiếu document.
+    """
+    missing: Dict[str, List[str]] = {}
+    errors: Dict[str, str] = {}
+    for container in containers:
+        try:
+            found = present_ids(client, container, ids)
+        except (RequestFailed, CircuitOpenError) as e:
+            errors[container["version"]] = str(e)
+            continue
+        for doc_id in ids:
+            if doc_id not in found:
+                missing.setdefault(doc_id, []).append(container["version"])
+    return {"missing": missing, "errors": errors}
+
+
+def format_reconcile_report(result: Dict[str, Any], containers: List[Dict[str, Any]]) -> List[str]:
+    """Các dòng tóm tắt kết quả reconcile theo container"""
+    lines = [f"Tổng {result['total_ids']:,} ids, có trên mọi container: {result['common']:,} "
+             f"({result['elapsed']:.1f}s)"]
+    for container in containers:
+        stats = result["containers"][container["name"]]
+        lines.append(f"{container['version']}: {stats['docs']:,} docs, thiếu {stats['missing']:,}, "
+                     f"thừa {stats['extra']:,}")
+        for kind, label in (("missing", "thiếu"), ("extra", "thừa")):
+            if stats[kind]:
+                sample = ", ".join(stats[f"{kind}_sample"][:5])
+                lines.append(f"   {label}: {sample}{' ...' if stats[kind] > 5 else ''} -> {stats[f'{kind}_file']}")
+    return lines
+
+
+def main():
+    # Set UTF-8 encoding cho Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    # Import muộn để tránh import vòng (compare_facet_results dùng module này)
+    from compare_facet_results import CONTAINERS
+
+    parser = argparse.ArgumentParser(description="Đối chiếu tập id giữa các containers (cursorMark + merge k-way)")
+    parser.add_argument("--rows", type=int, default=ROWS, help=f"Số id mỗi page (mặc định: {ROWS})")
+    parser.add_argument("--fq", help="Chỉ đối chiếu documents khớp filter này")
+    parser.add_argument("--output-dir", default=None, help="Thư mục ghi danh sách id (mặc định: reconcile_<timestamp>)")
+    parser.add_argument("--port", type=int, action="append", help="Chỉ đối chiếu các container có port này")
+    args = parser.parse_args()
+
+    containers = [c for c in CONTAINERS if not args.port or c["port"] in args.port]
+    if len(containers) < 2:
+        print("❌ Cần ít nhất 2 containers để đối chiếu")
+        sys.exit(1)
+    output_dir = args.output_dir or f"{OUTPUT_DIR}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    client = ResilientClient(RetryPolicy(max_attempts=4, base_delay=0.5, max_delay=10))
+
+    print("━" * 70)
+    print(f"🧮 Đối chiếu id giữa {len(containers)} containers" + (f" (fq: {args.fq})" if args.fq else ""))
+    print("━" * 70)
+    try:
+        result = reconcile(client, containers, output_dir, args.rows, args.fq)
+    except (RequestFailed, CircuitOpenError, ValueError) as e:
+        print(f"❌ Không đối chiếu được: {e}")
+        sys.exit(1)
+    for line in format_reconcile_report(result, containers):
+        print(f"   {line}")
+
+    summary_file = os.path.join(output_dir, "summary.json")
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Kết quả đã lưu vào: {output_dir}/")
+    gaps = sum(s["missing"] + s["extra"] for s in result["containers"].values())
+    sys.exit(1 if gaps else 0)
+
+
+if __name__ == "__main__":
+    main()
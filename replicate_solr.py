@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script để replicate dữ liệu trực tiếp từ Solr nguồn sang các Solr containers test
+- Đọc collection nguồn bằng cursorMark (SolrExporter), không ghi file trung gian
+- Áp dụng transform (mặc định xóa _version_) rồi index song song vào tất cả cores
+  khai báo trong docker-compose.yml
+- Mỗi target có một queue giới hạn kích thước: target chậm sẽ làm reader chờ (backpressure)
+- Hiển thị tiến độ theo từng target, lưu state để resume khi dừng giữa chừng
+
+Cách sử dụng:
+    python replicate_solr.py [options]
+
+Ví dụ:
+    python replicate_solr.py
+    python replicate_solr.py --clear --workers 4 --wait 0
+    python replicate_solr.py --targets solr_9_11
+"""
+
+import argparse
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+import requests
+
+from bulk_index import TARGETS, BulkIndexer, IndexStats, format_stats_line
+from export_solr_data import (COLLECTION_NAME, ROWS_PER_REQUEST, SOLR_PASSWORD, SOLR_URL,
+                              SOLR_USERNAME, WAIT_SECONDS, SolrExporter)
+from transform_documents import DEFAULT_DROP, FieldOperations
+
+# Thử import yaml để đọc docker-compose.yml, nếu không có thì dùng cấu hình mặc định
+try:
+    import yaml
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+
+COMPOSE_FILE = "docker-compose.yml"
+STATE_FILE = "replicate_state.json"
+QUEUE_SIZE = 8  # Số batch tối đa chờ trong queue của mỗi target
+WORKERS = 2  # Số request index song song cho mỗi target
+PROGRESS_INTERVAL = 10  # Giây
+
+
+def load_compose_targets(compose_file: str = COMPOSE_FILE) -> List[Dict[str, str]]:
+    """Đọc danh sách Solr cores từ docker-compose.yml (port host + tên core của solr-precreate)"""
+    if not HAS_YAML or not os.path.exists(compose_file):
+        return list(TARGETS.values())
+
+    with open(compose_file, 'r', encoding='utf-8') as f:
+        compose = yaml.safe_load(f) or {}
+
+    versions = {t["name"]: t["version"] for t in TARGETS.values()}
+    targets = []
+    for service_name, service in (compose.get("services") or {}).items():
+        command = service.get("command") or ""
+        if isinstance(command, list):
+            command = " ".join(command)
+        match = re.search(r"solr-precreate\s+(\S+)", command)
+        ports = service.get("ports") or []
+        if not match or not ports:
+            continue
+        host_port = str(ports[0]).split(":")[0]
+        name = service.get("container_name", service_name)
+        targets.append({
+            "name": name,
+            "url": f"http://localhost:{host_port}/solr",
+            "core": match.group(1),
+            "version": versions.get(name, f"{name} ({service.get('image', '')})")
+        })
+    return targets or list(TARGETS.values())
+
+
+class ReplicationState:
+    """Lưu cursorMark mà tất cả targets đã index xong để resume"""
+
+    def __init__(self, state_file: str):
+        self.state_file = state_file
+
+    def load(self) -> Dict[str, Any]:
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"⚠️  Lỗi khi load state: {e}")
+        return {"cursor_mark": "*", "docs_done": 0, "targets": {}, "start_time": None}
+
+    def save(self, state: Dict[str, Any]):
+        state["last_save_time"] = datetime.now().isoformat()
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, self.state_file)
+
+    def clear(self):
+        if os.path.exists(self.state_file):
+            os.remove(self.state_file)
+
+
+class TargetWriter:
+    """Một target: queue giới hạn + các worker threads index batch"""
+
+    def __init__(self, target: Dict[str, str], workers: int, queue_size: int, retries: int):
+        self.target = target
+        self.indexer = BulkIndexer(target["url"], target["core"], target["version"],
+                                   workers=workers, max_retries=retries)
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.stats = IndexStats(target["version"])
+        self.lock = threading.Lock()
+        self.done_pages = set()
+        self.failed_pages = set()
+        self.watermark = -1  # Tất cả pages <= watermark đã index xong
+        self.threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        self.start_time = time.time()
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            page, payload, count = item
+            error = self.indexer.post_batch(payload, self.stats)
+            with self.lock:
+                self.stats.batches += 1
+                if error is None:
+                    self.stats.docs_sent += count
+                    self.done_pages.add(page)
+                    while self.watermark + 1 in self.done_pages:
+                        self.watermark += 1
+                        self.done_pages.discard(self.watermark)
+                else:
+                    self.stats.docs_failed += count
+                    self.stats.last_error = error
+                    self.failed_pages.add(page)
+            self.queue.task_done()
+
+    def stop(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.stats.index_time = time.time() - self.start_time
+
+
+def print_progress(writers: List[TargetWriter], docs_read: int, total_docs: int):
+    percent = docs_read * 100 / total_docs if total_docs else 0
+    print(f"📊 Đã đọc {docs_read:,} / {total_docs:,} ({percent:.1f}%)")
+    for writer in writers:
+        elapsed = time.time() - writer.start_time
+        rate = writer.stats.docs_sent / elapsed if elapsed > 0 else 0
+        print(f"   • {writer.target['version']}: {writer.stats.docs_sent:,} docs | "
+              f"{rate:,.0f} docs/giây | queue {writer.queue.qsize()}/{writer.queue.maxsize} | "
+              f"lỗi {writer.stats.docs_failed:,}")
+
+
+def replicate(args) -> bool:
+    targets = load_compose_targets(args.compose)
+    if args.targets:
+        wanted = set(args.targets.split(","))
+        targets = [t for t in targets if t["name"] in wanted]
+    if not targets:
+        print("❌ Không có target nào")
+        return False
+
+    state_manager = ReplicationState(args.state)
+    if args.restart:
+        state_manager.clear()
+    state = state_manager.load()
+    resuming = state["cursor_mark"] != "*"
+
+    print("━" * 70)
+    print("🔁 Replicate Solr nguồn -> Solr containers")
+    print("━" * 70)
+    print(f"📦 Nguồn: {args.solr_url}/{args.collection}")
+    for target in targets:
+        print(f"🎯 Target: {target['version']} - {target['url']}/{target['core']}")
+    if resuming:
+        print(f"🔄 Resume từ cursor mark: {state['cursor_mark']} ({state['docs_done']:,} docs đã xong)")
+        print("   (dùng --restart để replicate lại từ đầu)")
+    print()
+
+    exporter = SolrExporter(args.solr_url, args.collection, args.username, args.password)
+    total_docs = exporter.get_total_count()
+    if total_docs is None:
+        print("❌ Solr nguồn không phản hồi")
+        return False
+    if total_docs == 0:
+        print("❌ Không tìm thấy documents trong collection nguồn!")
+        return False
+
+    writers = []
+    for target in targets:
+        writer = TargetWriter(target, args.workers, args.queue_size, args.retries)
+        if not writer.indexer.ping():
+            print(f"❌ {target['version']} không sẵn sàng, bỏ qua")
+            continue
+        if args.clear and not resuming:
+            try:
+                writer.indexer.clear()
+            except requests.exceptions.RequestException as e:
+                print(f"❌ Không xóa được dữ liệu cũ trên {target['version']}, bỏ qua: {e}")
+                continue
+            print(f"🧹 Đã xóa dữ liệu cũ trên {target['version']}")
+        writers.append(writer)
+    if not writers:
+        return False
+
+    operations = FieldOperations(drop=DEFAULT_DROP + list(args.drop))
+    for writer in writers:
+        writer.start()
+
+    cursor_mark = state["cursor_mark"]
+    docs_done_before = state["docs_done"]
+    start_time = state.get("start_time") or datetime.now().isoformat()
+    # cursors[page] = cursorMark để đọc page tiếp theo sau khi page đó đã index xong
+    cursors: Dict[int, str] = {-1: cursor_mark}
+    page_docs: Dict[int, int] = {}
+    docs_read = docs_done_before
+    page = 0
+    last_progress = time.time()
+    interrupted = False
+    source_failed = False
+
+    def save_state():
+        """Chỉ lưu vị trí mà mọi target đều đã index xong"""
+        watermark = min(w.watermark for w in writers)
+        done = docs_done_before + sum(n for p, n in page_docs.items() if p <= watermark)
+        state_manager.save({
+            "cursor_mark": cursors.get(watermark, cursor_mark),
+            "docs_done": done,
+            "start_time": start_time,
+            "targets": {w.target["name"]: w.stats.to_dict() for w in writers}
+        })
+        for p in [p for p in cursors if p < watermark]:
+            cursors.pop(p, None)
+
+    try:
+        while True:
+            # query_with_cursor đã retry với backoff (ResilientClient của SolrExporter)
+            data = exporter.query_with_cursor(cursor_mark, args.rows)
+            if data is None:
+                print("❌ Solr nguồn không phản hồi, dừng lại (state đã được lưu để resume)")
+                source_failed = True
+                break
+            docs = data.get("response", {}).get("docs", [])
+            next_cursor_mark = data.get("nextCursorMark", cursor_mark)
+            if not docs:
+                break
+
+            # Serialize một lần, dùng chung payload cho tất cả targets
+            payload = json.dumps([operations.apply(doc) for doc in docs], ensure_ascii=False).encode('utf-8')
+            cursors[page] = next_cursor_mark
+            page_docs[page] = len(docs)
+            for writer in writers:
+                writer.queue.put((page, payload, len(docs)))  # Block khi queue đầy
+            docs_read += len(docs)
+            page += 1
+
+            if time.time() - last_progress >= PROGRESS_INTERVAL:
+                print_progress(writers, docs_read, total_docs)
+                save_state()
+                last_progress = time.time()
+
+            if next_cursor_mark == cursor_mark:
+                break
+            cursor_mark = next_cursor_mark
+            if args.wait > 0:
+                time.sleep(args.wait)
+    except KeyboardInterrupt:
+        interrupted = True
+        print()
+        print("⚠️  ĐÃ DỪNG BỞI NGƯỜI DÙNG (Ctrl+C), đang chờ các batch đang index...")
+
+    for writer in writers:
+        writer.stop()
+    save_state()
+
+    print()
+    print("━" * 70)
+    print("📊 KẾT QUẢ REPLICATE")
+    print("━" * 70)
+    ok = not interrupted and not source_failed
+    if source_failed:
+        print(f"   ❌ Solr nguồn lỗi, mới đọc {docs_read:,} docs")
+    for writer in writers:
+        commit_start = time.time()
+        try:
+            writer.indexer.commit()
+        except Exception as e:
+            print(f"   ⚠️  Commit lỗi trên {writer.target['version']}: {e}")
+        writer.stats.commit_time = time.time() - commit_start
+        writer.stats.num_found = writer.indexer.count()
+        status = "✅" if not writer.failed_pages else "❌"
+        print(f"   {status} {writer.target['version']}: {format_stats_line(writer.stats)}")
+        if writer.stats.num_found is not None:
+            print(f"      numFound: {writer.stats.num_found:,}")
+        if writer.failed_pages:
+            ok = False
+            print(f"      {len(writer.failed_pages)} batch lỗi: {writer.stats.last_error}")
+    print()
+    print(f"💾 State: {os.path.abspath(args.state)}")
+    if not ok:
+        print("🔄 Chạy lại script để tiếp tục từ vị trí đã lưu")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replicate Solr nguồn sang các Solr containers test")
+    parser.add_argument("--solr-url", default=SOLR_URL)
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--username", default=SOLR_USERNAME)
+    parser.add_argument("--password", default=SOLR_PASSWORD)
+    parser.add_argument("--compose", default=COMPOSE_FILE, help="docker-compose.yml để lấy danh sách targets")
+    parser.add_argument("--targets", help="Chỉ replicate vào các container này (phân cách bằng dấu phẩy)")
+    parser.add_argument("--rows", type=int, default=ROWS_PER_REQUEST, help="Số documents mỗi page nguồn")
+    parser.add_argument("--wait", type=float, default=WAIT_SECONDS, help="Số giây đợi giữa các request nguồn")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Số request index song song mỗi target")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Số batch tối đa chờ mỗi target")
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--drop", action="append", default=[], metavar="FIELD", help="Xóa thêm field")
+    parser.add_argument("--clear", action="store_true", help="Xóa dữ liệu cũ trên targets trước khi bắt đầu")
+    parser.add_argument("--restart", action="store_true", help="Bỏ state cũ, replicate lại từ đầu")
+    parser.add_argument("--state", default=STATE_FILE)
+    args = parser.parse_args()
+
+    sys.exit(0 if replicate(args) else 1)
+
+
+if __name__ == "__main__":
+    main()
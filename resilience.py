@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lớp resilience dùng chung cho các script query Solr
+- RetryPolicy: exponential backoff với full jitter, chỉ retry lỗi tạm thời (timeout, 429, 5xx)
+- RetryBudget: giới hạn tỉ lệ retry so với số request để không dồn tải khi Solr đang quá tải
+- CircuitBreaker: mỗi container một breaker, lỗi liên tiếp thì ngắt và fail nhanh
+- Hedged request (tùy chọn, chỉ cho query read-only): gửi thêm một request nếu request
+  đầu chậm hơn ngưỡng, lấy kết quả về trước để cắt tail latency
+
+Lỗi được raise ra (RequestFailed, CircuitOpenError) để script gọi ghi nhận là lỗi,
+không trả về kết quả rỗng.
+
+Cách sử dụng:
+    client = ResilientClient(RetryPolicy(max_attempts=4), hedge_after=0.2)
+    data = client.call("8983", lambda: solr_get(None, url, params))
+    print(client.format_stats())
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Breaker của container đang mở, request bị từ chối ngay"""
+
+
+class RequestFailed(Exception):
+    """Request thất bại sau khi đã retry (hoặc lỗi không nên retry)"""
+
+    def __init__(self, key: str, attempts: int, error: BaseException):
+        super().__init__(f"{key}: {error} (sau {attempts} lần thử)")
+        self.key = key
+        self.attempts = attempts
+        self.error = error
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeout, lỗi kết nối, 429 và 5xx là lỗi tạm thời; 4xx khác thì retry cũng vô ích"""
+    if isinstance(error, requests.exceptions.HTTPError):
+        response = error.response
+        return response is None or response.status_code in RETRYABLE_STATUS
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Đọc header Retry-After (dạng số giây) từ response 429/503 nếu có"""
+    response = getattr(error, 'response', None)
+    value = response.headers.get('Retry-After') if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff với full jitter: delay ~ U(0, min(max_delay, base * multiplier^n))"""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 30.0,
+                 multiplier: float = 2.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+
+    def delay(self, retry: int, error: Optional[BaseException] = None) -> float:
+        """Thời gian chờ trước lần retry thứ `retry` (bắt đầu từ 1)"""
+        cap = min(self.max_delay, self.base_delay * self.multiplier ** (retry - 1))
+        delay = random.uniform(0, cap)
+        hinted = retry_after_seconds(error) if error is not None else None
+        if hinted is not None:
+            delay = max(delay, min(hinted, self.max_delay))
+        return delay
+
+
+class RetryBudget:
+    """
+    Token bucket cho retry: mỗi request nạp `ratio` token, mỗi retry tiêu 1 token
+
+    Khi nhiều request cùng lỗi (container chết/quá tải), budget cạn nên retry dừng lại
+    thay vì nhân số request lên max_attempts lần. `min_tokens` cho phép vài retry lúc đầu.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_tokens: float = 10.0, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class CircuitBreaker:
+    """
+    Breaker 3 trạng thái: closed -> open (sau failure_threshold lỗi liên tiếp)
+    -> half_open (sau reset_timeout, cho 1 request thử) -> closed nếu thành công
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.trips += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+class ResilientClient:
+    """Gọi request với retry + budget + breaker theo key (thường là port/container) + hedging"""
+
+    def __init__(self, policy: Optional[RetryPolicy] = None, budget: Optional[RetryBudget] = None,
+                 hedge_after: Optional[float] = None, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0, sleep: Callable[[float], None] = time.sleep):
+        self.policy = policy or RetryPolicy()
+        self.budget = budget or RetryBudget()
+        self.hedge_after = hedge_after
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.sleep = sleep
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4) if hedge_after is not None else None
+
+    def breaker(self, key: str) -> CircuitBreaker:
+        with self._lock:
+            if key not in self.breakers:
+                self.breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self.stats[key] = {"requests": 0, "attempts": 0, "retries": 0, "failures": 0,
+                                   "rejected": 0, "hedges": 0, "hedge_wins": 0, "budget_exhausted": 0}
+            return self.breakers[key]
+
+    def _count(self, key: str, name: str, n: int = 1):
+        with self._lock:
+            self.stats[key][name] += n
+
+    def call(self, key: str, fn: Callable[[], Any], hedge: bool = True) -> Any:
+        """
+        Gọi fn() cho container `key`
+
+        Raise CircuitOpenError nếu breaker đang mở (chưa gửi request nào), RequestFailed nếu vẫn lỗi
+        sau khi retry (kể cả khi breaker mở giữa các lần retry).
+        hedge=False cho request không idempotent.
+        """
+        breaker = self.breaker(key)
+        self._count(key, "requests")
+        self.budget.deposit()
+        attempt = 0
+        last_error: Optional[BaseException] = None
+        while True:
+            if not breaker.allow():
+                self._count(key, "rejected")
+                if last_error is not None:
+                    # Breaker mở giữa các lần retry: request đã thực sự lỗi, không phải bị từ chối ngay
+                    self._count(key, "failures")
+                    raise RequestFailed(key, attempt, last_error) from last_error
+                raise CircuitOpenError(f"{key}: circuit breaker đang mở")
+            attempt += 1
+            self._count(key, "attempts")
+            try:
+                if hedge and self._executor is not None:
+                    result = self._hedged(key, fn)
+                else:
+                    result = fn()
+            except Exception as e:
+                if not is_retryable(e):
+                    # Lỗi phía client (400 field/cú pháp sai): container vẫn trả lời bình thường,
+                    # không tính vào breaker
+                    breaker.record_success()
+                    self._count(key, "failures")
+                    raise RequestFailed(key, attempt, e) from e
+                breaker.record_failure()
+                last_error = e
+                if attempt >= self.policy.max_attempts:
+                    self._count(key, "failures")
+                    raise RequestFailed(key, attempt, e) from e
+                if not self.budget.withdraw():
+                    self._count(key, "budget_exhausted")
+                    self._count(key, "failures")
+                    raise RequestFailed(key, attempt, e) from e
+                self._count(key, "retries")
+                self.sleep(self.policy.delay(attempt, e))
+                continue
+            breaker.record_success()
+            return result
+
+    def _hedged(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Chạy fn(), nếu sau hedge_after giây chưa xong thì gửi thêm 1 bản, lấy kết quả đầu tiên thành công"""
+        first = self._executor.submit(fn)
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+        self._count(key, "hedges")
+        second = self._executor.submit(fn)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._count(key, "hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def format_stats(self) -> List[str]:
+        """Các dòng tóm tắt thống kê theo container để in/log"""
+        lines = []
+        for key, s in self.stats.items():
+            line = (f"{key}: {s['requests']} requests, {s['retries']} retries, "
+                    f"{s['failures']} lỗi, breaker {self.breakers[key].state} "
+                    f"(ngắt {self.breakers[key].trips} lần, từ chối {s['rejected']})")
+            if s['budget_exhausted']:
+                line += f", hết retry budget {s['budget_exhausted']} lần"
+            if self.hedge_after is not None:
+                line += f", hedge {s['hedges']} (thắng {s['hedge_wins']})"
+            lines.append(line)
+        return lines
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Thống kê dạng dict để lưu vào JSON"""
+        return {key: dict(s, breaker=self.breakers[key].state, trips=self.breakers[key].trips)
+                for key, s in self.stats.items()}
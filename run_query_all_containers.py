@@ -3,36 +3,60 @@
 """
 Script để chạy query Solr trên cả 3 containers
 Query: facet search với id filter
+- Một ID: in đầy đủ JSON response của từng container
+- Batch (nhiều ID, --file FILE hoặc --file - cho stdin): mỗi container một connection pool
+  giữ ấm suốt lần chạy, query 3 containers song song, mỗi ID chỉ in một dòng
+  tóm tắt facet có khớp nhau không (--full để in đầy đủ response)
+- Interactive (--interactive): giữ connection giữa các lần tra cứu, gõ ID để query,
+  "full <id>" để xem đầy đủ response
 
 Cách sử dụng:
-    python run_query_all_containers.py [id]
+    python run_query_all_containers.py [id ...] [--file FILE] [--full] [--workers N]
+                                       [--interactive] [--profile[=cprofile|folded]]
 
 Tham số:
     id: ID để filter (mặc định: 0034f7e7-7c85-5ae4-8c30-145cb0aecfae)
+    --file: File chứa danh sách ID (mỗi dòng một ID, "-" để đọc từ stdin)
+    --full: In đầy đủ JSON response của mọi ID trong batch
+    --workers: Số ID được query song song (mặc định: 8)
+    --interactive: Chế độ tra cứu liên tục
+    --profile: Ghi cProfile dump (.prof), --profile=folded ghi folded stacks cho flame graph
 
 Ví dụ:
     python run_query_all_containers.py
     python run_query_all_containers.py 0034f7e7-7c85-5ae4-8c30-145cb0aecfae
+    python run_query_all_containers.py --file suspicious_ids.txt --workers 16
+    cut -f1 ids.tsv | python run_query_all_containers.py --file -
+    python run_query_all_containers.py --interactive
 """
 
-import requests
+import argparse
 import json
 import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List
 from urllib.parse import urlencode
 
-# ID để filter (có thể override từ command line)
-ID = sys.argv[1] if len(sys.argv) > 1 else "0034f7e7-7c85-5ae4-8c30-145cb0aecfae"
+import requests
+from requests.adapters import HTTPAdapter
+
+from solr_javabin import facet_pairs, solr_get
+from tracing import TRACER, add_profile_args, profiled, span
+
+DEFAULT_ID = "0034f7e7-7c85-5ae4-8c30-145cb0aecfae"
+FACET_FIELD = "search_text_cloud"
+DEFAULT_WORKERS = 8
 
-# Base query parameters
+# Base query parameters (fq theo ID được thêm khi query)
 QUERY_PARAMS = {
     "q": "*:*",
-    "fq": f"id:{ID}",
     "facet": "true",
-    "facet.field": "search_text_cloud",
+    "facet.field": FACET_FIELD,
     "facet.sort": "count",
     "rows": "0",
     "wt": "json",
-    "indent": "true",
     "facet.limit": "1000",
     "facet.mincount": "1"
 }
@@ -59,30 +83,40 @@ CONTAINERS = [
     }
 ]
 
+STATUS_ICONS = {"match": "✅", "diff": "🔀", "missing": "⚠️ ", "error": "❌"}
+
+
+def build_params(doc_id: str) -> Dict[str, str]:
+    params = dict(QUERY_PARAMS)
+    params["fq"] = f"id:{doc_id}"
+    return params
+
 
-def run_query(container_name, port, core, solr_version):
-    """Chạy query trên một container"""
+def container_url(container: Dict[str, Any]) -> str:
+    return f"http://localhost:{container['port']}/solr/{container['core']}/select"
+
+
+def run_query(container_name, port, core, solr_version, doc_id, session=None):
+    """Chạy query trên một container và in đầy đủ JSON response"""
     url = f"http://localhost:{port}/solr/{core}/select"
-    
+    params = build_params(doc_id)
+
     print("━" * 50)
     print(f"📦 Container: {solr_version}")
     print("━" * 50)
-    print(f"\nURL: {url}?{urlencode(QUERY_PARAMS)}")
+    print(f"\nURL: {url}?{urlencode(params)}")
     print()
-    
+
     # Thử query trực tiếp (không cần ping trước)
     try:
-        response = requests.get(url, params=QUERY_PARAMS, timeout=30)
-        response.raise_for_status()
-        
-        # Format JSON output
-        data = response.json()
-        print(json.dumps(data, indent=2, ensure_ascii=False))
+        data = solr_get(session, url, params, timeout=30)
+        with span("print"):
+            print(json.dumps(data, indent=2, ensure_ascii=False))
         print()
         print("✅ Query thành công")
-        
+
         return True, data
-        
+
     except requests.exceptions.ConnectionError:
         print(f"❌ Không thể kết nối đến Solr {solr_version} trên port {port}")
         print(f"   Hãy kiểm tra container có đang chạy không:")
@@ -97,12 +131,11 @@ def run_query(container_name, port, core, solr_version):
         try:
             error_data = e.response.json()
             print(json.dumps(error_data, indent=2, ensure_ascii=False))
-        except:
+        except ValueError:
             print(e.response.text)
         return False, None
-    except json.JSONDecodeError:
+    except ValueError:
         print(f"❌ ERROR: Không thể parse JSON response")
-        print(f"Response: {response.text[:500]}")
         return False, None
     except Exception as e:
         print(f"❌ ERROR: {str(e)}")
@@ -111,25 +144,140 @@ def run_query(container_name, port, core, solr_version):
         return False, None
 
 
-def main():
+class ContainerPool:
+    """
+    Mỗi container một requests.Session (keep-alive, pool đủ cho số worker) dùng chung
+    cho cả lần chạy, cùng một thread pool để query các containers song song
+    """
+
+    def __init__(self, containers: List[Dict[str, Any]], workers: int = DEFAULT_WORKERS):
+        self.containers = containers
+        self.sessions = {}
+        for container in containers:
+            session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+            self.sessions[container["name"]] = session
+        self.executor = ThreadPoolExecutor(max_workers=workers * len(containers))
+
+    def query(self, container: Dict[str, Any], doc_id: str, keep_response: bool) -> Dict[str, Any]:
+        """Facet của một ID trên một container; lỗi được trả về trong kết quả thay vì raise"""
+        start = time.perf_counter()
+        try:
+            data = solr_get(self.sessions[container["name"]], container_url(container),
+                            build_params(doc_id), timeout=30, compact=not keep_response)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            return {"ok": False, "error": str(e), "ms": (time.perf_counter() - start) * 1000}
+        facet_field = data.get("facet_counts", {}).get("facet_fields", {}).get(FACET_FIELD, [])
+        return {
+            "ok": True,
+            "num_found": data.get("response", {}).get("numFound", 0),
+            "facets": dict(facet_pairs(facet_field)),
+            "data": data if keep_response else None,
+            "ms": (time.perf_counter() - start) * 1000
+        }
+
+    def submit(self, doc_id: str, keep_response: bool) -> List:
+        return [self.executor.submit(self.query, container, doc_id, keep_response)
+                for container in self.containers]
+
+    def query_many(self, ids: Iterable[str], keep_response: bool = False,
+                   window: int = DEFAULT_WORKERS) -> Iterator[tuple]:
+        """(id, kết quả theo container) theo đúng thứ tự input, tối đa `window` ID đang chạy"""
+        pending = deque()
+        for doc_id in ids:
+            pending.append((doc_id, self.submit(doc_id, keep_response)))
+            if len(pending) >= window:
+                doc_id, futures = pending.popleft()
+                yield doc_id, [future.result() for future in futures]
+        while pending:
+            doc_id, futures = pending.popleft()
+            yield doc_id, [future.result() for future in futures]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for session in self.sessions.values():
+            session.close()
+
+
+def agreement(results: List[Dict[str, Any]]) -> str:
+    """match / diff / missing / error cho kết quả của một ID trên các containers"""
+    if not all(r["ok"] for r in results):
+        return "error"
+    if not all(r["num_found"] for r in results):
+        return "missing"
+    reference = results[0]["facets"]
+    if all(r["facets"] == reference for r in results[1:]):
+        return "match"
+    return "diff"
+
+
+def format_agreement(doc_id: str, results: List[Dict[str, Any]], containers: List[Dict[str, Any]]) -> str:
+    """Một dòng: trạng thái, ID và số terms mỗi container (+/- terms, số count khác so với container đầu)"""
+    status = agreement(results)
+    reference = results[0].get("facets", {}) if results[0]["ok"] else None
+    parts = []
+    for idx, (container, r) in enumerate(zip(containers, results)):
+        label = str(container["port"])
+        if not r["ok"]:
+            parts.append(f"{label}: lỗi ({r['error'][:60]})")
+        elif not r["num_found"]:
+            parts.append(f"{label}: không có")
+        else:
+            text = f"{label}: {len(r['facets'])} terms"
+            if idx > 0 and reference is not None and r["facets"] != reference:
+                added = len(r["facets"].keys() - reference.keys())
+                removed = len(reference.keys() - r["facets"].keys())
+                changed = sum(1 for term in r["facets"].keys() & reference.keys()
+                              if r["facets"][term] != reference[term])
+                text += f" (+{added}/-{removed}"
+                text += f", {changed} count khác)" if changed else ")"
+            parts.append(text)
+    slowest = max(r["ms"] for r in results)
+    return f"{STATUS_ICONS[status]} {doc_id} | {' | '.join(parts)} | {slowest:.0f}ms"
+
+
+def print_full(doc_id: str, results: List[Dict[str, Any]], containers: List[Dict[str, Any]]):
+    for container, r in zip(containers, results):
+        print(f"   📦 {container['version']} ({doc_id}):")
+        body = r["data"] if r["ok"] else {"error": r["error"]}
+        with span("print"):
+            print(json.dumps(body, indent=2, ensure_ascii=False))
+
+
+def read_ids(path: str) -> Iterator[str]:
+    """Đọc ID mỗi dòng một (bỏ dòng trống và comment #), "-" là stdin"""
+    f = sys.stdin if path == "-" else open(path, 'r', encoding='utf-8')
+    try:
+        for line in f:
+            doc_id = line.strip()
+            if doc_id and not doc_id.startswith('#'):
+                yield doc_id
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def run_single(doc_id: str) -> bool:
+    """Một ID: in đầy đủ response của từng container"""
     print("━" * 50)
     print("🔍 Running Solr Query on All Containers")
     print("━" * 50)
-    print(f"\nID Filter: {ID}")
+    print(f"\nID Filter: {doc_id}")
     print(f"\nQuery Parameters:")
-    for key, value in QUERY_PARAMS.items():
+    for key, value in build_params(doc_id).items():
         print(f"  {key}: {value}")
     print()
-    
+
     results = []
-    
+
     # Chạy query trên từng container
     for container in CONTAINERS:
         success, data = run_query(
             container["name"],
             container["port"],
             container["core"],
-            container["version"]
+            container["version"],
+            doc_id
         )
         results.append({
             "container": container["name"],
@@ -139,7 +287,7 @@ def main():
         })
         print()
         print()
-    
+
     # Tóm tắt kết quả
     print("━" * 50)
     print("📊 Summary")
@@ -148,12 +296,105 @@ def main():
     for result in results:
         status = "✅ SUCCESS" if result["success"] else "❌ FAILED"
         print(f"{result['version']}: {status}")
-    
+    return all(r["success"] for r in results)
+
+
+def run_batch(ids: Iterable[str], workers: int, full: bool) -> bool:
+    """Nhiều ID: query song song qua pool, mỗi ID một dòng, cuối cùng in thống kê"""
+    print("━" * 70)
+    print(f"🔍 Batch query trên {len(CONTAINERS)} containers "
+          f"({', '.join(str(c['port']) for c in CONTAINERS)}), {workers} ID song song")
+    print(f"   Mốc so sánh: {CONTAINERS[0]['version']} (port {CONTAINERS[0]['port']})")
+    print("━" * 70)
+
+    pool = ContainerPool(CONTAINERS, workers)
+    counts = Counter()
+    start = time.time()
+    try:
+        for doc_id, results in pool.query_many(ids, keep_response=full, window=workers):
+            counts[agreement(results)] += 1
+            print(format_agreement(doc_id, results, CONTAINERS), flush=True)
+            if full:
+                print_full(doc_id, results, CONTAINERS)
+    except KeyboardInterrupt:
+        print("\n⚠️  Đã dừng bởi người dùng (Ctrl+C)")
+    finally:
+        pool.close()
+    elapsed = time.time() - start
+
+    total = sum(counts.values())
+    print()
+    print("━" * 70)
+    print("📊 Summary")
+    print("━" * 70)
+    print(f"   Tổng số ID: {total:,} trong {elapsed:.2f}s ({total / elapsed if elapsed > 0 else 0:.1f} ID/giây)")
+    print(f"   ✅ Giống nhau: {counts['match']:,}")
+    print(f"   🔀 Facet khác nhau: {counts['diff']:,}")
+    print(f"   ⚠️  Không có trên ít nhất một container: {counts['missing']:,}")
+    print(f"   ❌ Query lỗi: {counts['error']:,}")
+    return counts["error"] == 0
+
+
+def run_interactive(workers: int):
+    """Tra cứu liên tục, connection được giữ giữa các lần nhập"""
+    print("━" * 70)
+    print("🔍 Interactive: nhập một hoặc nhiều ID (cách nhau bởi dấu cách)")
+    print("   full <id>: in đầy đủ response | quit: thoát")
+    print("━" * 70)
+    pool = ContainerPool(CONTAINERS, workers)
+    try:
+        while True:
+            try:
+                line = input("id> ").strip()
+            except (EOFError, KeyboardInterrupt):
+                print()
+                break
+            if not line:
+                continue
+            if line in ("q", "quit", "exit"):
+                break
+            words = line.split()
+            full = words[0] == "full"
+            ids = words[1:] if full else words
+            for doc_id, results in pool.query_many(ids, keep_response=full, window=workers):
+                print(format_agreement(doc_id, results, CONTAINERS))
+                if full:
+                    print_full(doc_id, results, CONTAINERS)
+    finally:
+        pool.close()
+
+
+def main():
+    # Set UTF-8 encoding cho Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="Query facet theo ID trên cả 3 containers")
+    parser.add_argument("ids", nargs="*", help=f"ID để filter (mặc định: {DEFAULT_ID})")
+    parser.add_argument("--file", help="File chứa danh sách ID (mỗi dòng một ID, '-' là stdin)")
+    parser.add_argument("--full", action="store_true", help="Batch: in đầy đủ JSON response của mọi ID")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Số ID được query song song")
+    parser.add_argument("--interactive", "-i", action="store_true", help="Chế độ tra cứu liên tục")
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    with profiled(args.profile, "run_query_all_containers", args.profile_out):
+        if args.interactive:
+            run_interactive(args.workers)
+            success = True
+        elif args.file or len(args.ids) > 1:
+            ids = list(args.ids)
+            if args.file:
+                ids = ids + list(read_ids(args.file)) if ids else read_ids(args.file)
+            success = run_batch(ids, args.workers, args.full)
+        else:
+            success = run_single(args.ids[0] if args.ids else DEFAULT_ID)
+        TRACER.print_report()
+
     # Trả về exit code
-    if all(r["success"] for r in results):
-        sys.exit(0)
-    else:
-        sys.exit(1)
+    sys.exit(0 if success else 1)
 
 
 if __name__ == "__main__":
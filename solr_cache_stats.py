@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Thống kê cache của Solr (filterCache, queryResultCache, documentCache, fieldValueCache, fieldCache)
+- Snapshot cache stats của từng container qua /admin/mbeans?cat=CACHE
+- Tính delta giữa 2 snapshot: lookups, hits, hit ratio, inserts, evictions, size
+  (dùng counters cumulative_* nếu có để không bị reset khi mở searcher mới)
+- Sinh warming queries từ workload FACET_PARAMS, có thể xuất thành listener cho solrconfig.xml
+- Đo riêng số liệu cold (sau RELOAD core) và warm (chạy lại cùng workload)
+
+Cách sử dụng:
+    python solr_cache_stats.py snapshot
+    python solr_cache_stats.py measure [num_docs] [--no-reload] [--warm-sample N]
+    python solr_cache_stats.py warming-queries [num_docs] [--listener firstSearcher|newSearcher]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from xml.sax.saxutils import escape
+
+import requests
+
+CACHE_NAMES = ["filterCache", "queryResultCache", "documentCache", "fieldValueCache", "fieldCache"]
+COUNTERS = ["lookups", "hits", "inserts", "evictions"]
+WARM_SAMPLE = 20
+REQUEST_TIMEOUT = 30
+
+CacheStats = Dict[str, Dict[str, Any]]
+
+
+def fetch_cache_stats(port: int, core: str, session: Optional[requests.Session] = None) -> CacheStats:
+    """
+    Lấy cache stats của một core
+
+    Returns:
+        {cache_name: {"lookups": .., "hits": .., "size": .., "cumulative_hits": .., ...}}
+    """
+    http = session or requests
+    url = f"http://localhost:{port}/solr/{core}/admin/mbeans"
+    response = http.get(url, params={"cat": "CACHE", "stats": "true", "wt": "json"}, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    mbeans = response.json().get("solr-mbeans", [])
+
+    # json.nl=flat (mặc định): ["CACHE", {...}]; json.nl=map: {"CACHE": {...}}
+    if isinstance(mbeans, list):
+        mbeans = dict(zip(mbeans[::2], mbeans[1::2]))
+    caches = mbeans.get("CACHE", {})
+
+    result: CacheStats = {}
+    for name, info in caches.items():
+        stats = info.get("stats") or {}
+        # Key dạng "CACHE.searcher.filterCache.hits" -> "hits"
+        result[name] = {key.rsplit(".", 1)[-1]: value for key, value in stats.items()}
+    return result
+
+
+def _counter(stats: Dict[str, Any], name: str) -> float:
+    value = stats.get(f"cumulative_{name}", stats.get(name, 0))
+    return value if isinstance(value, (int, float)) else 0
+
+
+def cache_delta(before: CacheStats, after: CacheStats) -> CacheStats:
+    """Delta giữa 2 snapshot của một core, counter bị reset (core reload) được tính từ 0"""
+    deltas: CacheStats = {}
+    for name, stats_after in after.items():
+        stats_before = before.get(name, {})
+        delta: Dict[str, Any] = {}
+        for counter in COUNTERS:
+            value_after = _counter(stats_after, counter)
+            value_before = _counter(stats_before, counter)
+            delta[counter] = value_after - value_before if value_after >= value_before else value_after
+        delta["hit_ratio"] = delta["hits"] / delta["lookups"] if delta["lookups"] else None
+        delta["size_before"] = stats_before.get("size", stats_before.get("entries_count"))
+        delta["size_after"] = stats_after.get("size", stats_after.get("entries_count"))
+        delta["warmup_ms"] = stats_after.get("warmupTime")
+        delta["ram_bytes"] = stats_after.get("ramBytesUsed")
+        deltas[name] = delta
+    return deltas
+
+
+def snapshot_containers(containers: List[Dict[str, Any]],
+                        session: Optional[requests.Session] = None) -> Dict[str, Optional[CacheStats]]:
+    """Snapshot cache stats của tất cả containers, container lỗi trả về None"""
+    snapshots = {}
+    for container in containers:
+        try:
+            snapshots[container["version"]] = fetch_cache_stats(container["port"], container["core"], session)
+        except (requests.RequestException, ValueError):
+            snapshots[container["version"]] = None
+    return snapshots
+
+
+def delta_containers(before: Dict[str, Optional[CacheStats]],
+                     after: Dict[str, Optional[CacheStats]]) -> Dict[str, Optional[CacheStats]]:
+    return {version: cache_delta(before.get(version) or {}, stats) if stats is not None else None
+            for version, stats in after.items()}
+
+
+def _fmt(value: Any) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:,.1f}"
+    return f"{value:,}" if isinstance(value, int) else str(value)
+
+
+def format_cache_report(deltas: Dict[str, Optional[CacheStats]]) -> List[str]:
+    """Các dòng báo cáo delta cache theo container"""
+    lines = []
+    for version, caches in deltas.items():
+        lines.append(f"📦 {version}")
+        if caches is None:
+            lines.append("   ⚠️  Không lấy được cache stats (/admin/mbeans)")
+            continue
+        lines.append(f"   {'Cache':<18} {'Lookups':>9} {'Hits':>9} {'Hit%':>7} {'Inserts':>9} "
+                     f"{'Evict':>7} {'Size':>15}")
+        names = [n for n in CACHE_NAMES if n in caches] + sorted(n for n in caches if n not in CACHE_NAMES)
+        for name in names:
+            d = caches[name]
+            ratio = f"{d['hit_ratio']*100:.1f}" if d["hit_ratio"] is not None else "-"
+            size = f"{_fmt(d['size_before'])} -> {_fmt(d['size_after'])}"
+            lines.append(f"   {name:<18} {_fmt(d['lookups']):>9} {_fmt(d['hits']):>9} {ratio:>7} "
+                         f"{_fmt(d['inserts']):>9} {_fmt(d['evictions']):>7} {size:>15}")
+    return lines
+
+
+def build_warming_queries(facet_params: Dict[str, str], ids: List[str],
+                          sample: int = WARM_SAMPLE) -> List[Dict[str, str]]:
+    """
+    Sinh warming queries từ workload facet
+
+    Query đầu tiên không có fq để Solr uninvert field facet (fieldValueCache),
+    các query sau dùng fq=id:<id> giống workload thật để làm nóng filterCache.
+    """
+    base = {k: v for k, v in facet_params.items() if k != "indent"}
+    queries = [dict(base)]
+    for doc_id in ids[:sample]:
+        query = dict(base)
+        query["fq"] = f"id:{doc_id}"
+        queries.append(query)
+    return queries
+
+
+def listener_xml(queries: List[Dict[str, str]], event: str = "firstSearcher") -> str:
+    """Xuất warming queries thành QuerySenderListener cho solrconfig.xml"""
+    lines = [f'<listener event="{event}" class="solr.QuerySenderListener">', '  <arr name="queries">']
+    for query in queries:
+        lines.append("    <lst>")
+        for key, value in query.items():
+            if key == "wt":
+                continue
+            lines.append(f'      <str name="{escape(key)}">{escape(str(value))}</str>')
+        lines.append("    </lst>")
+    lines.extend(["  </arr>", "</listener>"])
+    return "\n".join(lines)
+
+
+def run_queries(port: int, core: str, queries: List[Dict[str, str]],
+                session: Optional[requests.Session] = None) -> Dict[str, Any]:
+    """Chạy tuần tự các queries, trả về latency (ms) và QTime"""
+    http = session or requests
+    url = f"http://localhost:{port}/solr/{core}/select"
+    latencies = []
+    qtimes = []
+    errors = 0
+    for query in queries:
+        start = time.perf_counter()
+        try:
+            response = http.get(url, params=query, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            qtimes.append(response.json().get("responseHeader", {}).get("QTime", 0))
+        except (requests.RequestException, ValueError):
+            errors += 1
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize_latencies(latencies, qtimes, errors)
+
+
+def summarize_latencies(latencies: List[float], qtimes: List[float], errors: int = 0) -> Dict[str, Any]:
+    if not latencies:
+        return {"queries": 0, "errors": errors}
+    ordered = sorted(latencies)
+    return {
+        "queries": len(latencies),
+        "errors": errors,
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": ordered[len(ordered) // 2],
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "qtime_mean_ms": statistics.mean(qtimes) if qtimes else None,
+    }
+
+
+def reload_core(port: int, core: str, session: Optional[requests.Session] = None) -> bool:
+    """RELOAD core để bắt đầu với cache rỗng (cold start)"""
+    http = session or requests
+    try:
+        response = http.get(f"http://localhost:{port}/solr/admin/cores",
+                            params={"action": "RELOAD", "core": core, "wt": "json"}, timeout=120)
+        response.raise_for_status()
+        return response.json().get("responseHeader", {}).get("status") == 0
+    except (requests.RequestException, ValueError):
+        return False
+
+
+def measure_container(container: Dict[str, Any], workload: List[Dict[str, str]],
+                      reload: bool = True) -> Dict[str, Any]:
+    """Chạy workload 2 lần (cold rồi warm), đo latency và cache delta của từng lần"""
+    session = requests.Session()
+    port, core = container["port"], container["core"]
+    result: Dict[str, Any] = {"reloaded": reload and reload_core(port, core, session)}
+    for phase in ("cold", "warm"):
+        before = fetch_cache_stats(port, core, session)
+        latency = run_queries(port, core, workload, session)
+        after = fetch_cache_stats(port, core, session)
+        result[phase] = {"latency": latency, "cache": cache_delta(before, after)}
+    return result
+
+
+def main():
+    # Set UTF-8 encoding cho Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    # Import muộn để tránh import vòng (compare_facet_results dùng module này)
+    from compare_facet_results import CONTAINERS, FACET_PARAMS, get_document_ids
+
+    parser = argparse.ArgumentParser(description="Thống kê cache Solr và đo cold/warm cho workload facet")
+    parser.add_argument("command", choices=["snapshot", "measure", "warming-queries"])
+    parser.add_argument("num_docs", nargs="?", type=int, default=100, help="Số documents cho workload (mặc định: 100)")
+    parser.add_argument("--source-port", type=int, default=CONTAINERS[0]["port"])
+    parser.add_argument("--no-reload", action="store_true", help="Không RELOAD core trước khi đo cold")
+    parser.add_argument("--warm-sample", type=int, default=WARM_SAMPLE, help="Số warming queries có fq=id")
+    parser.add_argument("--listener", choices=["firstSearcher", "newSearcher"],
+                        help="Xuất warming queries dạng listener cho solrconfig.xml")
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        snapshots = snapshot_containers(CONTAINERS)
+        empty = {v: {} for v in snapshots}
+        print("━" * 70)
+        print("📊 Cache stats hiện tại (tích lũy)")
+        print("━" * 70)
+        for line in format_cache_report(delta_containers(empty, snapshots)):
+            print(line)
+        return
+
+    source = next((c for c in CONTAINERS if c["port"] == args.source_port), CONTAINERS[0])
+    ids = get_document_ids(args.source_port, source["core"], args.num_docs)
+    if not ids:
+        print("❌ Không lấy được document IDs. Kiểm tra lại Solr containers.")
+        sys.exit(1)
+
+    if args.command == "warming-queries":
+        queries = build_warming_queries(FACET_PARAMS, ids, args.warm_sample)
+        if args.listener:
+            print(listener_xml(queries, args.listener))
+        else:
+            print(json.dumps(queries, ensure_ascii=False, indent=2))
+        return
+
+    workload = [dict(FACET_PARAMS, fq=f"id:{doc_id}") for doc_id in ids]
+    print("━" * 70)
+    print(f"🔥 Đo cold/warm: {len(workload)} facet queries x {len(CONTAINERS)} containers")
+    print("━" * 70)
+    results = {}
+    for container in CONTAINERS:
+        print(f"\n📦 {container['version']}")
+        try:
+            result = measure_container(container, workload, reload=not args.no_reload)
+        except (requests.RequestException, ValueError) as e:
+            print(f"   ❌ ERROR: {e}")
+            continue
+        results[container["version"]] = result
+        if not args.no_reload and not result["reloaded"]:
+            print("   ⚠️  RELOAD lỗi, số liệu cold có thể đã có cache")
+        for phase in ("cold", "warm"):
+            lat = result[phase]["latency"]
+            if lat["queries"]:
+                print(f"   {phase:<5} p50={lat['p50_ms']:.1f}ms p95={lat['p95_ms']:.1f}ms "
+                      f"mean={lat['mean_ms']:.1f}ms lỗi={lat['errors']}")
+            for line in format_cache_report({phase: result[phase]["cache"]})[1:]:
+                print(f"   {line}")
+
+    output_file = f"cache_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({"num_docs": len(ids), "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Kết quả đã lưu vào: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
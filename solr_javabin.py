@@ -0,0 +1,581 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Decode/encode định dạng javabin của Solr (wt=javabin, JavaBinCodec version 2)
+- Kết quả decode có cùng cấu trúc với response wt=json (json.nl=flat):
+  SimpleOrderedMap -> dict, NamedList -> list phẳng [k1, v1, k2, v2, ...],
+  SolrDocumentList -> {"numFound", "start", "numFoundExact", "docs"}, Date -> chuỗi ISO như JSON
+- compact=True: NamedList chỉ chứa số nguyên (facet_fields) được decode thẳng thành TermCounts
+  (list terms + array counts), không tạo list phẳng trung gian
+- solr_get(): query với wt=javabin, tự động fallback về wt=json nếu server/response không hỗ trợ
+
+Cách sử dụng:
+    from solr_javabin import solr_get, facet_pairs
+    data = solr_get(session, url, params)                 # giống response.json()
+    data = solr_get(session, url, params, compact=True)   # facet_fields là TermCounts
+
+    SOLR_WT=javabin python compare_facet_results.py       # bật javabin cho các script
+
+    python solr_javabin.py <url> [key=value ...]          # so sánh kích thước/thời gian decode với JSON
+"""
+
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from tracing import span
+
+VERSION = 2
+
+# Tags (JavaBinCodec)
+NULL = 0
+BOOL_TRUE = 1
+BOOL_FALSE = 2
+BYTE = 3
+SHORT = 4
+DOUBLE = 5
+INT = 6
+LONG = 7
+FLOAT = 8
+DATE = 9
+MAP = 10
+SOLRDOC = 11
+SOLRDOCLST = 12
+BYTEARR = 13
+ITERATOR = 14
+END = 15
+SOLRINPUTDOC = 16
+MAP_ENTRY_ITER = 17
+ENUM_FIELD_VALUE = 18
+MAP_ENTRY = 19
+# Tags có kích thước nằm trong 5 bit thấp
+STR = 1 << 5
+SINT = 2 << 5
+SLONG = 3 << 5
+ARR = 4 << 5
+ORDERED_MAP = 5 << 5
+NAMED_LST = 6 << 5
+EXTERN_STRING = 7 << 5
+
+JAVABIN_CONTENT_TYPE = "application/octet-stream"
+# Định dạng mặc định cho solr_get(): decoder javabin viết bằng Python nên tốn CPU hơn json (C),
+# chỉ nên bật (SOLR_WT=javabin) khi băng thông mạng là nút thắt
+DEFAULT_WT = os.environ.get("SOLR_WT", "json")
+
+_INT = struct.Struct(">i")
+_LONG = struct.Struct(">q")
+_SHORT = struct.Struct(">h")
+_FLOAT = struct.Struct(">f")
+_DOUBLE = struct.Struct(">d")
+_END = object()
+
+
+class JavabinError(ValueError):
+    pass
+
+
+class TermCounts:
+    """Danh sách (term, count) của một facet field, lưu dạng 2 mảng song song"""
+
+    __slots__ = ("terms", "counts")
+
+    def __init__(self, terms: Optional[List[str]] = None, counts: Optional[array] = None):
+        self.terms = terms if terms is not None else []
+        self.counts = counts if counts is not None else array("q")
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __iter__(self) -> Iterator[Tuple[str, int]]:
+        return zip(self.terms, self.counts)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, TermCounts):
+            return self.terms == other.terms and list(self.counts) == list(other.counts)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"TermCounts({len(self)} terms)"
+
+    def to_dict(self) -> Dict[str, int]:
+        return dict(zip(self.terms, self.counts))
+
+    def to_flat(self) -> List[Any]:
+        flat: List[Any] = []
+        for term, count in zip(self.terms, self.counts):
+            flat.append(term)
+            flat.append(count)
+        return flat
+
+
+def facet_pairs(value: Any) -> List[Tuple[str, int]]:
+    """(term, count) từ facet field dạng list phẳng (JSON) hoặc TermCounts (javabin compact)"""
+    if isinstance(value, TermCounts):
+        return list(value)
+    return list(zip(value[::2], value[1::2]))
+
+
+def format_date(millis: int) -> str:
+    """Format giống JSON response writer của Solr (ISO instant, chỉ có millis khi khác 0)"""
+    dt = datetime.fromtimestamp(millis / 1000, tz=timezone.utc)
+    if millis % 1000:
+        return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{millis % 1000:03d}Z"
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _float32(value: float) -> float:
+    """Số float 32-bit ngắn nhất khi in ra, giống Float.toString của Java trong JSON"""
+    packed = _FLOAT.pack(value)
+    for precision in range(6, 10):
+        candidate = float(f"{value:.{precision}g}")
+        if _FLOAT.pack(candidate) == packed:
+            return candidate
+    return value
+
+
+class JavabinDecoder:
+    """Decoder javabin, mỗi instance decode một response"""
+
+    def __init__(self, data: bytes, compact: bool = False):
+        self.data = data
+        self.pos = 0
+        self.compact = compact
+        self.strings: List[str] = []
+
+    def decode(self) -> Any:
+        if not self.data or self.data[0] != VERSION:
+            raise JavabinError(f"Không phải javabin version {VERSION}")
+        self.pos = 1
+        return self.read_val()
+
+    # --- Primitives ---
+    def _byte(self) -> int:
+        b = self.data[self.pos]
+        self.pos += 1
+        return b
+
+    def _vint(self) -> int:
+        data = self.data
+        pos = self.pos
+        b = data[pos]
+        pos += 1
+        result = b & 0x7F
+        shift = 7
+        while b & 0x80:
+            b = data[pos]
+            pos += 1
+            result |= (b & 0x7F) << shift
+            shift += 7
+        self.pos = pos
+        return result
+
+    def _size(self, tag: int) -> int:
+        size = tag & 0x1F
+        if size == 0x1F:
+            size += self._vint()
+        return size
+
+    def _small_int(self, tag: int) -> int:
+        value = tag & 0x0F
+        if tag & 0x10:
+            value |= self._vint() << 4
+        return value
+
+    def _unpack(self, fmt: struct.Struct) -> Any:
+        value = fmt.unpack_from(self.data, self.pos)[0]
+        self.pos += fmt.size
+        return value
+
+    def _str(self, tag: int) -> str:
+        size = self._size(tag)
+        start = self.pos
+        self.pos += size
+        return self.data[start:self.pos].decode("utf-8")
+
+    def _extern_str(self, tag: int) -> str:
+        idx = self._size(tag)
+        if idx:
+            return self.strings[idx - 1]
+        value = self.read_val()
+        self.strings.append(value)
+        return value
+
+    # --- Values ---
+    def read_val(self) -> Any:
+        tag = self.data[self.pos]
+        self.pos += 1
+        kind = tag >> 5
+        if kind:
+            if kind == 1:
+                # STR (inline vì là tag phổ biến nhất)
+                size = tag & 0x1F
+                if size == 0x1F:
+                    size += self._vint()
+                start = self.pos
+                self.pos = start + size
+                return self.data[start:start + size].decode("utf-8")
+            if kind == 2 or kind == 3:
+                return self._small_int(tag)
+            if kind == 4:
+                return [self.read_val() for _ in range(self._size(tag))]
+            if kind == 5:
+                return self._ordered_map(self._size(tag))
+            if kind == 6:
+                return self._named_list(self._size(tag))
+            return self._extern_str(tag)
+
+        if tag == NULL:
+            return None
+        if tag == BOOL_TRUE:
+            return True
+        if tag == BOOL_FALSE:
+            return False
+        if tag == INT:
+            return self._unpack(_INT)
+        if tag == LONG:
+            return self._unpack(_LONG)
+        if tag == FLOAT:
+            return _float32(self._unpack(_FLOAT))
+        if tag == DOUBLE:
+            return self._unpack(_DOUBLE)
+        if tag == DATE:
+            return format_date(self._unpack(_LONG))
+        if tag == BYTE:
+            value = self._byte()
+            return value - 256 if value > 127 else value
+        if tag == SHORT:
+            return self._unpack(_SHORT)
+        if tag == SOLRDOC:
+            return self._solr_doc()
+        if tag == SOLRDOCLST:
+            return self._solr_doc_list()
+        if tag == MAP:
+            size = self._vint()
+            return {self.read_val(): self.read_val() for _ in range(size)}
+        if tag == ITERATOR:
+            items = []
+            while True:
+                value = self.read_val()
+                if value is _END:
+                    return items
+                items.append(value)
+        if tag == END:
+            return _END
+        if tag == MAP_ENTRY_ITER:
+            result = {}
+            while True:
+                key = self.read_val()
+                if key is _END:
+                    return result
+                result[key] = self.read_val()
+        if tag == BYTEARR:
+            size = self._vint()
+            start = self.pos
+            self.pos += size
+            return bytes(self.data[start:self.pos])
+        if tag == ENUM_FIELD_VALUE:
+            self.read_val()  # giá trị int của enum
+            return self.read_val()  # tên enum (JSON cũng trả về tên)
+        if tag == MAP_ENTRY:
+            return {self.read_val(): self.read_val()}
+        if tag == SOLRINPUTDOC:
+            raise JavabinError("SolrInputDocument không được hỗ trợ trong response")
+        raise JavabinError(f"Tag không hợp lệ {tag} tại vị trí {self.pos - 1}")
+
+    def _ordered_map(self, size: int) -> Dict[str, Any]:
+        read_val = self.read_val
+        result = {}
+        for _ in range(size):
+            key = read_val()
+            result[key] = read_val()
+        return result
+
+    def _named_list(self, size: int) -> Any:
+        if self.compact:
+            return self._term_counts(size)
+        read_val = self.read_val
+        flat: List[Any] = []
+        for _ in range(size):
+            flat.append(read_val())
+            flat.append(read_val())
+        return flat
+
+    def _term_counts(self, size: int) -> Any:
+        """Decode NamedList<Integer> thẳng vào TermCounts; gặp giá trị không phải int thì trả về list phẳng"""
+        data = self.data
+        terms: List[str] = []
+        counts = array("q")
+        for i in range(size):
+            key = self.read_val()
+            tag = data[self.pos]
+            if tag >> 5 == 2:  # SINT: trường hợp phổ biến nhất của facet count
+                self.pos += 1
+                value = self._small_int(tag)
+            else:
+                value = self.read_val()
+                if not isinstance(value, int) or isinstance(value, bool):
+                    flat: List[Any] = TermCounts(terms, counts).to_flat() + [key, value]
+                    for _ in range(size - i - 1):
+                        flat.append(self.read_val())
+                        flat.append(self.read_val())
+                    return flat
+            terms.append(key)
+            counts.append(value)
+        return TermCounts(terms, counts)
+
+    def _solr_doc(self) -> Dict[str, Any]:
+        tag = self._byte()
+        size = self._size(tag)
+        data = self.data
+        strings = self.strings
+        read_val = self.read_val
+        doc: Dict[str, Any] = {}
+        for _ in range(size):
+            tag = data[self.pos]
+            if tag >> 5 == 7 and 0 < (tag & 0x1F) < 0x1F:
+                # Tên field đã gặp: tra bảng extern string trực tiếp
+                self.pos += 1
+                name = strings[(tag & 0x1F) - 1]
+            else:
+                name = read_val()
+                if isinstance(name, dict):  # child document
+                    doc.setdefault("_childDocuments_", []).append(name)
+                    continue
+            doc[name] = read_val()
+        return doc
+
+    def _solr_doc_list(self) -> Dict[str, Any]:
+        header = self.read_val()
+        docs = self.read_val()
+        result: Dict[str, Any] = {"numFound": header[0], "start": header[1]}
+        if len(header) > 2 and header[2] is not None:
+            result["maxScore"] = header[2]
+        if len(header) > 3:
+            result["numFoundExact"] = header[3]
+        result["docs"] = docs
+        return result
+
+
+def decode(data: bytes, compact: bool = False) -> Any:
+    """Decode một response javabin"""
+    try:
+        return JavabinDecoder(data, compact).decode()
+    except (IndexError, struct.error, UnicodeDecodeError) as e:
+        raise JavabinError(f"Response javabin không hợp lệ: {e}") from e
+
+
+# --- Encoder (dùng cho solr_stub_server.py) ---
+
+class NamedList(list):
+    """List phẳng [k1, v1, ...] được encode thành NAMED_LST thay vì ARR"""
+
+
+class SolrDocumentList(dict):
+    """Dict {"numFound", "start", "docs"} được encode thành SOLRDOCLST"""
+
+
+class JavabinEncoder:
+    def __init__(self):
+        self.out = bytearray([VERSION])
+        self.strings: Dict[str, int] = {}
+
+    def _tag(self, tag: int, size: int):
+        if size < 0x1F:
+            self.out.append(tag | size)
+        else:
+            self.out.append(tag | 0x1F)
+            self._vint(size - 0x1F)
+
+    def _vint(self, value: int):
+        while value & ~0x7F:
+            self.out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self.out.append(value)
+
+    def _str(self, value: str):
+        encoded = value.encode("utf-8")
+        self._tag(STR, len(encoded))
+        self.out += encoded
+
+    def _extern_str(self, value: str):
+        idx = self.strings.get(value)
+        if idx is not None:
+            self._tag(EXTERN_STRING, idx)
+            return
+        self._tag(EXTERN_STRING, 0)
+        self._str(value)
+        self.strings[value] = len(self.strings) + 1
+
+    def _int(self, value: int):
+        if 0 < value < (1 << 31):
+            if value >= 0x0F:
+                self.out.append(SINT | (value & 0x0F) | 0x10)
+                self._vint(value >> 4)
+            else:
+                self.out.append(SINT | value)
+        elif -(1 << 31) <= value < (1 << 31):
+            self.out.append(INT)
+            self.out += _INT.pack(value)
+        elif 0 <= value < (1 << 56):
+            if value >= 0x0F:
+                self.out.append(SLONG | (value & 0x0F) | 0x10)
+                self._vint(value >> 4)
+            else:
+                self.out.append(SLONG | value)
+        else:
+            self.out.append(LONG)
+            self.out += _LONG.pack(value)
+
+    def write(self, value: Any):
+        if value is None:
+            self.out.append(NULL)
+        elif value is True:
+            self.out.append(BOOL_TRUE)
+        elif value is False:
+            self.out.append(BOOL_FALSE)
+        elif isinstance(value, int):
+            self._int(value)
+        elif isinstance(value, float):
+            self.out.append(DOUBLE)
+            self.out += _DOUBLE.pack(value)
+        elif isinstance(value, str):
+            self._str(value)
+        elif isinstance(value, SolrDocumentList):
+            self.out.append(SOLRDOCLST)
+            self.write([value.get("numFound", 0), value.get("start", 0), value.get("maxScore"),
+                        value.get("numFoundExact", True)])
+            docs = value.get("docs", [])
+            self._tag(ARR, len(docs))
+            for doc in docs:
+                self.out.append(SOLRDOC)
+                self._tag(ORDERED_MAP, len(doc))
+                for key, item in doc.items():
+                    self._extern_str(key)
+                    self.write(item)
+        elif isinstance(value, NamedList):
+            self._tag(NAMED_LST, len(value) // 2)
+            for i in range(0, len(value), 2):
+                self._extern_str(value[i])
+                self.write(value[i + 1])
+        elif isinstance(value, dict):
+            self._tag(ORDERED_MAP, len(value))
+            for key, item in value.items():
+                self._extern_str(str(key))
+                self.write(item)
+        elif isinstance(value, (list, tuple)):
+            self._tag(ARR, len(value))
+            for item in value:
+                self.write(item)
+        elif isinstance(value, (bytes, bytearray)):
+            self.out.append(BYTEARR)
+            self._vint(len(value))
+            self.out += value
+        else:
+            self._str(str(value))
+
+
+def encode(value: Any) -> bytes:
+    encoder = JavabinEncoder()
+    encoder.write(value)
+    return bytes(encoder.out)
+
+
+# --- Query helper ---
+
+_json_only_urls = set()
+_json_only_lock = threading.Lock()
+
+
+def _base_url(url: str) -> str:
+    return url.rsplit("/", 1)[0]
+
+
+def solr_get(session: Any, url: str, params: Dict[str, Any], timeout: float = 30,
+             compact: bool = False, javabin: Optional[bool] = None, **kwargs) -> Dict[str, Any]:
+    """
+    GET tới Solr với wt=javabin (nếu bật, mặc định theo SOLR_WT) và fallback về wt=json
+
+    Chỉ khi response 2xx không phải javabin (proxy, server không hỗ trợ) mới ghi nhớ để các
+    request sau tới cùng core dùng thẳng JSON. Lỗi HTTP (kể cả trang lỗi HTML của proxy) được
+    raise cho lớp retry; javabin decode lỗi thì chỉ request này đọc lại bằng JSON.
+    """
+    http = session or requests
+    base = _base_url(url)
+    if javabin is None:
+        javabin = DEFAULT_WT == "javabin"
+    if javabin and base not in _json_only_urls:
+        query = dict(params)
+        query["wt"] = "javabin"
+        query.pop("indent", None)
+        with span("http"):
+            response = http.get(url, params=query, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        if response.headers.get("Content-Type", "").startswith(JAVABIN_CONTENT_TYPE):
+            try:
+                with span("decode.javabin"):
+                    return decode(response.content, compact)
+            except JavabinError:
+                pass
+        else:
+            with _json_only_lock:
+                _json_only_urls.add(base)
+
+    query = dict(params)
+    query["wt"] = "json"
+    query.pop("indent", None)
+    with span("http"):
+        response = http.get(url, params=query, timeout=timeout, **kwargs)
+    response.raise_for_status()
+    with span("decode.json"):
+        return response.json()
+
+
+def main():
+    # Set UTF-8 encoding cho Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    url = sys.argv[1]
+    params = dict(arg.split("=", 1) for arg in sys.argv[2:])
+    repeat = 20
+
+    session = requests.Session()
+    json_response = session.get(url, params=dict(params, wt="json"), timeout=60)
+    bin_response = session.get(url, params=dict(params, wt="javabin"), timeout=60)
+    json_response.raise_for_status()
+    bin_response.raise_for_status()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        json_data = json_response.json()
+    json_ms = (time.perf_counter() - start) * 1000 / repeat
+    timings = {}
+    for compact in (False, True):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            decode(bin_response.content, compact)
+        timings[compact] = (time.perf_counter() - start) * 1000 / repeat
+    same = decode(bin_response.content).get("response") == json_data.get("response")
+
+    print("━" * 70)
+    print(f"📦 JSON:    {len(json_response.content):>10,} bytes, decode {json_ms:.2f}ms")
+    print(f"📦 javabin: {len(bin_response.content):>10,} bytes, decode {timings[False]:.2f}ms "
+          f"(compact {timings[True]:.2f}ms)")
+    print(f"   {'✅' if same else '❌'} response giống nhau")
+    print("━" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,676 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP server giả lập Solr để benchmark/test các script mà không cần Docker
+- Dữ liệu lấy từ file JSONL/JSON fixture (ví dụ exported_data.jsonl)
+- Hỗ trợ phần API mà các script trong repo dùng:
+    /select, /query: q, fq (id:, field:value, range, {!terms}), fl, rows, start,
+                     sort=id asc/desc, cursorMark, facet.field (limit/offset/mincount/sort),
+                     facet.range (field ngày, gap +N HOUR/DAY/MINUTE),
+                     json.facet (type=terms, có thể lồng nhau), wt=json|javabin
+    /update: JSON array, {"add": ...}, {"delete": ...}, commit
+    /analysis/field, /admin/ping, /admin/cores?action=STATUS|RELOAD
+    /admin/mbeans?cat=CACHE: filterCache, queryResultCache, documentCache, fieldValueCache (LRU giả lập)
+    /admin/luke (fl, numTerms), /admin/segments: kích thước index ước lượng từ JSON của documents
+- Text fields được tokenize đơn giản (analysis.py: lowercase + tách từ), không phải VnCoreNLP
+- Có thể cấu hình latency và tỉ lệ lỗi để đo các tính năng phía client một cách ổn định
+
+Cách sử dụng:
+    python solr_stub_server.py <fixture_file> [options]
+
+Ví dụ:
+    # Giả lập 3 containers như docker-compose.yml
+    python solr_stub_server.py exported_data.jsonl --port 8983 --port 8984 --port 8985
+    python solr_stub_server.py exported_data.jsonl --port 8983 --latency-ms 20 --jitter-ms 10 --error-rate 0.05
+"""
+
+import argparse
+import base64
+import bisect
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from analysis import COPY_FIELDS, TEXT_FIELDS, TOKEN_RE, as_list, field_terms, tokenize
+from json_stream import DocumentReader
+from solr_javabin import NamedList, SolrDocumentList, encode as javabin_encode
+
+DATE_MATH_RE = re.compile(r"^NOW(?:([+-])(\d+)(DAY|DAYS|HOUR|HOURS|MINUTE|MINUTES))?(?:/(DAY|HOUR))?$")
+RANGE_RE = re.compile(r"^([\[{])\s*(\S+)\s+TO\s+(\S+)\s*([\]}])$")
+GAP_RE = re.compile(r"^\+(\d+)(DAY|DAYS|HOUR|HOURS|MINUTE|MINUTES)$")
+TERMS_RE = re.compile(r"^\{!terms\s+f=(\w+)(?:\s+separator=(\S))?\}(.*)$", re.DOTALL)
+
+
+def parse_date_math(value: str) -> str:
+    """Hỗ trợ NOW, NOW-7DAYS, NOW/DAY... trả về chuỗi ISO để so sánh"""
+    match = DATE_MATH_RE.match(value)
+    if not match:
+        return value
+    now = datetime.now(timezone.utc)
+    sign, amount, unit, round_unit = match.groups()
+    if amount:
+        unit = unit.rstrip('S').lower() + 's'
+        delta = timedelta(**{unit: int(amount)})
+        now = now + delta if sign == '+' else now - delta
+    if round_unit == 'DAY':
+        now = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif round_unit == 'HOUR':
+        now = now.replace(minute=0, second=0, microsecond=0)
+    return now.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def compare_values(a: Any, b: str) -> int:
+    """So sánh giá trị field với biên của range (số hoặc chuỗi/ngày)"""
+    try:
+        x, y = float(a), float(b)
+    except (TypeError, ValueError):
+        x, y = str(a), parse_date_math(b)
+    return (x > y) - (x < y)
+
+
+def make_filter(query: str):
+    """Chuyển một query (q hoặc fq) thành hàm filter trên document"""
+    query = query.strip()
+    if query in ('*:*', ''):
+        return lambda doc: True
+
+    match = TERMS_RE.match(query)
+    if match:
+        field, separator, values = match.groups()
+        wanted = set(values.split(separator or ','))
+        return lambda doc: any(str(v) in wanted for v in as_list(doc.get(field)))
+
+    clauses = [c for c in re.split(r'\s+AND\s+', query) if c]
+    if len(clauses) > 1:
+        filters = [make_filter(c) for c in clauses]
+        return lambda doc: all(f(doc) for f in filters)
+
+    negate = query.startswith('-')
+    if negate:
+        query = query[1:]
+    field, _, value = query.partition(':')
+    value = value.strip()
+
+    range_match = RANGE_RE.match(value)
+    if range_match:
+        left, low, high, right = range_match.groups()
+
+        def in_range(doc):
+            for v in as_list(doc.get(field)):
+                if low != '*':
+                    c = compare_values(v, low)
+                    if c < 0 or (c == 0 and left == '{'):
+                        continue
+                if high != '*':
+                    c = compare_values(v, high)
+                    if c > 0 or (c == 0 and right == '}'):
+                        continue
+                return True
+            return False
+        check = in_range
+    elif value == '*':
+        check = lambda doc: doc.get(field) not in (None, [], '')
+    else:
+        value = value.strip('"').replace('\\', '')
+        if field in TEXT_FIELDS or field in COPY_FIELDS:
+            tokens = set(tokenize(value))
+            check = lambda doc: tokens <= field_terms(doc, field)
+        else:
+            check = lambda doc: any(str(v).lower() == value.lower() if isinstance(v, bool) else str(v) == value
+                                    for v in as_list(doc.get(field)))
+    if negate:
+        return lambda doc: not check(doc)
+    return check
+
+
+def encode_cursor(last_id: str) -> str:
+    return "AoE" + base64.urlsafe_b64encode(last_id.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Optional[str]:
+    if cursor == '*':
+        return None
+    return base64.urlsafe_b64decode(cursor[3:].encode('ascii')).decode('utf-8')
+
+
+class SolrError(Exception):
+    def __init__(self, code: int, msg: str):
+        super().__init__(msg)
+        self.code = code
+        self.msg = msg
+
+
+class StubCache:
+    """LRU cache chỉ để đếm lookups/hits/evictions giống SolrCache (không lưu giá trị)"""
+
+    COUNTERS = ("lookups", "hits", "inserts", "evictions")
+
+    def __init__(self, name: str, max_size: int):
+        self.name = name
+        self.max_size = max_size
+        self.entries: "OrderedDict[Any, bool]" = OrderedDict()
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+        self.cumulative = dict.fromkeys(self.COUNTERS, 0)
+
+    def lookup(self, key: Any) -> bool:
+        self._add("lookups")
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self._add("hits")
+            return True
+        self.entries[key] = True
+        self._add("inserts")
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self._add("evictions")
+        return False
+
+    def _add(self, counter: str):
+        self.counts[counter] += 1
+        self.cumulative[counter] += 1
+
+    def new_searcher(self):
+        """Searcher mới: cache rỗng, counters không tích lũy được reset"""
+        self.entries.clear()
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        prefix = f"CACHE.searcher.{self.name}"
+        lookups = self.counts["lookups"]
+        result = {f"{prefix}.{k}": v for k, v in self.counts.items()}
+        result.update({f"{prefix}.cumulative_{k}": v for k, v in self.cumulative.items()})
+        result[f"{prefix}.hitratio"] = self.counts["hits"] / lookups if lookups else 0.0
+        result[f"{prefix}.size"] = len(self.entries)
+        result[f"{prefix}.maxSize"] = self.max_size
+        result[f"{prefix}.warmupTime"] = 0
+        return result
+
+
+class StubCore:
+    """Một core giả lập, dữ liệu lưu trong dict id -> document"""
+
+    def __init__(self, name: str, docs: Iterable[Dict[str, Any]]):
+        self.name = name
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        for doc in docs:
+            if 'id' in doc:
+                self.docs[str(doc['id'])] = doc
+        self._sorted_ids: Optional[List[str]] = None
+        self.lock = threading.Lock()
+        self.start_time = datetime.now(timezone.utc)
+        self.reload()
+
+    def reload(self):
+        """Giống Core Admin RELOAD: caches mới, counters về 0"""
+        self.caches = {name: StubCache(name, size) for name, size in (
+            ("filterCache", 512), ("queryResultCache", 512), ("documentCache", 512), ("fieldValueCache", 16))}
+
+    def sorted_ids(self) -> List[str]:
+        with self.lock:
+            if self._sorted_ids is None:
+                self._sorted_ids = sorted(self.docs)
+            return self._sorted_ids
+
+    def _candidate_ids(self, filters_src: List[str]) -> List[str]:
+        # Fast path: fq=id:xxx tra cứu trực tiếp
+        for src in filters_src:
+            field, _, value = src.partition(':')
+            if field == 'id' and value and not value.startswith(('[', '{', '*')) and ' ' not in value:
+                doc_id = value.strip('"').replace('\\', '')
+                return [doc_id] if doc_id in self.docs else []
+        return self.sorted_ids()
+
+    def search(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        q = params.get('q', ['*:*'])[0]
+        fqs = params.get('fq', [])
+        filters = [make_filter(q)] + [make_filter(fq) for fq in fqs]
+        rows = int(params.get('rows', ['10'])[0])
+        start = int(params.get('start', ['0'])[0])
+        sort = params.get('sort', [''])[0].strip()
+        cursor = params.get('cursorMark', [None])[0]
+        fl = params.get('fl', ['*'])[0]
+
+        if cursor is not None and not sort.startswith('id '):
+            raise SolrError(400, "Cursor functionality requires a sort containing a uniqueKey field tie breaker")
+        if cursor is not None and start:
+            raise SolrError(400, "Cursor functionality requires start=0")
+
+        with self.lock:
+            for fq in fqs:
+                self.caches["filterCache"].lookup(fq)
+            if cursor is None:
+                self.caches["queryResultCache"].lookup((q, tuple(fqs), sort, start // 50))
+            for field in params.get('facet.field', []) if params.get('facet', ['false'])[0] == 'true' else []:
+                self.caches["fieldValueCache"].lookup(field)
+        matched = [doc_id for doc_id in self._candidate_ids([q] + fqs)
+                   if all(f(self.docs[doc_id]) for f in filters)]
+        if sort == 'id desc':
+            matched.reverse()
+
+        result: Dict[str, Any] = {}
+        if cursor is not None:
+            last_id = decode_cursor(cursor)
+            if last_id is not None:
+                if sort == 'id desc':
+                    page_ids = [i for i in matched if i < last_id][:rows]
+                else:
+                    page_ids = [i for i in matched if i > last_id][:rows]
+            else:
+                page_ids = matched[:rows]
+            result['nextCursorMark'] = encode_cursor(page_ids[-1]) if page_ids else cursor
+        else:
+            page_ids = matched[start:start + rows]
+
+        fields = [f.strip() for f in fl.split(',') if f.strip()]
+        docs = [self._project(self.docs[i], fields) for i in page_ids]
+        with self.lock:
+            for doc_id in page_ids:
+                self.caches["documentCache"].lookup(doc_id)
+        result['response'] = {"numFound": len(matched), "start": start, "numFoundExact": True, "docs": docs}
+
+        if params.get('facet', ['false'])[0] == 'true':
+            result['facet_counts'] = {
+                "facet_queries": {},
+                "facet_fields": {f: self._facet(matched, f, params) for f in params.get('facet.field', [])},
+                "facet_ranges": {f: self._facet_range(matched, f, params) for f in params.get('facet.range', [])},
+                "facet_intervals": {}, "facet_heatmaps": {}
+            }
+        if 'json.facet' in params:
+            result['facets'] = self._json_facets(matched, json.loads(params['json.facet'][0]))
+        return result
+
+    @staticmethod
+    def _project(doc: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+        if not fields or '*' in fields:
+            return dict(doc)
+        return {f: doc[f] for f in fields if f in doc}
+
+    def _term_counts(self, ids: List[str], field: str, limit: int, offset: int,
+                     mincount: int, sort: str) -> List[Any]:
+        counts: Dict[str, int] = {}
+        for doc_id in ids:
+            for term in field_terms(self.docs[doc_id], field):
+                counts[term] = counts.get(term, 0) + 1
+        items = [(t, c) for t, c in counts.items() if c >= max(mincount, 1)]
+        if sort == 'index':
+            items.sort(key=lambda x: x[0])
+        else:
+            items.sort(key=lambda x: (-x[1], x[0]))
+        return items[offset:] if limit < 0 else items[offset:offset + limit]
+
+    def _facet(self, ids: List[str], field: str, params: Dict[str, List[str]]) -> List[Any]:
+        def param(name, default):
+            return params.get(f"f.{field}.{name}", params.get(name, [default]))[0]
+
+        limit = int(param('facet.limit', '100'))
+        offset = int(param('facet.offset', '0'))
+        mincount = int(param('facet.mincount', '0'))
+        sort = param('facet.sort', 'count' if limit > 0 else 'index')
+
+        flat: List[Any] = []
+        for term, count in self._term_counts(ids, field, limit, offset, mincount, sort):
+            flat.extend((term, count))
+        return flat
+
+    def _facet_range(self, ids: List[str], field: str, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        """facet.range trên field ngày: đếm documents trong từng khoảng [start, start + gap)"""
+        def param(name, default=None):
+            return params.get(f"f.{field}.{name}", params.get(name, [default]))[0]
+
+        start_text, end_text, gap = param('facet.range.start'), param('facet.range.end'), param('facet.range.gap')
+        match = GAP_RE.match(gap or '')
+        if not start_text or not end_text or not match:
+            raise SolrError(400, f"Missing or unsupported facet.range params for field {field}")
+        unit = match.group(2).rstrip('S').lower() + 's'
+        step = timedelta(**{unit: int(match.group(1))})
+        mincount = int(param('facet.mincount', '0'))
+        fmt = '%Y-%m-%dT%H:%M:%SZ'
+        start = datetime.strptime(parse_date_math(start_text), fmt)
+        end = datetime.strptime(parse_date_math(end_text), fmt)
+
+        boundaries = []
+        cursor = start
+        while cursor < end:
+            boundaries.append(cursor.strftime(fmt))
+            cursor += step
+        counts = [0] * len(boundaries)
+        end_iso = end.strftime(fmt)
+        for doc_id in ids:
+            for value in as_list(self.docs[doc_id].get(field)):
+                value = str(value)[:19] + 'Z'
+                if boundaries and boundaries[0] <= value < end_iso:
+                    index = bisect.bisect_right(boundaries, value) - 1
+                    counts[index] += 1
+        flat: List[Any] = []
+        for boundary, count in zip(boundaries, counts):
+            if count >= mincount:
+                flat.extend((boundary, count))
+        return {"counts": flat, "gap": gap, "start": start.strftime(fmt), "end": cursor.strftime(fmt)}
+
+    def _json_facets(self, ids: List[str], spec: Dict[str, Any]) -> Dict[str, Any]:
+        """JSON Facet API: chỉ hỗ trợ type=terms (kể cả facet lồng nhau)"""
+        result: Dict[str, Any] = {"count": len(ids)}
+        for name, facet in spec.items():
+            if isinstance(facet, str):
+                raise SolrError(400, f"Unsupported facet (stub): {name}={facet}")
+            if facet.get('type', 'terms') != 'terms' or 'field' not in facet:
+                raise SolrError(400, f"Only terms facets are supported (stub): {name}")
+            sort = facet.get('sort', 'count desc')
+            if isinstance(sort, dict):
+                sort = ' '.join(next(iter(sort.items())))
+            by_index = sort.split()[0] == 'index'
+            items = self._term_counts(ids, facet['field'], int(facet.get('limit', 10)),
+                                      int(facet.get('offset', 0)), int(facet.get('mincount', 1)),
+                                      'index' if by_index else 'count')
+            if by_index and sort.endswith('desc'):
+                items.reverse()
+            buckets = []
+            for term, count in items:
+                bucket: Dict[str, Any] = {"val": term, "count": count}
+                if facet.get('facet'):
+                    sub_ids = [i for i in ids if term in field_terms(self.docs[i], facet['field'])]
+                    sub = self._json_facets(sub_ids, facet['facet'])
+                    sub.pop('count')
+                    bucket.update(sub)
+                buckets.append(bucket)
+            result[name] = {"buckets": buckets}
+        return result
+
+    def update(self, body: Any, params: Dict[str, List[str]]) -> None:
+        commands = body if isinstance(body, dict) else {"add": body}
+        with self.lock:
+            for key, value in commands.items():
+                if key == 'add':
+                    items = value if isinstance(value, list) else [value]
+                    for item in items:
+                        doc = item.get('doc', item) if isinstance(item, dict) and 'doc' in item else item
+                        if not isinstance(doc, dict) or 'id' not in doc:
+                            raise SolrError(400, "Document is missing mandatory uniqueKey field: id")
+                        self.docs[str(doc['id'])] = doc
+                elif key == 'delete':
+                    items = value if isinstance(value, list) else [value]
+                    for item in items:
+                        if isinstance(item, dict) and 'query' in item:
+                            check = make_filter(item['query'])
+                            for doc_id in [i for i, d in self.docs.items() if check(d)]:
+                                del self.docs[doc_id]
+                        else:
+                            doc_id = item.get('id') if isinstance(item, dict) else item
+                            self.docs.pop(str(doc_id), None)
+                elif key not in ('commit', 'optimize'):
+                    raise SolrError(400, f"Unknown command '{key}'")
+            self._sorted_ids = None
+            for cache in self.caches.values():
+                cache.new_searcher()
+
+    def mbeans(self) -> Dict[str, Any]:
+        with self.lock:
+            caches = {name: {"class": "stub.LRUCache", "stats": cache.stats()}
+                      for name, cache in self.caches.items()}
+        return {"solr-mbeans": ["CACHE", caches]}
+
+    def analyze(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        field = params.get('analysis.fieldname', [''])[0]
+        value = params.get('analysis.fieldvalue', [''])[0]
+        tokens = []
+        position = 0
+        for match in TOKEN_RE.finditer(value.lower()):
+            position += 1
+            tokens.append({"text": match.group(), "raw_bytes": "", "start": match.start(),
+                           "end": match.end(), "position": position, "type": "word"})
+        return {"analysis": {"field_types": {}, "field_names": {
+            field: {"index": ["stub.StandardTokenizer", tokens]}}}}
+
+    def _index_size(self) -> int:
+        """Kích thước index giả lập: số bytes JSON của các documents"""
+        return sum(len(json.dumps(doc, ensure_ascii=False).encode('utf-8')) for doc in self.docs.values())
+
+    def luke(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        fl = [f.strip() for f in params.get('fl', [''])[0].split(',') if f.strip()]
+        num_terms = int(params.get('numTerms', ['10'])[0])
+        with self.lock:
+            docs = list(self.docs.values())
+        fields = {}
+        for field in fl:
+            counts: Dict[str, int] = {}
+            with_field = 0
+            for doc in docs:
+                terms = field_terms(doc, field)
+                with_field += bool(terms)
+                for term in terms:
+                    counts[term] = counts.get(term, 0) + 1
+            info: Dict[str, Any] = {"type": "text_cloud" if field in COPY_FIELDS else "string",
+                                    "schema": "I-M-----OF-----", "docs": with_field}
+            if num_terms > 0:
+                info["distinct"] = len(counts)
+                top = sorted(counts.items(), key=lambda x: (-x[1], x[0]))[:num_terms]
+                info["topTerms"] = [v for item in top for v in item]
+            fields[field] = info
+        return {"index": {"numDocs": len(docs), "maxDoc": len(docs), "deletedDocs": 0,
+                          "segmentCount": 1, "current": True, "hasDeletions": False,
+                          "indexHeapUsageBytes": len(docs) * 64},
+                "fields": fields}
+
+    def segments(self) -> Dict[str, Any]:
+        size = self._index_size()
+        return {"segments": {"_0": {"name": "_0", "delCount": 0, "softDelCount": 0, "sizeInBytes": size,
+                                    "size": len(self.docs), "age": self.start_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                                    "source": "flush", "version": "9.0.0", "mergeCandidate": False}}}
+
+    def status(self) -> Dict[str, Any]:
+        size = self._index_size()
+        return {
+            "name": self.name,
+            "instanceDir": f"/var/solr/data/{self.name}",
+            "startTime": self.start_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "uptime": int((datetime.now(timezone.utc) - self.start_time).total_seconds() * 1000),
+            "index": {"numDocs": len(self.docs), "maxDoc": len(self.docs), "deletedDocs": 0,
+                      "segmentCount": 1, "current": True, "hasDeletions": False,
+                      "sizeInBytes": size, "size": f"{size / 1024:.2f} KB"}
+        }
+
+
+class StubSolrServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, fixture: List[Dict[str, Any]], options):
+        super().__init__(address, StubSolrHandler)
+        self.fixture = fixture
+        self.options = options
+        self.cores: Dict[str, StubCore] = {}
+        self.cores_lock = threading.Lock()
+        self.rng = random.Random(options.seed + address[1] if options.seed is not None else None)
+        self.requests_served = 0
+
+    def get_core(self, name: str) -> StubCore:
+        with self.cores_lock:
+            core = self.cores.get(name)
+            if core is None:
+                core = StubCore(name, (dict(doc) for doc in self.fixture))
+                self.cores[name] = core
+            return core
+
+
+def to_javabin_types(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Đánh dấu các phần là SolrDocumentList/NamedList giống response thật của Solr"""
+    payload = dict(payload)
+    if isinstance(payload.get('response'), dict):
+        payload['response'] = SolrDocumentList(payload['response'])
+    facet_counts = payload.get('facet_counts')
+    if facet_counts:
+        facet_counts = dict(facet_counts)
+        facet_counts['facet_fields'] = {f: NamedList(v) for f, v in facet_counts['facet_fields'].items()}
+        payload['facet_counts'] = facet_counts
+    return payload
+
+
+class StubSolrHandler(BaseHTTPRequestHandler):
+    server: StubSolrServer
+    protocol_version = 'HTTP/1.1'
+    # Header và body được ghi riêng: tắt Nagle để keep-alive không bị trễ ~40ms do delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.options.verbose:
+            super().log_message(format, *args)
+
+    def _params(self, body: bytes) -> Dict[str, List[str]]:
+        params = parse_qs(urlparse(self.path).query, keep_blank_values=True)
+        content_type = self.headers.get('Content-Type', '')
+        if body and content_type.startswith('application/x-www-form-urlencoded'):
+            for key, values in parse_qs(body.decode('utf-8'), keep_blank_values=True).items():
+                params.setdefault(key, []).extend(values)
+        return params
+
+    def _send(self, code: int, payload: Dict[str, Any], qtime: int = 0):
+        payload = {"responseHeader": {"status": 0 if code == 200 else code, "QTime": qtime}, **payload}
+        if code != 200:
+            payload["error"] = {"msg": payload.pop("msg", ""), "code": code}
+        if getattr(self, 'wt', 'json') == 'javabin':
+            body = javabin_encode(to_javabin_types(payload))
+            content_type = 'application/octet-stream'
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json;charset=utf-8'
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_faults(self) -> bool:
+        """Latency và lỗi giả lập, trả về True nếu request này bị lỗi"""
+        options = self.server.options
+        delay = options.latency_ms
+        if options.jitter_ms:
+            delay += self.server.rng.uniform(0, options.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if options.error_rate and self.server.rng.random() < options.error_rate:
+            self._send(503, {"msg": "Injected error"})
+            return True
+        return False
+
+    def do_GET(self):
+        self._handle(b'')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0) or 0)
+        self._handle(self.rfile.read(length) if length else b'')
+
+    def _handle(self, body: bytes):
+        self.server.requests_served += 1
+        if self._inject_faults():
+            return
+        start = time.perf_counter()
+        parts = [p for p in urlparse(self.path).path.split('/') if p]
+        if parts[:1] == ['solr']:
+            parts = parts[1:]
+        params = self._params(body)
+        self.wt = params.get('wt', ['json'])[0]
+
+        try:
+            payload = self._dispatch(parts, params, body)
+        except SolrError as e:
+            self._send(e.code, {"msg": e.msg})
+            return
+        except (ValueError, KeyError) as e:
+            self._send(400, {"msg": f"{type(e).__name__}: {e}"})
+            return
+        if payload is None:
+            self._send(404, {"msg": f"Not found: {self.path}"})
+            return
+        self._send(200, payload, int((time.perf_counter() - start) * 1000))
+
+    def _dispatch(self, parts: List[str], params: Dict[str, List[str]], body: bytes) -> Optional[Dict[str, Any]]:
+        if parts == ['admin', 'ping']:
+            return {"status": "OK"}
+        if parts == ['admin', 'cores']:
+            action = params.get('action', ['STATUS'])[0].upper()
+            if action == 'RELOAD':
+                self.server.get_core(params.get('core', [''])[0]).reload()
+                return {}
+            if action != 'STATUS':
+                return {}
+            names = params.get('core') or list(self.server.cores)
+            return {"initFailures": {},
+                    "status": {n: self.server.get_core(n).status() for n in names}}
+        if len(parts) < 2:
+            return None
+
+        core = self.server.get_core(parts[0])
+        handler = '/'.join(parts[1:])
+        if handler in ('select', 'query'):
+            return core.search(params)
+        if handler in ('update', 'update/json', 'update/json/docs'):
+            data = json.loads(body.decode('utf-8')) if body else {}
+            core.update(data, params)
+            return {}
+        if handler == 'admin/ping':
+            return {"status": "OK"}
+        if handler == 'admin/mbeans':
+            return core.mbeans()
+        if handler == 'admin/luke':
+            return core.luke(params)
+        if handler == 'admin/segments':
+            return core.segments()
+        if handler == 'analysis/field':
+            return core.analyze(params)
+        return None
+
+
+def load_fixture(path: str) -> List[Dict[str, Any]]:
+    docs = []
+    for doc in DocumentReader(path):
+        doc.pop('_version_', None)
+        docs.append(doc)
+    return docs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server giả lập Solr từ file fixture")
+    parser.add_argument("fixture", help="File JSONL/JSON chứa documents")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, action="append", help="Port (có thể lặp lại, mặc định: 8983)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency cố định mỗi request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Latency ngẫu nhiên thêm [0, jitter]")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỉ lệ request trả về HTTP 503")
+    parser.add_argument("--seed", type=int, default=None, help="Seed cho latency/lỗi ngẫu nhiên")
+    parser.add_argument("--verbose", action="store_true", help="Log từng request")
+    args = parser.parse_args()
+
+    print(f"📖 Đang load fixture: {args.fixture}")
+    fixture = load_fixture(args.fixture)
+    print(f"   ✅ {len(fixture):,} documents")
+
+    servers = []
+    for port in args.port or [8983]:
+        server = StubSolrServer((args.host, port), fixture, args)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        servers.append(server)
+        print(f"🚀 Solr stub: http://{args.host}:{port}/solr")
+    if args.latency_ms or args.jitter_ms or args.error_rate:
+        print(f"   ⏱️  latency {args.latency_ms}ms + jitter {args.jitter_ms}ms, error rate {args.error_rate:.1%}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print()
+        for server in servers:
+            print(f"🛑 Port {server.server_address[1]}: {server.requests_served:,} requests")
+            server.shutdown()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Phân loại nguyên nhân khác biệt facet terms giữa hai analyzer (vd: VnCoreNLP 1.1.1 vs 1.2)
+Với mỗi document, các term chỉ có ở một bên được ghép cặp với term bên kia theo cấu trúc
+từ ghép (âm tiết nối bằng "_", từ cách nhau bởi dấu cách) và theo chuỗi con, rồi gắn nhãn:
+- split: từ ghép bên trái bị tách thành các term nhỏ hơn bên phải (hà_nội -> hà, nội)
+- merge: ngược lại, các term bên trái được gộp thành từ ghép bên phải
+- resegment: cùng âm tiết nhưng ranh giới từ khác (hồ_chí minh -> hồ chí_minh) hoặc chồng lấn
+- normalization: cùng term sau khi chuẩn hóa Unicode/vị trí dấu thanh/bỏ dấu (hoà -> hòa)
+- stopword: term là stopword chỉ ở một bên (cần --stopwords-left/right)
+- substring: term bên này là chuỗi con của term bên kia (mất/thêm âm tiết ở đầu/cuối)
+- other: không ghép được với term nào
+
+Phân loại chạy trên process pool theo từng lô documents, kết quả gộp thành số liệu toàn corpus
+(số term và số document theo nhãn, các cặp ví dụ hay gặp nhất).
+
+Nguồn dữ liệu:
+    - files: hai file terms JSONL (id + terms) từ `wordcloud_sketch.py extract --analyzer solr`
+      chạy trên hai port, join theo id (hai file cùng thứ tự export thì chỉ cần buffer nhỏ)
+    - solr: query lại facet theo id trên hai containers, id lấy từ file kết quả
+      compare_facet_results.py (all_differences) hoặc file danh sách id
+
+Cách sử dụng:
+    python tokenization_diff.py files terms_8983.jsonl terms_8984.jsonl [--output diffs.jsonl]
+    python tokenization_diff.py solr facet_comparison_results_*.json --left-port 8983 --right-port 8984
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from json_stream import DocumentReader
+from resilience import CircuitOpenError, RequestFailed
+from tracing import TRACER, add_profile_args, profiled, span
+
+CATEGORIES = ["split", "merge", "resegment", "normalization", "stopword", "substring", "other"]
+CHUNK_DOCS = 2000  # Số documents mỗi task gửi cho worker
+MAX_PAIRS_PER_DOC = 50  # Số cặp ghi ra file output cho mỗi document
+TOP_EXAMPLES = 20
+EXAMPLES_PER_CHUNK = 200  # Mỗi worker chỉ trả về các ví dụ hay gặp nhất của lô (gộp xấp xỉ)
+MAX_SUBSTRING_SCAN = 200  # Chỉ so khớp chuỗi con từng cặp khi số term khác biệt nhỏ
+
+SEPARATOR_RE = re.compile(r"[_\s]+")
+TONE_MARKS = {"̀", "́", "̃", "̉", "̣"}  # huyền, sắc, ngã, hỏi, nặng
+KEY_CACHE_SIZE = 1 << 18  # Từ vựng lặp lại nhiều giữa các documents nên cache key theo term
+
+Term = Tuple[Tuple[str, ...], ...]  # Các từ, mỗi từ là tuple âm tiết
+
+
+def parse_term(term: str) -> Term:
+    """'hồ_chí minh' -> (('hồ', 'chí'), ('minh',))"""
+    return tuple(tuple(s for s in word.split("_") if s) for word in term.split() if word.strip("_"))
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def syllables(term: str) -> Tuple[str, ...]:
+    return tuple(s for s in SEPARATOR_RE.split(term) if s)
+
+
+def boundaries(structure: Term) -> Set[int]:
+    """Vị trí (theo âm tiết) của ranh giới giữa các từ"""
+    result, pos = set(), 0
+    for word in structure[:-1]:
+        pos += len(word)
+        result.add(pos)
+    return result
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def tone_key(term: str) -> str:
+    """Chuẩn hóa Unicode + chữ thường + đưa dấu thanh về cuối âm tiết (hoà và hòa cùng key)"""
+    decomposed = unicodedata.normalize("NFD", term.casefold())
+    out, tones = [], []
+    for ch in decomposed + " ":
+        if ch in TONE_MARKS:
+            tones.append(ch)
+        elif ch in "_ " or ch.isspace():
+            out.extend(sorted(tones))
+            tones = []
+            out.append(ch)
+        else:
+            out.append(ch)
+    return unicodedata.normalize("NFC", "".join(out[:-1]))
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def fold_key(term: str) -> str:
+    """Bỏ toàn bộ dấu (giống ASCIIFoldingFilter), đ -> d"""
+    decomposed = unicodedata.normalize("NFD", term.casefold().replace("đ", "d"))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def contains(outer: Tuple[str, ...], inner: Tuple[str, ...]) -> bool:
+    n = len(inner)
+    return 0 < n < len(outer) and any(outer[i:i + n] == inner for i in range(len(outer) - n + 1))
+
+
+def overlaps(a: Tuple[str, ...], b: Tuple[str, ...]) -> bool:
+    """Hậu tố của a là tiền tố của b hoặc ngược lại (ranh giới từ bị dịch)"""
+    for n in range(1, min(len(a), len(b))):
+        if a[-n:] == b[:n] or b[-n:] == a[:n]:
+            return True
+    return False
+
+
+def covered_by(seq: Tuple[str, ...], pieces: Set[Tuple[str, ...]]) -> Optional[List[Tuple[str, ...]]]:
+    """Tách seq thành >= 2 đoạn liên tiếp, mỗi đoạn là một term của bên kia (DP), None nếu không được"""
+    n = len(seq)
+    if n < 2:
+        return None
+    best: List[Optional[List[Tuple[str, ...]]]] = [None] * (n + 1)
+    best[0] = []
+    for end in range(1, n + 1):
+        for start in range(end):
+            piece = seq[start:end]
+            if best[start] is not None and piece in pieces and (start > 0 or end < n):
+                best[end] = best[start] + [piece]
+                break
+    return best[n]
+
+
+def pair_relation(left: str, right: str) -> Optional[str]:
+    """Quan hệ giữa hai term khác nhau ở hai bên, None nếu không liên quan"""
+    left_syl, right_syl = syllables(left), syllables(right)
+    if left_syl == right_syl:
+        # Cùng âm tiết, khác ranh giới từ: thêm ranh giới là tách, bớt là gộp
+        left_b, right_b = boundaries(parse_term(left)), boundaries(parse_term(right))
+        if left_b < right_b:
+            return "split"
+        if right_b < left_b:
+            return "merge"
+        return "resegment" if left_b != right_b else "normalization"
+    if contains(left_syl, right_syl) or contains(right_syl, left_syl):
+        return "substring"
+    if overlaps(left_syl, right_syl):
+        return "resegment"
+    return None
+
+
+class DocDiff:
+    """Phân loại các term chỉ có ở một bên của một document"""
+
+    def __init__(self, left_terms: Set[str], right_terms: Set[str],
+                 stop_left: Set[str], stop_right: Set[str]):
+        self.left_all = left_terms
+        self.right_all = right_terms
+        self.left_only = sorted(left_terms - right_terms)
+        self.right_only = sorted(right_terms - left_terms)
+        self.stop_left = stop_left  # stopwords của analyzer bên trái (term bị mất ở bên trái)
+        self.stop_right = stop_right
+        self.categories = Counter()
+        self.pairs: List[Tuple[str, List[str], List[str]]] = []
+        self._explained: Set[Tuple[str, str]] = set()
+
+    def _record(self, category: str, left: List[str], right: List[str]):
+        """Ghi một cặp; term có ở cả hai bên chỉ để hiển thị (vd: các phần của từ bị tách), không được đếm"""
+        for term in left:
+            if term not in self.right_all and ("L", term) not in self._explained:
+                self._explained.add(("L", term))
+                self.categories[category] += 1
+        for term in right:
+            if term not in self.left_all and ("R", term) not in self._explained:
+                self._explained.add(("R", term))
+                self.categories[category] += 1
+        self.pairs.append((category, left, right))
+
+    @staticmethod
+    def _is_stopword(term: str, removed_by: Set[str], kept_by: Set[str]) -> bool:
+        """Cả term là stopword ở bên làm mất nó nhưng không phải ở bên còn giữ"""
+        return term in removed_by and term not in kept_by
+
+    def classify(self) -> "DocDiff":
+        # normalization: ghép theo key chuẩn hóa (chính xác trước, bỏ dấu sau), với mọi term
+        # của bên kia vì dạng chuẩn hóa có thể đã có sẵn ở cả hai bên
+        for key_fn in (tone_key, fold_key):
+            right_keys, left_keys = defaultdict(list), defaultdict(list)
+            for term in self.right_all:
+                right_keys[key_fn(term)].append(term)
+            for term in self.left_all:
+                left_keys[key_fn(term)].append(term)
+            for term in self.left_only:
+                partners = right_keys.get(key_fn(term))
+                if partners and ("L", term) not in self._explained:
+                    self._record("normalization", [term], sorted(partners))
+            for term in self.right_only:
+                partners = left_keys.get(key_fn(term))
+                if partners and ("R", term) not in self._explained:
+                    self._record("normalization", sorted(partners), [term])
+
+        # stopword: term bị loại ở một bên vì stopword list khác nhau
+        for term in self.left_only:
+            if ("L", term) not in self._explained and self._is_stopword(term, self.stop_right, self.stop_left):
+                self._record("stopword", [term], [])
+        for term in self.right_only:
+            if ("R", term) not in self._explained and self._is_stopword(term, self.stop_left, self.stop_right):
+                self._record("stopword", [], [term])
+
+        # split/merge: term được phủ kín bởi >= 2 term của bên kia
+        right_pieces = {syllables(t): t for t in self.right_all}
+        left_pieces = {syllables(t): t for t in self.left_all}
+        for term in self.left_only:
+            if ("L", term) in self._explained:
+                continue
+            cover = covered_by(syllables(term), set(right_pieces))
+            if cover:
+                parts = [right_pieces[p] for p in cover]
+                self._record("split", [term], parts)
+        for term in self.right_only:
+            if ("R", term) in self._explained:
+                continue
+            cover = covered_by(syllables(term), set(left_pieces))
+            if cover:
+                parts = [left_pieces[p] for p in cover]
+                self._record("merge", parts, [term])
+
+        # Ghép cặp theo âm tiết chung: split/merge/resegment/substring
+        index = defaultdict(set)
+        for term in self.right_only:
+            for syllable in syllables(term):
+                index[syllable].add(term)
+        priority = {"normalization": 0, "split": 0, "merge": 0, "substring": 1, "resegment": 2}
+        for term in self.left_only:
+            if ("L", term) in self._explained:
+                continue
+            candidates = set()
+            for syllable in syllables(term):
+                candidates |= index.get(syllable, set())
+            best = None
+            for candidate in sorted(candidates):
+                relation = pair_relation(term, candidate)
+                if relation and (best is None or priority[relation] < priority[best[0]]):
+                    best = (relation, candidate)
+            if best:
+                self._record(best[0], [term], [best[1]])
+
+        # substring ở mức ký tự (dấu câu, tiền tố/hậu tố không theo âm tiết)
+        left_rest = [t for t in self.left_only if ("L", t) not in self._explained]
+        right_rest = [t for t in self.right_only if ("R", t) not in self._explained]
+        if len(left_rest) * len(right_rest) <= MAX_SUBSTRING_SCAN * MAX_SUBSTRING_SCAN:
+            for term in left_rest:
+                for candidate in right_rest:
+                    if len(term) > 1 and len(candidate) > 1 and (term in candidate or candidate in term):
+                        self._record("substring", [term], [candidate])
+                        break
+
+        # Term bên phải chưa được giải thích nhưng có âm tiết chung với term bên trái đã ghép
+        left_index = defaultdict(set)
+        for term in self.left_only:
+            for syllable in syllables(term):
+                left_index[syllable].add(term)
+        for term in self.right_only:
+            if ("R", term) in self._explained:
+                continue
+            for candidate in sorted(set().union(*(left_index.get(s, set()) for s in syllables(term)))):
+                relation = pair_relation(candidate, term)
+                if relation:
+                    self._record(relation, [candidate], [term])
+                    break
+
+        for term in self.left_only:
+            if ("L", term) not in self._explained:
+                self._record("other", [term], [])
+        for term in self.right_only:
+            if ("R", term) not in self._explained:
+                self._record("other", [], [term])
+        return self
+
+
+def format_pair(category: str, left: List[str], right: List[str]) -> str:
+    return f"{' + '.join(left) or '∅'} -> {' + '.join(right) or '∅'}"
+
+
+# Stopword lists được gửi một lần cho mỗi worker qua initializer
+_STOP_LEFT: Set[str] = set()
+_STOP_RIGHT: Set[str] = set()
+
+
+def _init_worker(stop_left: Set[str], stop_right: Set[str]):
+    global _STOP_LEFT, _STOP_RIGHT
+    _STOP_LEFT, _STOP_RIGHT = stop_left, stop_right
+
+
+def classify_chunk(chunk: List[Tuple[str, List[str], List[str]]], keep_pairs: bool) -> Dict[str, Any]:
+    """Phân loại một lô documents (chạy trong worker process), trả về số liệu đã gộp của lô"""
+    start = time.perf_counter()
+    terms = Counter()
+    docs = Counter()
+    examples = {category: Counter() for category in CATEGORIES}
+    records = []
+    for doc_id, left_terms, right_terms in chunk:
+        diff = DocDiff(set(left_terms), set(right_terms), _STOP_LEFT, _STOP_RIGHT).classify()
+        terms.update(diff.categories)
+        docs.update(diff.categories.keys())
+        for category, left, right in diff.pairs:
+            examples[category][format_pair(category, left, right)] += 1
+        if keep_pairs:
+            records.append({"id": doc_id, "left_only": len(diff.left_only), "right_only": len(diff.right_only),
+                            "categories": dict(diff.categories),
+                            "pairs": [[c, l, r] for c, l, r in diff.pairs[:MAX_PAIRS_PER_DOC]]})
+    return {
+        "docs": len(chunk),
+        "terms": terms,
+        "doc_counts": docs,
+        "examples": {c: dict(counter.most_common(EXAMPLES_PER_CHUNK)) for c, counter in examples.items() if counter},
+        "records": records,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def load_stopwords(path: Optional[str]) -> Set[str]:
+    """File stopwords.txt của Solr: mỗi dòng một từ, bỏ comment #"""
+    if not path:
+        return set()
+    words = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            word = line.split('#', 1)[0].strip().casefold()
+            if word:
+                words.add(word)
+    return words
+
+
+def paired_documents(left_path: str, right_path: str, stats: Counter) -> Iterator[Tuple[str, List[str], List[str]]]:
+    """
+    Join hai file terms theo id: đọc song song, id lệch thì buffer đến khi gặp bên kia
+    (hai file extract từ cùng một file export có cùng thứ tự nên buffer gần như rỗng)
+    """
+    pending_left: Dict[str, List[str]] = {}
+    pending_right: Dict[str, List[str]] = {}
+    left_iter, right_iter = iter(DocumentReader(left_path)), iter(DocumentReader(right_path))
+    while True:
+        with span("read"):
+            left_doc = next(left_iter, None)
+            right_doc = next(right_iter, None)
+        if left_doc is None and right_doc is None:
+            break
+        for doc, own, other, side in ((left_doc, pending_left, pending_right, "left"),
+                                      (right_doc, pending_right, pending_left, "right")):
+            if doc is None:
+                continue
+            doc_id = str(doc.get("id"))
+            terms = doc.get("terms") or []
+            if doc_id in other:
+                other_terms = other.pop(doc_id)
+                yield (doc_id, terms, other_terms) if side == "left" else (doc_id, other_terms, terms)
+            else:
+                own[doc_id] = terms
+        stats["max_buffer"] = max(stats["max_buffer"], len(pending_left) + len(pending_right))
+    stats["only_left"] += len(pending_left)
+    stats["only_right"] += len(pending_right)
+
+
+def ids_from_file(path: str) -> List[str]:
+    """id từ file kết quả compare_facet_results.py (all_differences) hoặc file mỗi dòng một id"""
+    if path.endswith(".json"):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return [doc["id"] for doc in data.get("all_differences", [])]
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def solr_documents(ids: List[str], left_port: int, right_port: int, workers: int,
+                   stats: Counter) -> Iterator[Tuple[str, List[str], List[str]]]:
+    """Query facet theo id trên hai containers (có retry/circuit breaker của compare_facet_results)"""
+    from compare_facet_results import CONTAINERS, get_facet_results
+
+    cores = {c["port"]: c["core"] for c in CONTAINERS}
+
+    def fetch(doc_id):
+        # Terms bị cắt ở facet.limit sẽ bị phân loại sai, luôn lấy đủ bằng facet.offset
+        left, left_found = get_facet_results(left_port, cores[left_port], doc_id, exhaustive=True)
+        right, right_found = get_facet_results(right_port, cores[right_port], doc_id, exhaustive=True)
+        return doc_id, list(left), list(right), left_found and right_found
+
+    def collect(future):
+        try:
+            doc_id, left, right, found = future.result()
+        except (RequestFailed, CircuitOpenError) as e:
+            stats["errors"] += 1
+            print(f"   ❌ Query lỗi: {e}")
+            return None
+        if not found:
+            stats["not_found"] += 1
+            return None
+        return doc_id, left, right
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for doc_id in ids:
+            pending.append(pool.submit(fetch, doc_id))
+            if len(pending) >= workers * 2:
+                result = collect(pending.popleft())
+                if result:
+                    yield result
+        while pending:
+            result = collect(pending.popleft())
+            if result:
+                yield result
+
+
+def chunked(items: Iterable, size: int) -> Iterator[List]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def classify_corpus(documents: Iterable[Tuple[str, List[str], List[str]]], stop_left: Set[str],
+                    stop_right: Set[str], workers: int, chunk_docs: int,
+                    output: Optional[str]) -> Dict[str, Any]:
+    """Gửi các document có khác biệt cho process pool theo lô, gộp kết quả theo đúng thứ tự"""
+    totals = {"docs_compared": 0, "docs_different": 0, "terms": Counter(), "doc_counts": Counter(),
+              "examples": defaultdict(Counter)}
+    out = open(output, 'w', encoding='utf-8') if output else None
+    start = time.time()
+
+    def different_only():
+        for doc_id, left, right in documents:
+            totals["docs_compared"] += 1
+            if set(left) != set(right):
+                totals["docs_different"] += 1
+                yield doc_id, left, right
+
+    def merge(result):
+        TRACER.add("classify", result["seconds"])
+        totals["terms"].update(result["terms"])
+        totals["doc_counts"].update(result["doc_counts"])
+        for category, examples in result["examples"].items():
+            totals["examples"][category].update(examples)
+        if out:
+            with span("write"):
+                for record in result["records"]:
+                    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        elapsed = time.time() - start
+        print(f"   ✅ {totals['docs_different']:,} documents khác biệt / {totals['docs_compared']:,} "
+              f"({totals['docs_compared'] / elapsed if elapsed > 0 else 0:,.0f} docs/giây)")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(stop_left, stop_right)) as executor:
+            pending = deque()
+            for chunk in chunked(different_only(), chunk_docs):
+                pending.append(executor.submit(classify_chunk, chunk, out is not None))
+                if len(pending) >= workers * 2:
+                    with span("wait"):
+                        result = pending.popleft().result()
+                    merge(result)
+            while pending:
+                with span("wait"):
+                    result = pending.popleft().result()
+                merge(result)
+    finally:
+        if out:
+            out.close()
+    totals["elapsed_seconds"] = round(time.time() - start, 2)
+    return totals
+
+
+def print_report(totals: Dict[str, Any], left_label: str, right_label: str):
+    total_terms = sum(totals["terms"].values())
+    print("\n" + "━" * 70)
+    print(f"📊 NGUYÊN NHÂN KHÁC BIỆT: {left_label} -> {right_label}")
+    print("━" * 70)
+    print(f"   Documents so sánh: {totals['docs_compared']:,}, khác biệt: {totals['docs_different']:,}")
+    print(f"   Term khác biệt: {total_terms:,} trong {totals['elapsed_seconds']:.2f}s")
+    print()
+    print(f"   {'Nhãn':<15} {'Số term':>10} {'%':>7} {'Số docs':>10}")
+    for category in CATEGORIES:
+        count = totals["terms"].get(category, 0)
+        share = count * 100 / total_terms if total_terms else 0.0
+        print(f"   {category:<15} {count:>10,} {share:>6.1f}% {totals['doc_counts'].get(category, 0):>10,}")
+    for category in CATEGORIES:
+        examples = totals["examples"].get(category)
+        if not examples:
+            continue
+        print(f"\n   🔎 {category}:")
+        for pair, count in examples.most_common(5):
+            print(f"      {count:>6,}x  {pair}")
+
+
+def save_report(totals: Dict[str, Any], path: str, metadata: Dict[str, Any]):
+    report = {
+        "metadata": dict(metadata, timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                         elapsed_seconds=totals["elapsed_seconds"], trace=TRACER.snapshot()),
+        "docs_compared": totals["docs_compared"],
+        "docs_different": totals["docs_different"],
+        "term_counts": {c: totals["terms"].get(c, 0) for c in CATEGORIES},
+        "doc_counts": {c: totals["doc_counts"].get(c, 0) for c in CATEGORIES},
+        "top_examples": {c: totals["examples"][c].most_common(TOP_EXAMPLES)
+                         for c in CATEGORIES if totals["examples"].get(c)},
+    }
+    with span("report.json"), open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Kết quả đã lưu vào: {path}")
+
+
+def cmd_files(args):
+    print("━" * 70)
+    print(f"🔤 Phân loại khác biệt tokenization: {args.left_file} vs {args.right_file}")
+    print("━" * 70)
+    stats = Counter()
+    totals = classify_corpus(paired_documents(args.left_file, args.right_file, stats),
+                             load_stopwords(args.stopwords_left), load_stopwords(args.stopwords_right),
+                             args.workers, args.chunk_docs, args.output)
+    if stats["only_left"] or stats["only_right"]:
+        print(f"   ⚠️  id chỉ có ở một file: trái {stats['only_left']:,}, phải {stats['only_right']:,} "
+              f"(buffer tối đa {stats['max_buffer']:,})")
+    left_label, right_label = os.path.basename(args.left_file), os.path.basename(args.right_file)
+    print_report(totals, left_label, right_label)
+    return totals, {"left": args.left_file, "right": args.right_file, "only_left": stats["only_left"],
+                    "only_right": stats["only_right"]}
+
+
+def cmd_solr(args):
+    from compare_facet_results import CONTAINERS
+
+    versions = {c["port"]: c["version"] for c in CONTAINERS}
+    ids = ids_from_file(args.ids_file)
+    print("━" * 70)
+    print(f"🔤 Phân loại khác biệt tokenization: {versions.get(args.left_port, args.left_port)} vs "
+          f"{versions.get(args.right_port, args.right_port)} ({len(ids):,} ids)")
+    print("━" * 70)
+    stats = Counter()
+    totals = classify_corpus(solr_documents(ids, args.left_port, args.right_port, args.fetch_workers, stats),
+                             load_stopwords(args.stopwords_left), load_stopwords(args.stopwords_right),
+                             args.workers, args.chunk_docs, args.output)
+    if stats["errors"] or stats["not_found"]:
+        print(f"   ⚠️  Query lỗi: {stats['errors']:,}, không có ở một trong hai bên: {stats['not_found']:,}")
+    print_report(totals, versions.get(args.left_port, str(args.left_port)),
+                 versions.get(args.right_port, str(args.right_port)))
+    return totals, {"ids_file": args.ids_file, "left_port": args.left_port, "right_port": args.right_port,
+                    "query_errors": stats["errors"], "not_found": stats["not_found"]}
+
+
+def main():
+    # Set UTF-8 encoding cho Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="Phân loại nguyên nhân khác biệt facet terms giữa hai analyzer")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("files", help="So sánh hai file terms JSONL (id + terms)")
+    p.add_argument("left_file", help="File terms bên trái (vd: extract từ port 8983)")
+    p.add_argument("right_file", help="File terms bên phải (vd: extract từ port 8984)")
+    p.set_defaults(func=cmd_files)
+
+    p2 = sub.add_parser("solr", help="Query lại facet theo id trên hai containers")
+    p2.add_argument("ids_file", help="File kết quả compare_facet_results.py (.json) hoặc file danh sách id")
+    p2.add_argument("--left-port", type=int, default=8983)
+    p2.add_argument("--right-port", type=int, default=8984)
+    p2.add_argument("--fetch-workers", type=int, default=8, help="Số query Solr song song (mặc định: 8)")
+    p2.set_defaults(func=cmd_solr)
+
+    for p in (p, p2):
+        p.add_argument("--stopwords-left", help="stopwords.txt của analyzer bên trái")
+        p.add_argument("--stopwords-right", help="stopwords.txt của analyzer bên phải")
+        p.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                       help="Số worker processes (mặc định: số CPU)")
+        p.add_argument("--chunk-docs", type=int, default=CHUNK_DOCS, help=f"Số documents mỗi lô (mặc định: {CHUNK_DOCS})")
+        p.add_argument("--output", help="File JSONL ghi chi tiết từng document (các cặp term và nhãn)")
+        p.add_argument("--report", help="File JSON số liệu toàn corpus (mặc định tự đặt tên)")
+        add_profile_args(p)
+    args = parser.parse_args()
+
+    with profiled(args.profile, "tokenization_diff", args.profile_out):
+        totals, metadata = args.func(args)
+        report = args.report or f"tokenization_diff_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        save_report(totals, report, metadata)
+        TRACER.print_report()
+
+
+if __name__ == "__main__":
+    main()
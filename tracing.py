@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tracing theo phase + profiling dùng chung cho các script
+- span("http"): context manager/decorator ghi số lần, tổng/max thời gian theo tên phase
+  (http, decode.json, compare, report.excel, write...), thread-safe, chi phí ~1µs/span
+- In bảng phân bổ thời gian cuối mỗi lần chạy thay vì một con số "queries/giây" chung
+- --profile: ghi cProfile dump (.prof, xem bằng `python -m pstats` hoặc snakeviz)
+- --profile=folded: lấy mẫu stack mọi thread và ghi folded stacks (.folded),
+  dùng được với flamegraph.pl hoặc speedscope
+
+Lưu ý: cProfile chỉ đo thread gọi enable(); span và profile không bao gồm
+thời gian trong worker process (ProcessPoolExecutor) - script tự gộp số liệu trả về.
+
+Cách sử dụng:
+    from tracing import TRACER, span, profiled
+
+    with profiled("cprofile", "compare"):
+        with span("http"):
+            response = session.get(url)
+    TRACER.print_report()
+"""
+
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+PROFILE_MODES = ("cprofile", "folded")
+SAMPLE_INTERVAL = 0.005  # 200 mẫu/giây cho folded stacks
+
+
+class SpanStats:
+    """Số liệu cộng dồn của một phase"""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class Tracer:
+    """Registry span theo tên, đo bằng perf_counter"""
+
+    def __init__(self):
+        self.enabled = True
+        self.spans: Dict[str, SpanStats] = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float, count: int = 1):
+        """Cộng thời gian đo từ bên ngoài (vd: worker process trả về)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = SpanStats()
+            stats.count += count
+            stats.total += seconds
+            if seconds / max(count, 1) > stats.max:
+                stats.max = seconds / max(count, 1)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def traced(self, name: Optional[str] = None) -> Callable:
+        """Decorator: mỗi lần gọi hàm là một span (mặc định tên hàm)"""
+        def decorator(fn: Callable) -> Callable:
+            span_name = name or fn.__name__
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.started = time.perf_counter()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Số liệu dạng dict để lưu vào JSON"""
+        with self._lock:
+            return {name: {"count": s.count, "total_s": round(s.total, 4),
+                           "avg_ms": round(s.total * 1000 / s.count, 3) if s.count else 0.0,
+                           "max_ms": round(s.max * 1000, 3)}
+                    for name, s in sorted(self.spans.items(), key=lambda kv: -kv[1].total)}
+
+    def report_lines(self) -> List[str]:
+        """Bảng phân bổ thời gian, % tính trên wall time (span lồng nhau/song song có thể > 100%)"""
+        wall = time.perf_counter() - self.started
+        snapshot = self.snapshot()
+        if not snapshot:
+            return [f"(không có span nào, wall time {wall:.2f}s)"]
+        width = max(12, max(len(name) for name in snapshot))
+        lines = [f"{'Phase':<{width}} {'Số lần':>9} {'Tổng (s)':>10} {'% wall':>7} {'TB (ms)':>9} {'Max (ms)':>9}"]
+        for name, s in snapshot.items():
+            share = s["total_s"] * 100 / wall if wall > 0 else 0.0
+            lines.append(f"{name:<{width}} {s['count']:>9,} {s['total_s']:>10.3f} {share:>6.1f}% "
+                         f"{s['avg_ms']:>9.2f} {s['max_ms']:>9.2f}")
+        lines.append(f"Wall time: {wall:.2f}s")
+        return lines
+
+    def print_report(self, title: str = "THỜI GIAN THEO PHASE"):
+        print(f"\n{'━'*70}")
+        print(f"⏱️  {title}")
+        print(f"{'━'*70}")
+        for line in self.report_lines():
+            print(f"   {line}")
+
+
+TRACER = Tracer()
+span = TRACER.span
+traced = TRACER.traced
+
+
+class StackSampler(threading.Thread):
+    """Lấy mẫu stack của mọi thread định kỳ, gộp thành folded stacks (frame ngoài cùng trước)"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write(self, path: str) -> int:
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return sum(self.samples.values())
+
+
+def profile_path(name: str, mode: str) -> str:
+    ext = "prof" if mode == "cprofile" else "folded"
+    return f"profile_{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{ext}"
+
+
+@contextmanager
+def profiled(mode: Optional[str], name: str, output: Optional[str] = None) -> Iterator[None]:
+    """Bật profiler cho khối lệnh nếu mode là cprofile/folded, mode None thì không làm gì"""
+    if not mode:
+        yield
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"--profile chỉ nhận {'/'.join(PROFILE_MODES)}, không nhận '{mode}'")
+    path = output or profile_path(name, mode)
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+            print(f"\n🔥 cProfile: {path} (xem bằng: python -m pstats {path} hoặc snakeviz {path})")
+    else:
+        sampler = StackSampler()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            total = sampler.write(path)
+            print(f"\n🔥 Folded stacks: {path} ({total:,} mẫu, "
+                  f"flamegraph.pl {path} > flame.svg hoặc mở bằng speedscope)")
+
+
+def add_profile_args(parser):
+    """Thêm --profile[=cprofile|folded] và --profile-out cho script dùng argparse"""
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=PROFILE_MODES, default=None,
+                        help="Ghi cProfile dump (mặc định) hoặc folded stacks cho flame graph")
+    parser.add_argument("--profile-out", default=None, help="Đường dẫn file profile (mặc định tự đặt tên)")
+
+
+def pop_profile_arg(argv: List[str]) -> Tuple[Optional[str], List[str]]:
+    """Tách --profile / --profile=MODE khỏi argv cho script tự parse sys.argv"""
+    mode = None
+    rest = []
+    for arg in argv:
+        if arg == "--profile":
+            mode = "cprofile"
+        elif arg.startswith("--profile="):
+            mode = arg.split("=", 1)[1]
+            if mode not in PROFILE_MODES:
+                raise ValueError(f"--profile chỉ nhận {'/'.join(PROFILE_MODES)}, không nhận '{mode}'")
+        else:
+            rest.append(arg)
+    return mode, rest
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script để biến đổi documents của file export theo kiểu streaming
+- Đọc JSON array hoặc JSONL từng phần, không load cả file vào RAM
+- Các thao tác trên field: xóa (drop), đổi tên (rename), chỉ giữ lại (project)
+- Có thể chỉ giữ các field được index theo managed-schema
+- Ghi output theo batch, bộ nhớ tối đa một batch
+- In thời gian theo phase (read+transform, write), --profile[=cprofile|folded] ghi file profile
+
+Cách sử dụng:
+    python transform_documents.py <input_file> [output_file] [options]
+
+Ví dụ:
+    python transform_documents.py exported_data.json exported_data_no_version.json
+    python transform_documents.py exported_data.jsonl clean.jsonl --drop attachment --rename image=image_url
+    python transform_documents.py exported_data.jsonl clean.json \\
+        --project-indexed wordcloud_config_solr_9.11_bk/conf/managed-schema.xml
+"""
+
+import argparse
+import fnmatch
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from json_stream import DocumentReader, DocumentWriter
+from tracing import TRACER, add_profile_args, profiled, span
+
+BATCH_SIZE = 1000
+DEFAULT_DROP = ['_version_']
+
+Document = Dict[str, Any]
+
+
+def load_indexed_fields(schema_file: str) -> Dict[str, Any]:
+    """
+    Đọc managed-schema, trả về các field được index hoặc có docValues
+
+    Bỏ qua các field đích của copyField vì Solr tự sinh khi index.
+    Field không khai báo indexed thì mặc định là được index. Field indexed="false" nhưng
+    docValues="true" (views, likes, identity_*...) vẫn sort/facet được nên được giữ lại;
+    docValues không khai báo trên field thì lấy theo fieldType.
+
+    Returns:
+        {"fields": set tên field, "patterns": list pattern dynamicField, "unique_key": str}
+    """
+    root = ET.parse(schema_file).getroot()
+    copy_dests = {el.get('dest') for el in root.iter('copyField')}
+    type_doc_values = {el.get('name'): el.get('docValues', 'false') for el in root.iter('fieldType')}
+
+    def searchable(el) -> bool:
+        if el.get('indexed', 'true') != 'false':
+            return True
+        return el.get('docValues', type_doc_values.get(el.get('type'), 'false')) == 'true'
+
+    fields = set()
+    patterns = []
+    for el in root.iter('field'):
+        name = el.get('name')
+        if name and searchable(el) and name not in copy_dests:
+            fields.add(name)
+    for el in root.iter('dynamicField'):
+        name = el.get('name')
+        if name and searchable(el):
+            patterns.append(name)
+
+    unique_key_el = root.find('.//uniqueKey')
+    unique_key = unique_key_el.text.strip() if unique_key_el is not None and unique_key_el.text else 'id'
+    fields.add(unique_key)
+    return {"fields": fields, "patterns": patterns, "unique_key": unique_key}
+
+
+class FieldOperations:
+    """Tập các thao tác trên field, áp dụng theo thứ tự: drop -> rename -> project"""
+
+    def __init__(self, drop: Iterable[str] = (), rename: Optional[Dict[str, str]] = None,
+                 keep: Optional[Set[str]] = None, keep_patterns: Iterable[str] = ()):
+        self.drop = set(drop)
+        self.rename = dict(rename or {})
+        self.keep = set(keep) if keep is not None else None
+        self.keep_patterns = list(keep_patterns)
+        self._keep_cache: Dict[str, bool] = {}
+        self.dropped_count = 0
+        self.renamed_count = 0
+
+    def _is_kept(self, name: str) -> bool:
+        if self.keep is None or name in self.keep:
+            return True
+        kept = self._keep_cache.get(name)
+        if kept is None:
+            kept = any(fnmatch.fnmatchcase(name, p) for p in self.keep_patterns)
+            self._keep_cache[name] = kept
+        return kept
+
+    def apply(self, doc: Document) -> Document:
+        for name in self.drop:
+            if name in doc:
+                del doc[name]
+                self.dropped_count += 1
+        for old, new in self.rename.items():
+            if old in doc:
+                doc[new] = doc.pop(old)
+                self.renamed_count += 1
+        if self.keep is not None:
+            for name in [n for n in doc if not self._is_kept(n)]:
+                del doc[name]
+                self.dropped_count += 1
+        return doc
+
+    def describe(self) -> List[str]:
+        lines = []
+        if self.drop:
+            lines.append(f"drop: {', '.join(sorted(self.drop))}")
+        for old, new in self.rename.items():
+            lines.append(f"rename: {old} -> {new}")
+        if self.keep is not None:
+            lines.append(f"project: {len(self.keep)} fields + {len(self.keep_patterns)} dynamic patterns")
+        return lines
+
+
+def transform_stream(docs: Iterable[Document], operations: Callable[[Document], Document],
+                     batch_size: int = BATCH_SIZE) -> Iterable[List[Document]]:
+    """Áp dụng operations và gom thành các batch"""
+    batch = []
+    for doc in docs:
+        batch.append(operations(doc))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def transform_file(input_file: str, output_file: str, operations: FieldOperations,
+                   output_format: Optional[str] = None, indent: Optional[int] = None,
+                   batch_size: int = BATCH_SIZE) -> bool:
+    """Đọc input, áp dụng operations và ghi ra output theo từng batch"""
+    if not os.path.exists(input_file):
+        print(f"❌ File không tồn tại: {input_file}")
+        return False
+    if os.path.abspath(input_file) == os.path.abspath(output_file):
+        print("❌ Output file phải khác input file")
+        return False
+
+    reader = DocumentReader(input_file)
+    print(f"📖 Đang đọc file: {input_file} ({reader.format})")
+    for line in operations.describe():
+        print(f"   🔧 {line}")
+
+    start = time.time()
+    try:
+        with DocumentWriter(output_file, output_format, indent) as writer:
+            print(f"📝 Đang ghi vào file: {output_file} ({writer.format})")
+            batches = transform_stream(reader, operations.apply, batch_size)
+            while True:
+                # Đọc + parse JSON + áp dụng operations nằm chung trong generator
+                with span("read+transform"):
+                    batch = next(batches, None)
+                if batch is None:
+                    break
+                with span("write"):
+                    writer.write_batch(batch)
+                if writer.docs_written % (batch_size * 100) == 0:
+                    percent = reader.bytes_read * 100 / reader.total_bytes if reader.total_bytes else 100
+                    print(f"   Đã xử lý: {writer.docs_written:,} records ({percent:.1f}%)")
+    except ValueError as e:
+        print(f"❌ Lỗi khi đọc file: {e}")
+        return False
+
+    elapsed = time.time() - start
+    print(f"   ✅ Tổng số records: {writer.docs_written:,}")
+    print(f"   ✅ Số field đã xóa: {operations.dropped_count:,}, đã đổi tên: {operations.renamed_count:,}")
+    if reader.bad_records:
+        print(f"   ⚠️  Bỏ qua {reader.bad_records:,} records lỗi ({reader.last_error})")
+
+    input_size = os.path.getsize(input_file)
+    output_size = os.path.getsize(output_file)
+    print("   ✅ Kích thước file:")
+    print(f"      Input: {input_size / (1024*1024):.2f} MB")
+    print(f"      Output: {output_size / (1024*1024):.2f} MB")
+    print(f"✅ Hoàn thành trong {elapsed:.2f}s!")
+    TRACER.print_report()
+    return True
+
+
+def parse_rename(values: List[str]) -> Dict[str, str]:
+    rename = {}
+    for value in values:
+        if '=' not in value:
+            raise argparse.ArgumentTypeError(f"--rename cần dạng old=new: {value}")
+        old, new = value.split('=', 1)
+        rename[old.strip()] = new.strip()
+    return rename
+
+
+def main():
+    # Set UTF-8 encoding cho Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="Biến đổi documents của file export theo kiểu streaming")
+    parser.add_argument("input_file")
+    parser.add_argument("output_file", nargs="?")
+    parser.add_argument("--drop", action="append", default=[], metavar="FIELD",
+                        help="Xóa field (có thể lặp lại). _version_ luôn bị xóa trừ khi --keep-version")
+    parser.add_argument("--keep-version", action="store_true", help="Không xóa _version_")
+    parser.add_argument("--rename", action="append", default=[], metavar="OLD=NEW", help="Đổi tên field")
+    parser.add_argument("--fields", help="Chỉ giữ các field này (phân cách bằng dấu phẩy)")
+    parser.add_argument("--project-indexed", metavar="SCHEMA",
+                        help="Chỉ giữ các field được index hoặc có docValues theo managed-schema")
+    parser.add_argument("--format", choices=["json", "jsonl"], help="Format output (mặc định: theo đuôi file)")
+    parser.add_argument("--indent", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    output_file = args.output_file
+    if output_file is None:
+        base, ext = os.path.splitext(args.input_file)
+        output_file = f"{base}_transformed{ext or '.json'}"
+        print(f"⚠️  Không chỉ định output file, sẽ tạo: {output_file}")
+
+    drop = list(args.drop) if args.keep_version else DEFAULT_DROP + list(args.drop)
+    keep = None
+    patterns: List[str] = []
+    if args.fields:
+        keep = {f.strip() for f in args.fields.split(',') if f.strip()}
+    if args.project_indexed:
+        schema = load_indexed_fields(args.project_indexed)
+        keep = schema["fields"] if keep is None else keep & schema["fields"]
+        patterns = schema["patterns"]
+
+    try:
+        rename = parse_rename(args.rename)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    operations = FieldOperations(drop=drop, rename=rename, keep=keep, keep_patterns=patterns)
+    with profiled(args.profile, "transform_documents", args.profile_out):
+        success = transform_file(args.input_file, output_file, operations, args.format,
+                                 args.indent, args.batch_size)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
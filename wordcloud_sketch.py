@@ -0,0 +1,569 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tính word cloud (top-K terms của search_text_cloud) ngay tại local bằng heavy-hitter sketches
+- Space-Saving (capacity cố định) giữ các term ứng viên, mỗi term có cận sai số
+- Count-Min Sketch (width x depth theo epsilon/delta) thu hẹp cận trên của count
+- Bộ nhớ cố định bất kể số documents/terms, có thể lọc theo domain, platform, khoảng ngày
+- Count giống facet của Solr: số documents chứa term (mỗi document chỉ tính một lần)
+
+Nguồn terms:
+    - File terms (JSONL có field "terms") sinh bởi lệnh extract, lấy từ analysis API của Solr
+      (đúng analyzer VnCoreNLP) hoặc tokenizer đơn giản (analysis.py)
+    - Hoặc trực tiếp file export: search_text được tokenize bằng tokenizer đơn giản,
+      count sẽ không khớp với container nào (VnCoreNLP tách từ ghép khác)
+
+Cách sử dụng:
+    python wordcloud_sketch.py extract exported_data.jsonl terms.jsonl [--analyzer solr --port 8983]
+    python wordcloud_sketch.py cloud terms.jsonl [--domain news.vn] [--platform 1] [--from 2024-01-01 --to 2024-01-31]
+    python wordcloud_sketch.py validate terms.jsonl --port 8983 [--top 100] [filters...]
+
+validate so sánh top-K của sketch với count chính xác (tính cùng lượt) và với facet của Solr
+(facet.field=search_text_cloud, cùng filter dạng fq), in recall@K, sai số count và bộ nhớ.
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import os
+import sys
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import requests
+
+from analysis import field_terms
+from compare_facet_results import CONTAINERS, FACET_PARAMS
+from json_stream import DocumentReader
+from solr_javabin import facet_pairs, solr_get
+
+FACET_FIELD = "search_text_cloud"
+DATE_FIELD = "created_date"
+TOP_K = 100
+CAPACITY = 2000  # Số term Space-Saving theo dõi (nên >= 20 x TOP_K), sai số count <= N / CAPACITY
+EPSILON = 0.0005  # Count-Min: sai số <= EPSILON * N ...
+DELTA = 0.001  # ... với xác suất >= 1 - DELTA
+MIN_RECALL = 0.95
+BATCH_DOCS = 1000  # Gộp count theo lô documents trước khi đưa vào sketch (giảm số lần hash/heap)
+PROGRESS_EVERY = 100000
+
+
+class SpaceSaving:
+    """
+    Space-Saving (Metwally et al.): giữ tối đa `capacity` term
+
+    Khi đầy, term mới thay term có count nhỏ nhất và kế thừa count đó làm sai số.
+    Với mỗi term được giữ: count - error <= count thật <= count. Mọi term có count thật
+    > N / capacity chắc chắn nằm trong sketch.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []  # (count, term), entry cũ bị bỏ qua khi pop
+        self.n = 0
+
+    def add(self, term: str, weight: int = 1):
+        """Thêm term với trọng số (Space-Saving có trọng số giữ nguyên các cận sai số)"""
+        self.n += weight
+        counts = self.counts
+        count = counts.get(term)
+        if count is not None:
+            counts[term] = count + weight
+            heapq.heappush(self._heap, (count + weight, term))
+        elif len(counts) < self.capacity:
+            counts[term] = weight
+            self.errors[term] = 0
+            heapq.heappush(self._heap, (weight, term))
+        else:
+            min_count, victim = self._pop_min()
+            del counts[victim]
+            del self.errors[victim]
+            counts[term] = min_count + weight
+            self.errors[term] = min_count
+            heapq.heappush(self._heap, (min_count + weight, term))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, t) for t, c in counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> Tuple[int, str]:
+        while True:
+            count, term = heapq.heappop(self._heap)
+            if self.counts.get(term) == count:
+                return count, term
+
+    def top(self, k: int) -> List[Tuple[str, int, int]]:
+        """Top-k (term, count, error) theo count giảm dần"""
+        items = heapq.nsmallest(k, self.counts.items(), key=lambda kv: (-kv[1], kv[0]))
+        return [(term, count, self.errors[term]) for term, count in items]
+
+    def error_bound(self) -> int:
+        """Sai số tối đa của mọi count: count nhỏ nhất khi sketch đã đầy"""
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def memory_bytes(self) -> int:
+        # Ước tính: dict entry + string term + heap entry
+        return self.capacity * 200
+
+
+class CountMinSketch:
+    """Count-Min Sketch: ước lượng >= count thật, vượt quá <= epsilon * N với xác suất 1 - delta"""
+
+    def __init__(self, epsilon: float = EPSILON, delta: float = DELTA):
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.epsilon = epsilon
+        self.delta = delta
+        self.rows = [array('I', bytes(4 * self.width)) for _ in range(self.depth)]
+        self.n = 0
+
+    def _indexes(self, term: str) -> Iterator[int]:
+        # Double hashing: h1 + i * h2, đủ độc lập cho Count-Min (Kirsch & Mitzenmacher)
+        digest = hashlib.blake2b(term.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        width = self.width
+        return ((h1 + i * h2) % width for i in range(self.depth))
+
+    def add(self, term: str, weight: int = 1):
+        self.n += weight
+        for row, index in zip(self.rows, self._indexes(term)):
+            row[index] += weight
+
+    def estimate(self, term: str) -> int:
+        return min(row[index] for row, index in zip(self.rows, self._indexes(term)))
+
+    def error_bound(self) -> float:
+        return self.epsilon * self.n
+
+    def memory_bytes(self) -> int:
+        return self.width * self.depth * 4
+
+
+class WordCloudSketch:
+    """
+    Kết hợp Space-Saving (chọn term) và Count-Min (siết cận trên)
+
+    Terms được gộp count theo lô BATCH_DOCS documents rồi mới đưa vào sketch với trọng số:
+    term phổ biến chỉ hash/đẩy heap một lần mỗi lô. Bộ nhớ của lô bị chặn bởi kích thước lô.
+    """
+
+    def __init__(self, capacity: int = CAPACITY, epsilon: float = EPSILON, delta: float = DELTA,
+                 batch_docs: int = BATCH_DOCS):
+        self.space_saving = SpaceSaving(capacity)
+        self.count_min = CountMinSketch(epsilon, delta)
+        self.batch_docs = batch_docs
+        self.docs = 0
+        self._pending = Counter()
+        self._pending_docs = 0
+
+    def add_document(self, terms: Iterable[str]):
+        self.docs += 1
+        self._pending.update(set(terms))
+        self._pending_docs += 1
+        if self._pending_docs >= self.batch_docs:
+            self.flush()
+
+    def flush(self):
+        # Term nặng trước: term hiếm cuối lô chỉ thay thế lẫn nhau, không đẩy term đang lên hạng ra ngoài
+        for term, weight in self._pending.most_common():
+            self.space_saving.add(term, weight)
+            self.count_min.add(term, weight)
+        self._pending = Counter()
+        self._pending_docs = 0
+
+    def top(self, k: int) -> List[Dict[str, Any]]:
+        """Top-k với khoảng [lower, upper] chứa count thật; estimate = upper"""
+        self.flush()
+        # Lấy dư ứng viên vì thứ tự có thể đổi sau khi siết bằng Count-Min
+        candidates = self.space_saving.top(max(k * 2, k + 50))
+        cloud = []
+        for term, count, error in candidates:
+            upper = min(count, self.count_min.estimate(term))
+            cloud.append({"term": term, "count": upper, "lower": max(0, count - error), "upper": upper})
+        cloud.sort(key=lambda item: (-item["count"], item["term"]))
+        return cloud[:k]
+
+    def memory_bytes(self) -> int:
+        return self.space_saving.memory_bytes() + self.count_min.memory_bytes()
+
+
+class DocumentFilter:
+    """Lọc documents theo domain, platform, khoảng ngày (cùng ngữ nghĩa với fq gửi lên Solr)"""
+
+    def __init__(self, domains: Optional[List[str]] = None, platforms: Optional[List[int]] = None,
+                 date_from: Optional[str] = None, date_to: Optional[str] = None,
+                 date_field: str = DATE_FIELD):
+        self.domains = set(domains) if domains else None
+        self.platforms = set(platforms) if platforms else None
+        self.date_from = normalize_date(date_from, end=False) if date_from else None
+        self.date_to = normalize_date(date_to, end=True) if date_to else None
+        self.date_field = date_field
+
+    def __call__(self, doc: Dict[str, Any]) -> bool:
+        if self.domains is not None and doc.get("domain") not in self.domains:
+            return False
+        if self.platforms is not None:
+            try:
+                if int(doc.get("platform")) not in self.platforms:
+                    return False
+            except (TypeError, ValueError):
+                return False
+        if self.date_from or self.date_to:
+            value = doc.get(self.date_field)
+            if not value:
+                return False
+            value = normalize_date(str(value), end=False)
+            if self.date_from and value < self.date_from:
+                return False
+            if self.date_to and value > self.date_to:
+                return False
+        return True
+
+    def to_fq(self) -> List[str]:
+        fq = []
+        if self.domains:
+            fq.append("{!terms f=domain}" + ",".join(sorted(self.domains)))
+        if self.platforms:
+            fq.append("{!terms f=platform}" + ",".join(str(p) for p in sorted(self.platforms)))
+        if self.date_from or self.date_to:
+            fq.append(f"{self.date_field}:[{self.date_from or '*'} TO {self.date_to or '*'}]")
+        return fq
+
+    def describe(self) -> str:
+        return " AND ".join(self.to_fq()) or "(không lọc)"
+
+
+def normalize_date(value: str, end: bool) -> str:
+    """YYYY-MM-DD -> ISO đầu/cuối ngày, ISO có millis -> bỏ millis để so sánh chuỗi"""
+    if len(value) == 10:
+        return value + ("T23:59:59Z" if end else "T00:00:00Z")
+    if '.' in value:
+        value = value.split('.', 1)[0] + 'Z'
+    return value
+
+
+def document_terms(doc: Dict[str, Any]) -> Set[str]:
+    """Terms của document: field "terms" (file extract) hoặc tokenize search_text"""
+    terms = doc.get("terms")
+    if terms is not None:
+        return set(terms)
+    return field_terms(doc, FACET_FIELD)
+
+
+def build_sketch(path: str, doc_filter: DocumentFilter, capacity: int, epsilon: float, delta: float,
+                 exact: bool = False, batch_docs: int = BATCH_DOCS
+                 ) -> Tuple[WordCloudSketch, Optional[Counter], Dict[str, Any]]:
+    """Stream file một lượt vào sketch; exact=True thì đếm chính xác song song để kiểm chứng"""
+    sketch = WordCloudSketch(capacity, epsilon, delta, batch_docs)
+    exact_counts = Counter() if exact else None
+    reader = DocumentReader(path)
+    start = time.time()
+    local_docs = 0
+    for doc in reader:
+        if not doc_filter(doc):
+            continue
+        if "terms" not in doc:
+            local_docs += 1
+        terms = document_terms(doc)
+        sketch.add_document(terms)
+        if exact_counts is not None:
+            exact_counts.update(terms)
+        if reader.docs_read % PROGRESS_EVERY == 0:
+            print(f"   📖 {reader.docs_read:,} docs đọc, {sketch.docs:,} docs khớp filter")
+    sketch.flush()
+    stats = {
+        "docs_read": reader.docs_read,
+        "docs_matched": sketch.docs,
+        "docs_tokenized_locally": local_docs,
+        "term_occurrences": sketch.space_saving.n,
+        "elapsed_seconds": round(time.time() - start, 2),
+        "memory_bytes": sketch.memory_bytes(),
+        "space_saving_error": sketch.space_saving.error_bound(),
+        "count_min_error": round(sketch.count_min.error_bound(), 1),
+        "count_min_shape": [sketch.count_min.depth, sketch.count_min.width],
+    }
+    return sketch, exact_counts, stats
+
+
+def solr_analyzed_terms(session: requests.Session, port: int, core: str, text: str) -> List[str]:
+    """Terms ở bước cuối của analysis chain index-time của search_text_cloud"""
+    url = f"http://localhost:{port}/solr/{core}/analysis/field"
+    data = {"analysis.fieldname": FACET_FIELD, "analysis.fieldvalue": text,
+            "analysis.showmatch": "false", "wt": "json"}
+    response = session.post(url, data=data, timeout=120)
+    response.raise_for_status()
+    stages = (response.json().get("analysis", {}).get("field_names", {})
+              .get(FACET_FIELD, {}).get("index", []))
+    for item in reversed(stages):
+        if isinstance(item, list):
+            return [token.get("text") for token in item if token.get("text")]
+    return []
+
+
+def extract_terms(data_file: str, output_file: str, analyzer: str, port: int, core: str,
+                  date_field: str, workers: int) -> Dict[str, int]:
+    """Ghi file terms: {id, domain, platform, <date_field>, terms} cho mỗi document"""
+    keep = ("id", "domain", "platform", date_field)
+    stats = {"docs": 0, "errors": 0}
+    session = requests.Session()
+
+    def analyze(doc):
+        if analyzer == "local":
+            return sorted(field_terms(doc, FACET_FIELD))
+        values = doc.get("search_text") or []
+        values = values if isinstance(values, list) else [values]
+        # Mỗi giá trị multiValued được analyze riêng giống lúc index
+        terms = set()
+        for value in values:
+            terms.update(solr_analyzed_terms(session, port, core, str(value)))
+        return sorted(terms)
+
+    def batches(reader, size=500):
+        batch = []
+        for doc in reader:
+            batch.append(doc)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    with open(output_file, 'w', encoding='utf-8') as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in batches(DocumentReader(data_file)):
+            futures = [pool.submit(analyze, doc) for doc in batch]
+            for doc, future in zip(batch, futures):
+                try:
+                    terms = future.result()
+                except requests.exceptions.RequestException as e:
+                    stats["errors"] += 1
+                    print(f"   ❌ Lỗi analyze {doc.get('id')}: {e}")
+                    continue
+                record = {k: doc[k] for k in keep if k in doc}
+                record["terms"] = terms
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                stats["docs"] += 1
+            print(f"   ✅ {stats['docs']:,} documents")
+    return stats
+
+
+def solr_facet(port: int, core: str, doc_filter: DocumentFilter, limit: int) -> Tuple[List[Tuple[str, int]], int]:
+    """Facet chính xác từ Solr với cùng filter, trả về ([(term, count)], numFound)"""
+    url = f"http://localhost:{port}/solr/{core}/select"
+    params = dict(FACET_PARAMS)
+    params["facet.limit"] = str(limit)
+    fq = doc_filter.to_fq()
+    if fq:
+        params["fq"] = fq
+    data = solr_get(None, url, params, timeout=120, compact=True)
+    pairs = list(facet_pairs(data.get("facet_counts", {}).get("facet_fields", {}).get(FACET_FIELD, [])))
+    return pairs, data.get("response", {}).get("numFound", 0)
+
+
+def score_cloud(cloud: List[Dict[str, Any]], truth: List[Tuple[str, int]], k: int) -> Dict[str, Any]:
+    """So sánh top-k của sketch với top-k chính xác (tie-aware ở biên)"""
+    truth_counts = dict(truth)
+    truth_top = truth[:k]
+    kth = truth_top[-1][1] if len(truth_top) >= k else 0
+    sketch_terms = [item["term"] for item in cloud[:k]]
+    exact_terms = {term for term, _ in truth_top}
+    # Term có count bằng count thứ k cũng là đáp án đúng (Solr cũng chọn ngẫu nhiên theo tie)
+    acceptable = {term for term, count in truth if count >= kth} if kth else exact_terms
+    hits = sum(1 for term in sketch_terms if term in acceptable)
+    errors = [abs(item["count"] - truth_counts[item["term"]]) for item in cloud[:k] if item["term"] in truth_counts]
+    relative = [abs(item["count"] - truth_counts[item["term"]]) / truth_counts[item["term"]]
+                for item in cloud[:k] if truth_counts.get(item["term"])]
+    outside_bounds = [item["term"] for item in cloud[:k] if item["term"] in truth_counts
+                      and not item["lower"] <= truth_counts[item["term"]] <= item["upper"]]
+    return {
+        "k": min(k, len(truth_top)),
+        "recall": hits / min(k, len(truth_top)) if truth_top else 1.0,
+        "missing": [term for term, _ in truth_top if term not in set(sketch_terms) and truth_counts[term] > kth],
+        "max_abs_error": max(errors) if errors else 0,
+        "mean_abs_error": round(sum(errors) / len(errors), 2) if errors else 0,
+        "max_rel_error": round(max(relative), 4) if relative else 0,
+        "outside_bounds": outside_bounds,
+    }
+
+
+def filter_from_args(args) -> DocumentFilter:
+    domains = [d.strip() for d in args.domain.split(',')] if args.domain else None
+    platforms = [int(p) for p in args.platform.split(',')] if args.platform else None
+    return DocumentFilter(domains, platforms, args.date_from, args.date_to, args.date_field)
+
+
+def print_cloud(cloud: List[Dict[str, Any]], limit: int):
+    for idx, item in enumerate(cloud[:limit], 1):
+        spread = item["upper"] - item["lower"]
+        bound = f"±{spread}" if spread else "chính xác"
+        print(f"   {idx:>4}. {item['term']:<30} {item['count']:>10,}  ({bound})")
+
+
+def print_stats(stats: Dict[str, Any]):
+    print(f"   Documents: {stats['docs_matched']:,} / {stats['docs_read']:,} khớp filter, "
+          f"{stats['term_occurrences']:,} lượt term")
+    print(f"   Bộ nhớ sketch: ~{stats['memory_bytes'] / 1024 / 1024:.1f} MB "
+          f"(Count-Min {stats['count_min_shape'][0]}x{stats['count_min_shape'][1]})")
+    print(f"   Cận sai số: Space-Saving <= {stats['space_saving_error']:,}, "
+          f"Count-Min <= {stats['count_min_error']:,}")
+    print(f"   Thời gian: {stats['elapsed_seconds']:.2f}s")
+    if stats["docs_tokenized_locally"]:
+        print(f"   ⚠️  {stats['docs_tokenized_locally']:,} documents không có field \"terms\", đã tokenize "
+              f"search_text bằng tokenizer đơn giản: count sẽ không khớp với container nào "
+              f"(chạy extract --analyzer solr trước)")
+
+
+def cmd_extract(args):
+    print("━" * 70)
+    print(f"🔤 Trích terms: {args.data_file} -> {args.output_file} (analyzer: {args.analyzer})")
+    print("━" * 70)
+    start = time.time()
+    stats = extract_terms(args.data_file, args.output_file, args.analyzer, args.port, args.core,
+                          args.date_field, args.workers)
+    print(f"\n✅ {stats['docs']:,} documents, {stats['errors']:,} lỗi trong {time.time() - start:.1f}s")
+
+
+def cmd_cloud(args):
+    doc_filter = filter_from_args(args)
+    print("━" * 70)
+    print(f"☁️  Word cloud (sketch): {args.data_file}")
+    print(f"   Filter: {doc_filter.describe()}")
+    print("━" * 70)
+    sketch, _, stats = build_sketch(args.data_file, doc_filter, args.capacity, args.epsilon, args.delta,
+                                    batch_docs=args.batch_docs)
+    cloud = sketch.top(args.top)
+    print_stats(stats)
+    print()
+    print_cloud(cloud, args.top)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"filter": doc_filter.describe(), "stats": stats, "cloud": cloud}, f,
+                      ensure_ascii=False, indent=2)
+        print(f"\n💾 Đã lưu: {args.output}")
+
+
+def cmd_validate(args):
+    doc_filter = filter_from_args(args)
+    print("━" * 70)
+    print(f"🔬 Kiểm chứng sketch với count chính xác và facet Solr: {args.data_file}")
+    print(f"   Filter: {doc_filter.describe()}")
+    print("━" * 70)
+    sketch, exact_counts, stats = build_sketch(args.data_file, doc_filter, args.capacity,
+                                               args.epsilon, args.delta, exact=True,
+                                               batch_docs=args.batch_docs)
+    cloud = sketch.top(args.top)
+    print_stats(stats)
+
+    exact_truth = sorted(exact_counts.items(), key=lambda kv: (-kv[1], kv[0]))
+    results = {"filter": doc_filter.describe(), "stats": stats,
+               "vs_exact": score_cloud(cloud, exact_truth, args.top), "vs_solr": {}}
+
+    targets = [c for c in CONTAINERS if not args.port or c["port"] == args.port]
+    for container in targets:
+        try:
+            solr_start = time.perf_counter()
+            # Lấy dư terms (facet.limit mặc định) để term đồng hạng ở biên top-k vẫn có count chính xác
+            pairs, num_found = solr_facet(container["port"], container["core"], doc_filter,
+                                          max(args.top, int(FACET_PARAMS["facet.limit"])))
+            solr_ms = (time.perf_counter() - solr_start) * 1000
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"   ❌ Không query được {container['version']}: {e}")
+            continue
+        score = score_cloud(cloud, pairs, args.top)
+        score.update({"num_found": num_found, "latency_ms": round(solr_ms, 1)})
+        results["vs_solr"][container["version"]] = score
+
+    print("\n" + "━" * 70)
+    print(f"📊 KẾT QUẢ (top {args.top})")
+    print("━" * 70)
+    rows = [("Count chính xác (local)", results["vs_exact"])]
+    rows += [(version, score) for version, score in results["vs_solr"].items()]
+    print(f"   {'So với':<32} {'Recall':>8} {'Max err':>9} {'Mean err':>9} {'Max rel':>8} {'Ngoài cận':>10}")
+    for label, score in rows:
+        print(f"   {label:<32} {score['recall']*100:>7.1f}% {score['max_abs_error']:>9,} "
+              f"{score['mean_abs_error']:>9} {score['max_rel_error']*100:>7.2f}% {len(score['outside_bounds']):>10}")
+    for label, score in rows:
+        if score.get("num_found") is not None and score["num_found"] != stats["docs_matched"]:
+            print(f"   ⚠️  {label}: Solr có {score['num_found']:,} docs khớp filter, local có "
+                  f"{stats['docs_matched']:,} (file export/terms không cùng dữ liệu với core)")
+        if score["missing"]:
+            print(f"   ⚠️  {label}: thiếu {len(score['missing'])} term trong top {args.top}: "
+                  f"{', '.join(score['missing'][:10])}")
+
+    ok = results["vs_exact"]["recall"] >= args.min_recall and not results["vs_exact"]["outside_bounds"]
+    print()
+    if ok:
+        print(f"✅ Sketch đạt recall >= {args.min_recall:.0%} so với count chính xác, "
+              f"có thể dùng để giảm tải facet cho cluster")
+    else:
+        print(f"❌ Sketch chưa đạt recall {args.min_recall:.0%}: tăng --capacity hoặc giảm --epsilon")
+    results["accepted"] = ok
+
+    output = args.output or f"wordcloud_sketch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"💾 Kết quả đã lưu vào: {output}")
+
+
+def main():
+    # Set UTF-8 encoding cho Windows
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="Word cloud top-K bằng Space-Saving + Count-Min sketch")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("extract", help="Trích terms của search_text_cloud cho từng document")
+    p.add_argument("data_file", help="File export (JSONL hoặc JSON)")
+    p.add_argument("output_file", help="File terms JSONL")
+    p.add_argument("--analyzer", choices=["solr", "local"], default="solr",
+                   help="solr: analysis API (đúng VnCoreNLP); local: tokenizer đơn giản")
+    p.add_argument("--port", type=int, default=8983, help="Port Solr cho analysis API (mặc định: 8983)")
+    p.add_argument("--core", default="topic_tanvd", help="Core (mặc định: topic_tanvd)")
+    p.add_argument("--workers", type=int, default=4, help="Số request analysis song song (mặc định: 4)")
+    p.add_argument("--date-field", default=DATE_FIELD, help=f"Field ngày giữ lại để lọc (mặc định: {DATE_FIELD})")
+    p.set_defaults(func=cmd_extract)
+
+    for name, func, help_text in (("cloud", cmd_cloud, "Tính word cloud bằng sketch"),
+                                  ("validate", cmd_validate, "So sánh sketch với count chính xác và facet Solr")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("data_file", help="File terms (từ extract) hoặc file export")
+        p.add_argument("--top", type=int, default=TOP_K, help=f"Số term của word cloud (mặc định: {TOP_K})")
+        p.add_argument("--domain", help="Lọc theo domain (nhiều giá trị cách nhau bởi dấu phẩy)")
+        p.add_argument("--platform", help="Lọc theo platform (vd: 1,2)")
+        p.add_argument("--from", dest="date_from", help="Từ ngày (YYYY-MM-DD hoặc ISO)")
+        p.add_argument("--to", dest="date_to", help="Đến ngày (YYYY-MM-DD hoặc ISO, tính cả ngày cuối)")
+        p.add_argument("--date-field", default=DATE_FIELD, help=f"Field ngày để lọc (mặc định: {DATE_FIELD})")
+        p.add_argument("--capacity", type=int, default=CAPACITY,
+                       help=f"Số term Space-Saving theo dõi (mặc định: {CAPACITY})")
+        p.add_argument("--epsilon", type=float, default=EPSILON, help=f"Sai số Count-Min (mặc định: {EPSILON})")
+        p.add_argument("--delta", type=float, default=DELTA, help=f"Xác suất vượt sai số (mặc định: {DELTA})")
+        p.add_argument("--batch-docs", type=int, default=BATCH_DOCS,
+                       help=f"Số documents gộp count trước khi đưa vào sketch, 1 = không gộp (mặc định: {BATCH_DOCS})")
+        p.add_argument("--output", help="File JSON kết quả")
+        p.set_defaults(func=func)
+        if name == "validate":
+            p.add_argument("--port", type=int, help="Chỉ so sánh với container ở port này (mặc định: cả 3)")
+            p.add_argument("--min-recall", type=float, default=MIN_RECALL,
+                           help=f"Recall tối thiểu để chấp nhận sketch (mặc định: {MIN_RECALL})")
+
+    args = parser.parse_args()
+    if not os.path.exists(args.data_file):
+        print(f"❌ File không tồn tại: {args.data_file}")
+        sys.exit(1)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()